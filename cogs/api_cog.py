@@ -18,11 +18,12 @@ from database.db import (
     get_all_recent_backups,
     get_all_schedules, get_schedule_by_uuid, set_schedule_enabled, set_schedule_next_run, create_schedule_log,
     get_all_deployments, get_deployment_by_uuid, update_deployment,
-    get_live_deployment_by_subdomain, get_live_deployment_by_fqdn, get_active_deployments,
+    get_live_deployment_by_subdomain, get_live_deployment_by_fqdn,
     create_managed_service, get_managed_service, get_all_managed_services,
     update_managed_service, delete_managed_service,
     get_alerts, get_unacknowledged_alert_count, acknowledge_alert, acknowledge_all_alerts,
     create_tusd_upload, create_tusd_upload_meta, update_tusd_upload,
+    get_recent_stage_timings, get_latest_deployment_run,
 )
 import jwt
 import bcrypt
@@ -33,6 +34,8 @@ import shutil
 import ipaddress
 from typing import Optional
 from utils.domains import fqdn_of
+from utils.pm2_profile import load_profile, parse_profile
+from utils.stage_timing import summarize as summarize_stage_timings
 
 def json_serial(obj):
     if isinstance(obj, datetime):
@@ -161,6 +164,7 @@ class ApiCog(commands.Cog):
         self._add_route('OPTIONS', '/{tail:.*}', self.handle_options)
         self._add_route('POST', '/api/auth/check-user', self.handle_check_user)
         self._add_route('GET', '/api/stats', self.handle_get_system_resources)
+        self._add_route('GET', '/api/stats/host', self.handle_host_metrics)
         self._add_route('GET', '/api/cloudflare/records', self.handle_get_dns_records)
         self._add_route('POST', '/api/cloudflare/records', self.handle_create_dns_record)
         self._add_route('PUT', '/api/cloudflare/records/{record_id}', self.handle_update_dns_record)
@@ -210,6 +214,12 @@ class ApiCog(commands.Cog):
         # Watchdog down-alert toggle (off by default so a reboot doesn't alert-storm).
         self._add_route('GET', '/api/watchdog', self.handle_watchdog_status)
         self._add_route('POST', '/api/watchdog', self.handle_watchdog_set)
+        self._add_route('GET', '/api/watchdog/uptime', self.handle_watchdog_uptime)
+        self._add_route('GET', '/api/watchdog/incidents', self.handle_watchdog_incidents)
+        self._add_route('GET', '/api/disk/usage', self.handle_disk_usage)
+        self._add_route('GET', '/api/resources/apps', self.handle_app_resources)
+        self._add_route('GET', '/api/traffic', self.handle_traffic)
+        self._add_route('GET', '/api/resources/apps/{app}', self.handle_app_resource_history)
 
         # Alerts / notifications feed (frontend-first)
         self._add_route('GET', '/api/alerts', self.handle_list_alerts)
@@ -235,9 +245,17 @@ class ApiCog(commands.Cog):
         self._add_route('GET', '/api/deployments/{deployment_uuid}/logs/{kind}', self.handle_deployment_logs)
         self._add_route('GET', '/api/deployments/{deployment_uuid}/config', self.handle_deployment_config)
         self._add_route('POST', '/api/deployments/{deployment_uuid}/process', self.handle_deployment_process)
+        self._add_route('GET', '/api/deployments/{deployment_uuid}/process/profile', self.handle_get_process_profile)
+        self._add_route('PUT', '/api/deployments/{deployment_uuid}/process/profile', self.handle_update_process_profile)
+        self._add_route('GET', '/api/deployments/{deployment_uuid}/health', self.handle_get_health_settings)
+        self._add_route('GET', '/api/deployments/{deployment_uuid}/traffic', self.handle_deployment_traffic)
+        self._add_route('PUT', '/api/deployments/{deployment_uuid}/health', self.handle_update_health_settings)
         self._add_route('POST', '/api/deployments/{deployment_uuid}/nginx', self.handle_deployment_nginx)
         self._add_route('POST', '/api/deployments/{deployment_uuid}/ssl/renew', self.handle_deployment_ssl_renew)
         self._add_route('POST', '/api/deployments/{deployment_uuid}/dns/reconcile', self.handle_deployment_dns_reconcile)
+        # Release directories: list kept releases, instant symlink rollback.
+        self._add_route('GET', '/api/deployments/{deployment_uuid}/releases', self.handle_deployment_releases)
+        self._add_route('POST', '/api/deployments/{deployment_uuid}/rollback', self.handle_deployment_rollback)
         # Webhook management (register/inspect/remove GitHub auto-deploy for a deployment)
         self._add_route('GET', '/api/deployments/{deployment_uuid}/webhook', self.handle_get_webhook)
         self._add_route('POST', '/api/deployments/{deployment_uuid}/webhook', self.handle_create_webhook)
@@ -245,6 +263,11 @@ class ApiCog(commands.Cog):
         self._add_route('POST', '/api/deploy', self.handle_deploy)
         self._add_route('GET', '/api/deploy/logs/{run_uuid}', self.handle_stream_logs)
         self._add_route('POST', '/api/deploy/rebuild/{deployment_uuid}', self.handle_rebuild)
+        self._add_route('GET', '/api/deploy/queue', self.handle_deploy_queue)
+        self._add_route('GET', '/api/deploy/queue/{run_uuid}', self.handle_deploy_queue_position)
+        self._add_route('POST', '/api/deploy/cancel/{run_uuid}', self.handle_deploy_cancel)
+        self._add_route('GET', '/api/deploy/timings', self.handle_deploy_timings)
+        self._add_route('GET', '/api/nodes', self.handle_nodes)
         # In-product self-test: exercises the real pipeline against hermetic
         # fixtures (LE staging) and streams via the deploy-logs SSE endpoint above.
         self._add_route('POST', '/api/selftest', self.handle_selftest)
@@ -406,6 +429,16 @@ class ApiCog(commands.Cog):
         except Exception as e:
             return self.json_response({'error': str(e)}, status=500)
 
+    async def handle_host_metrics(self, request):
+        """GET /api/stats/host — last tick's load, per-core CPU, disk/network rates and PSI."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        metrics = mon.host_metrics()
+        if not metrics:
+            return self.json_response({'error': 'No data available'}, status=404)
+        return self.json_response(metrics)
+
     # ------------------------------
     # DEPLOYMENTS (placeholder)
     # ------------------------------
@@ -604,7 +637,7 @@ class ApiCog(commands.Cog):
                 status=404,
             )
 
-        run_id = deployer.queue_rebuild(deployment['deployment_uuid'], 'webhook')
+        run_id = await deployer.queue_rebuild(deployment['deployment_uuid'], 'webhook')
         await self._log_to_discord(
             'Webhook rebuild queued',
             f"Push to `{pushed_branch or tracked_branch}` → rebuilding "
@@ -1230,21 +1263,15 @@ class ApiCog(commands.Cog):
         dep = self.bot.get_cog('DeploymentCog')
         if not dep:
             return self.json_response({'error': 'Deployment module unavailable'}, status=503)
-        deployments = await get_active_deployments()
-        services = await get_all_managed_services()
-        dep_status = await dep.build_overview(deployments)
-        stats = await get_recent_system_resources_with_averages()
-        return self.json_response({
-            'system': stats,
-            'deployments': dep_status,
-            'managed_services': services,
-        })
+        fresh = request.query.get('fresh', 'false').lower() == 'true'
+        return self.json_response(await dep.snapshot('overview', dep.server_overview, fresh=fresh))
 
     async def handle_server_discover(self, request):
         dep = self.bot.get_cog('DeploymentCog')
         if not dep:
             return self.json_response({'error': 'Deployment module unavailable'}, status=503)
-        return self.json_response(await dep.discover_server_state())
+        fresh = request.query.get('fresh', 'false').lower() == 'true'
+        return self.json_response(await dep.snapshot('discover', dep.discover_server_state, fresh=fresh))
 
     async def handle_server_recover(self, request):
         """POST /api/server/recover — bring every active node deployment + enabled pm2 managed
@@ -1254,7 +1281,7 @@ class ApiCog(commands.Cog):
             return self.json_response({'error': 'Deployment module unavailable'}, status=503)
         report = await dep.recover_all()
         recovered = sum(1 for r in report if r['ok'] and r['detail'] != 'already online')
-        failed = [r for r in report if not r['ok']]
+        failed = [r for r in report if r['ok'] is False]   # None: on another node, skipped
         return self.json_response({
             'status': 'ok' if not failed else 'partial',
             'recovered': recovered, 'failed': len(failed), 'report': report,
@@ -1281,6 +1308,112 @@ class ApiCog(commands.Cog):
             self_heal_enabled=data.get('self_heal_enabled'),
         ))
 
+    async def handle_disk_usage(self, request):
+        """GET /api/disk/usage?hours=24&top=10 — largest and fastest-growing disk consumers."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        try:
+            hours = int(request.query.get('hours', 24))
+        except ValueError:
+            return self.json_response({'error': 'Invalid hours parameter'}, status=400)
+        try:
+            top = int(request.query.get('top', 10))
+        except ValueError:
+            return self.json_response({'error': 'Invalid top parameter'}, status=400)
+        return self.json_response(await mon.disk_usage_report(
+            hours=max(1, min(hours, 24 * 30)), top=max(1, min(top, 100)),
+        ))
+
+    async def handle_app_resources(self, request):
+        """GET /api/resources/apps?hours=24&by=cpu|rss&top=10 — apps using the most CPU/memory."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        try:
+            hours = int(request.query.get('hours', 24))
+        except ValueError:
+            return self.json_response({'error': 'Invalid hours parameter'}, status=400)
+        try:
+            top = int(request.query.get('top', 10))
+        except ValueError:
+            return self.json_response({'error': 'Invalid top parameter'}, status=400)
+        by = request.query.get('by', 'cpu')
+        if by not in ('cpu', 'rss'):
+            return self.json_response({'error': 'Invalid by parameter'}, status=400)
+        return self.json_response(await mon.app_resource_report(
+            hours=max(1, min(hours, 24 * 90)), by=by, top=max(1, min(top, 100)),
+        ))
+
+    async def handle_app_resource_history(self, request):
+        """GET /api/resources/apps/{app}?hours=24 — one app's CPU/RSS/fd/thread history.
+        {app} is a deployment_uuid or svc:<managed service name>."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        try:
+            hours = int(request.query.get('hours', 24))
+        except ValueError:
+            return self.json_response({'error': 'Invalid hours parameter'}, status=400)
+        return self.json_response(await mon.app_resource_history(
+            request.match_info['app'], hours=max(1, min(hours, 24 * 90)),
+        ))
+
+    async def handle_traffic(self, request):
+        """GET /api/traffic?minutes=60&top=10 — deployments ranked by requests (nginx access logs)."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        try:
+            minutes = int(request.query.get('minutes', 60))
+        except ValueError:
+            return self.json_response({'error': 'Invalid minutes parameter'}, status=400)
+        try:
+            top = int(request.query.get('top', 10))
+        except ValueError:
+            return self.json_response({'error': 'Invalid top parameter'}, status=400)
+        return self.json_response(await mon.traffic_report(
+            minutes=max(1, min(minutes, 60 * 24 * 14)), top=max(1, min(top, 100)),
+        ))
+
+    async def handle_deployment_traffic(self, request):
+        """GET /api/deployments/{deployment_uuid}/traffic?minutes=60 — per-minute requests,
+        status classes, bytes, upstream p50/p95/p99 and top paths from its access log."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        try:
+            minutes = int(request.query.get('minutes', 60))
+        except ValueError:
+            return self.json_response({'error': 'Invalid minutes parameter'}, status=400)
+        return self.json_response(await mon.traffic(
+            deployment['deployment_uuid'], minutes=max(1, min(minutes, 60 * 24 * 14)),
+        ))
+
+    async def handle_watchdog_uptime(self, request):
+        """GET /api/watchdog/uptime?target= — uptime % and p50/p95/p99 latency per watchdog
+        target over 24h, 7d and 30d. target is `svc:<uuid>` or `dep:<uuid>`."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        return self.json_response(await mon.uptime_report(request.query.get('target') or None))
+
+    async def handle_watchdog_incidents(self, request):
+        """GET /api/watchdog/incidents?hours=720&target= — outage timeline, newest first."""
+        mon = self.bot.get_cog('MonitoringCog')
+        if not mon:
+            return self.json_response({'error': 'Monitoring module unavailable'}, status=503)
+        try:
+            hours = int(request.query.get('hours', 24 * 30))
+        except ValueError:
+            return self.json_response({'error': 'Invalid hours parameter'}, status=400)
+        return self.json_response(await mon.incident_timeline(
+            hours=max(1, min(hours, 24 * 90)), target=request.query.get('target') or None,
+        ))
+
     # ------------------------------
     # ALERTS / NOTIFICATIONS
     # ------------------------------
@@ -1412,7 +1545,11 @@ class ApiCog(commands.Cog):
         deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
         if not deployment:
             return self.json_response({'error': 'Deployment not found'}, status=404)
-        return self.json_response(await dep.get_deployment_status(deployment))
+        fresh = request.query.get('fresh', 'false').lower() == 'true'
+        return self.json_response(await dep.snapshot(
+            f"status:{deployment['deployment_uuid']}",
+            lambda: dep.get_deployment_status(deployment, fresh=fresh), fresh=fresh,
+        ))
 
     async def handle_deployment_logs(self, request):
         deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
@@ -1446,11 +1583,24 @@ class ApiCog(commands.Cog):
         if kind == 'nginx-error':
             return await self._stream_shell(request, "tail -n 100 -F /var/log/nginx/error.log")
         if kind == 'build':
-            row = await execute_query(
-                "SELECT output_log FROM deployment_logs WHERE deployment_uuid=%s "
-                "ORDER BY started_at DESC LIMIT 1",
-                (request.match_info['deployment_uuid'],), fetch_one=True)
-            return await self._stream_static_text(request, (row or {}).get('output_log') or 'No build logs.')
+            # Latest run's stored log; ?tail=N for its last N lines, ?start=&end= for a
+            # line range (0-based, end exclusive).
+            try:
+                tail = int(request.query['tail']) if 'tail' in request.query else None
+                start = int(request.query.get('start', 0))
+                end = int(request.query['end']) if 'end' in request.query else None
+            except ValueError:
+                return self.json_response({'error': 'Invalid tail/start/end parameter'}, status=400)
+            run = await get_latest_deployment_run(deployment['deployment_uuid'])
+            if not run:
+                return await self._stream_static_text(request, 'No build logs.')
+            dep_cog = self.bot.get_cog('DeploymentCog')
+            lines = await dep_cog.read_run_log(run['run_uuid'], tail, start, end) if dep_cog else []
+            if not lines and run.get('output_log'):
+                # Run recorded before chunked logs: the whole log is in output_log.
+                lines = run['output_log'].split('\n')
+                lines = lines[-tail:] if tail else lines[start:end]
+            return await self._stream_static_text(request, '\n'.join(lines) or 'No build logs.')
         return self.json_response({'error': 'Unknown log kind'}, status=400)
 
     async def handle_deployment_diagnostics(self, request):
@@ -1462,7 +1612,11 @@ class ApiCog(commands.Cog):
         deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
         if not deployment:
             return self.json_response({'error': 'Deployment not found'}, status=404)
-        return self.json_response(await dep.get_deployment_diagnostics(deployment))
+        fresh = request.query.get('fresh', 'false').lower() == 'true'
+        return self.json_response(await dep.snapshot(
+            f"diagnostics:{deployment['deployment_uuid']}",
+            lambda: dep.get_deployment_diagnostics(deployment), fresh=fresh,
+        ))
 
     async def handle_deployment_config(self, request):
         deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
@@ -1508,16 +1662,86 @@ class ApiCog(commands.Cog):
             data = {}
         pm2_name = deployment.get('pm2_name') or deployment['deployment_uuid'][:12]
         # Pass deploy_path + assigned_port so a process pm2 lost is recreated on its
-        # correct port, not just poked.
+        # correct port, not just poked; the profile keeps instances/limits as configured.
         ok, msg = await dep.control_process(
             pm2_name, data.get('action', 'restart'),
             deploy_path=deployment.get('deploy_path'),
             port=deployment.get('assigned_port'),
+            profile=load_profile(deployment.get('process_profile')),
         )
         if not ok:
             return self.json_response({'error': msg}, status=400)
         return self.json_response({'status': data.get('action', 'restart'), 'detail': msg})
 
+    async def handle_get_process_profile(self, request):
+        """GET /api/deployments/{deployment_uuid}/process/profile"""
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        if deployment.get('tech_stack') != 'node':
+            return self.json_response({'error': 'No process for this stack'}, status=400)
+        return self.json_response(await dep.process_profile(deployment))
+
+    async def handle_update_process_profile(self, request):
+        """PUT /api/deployments/{deployment_uuid}/process/profile
+        Body: any of {"instances": 1|N|"max", "exec_mode": "fork"|"cluster",
+        "max_memory_mb": int|null, "heap_mb": int|null}, plus "apply": false to only store.
+        """
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        if deployment.get('tech_stack') != 'node':
+            return self.json_response({'error': 'No process for this stack'}, status=400)
+        try:
+            data = await request.json()
+        except Exception:
+            return self.json_response({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(data, dict):
+            return self.json_response({'error': 'Invalid JSON body'}, status=400)
+        apply = data.pop('apply', True) is not False
+        ok, result = await dep.set_process_profile(deployment, data, apply=apply)
+        if not ok:
+            return self.json_response({'error': result}, status=400)
+        return self.json_response({'status': 'applied' if apply else 'stored', 'profile': result})
+
+    async def handle_get_health_settings(self, request):
+        """GET /api/deployments/{deployment_uuid}/health — health path/mode plus a live
+        origin and edge probe with connect / first-byte / total timings."""
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        return self.json_response(await dep.health_settings(deployment))
+
+    async def handle_update_health_settings(self, request):
+        """PUT /api/deployments/{deployment_uuid}/health
+        Body: any of {"path": "/healthz", "mode": "origin"|"edge"|null}.
+        """
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        try:
+            data = await request.json()
+        except Exception:
+            return self.json_response({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(data, dict):
+            return self.json_response({'error': 'Invalid JSON body'}, status=400)
+        ok, result = await dep.set_health_settings(deployment, data)
+        if not ok:
+            return self.json_response({'error': result}, status=400)
+        return self.json_response({'status': 'stored', 'health': result})
+
     async def handle_deployment_nginx(self, request):
         dep = self.bot.get_cog('DeploymentCog')
         if not dep:
@@ -1559,6 +1783,33 @@ class ApiCog(commands.Cog):
             return self.json_response({'error': msg}, status=400)
         return self.json_response({'status': 'reconciled', 'detail': msg})
 
+    async def handle_deployment_releases(self, request):
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        return self.json_response(await dep.list_deployment_releases(deployment))
+
+    async def handle_deployment_rollback(self, request):
+        """POST /api/deployments/{deployment_uuid}/rollback  body (optional): {"release": name}"""
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        deployment = await get_deployment_by_uuid(request.match_info['deployment_uuid'])
+        if not deployment:
+            return self.json_response({'error': 'Deployment not found'}, status=404)
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+        triggered_by = request.get('auth_key_data', {}).get('owner_discord_id', 'api')
+        ok, msg = await dep.rollback_release(deployment, body.get('release'), triggered_by)
+        if not ok:
+            return self.json_response({'error': msg}, status=400)
+        return self.json_response({'status': 'rolled_back', 'detail': msg})
+
     # ------------------------------
     # WEBHOOK MANAGEMENT
     # ------------------------------
@@ -1647,6 +1898,7 @@ class ApiCog(commands.Cog):
         """POST /api/deploy
         subdomain mode: {project_uuid, subdomain, github_pat, triggered_by}
         custom domain:  {project_uuid, domain, dns_mode: 'cloudflare'|'external', github_pat, triggered_by}
+        optional:       process: {instances, exec_mode, max_memory_mb, heap_mb} (node pm2 profile)
         """
         dep_cog = self.bot.get_cog('DeploymentCog')
         if not dep_cog:
@@ -1696,9 +1948,16 @@ class ApiCog(commands.Cog):
                 'default_branch': project.get('branch', 'main')
             }
 
-            run_id = dep_cog.queue_deploy(
+            process_profile = data.get('process')
+            if process_profile is not None:
+                try:
+                    process_profile = parse_profile(process_profile)
+                except ValueError as e:
+                    return self.json_response({'error': str(e)}, status=400)
+
+            run_id = await dep_cog.queue_deploy(
                 project_data, subdomain, github_pat, triggered_by,
-                domain=domain, dns_mode=dns_mode,
+                domain=domain, dns_mode=dns_mode, process_profile=process_profile,
             )
             return self.json_response({'run_id': run_id}, status=202)
         except Exception as e:
@@ -1710,7 +1969,7 @@ class ApiCog(commands.Cog):
         if not dep_cog:
             return self.json_response({'error': 'Deployment module unavailable'}, status=503)
         run_uuid = request.match_info['run_uuid']
-        queue = dep_cog.get_stream(run_uuid)
+        queue = await dep_cog.attach_stream(run_uuid)
         if not queue:
             return self.json_response({'error': 'No active log stream for that run ID'}, status=404)
         response = web.StreamResponse(
@@ -1755,9 +2014,67 @@ class ApiCog(commands.Cog):
         if not deployment:
             return self.json_response({'error': 'Deployment not found'}, status=404)
         triggered_by = request.get('auth_key_data', {}).get('owner_discord_id', 'api')
-        run_id = dep_cog.queue_rebuild(deployment_uuid, triggered_by)
+        run_id = await dep_cog.queue_rebuild(deployment_uuid, triggered_by)
         return self.json_response({'run_id': run_id}, status=202)
 
+    async def handle_deploy_queue(self, request):
+        """GET /api/deploy/queue  - running and queued deploy/rebuild runs, in dispatch order"""
+        dep_cog = self.bot.get_cog('DeploymentCog')
+        if not dep_cog:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        return self.json_response(await dep_cog.queue_status())
+
+    async def handle_deploy_queue_position(self, request):
+        """GET /api/deploy/queue/{run_uuid}  - one run's queue position and estimated wait"""
+        dep_cog = self.bot.get_cog('DeploymentCog')
+        if not dep_cog:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        status = await dep_cog.queue_status(request.match_info['run_uuid'])
+        if status is None:
+            return self.json_response({'error': 'Run is not queued or running'}, status=404)
+        return self.json_response(status)
+
+    async def handle_deploy_cancel(self, request):
+        """POST /api/deploy/cancel/{run_uuid}
+
+        Cancels a queued run, or a running one that hasn't started switching traffic yet.
+        """
+        dep_cog = self.bot.get_cog('DeploymentCog')
+        if not dep_cog:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        if not await dep_cog.cancel_run(request.match_info['run_uuid']):
+            return self.json_response(
+                {'error': 'Run is not queued, already finished, or past the point of cancellation'},
+                status=409,
+            )
+        return self.json_response({'status': 'cancelling'}, status=202)
+
+    async def handle_deploy_timings(self, request):
+        """GET /api/deploy/timings?kind=deploy|rebuild&limit=200
+
+        p50/p95 seconds per pipeline stage, per stack, over the most recent successful runs.
+        """
+        kind = request.query.get('kind')
+        if kind not in (None, 'deploy', 'rebuild'):
+            return self.json_response({'error': 'Invalid kind parameter'}, status=400)
+        try:
+            limit = int(request.query.get('limit', 200))
+        except ValueError:
+            return self.json_response({'error': 'Invalid limit parameter'}, status=400)
+        limit = max(1, min(limit, 1000))
+        records = await get_recent_stage_timings(limit)
+        return self.json_response({
+            'sampled': len(records),
+            'stacks': summarize_stage_timings(records, kind),
+        })
+
+    async def handle_nodes(self, request):
+        """GET /api/nodes  - deployment nodes, their capacity and the next placement"""
+        dep_cog = self.bot.get_cog('DeploymentCog')
+        if not dep_cog:
+            return self.json_response({'error': 'Deployment module unavailable'}, status=503)
+        return self.json_response(await dep_cog.nodes_overview())
+
     async def handle_selftest(self, request):
         """POST /api/selftest
 
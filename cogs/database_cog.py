@@ -21,7 +21,8 @@ _NYDUS_BACKUP_KEEP = int(os.getenv('NYDUS_BACKUP_KEEP', '12'))  # prune to most-
 _NYDUS_HEAVY_TABLES = [
     t.strip() for t in os.getenv(
         'NYDUS_BACKUP_EXCLUDE_DATA',
-        'nginx_requests,system_stats,auth_key_usage,deployment_logs,slash_command_logs,'
+        'nginx_requests,system_stats,auth_key_usage,deployment_logs,deployment_log_chunks,'
+        'slash_command_logs,'
         'user_login_attempts,demo_school_attendance,demo_school_attendance_tokens,'
         'tusd_uploads,tusd_upload_meta'
     ).split(',') if t.strip()
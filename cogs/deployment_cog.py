@@ -1,40 +1,103 @@
 import asyncio
+import contextlib
+import contextvars
 import json
 import logging
 import os
 import re
 import shutil
+import signal
+import socket
+import time
 import uuid as uuid_lib
 from datetime import datetime, timezone
 
 import aiohttp
 import discord
+from cryptography.fernet import Fernet, InvalidToken
 from discord.ext import commands
 
 from database.db import (
+    append_log_chunk,
+    cancel_deploy_job,
+    claim_deployment_port,
+    claim_deploy_job,
+    create_deploy_job,
     create_deployment,
     create_deployment_log,
     delete_deployment_row,
+    finish_deploy_job,
     get_active_deployments,
+    get_all_deploy_nodes,
     get_all_managed_services,
     get_deployment_by_subdomain,
+    get_deploy_job,
+    get_deploy_nodes,
     get_deployment_by_uuid,
     get_deployments_by_fqdn,
     get_deployments_by_subdomain,
     get_live_deployment_by_fqdn,
     get_live_deployment_by_subdomain,
+    get_log_chunk_index,
+    get_log_chunks,
+    get_open_deploy_jobs,
+    get_recent_system_resources_with_averages,
+    get_stale_deploy_jobs,
     get_stale_pending_deployments,
     get_used_deployment_ports,
+    heartbeat_deploy_job,
+    report_deploy_node,
+    requeue_deploy_job,
+    supersede_rebuild_jobs,
     update_deployment,
     update_deployment_log,
 )
+from utils.blue_green import cutover_cleanup, peer_name
 from utils.deploy_checks import (
-    assign_free_port,
     check_dns_propagated,
-    get_used_ports_from_nginx,
     redact_pat,
 )
+from utils.deploy_queue import (
+    DeployJob,
+    DeployScheduler,
+    JobCancelled,
+    claim_candidates_query,
+    claim_order,
+    estimate_waits,
+    priority_for,
+    stale_job_action,
+)
+from utils.deploy_stages import Stage, run_stages
 from utils.domains import fqdn_of
+from utils.http_probe import parse_health_path, parse_mode, phase_timings, probe_target, status_ok
+from utils.git_mirror import credential_env, mirror_dir_name, parse_ls_remote, strip_credentials
+from utils.log_chunks import LogChunker, chunks_for_range, chunks_for_tail, resume_point, slice_lines
+from utils.nginx_batch import NginxController, link_op, remove_op, write_op
+from utils.nginx_index import NginxSiteIndex
+from utils.placement import choose_node, node_metrics, score_node
+from utils.pm2_profile import (
+    DEFAULT_PROFILE, apply_action, cluster_entry, launch_env, load_profile, parse_profile,
+    resolve_instances, start_command,
+)
+from utils.port_pool import PortPool
+from utils.probe_cache import ProbeCache
+from utils.snapshot_cache import SnapshotCache
+from utils.releases import (
+    CURRENT_LINK,
+    INCOMING,
+    RELEASES_DIR,
+    current_release,
+    link_shared,
+    list_releases,
+    previous_release,
+    prune_releases,
+    release_name,
+    release_root,
+    release_sha,
+    share_dependencies,
+    switch_current,
+)
+from utils.stage_timing import StageSpans
 from utils.validators import validate_domain, validate_env_key, validate_subdomain
 
 
@@ -48,7 +111,7 @@ _PORT_MIN        = int(os.getenv('DEPLOYMENT_PORT_MIN', '3100'))
 _PORT_MAX        = int(os.getenv('DEPLOYMENT_PORT_MAX', '3999'))
 _NGINX_AVAILABLE = '/etc/nginx/sites-available'
 _NGINX_ENABLED   = '/etc/nginx/sites-enabled'
-_DEPLOY_BASE     = '/var/www'
+_DEPLOY_BASE     = os.getenv('DEPLOY_BASE', '/var/www')
 _CERTBOT_EMAIL   = 'nydus@arvo.team'
 _DOMAIN          = os.getenv('DEPLOY_DOMAIN', 'arvo.team')
 _SERVER_IP       = os.getenv('SERVER_IP', '')
@@ -57,37 +120,83 @@ _NODE_MEM_MB     = 512
 _STREAM_TTL      = 300
 _MAX_LINE        = 4096
 _MAX_OUTPUT      = 2 * 1024 * 1024
-_MAX_LOG_BYTES   = 500_000
 _DNS_RETRIES     = 12
 _DNS_DELAY       = 10.0
 _DEV_ID          = int(os.getenv('DEV_ID', '0'))
+_BLUE_GREEN      = os.getenv('DEPLOY_BLUE_GREEN', '1').lower() not in ('0', 'false', 'no', '')
+_DRAIN_SECONDS   = float(os.getenv('DEPLOY_DRAIN_SECONDS', '10'))
+_KEEP_RELEASES   = int(os.getenv('DEPLOY_KEEP_RELEASES', '5'))
+_GIT_MIRROR_DIR  = os.getenv('GIT_MIRROR_DIR', '/var/cache/nydus/git')
+_CLONE_DEPTH     = int(os.getenv('GIT_CLONE_DEPTH', '1'))
+_REFS_TTL        = 60.0
+_PORT_RECONCILE  = 300.0
+_NGINX_WINDOW    = float(os.getenv('NGINX_BATCH_WINDOW', '0.5'))
+_QUEUE_REPORT    = 5.0
+# How long get_deployment_status may serve a probe's last result instead of re-running it.
+_STATUS_MAX_AGE  = {'pm2': 10.0, 'http': 30.0, 'ssl': 3600.0, 'dns': 300.0}
+# How long a whole control-plane response may be served as a snapshot (see snapshot()).
+# While a dashboard has read the overview within _OVERVIEW_DEMAND s, the watchdog tick
+# keeps it refreshed so reads are served from memory.
+_SNAPSHOT_MAX_AGE = {'overview': 30.0, 'discover': 60.0, 'status': 5.0, 'diagnostics': 10.0}
+_OVERVIEW_DEMAND = 600.0
+# Durable job queue: this process claims deploy_jobs rows when DEPLOY_WORKER is on
+# (the default, so a single bot process still does everything). Build-only workers
+# run deploy_worker.py with the same .env.
+_WORKER_ENABLED  = os.getenv('DEPLOY_WORKER', '1').lower() not in ('0', 'false', 'no', '')
+_WORKER_ID       = os.getenv('DEPLOY_WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+_JOB_LEASE       = int(os.getenv('DEPLOY_JOB_LEASE', '60'))
+_JOB_MAX_ATTEMPTS = 2
+_JOB_HEARTBEAT   = 5.0
+_JOB_POLL        = 2.0
+# Multi-node: every worker process reports its machine's capacity under NODE_NAME, new
+# deploys are pinned to the node utils.placement picks, and only that node's workers
+# claim them. A node is any machine running the bot or deploy_worker.py with its own
+# SERVER_IP, DEPLOY_BASE and port range.
+_NODE_NAME       = os.getenv('NODE_NAME') or socket.gethostname()
+_NODE_REPORT     = 15.0
+# Shared HTTP probe client (status, overview, deploy health gates, watchdog): one pooled
+# keep-alive session. HEALTH_PROBE_MODE picks origin (nginx on the node, Host header) or
+# edge (the public hostname) for deployments without their own health_mode.
+_HEALTH_MODE     = parse_mode(os.getenv('HEALTH_PROBE_MODE', '').lower() or None)
+_PROBE_TIMEOUT   = float(os.getenv('HEALTH_PROBE_TIMEOUT', '8'))
+_PROBE_POOL      = int(os.getenv('HEALTH_PROBE_POOL', '20'))
+_PROBE_KEEPALIVE = 30.0
+_PROBE_MAX_BODY  = 1024 * 1024
+_PROBE_EVENTS    = (
+    'request_start', 'dns_resolvehost_start', 'dns_resolvehost_end',
+    'connection_create_start', 'connection_create_end', 'connection_reuseconn',
+    'request_headers_sent', 'request_end',
+)
+
+
+def _trace_mark(event: str):
+    """aiohttp trace callback stamping `event` into the request's trace_request_ctx dict."""
+    async def _mark(session, ctx, params):
+        marks = ctx.trace_request_ctx
+        if isinstance(marks, dict):
+            marks.setdefault(event, time.monotonic())
+    return _mark
 
 
 class DeployError(Exception):
     pass
 
 
-def _nginx_node_http(fqdn: str, port: int) -> str:
+# The scheduler job the current task is running for. Set while a deploy/rebuild holds
+# its slot so run_exec_stream can record child PIDs for cancellation.
+_current_job: contextvars.ContextVar[DeployJob | None] = contextvars.ContextVar('deploy_job', default=None)
+
+
+def _nginx_acme_http(fqdn: str) -> str:
+    """Port-80 placeholder written while a first deploy builds: certbot's nginx plugin
+    adds its HTTP-01 challenge location to it; everything else gets a 503."""
     return (
         f"server {{\n"
         f"    listen 80;\n"
         f"    server_name {fqdn};\n"
         f"\n"
         f"    location / {{\n"
-        f"        proxy_pass http://localhost:{port};\n"
-        f"        proxy_http_version 1.1;\n"
-        f"        proxy_set_header Upgrade $http_upgrade;\n"
-        f"        proxy_set_header Connection upgrade;\n"
-        f"        proxy_set_header Host $host;\n"
-        f"        proxy_cache_bypass $http_upgrade;\n"
-        f"        proxy_set_header X-Real-IP $remote_addr;\n"
-        f"        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;\n"
-        f"        proxy_set_header X-Forwarded-Proto $scheme;\n"
-        f"        proxy_set_header X-Geo-Country $http_cf_ipcountry;\n"
-        f"        proxy_set_header X-Geo-Region $http_cf_region;\n"
-        f"        proxy_set_header X-Geo-City $http_cf_ipcity;\n"
-        f"        proxy_set_header X-Geo-Lat $http_cf_iplatitude;\n"
-        f"        proxy_set_header X-Geo-Long $http_cf_iplongitude;\n"
+        f"        return 503;\n"
         f"    }}\n"
         f"}}\n"
     )
@@ -130,51 +239,6 @@ def _nginx_node_ssl(fqdn: str, port: int) -> str:
     )
 
 
-def _nginx_laravel_http(fqdn: str, deploy_path: str) -> str:
-    return (
-        f"server {{\n"
-        f"    listen 80;\n"
-        f"    server_name {fqdn};\n"
-        f"    root {deploy_path}/public;\n"
-        f"    index index.php index.html;\n"
-        f"\n"
-        f"    location / {{\n"
-        f"        try_files $uri $uri/ /index.php?$query_string;\n"
-        f"    }}\n"
-        f"\n"
-        f"    location ~ \\.php$ {{\n"
-        f"        fastcgi_pass {_PHP_FPM_SOCKET};\n"
-        f"        fastcgi_index index.php;\n"
-        f"        fastcgi_param SCRIPT_FILENAME $realpath_root$fastcgi_script_name;\n"
-        f"        include fastcgi_params;\n"
-        f"    }}\n"
-        f"\n"
-        f"    location ~ /\\.(?!well-known).* {{\n"
-        f"        deny all;\n"
-        f"    }}\n"
-        f"}}\n"
-    )
-
-
-def _nginx_static_http(fqdn: str, root_dir: str) -> str:
-    return (
-        f"server {{\n"
-        f"    listen 80;\n"
-        f"    server_name {fqdn};\n"
-        f"    root {root_dir};\n"
-        f"    index index.html;\n"
-        f"\n"
-        f"    location / {{\n"
-        f"        try_files $uri $uri/ /index.html;\n"
-        f"    }}\n"
-        f"\n"
-        f"    location ~ /\\.(?!well-known).* {{\n"
-        f"        deny all;\n"
-        f"    }}\n"
-        f"}}\n"
-    )
-
-
 def _nginx_static_ssl(fqdn: str, root_dir: str) -> str:
     return (
         f"server {{\n"
@@ -254,53 +318,189 @@ class DeploymentCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('nydus')
-        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(_SEMAPHORE_LIMIT)
-        self._project_locks: dict[str, asyncio.Lock] = {}
+        # Decides which deploy/rebuild runs next: DEPLOY_MAX_CONCURRENT slots, one run per
+        # project at a time, priority classes and per-owner round-robin.
+        self._scheduler: DeployScheduler = DeployScheduler(_SEMAPHORE_LIMIT)
         self._active_streams: dict[str, asyncio.Queue] = {}
-        # Serializes port scan→reserve across concurrent deploys so two deploys
-        # can't pick the same free port before either has persisted its choice.
+        # run_uuids of the deploy_jobs rows this process is working.
+        self._worker_runs: set[str] = set()
+        # run_id → buffer of log lines not yet written to deployment_log_chunks.
+        self._run_logs: dict[str, LogChunker] = {}
+        self._job_wakeup: asyncio.Event = asyncio.Event()
+        key = os.getenv('DB_ENCRYPTION_KEY')
+        self._fernet: Fernet | None = Fernet(key.encode()) if key else None
+        # Bitmap of taken ports in DEPLOYMENT_PORT_MIN..MAX, built from the DB + nginx at
+        # startup and reconciled every _PORT_RECONCILE s. Deploys and blue/green cutovers
+        # take leases from it; _port_lock keeps a reconcile from racing an allocation.
+        self._ports: PortPool = PortPool(_PORT_MIN, _PORT_MAX)
+        self._ports_ready: asyncio.Event = asyncio.Event()
         self._port_lock: asyncio.Lock = asyncio.Lock()
+        self._port_task: asyncio.Task = asyncio.create_task(self._port_reconcile_loop())
         self._reconciled: bool = False
+        # Parsed sites-available/sites-enabled: stat-checked at most every 10 s (or right
+        # after one of our own writes calls invalidate()), re-read only when a file changed.
+        self._sites: NginxSiteIndex = NginxSiteIndex(_NGINX_AVAILABLE, _NGINX_ENABLED)
+        # Every nginx config write goes through here: changes landing within
+        # NGINX_BATCH_WINDOW s share one `nginx -t` and one reload.
+        self._nginx: NginxController = NginxController(
+            lambda cmd: self.run_exec(cmd, timeout=30),
+            window=_NGINX_WINDOW, on_change=self._sites.invalidate,
+        )
+        # ls-remote results per credential-free URL: (monotonic ts, (default, heads)).
+        self._ref_cache: dict[str, tuple[float, tuple]] = {}
+        self._mirror_locks: dict[str, asyncio.Lock] = {}
+        self._worker_task: asyncio.Task | None = (
+            asyncio.create_task(self._worker_loop()) if _WORKER_ENABLED else None
+        )
+        self._node_task: asyncio.Task | None = (
+            asyncio.create_task(self._node_report_loop()) if _WORKER_ENABLED else None
+        )
+        # Last result of each status probe per deployment (see get_deployment_status).
+        self._status: ProbeCache = ProbeCache(_STATUS_MAX_AGE)
+        # Single-flight snapshots of overview/discover/status/diagnostics responses.
+        self._snapshots: SnapshotCache = SnapshotCache(_SNAPSHOT_MAX_AGE)
+        # Created on first use (needs the running loop); see _probe_session.
+        self._probe_http: aiohttp.ClientSession | None = None
+
+    def cog_unload(self):
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+        if self._node_task and not self._node_task.done():
+            self._node_task.cancel()
+        if not self._port_task.done():
+            self._port_task.cancel()
+        if self._probe_http and not self._probe_http.closed:
+            asyncio.ensure_future(self._probe_http.close())
+
+    async def _site_index(self, force: bool = False) -> NginxSiteIndex:
+        """The nginx site index, re-validated off the loop only when its check is due."""
+        if force or self._sites.due():
+            await asyncio.get_running_loop().run_in_executor(None, self._sites.refresh)
+        return self._sites
+
+    async def _sync_ports(self):
+        """Rebuild the port bitmap from nginx configs and live deployment rows."""
+        async with self._port_lock:
+            sites = await self._site_index(force=True)
+            used = sites.used_ports() | await get_used_deployment_ports()
+            added, freed = self._ports.reconcile(used)
+        if self._ports_ready.is_set() and (added or freed):
+            self.logger.info(
+                f"Port pool drift corrected: +{sorted(added)} -{sorted(freed)}"
+            )
+        self._ports_ready.set()
 
-    async def branch_exists(self, git_url: str, branch: str, pat: str = "") -> bool:
-        """Check if a branch exists in the remote repository."""
+    async def _port_reconcile_loop(self):
+        while True:
+            try:
+                await self._sync_ports()
+            except Exception as e:
+                self.logger.error(f"Port pool reconcile failed: {e}")
+            await asyncio.sleep(_PORT_RECONCILE)
+
+    async def _allocate_port(self, deployment_uuid: str) -> int | None:
+        """
+        Lease the lowest free port for a new deployment and persist it on its row.
+
+        The lease lasts _DEPLOY_TIMEOUT; the deploy confirms it on success and releases
+        it on rollback. A port another worker process persisted first (the DB claim
+        fails) is kept marked used and the next one is tried. None when exhausted.
+        """
+        await self._ports_ready.wait()
+        async with self._port_lock:
+            while True:
+                port = self._ports.allocate(deployment_uuid, ttl=_DEPLOY_TIMEOUT)
+                if port is None:
+                    return None
+                try:
+                    claimed = await claim_deployment_port(deployment_uuid, port)
+                except Exception:
+                    self._ports.release(port)
+                    raise
+                if claimed:
+                    return port
+                self._ports.confirm(port)
+
+    async def _remote_refs(self, git_url: str, pat: str = "") -> tuple[str | None, dict] | None:
+        """
+        Default branch and branch heads of a remote, from ONE `git ls-remote` per run.
+
+        branch_exists, get_default_branch and the rebuild's tip lookup all read this, so
+        a deploy that checks a branch and then falls back to the default no longer asks
+        GitHub twice. Cached for _REFS_TTL seconds, keyed on the credential-free URL;
+        failures are not cached. Returns (default_branch, {branch: sha}) or None.
+        """
+        key = strip_credentials(git_url)
+        hit = self._ref_cache.get(key)
+        if hit and time.monotonic() - hit[0] < _REFS_TTL:
+            return hit[1]
         # Build authenticated URL if PAT is provided
         if pat and git_url.startswith('https://'):
             git_url = git_url.replace('https://', f'https://{pat}@')
-        
-        # Use git ls-remote to check branch
-        cmd = ['git', 'ls-remote', '--heads', git_url, branch]
+        cmd = ['git', 'ls-remote', '--symref', git_url, 'HEAD', 'refs/heads/*']
         code, out, _ = await self.run_exec(cmd, timeout=30)
-        
         if code != 0:
-            return False
-        # Output will be empty if branch not found
-        return bool(out.strip())
+            return None
+        refs = parse_ls_remote(out)
+        self._ref_cache[key] = (time.monotonic(), refs)
+        return refs
+
+    async def branch_exists(self, git_url: str, branch: str, pat: str = "") -> bool:
+        """Check if a branch exists in the remote repository."""
+        refs = await self._remote_refs(git_url, pat)
+        return bool(refs) and branch in refs[1]
 
     async def get_default_branch(self, git_url: str, pat: str = "") -> str | None:
         """Detect the default branch of the remote repository."""
-        # Build authenticated URL if PAT is provided
-        if pat and git_url.startswith('https://'):
-            git_url = git_url.replace('https://', f'https://{pat}@')
-        
-        # Use git ls-remote to get the default branch
-        # Output format: "ref: refs/heads/main\tHEAD" or "ref: refs/heads/master\tHEAD"
-        cmd = ['git', 'ls-remote', '--symref', git_url, 'HEAD']
-        code, out, _ = await self.run_exec(cmd, timeout=30)
-        
-        if code != 0 or not out.strip():
+        refs = await self._remote_refs(git_url, pat)
+        return refs[0] if refs else None
+
+    def _get_mirror_lock(self, key: str) -> asyncio.Lock:
+        if key not in self._mirror_locks:
+            self._mirror_locks[key] = asyncio.Lock()
+        return self._mirror_locks[key]
+
+    async def _sync_mirror(self, git_url: str, emit, pat: str = "") -> str | None:
+        """
+        Create or incrementally fetch the local bare mirror of `git_url`; return its path.
+
+        Deploy clones borrow objects from it (`--reference`) and rebuilds clone from it
+        directly, so only new objects ever cross the network. Best-effort: on any failure
+        this returns None and the caller clones straight from the remote as before.
+        The mirror is shared across projects, so its origin URL never carries a PAT;
+        each clone/fetch authenticates with this caller's PAT for that command only.
+        """
+        if not _GIT_MIRROR_DIR:
             return None
-        
-        # Parse the output to extract branch name
-        # Format: ref: refs/heads/BRANCH_NAME\tHEAD
-        for line in out.strip().split('\n'):
-            if line.startswith('ref:'):
-                # Extract branch name from "ref: refs/heads/branch_name"
-                parts = line.split('refs/heads/')
-                if len(parts) > 1:
-                    branch = parts[1].split('\t')[0].strip()
-                    return branch if branch else None
-        return None
+        key = strip_credentials(git_url)
+        path = os.path.join(_GIT_MIRROR_DIR, mirror_dir_name(key))
+        auth_env = credential_env(git_url, pat)
+        loop = asyncio.get_running_loop()
+        async with self._get_mirror_lock(key):
+            exists = await loop.run_in_executor(None, os.path.isdir, path)
+            if not exists:
+                await emit("[GIT] Creating local mirror (first deploy of this repository)...")
+                await loop.run_in_executor(None, lambda: os.makedirs(_GIT_MIRROR_DIR, exist_ok=True))
+                code, _, err = await self.run_exec(
+                    ['git', 'clone', '--mirror', '-q', key, path], env_extra=auth_env,
+                )
+                if code == 0:
+                    # Old releases may still borrow objects a force-push made unreachable.
+                    await self.run_exec(['git', 'config', 'gc.pruneExpire', 'never'], cwd=path)
+            else:
+                # Also scrubs a PAT an older version stored in the mirror's config.
+                await self.run_exec(['git', 'remote', 'set-url', 'origin', key], cwd=path)
+                code, _, err = await self.run_exec(
+                    ['git', 'fetch', '--prune', '-q', 'origin'], cwd=path, env_extra=auth_env,
+                )
+            if code != 0:
+                await emit(f"[WARN] Local mirror unavailable ({redact_pat(err.strip()[:200], pat)}); "
+                           "cloning from the remote directly.")
+                if not exists:
+                    await loop.run_in_executor(None, lambda: shutil.rmtree(path, ignore_errors=True))
+                return None
+        await emit("[GIT] Local mirror up to date.")
+        return path
 
     async def get_local_git_remote_url(self, cwd: str) -> str | None:
         """Get the remote URL from a local git repository."""
@@ -310,10 +510,371 @@ class DeploymentCog(commands.Cog):
             return out.strip()
         return None
 
-    def _get_project_lock(self, project_uuid: str) -> asyncio.Lock:
-        if project_uuid not in self._project_locks:
-            self._project_locks[project_uuid] = asyncio.Lock()
-        return self._project_locks[project_uuid]
+    @contextlib.asynccontextmanager
+    async def _scheduled(self, job: DeployJob, emit):
+        """
+        Hold a scheduler slot for `job` for the body of the `async with`.
+
+        While queued, reports position and estimated wait on the run's log stream whenever
+        they change. Raises JobCancelled if the job is cancelled/superseded while queued.
+        """
+        self._scheduler.submit(job)
+        try:
+            waiter = asyncio.ensure_future(self._scheduler.acquire(job))
+            last = None
+            while not waiter.done():
+                pos = self._scheduler.position(job.run_id)
+                if pos and pos['state'] == 'queued':
+                    report = (pos['position'], pos['queued'])
+                    if report != last:
+                        last = report
+                        eta = pos['eta_seconds']
+                        await emit(
+                            f"[QUEUE] Position {pos['position']} of {pos['queued']} "
+                            f"({pos['priority']} priority)"
+                            + (f", estimated wait ~{eta // 60}m{eta % 60:02d}s." if eta is not None else ".")
+                        )
+                await asyncio.wait({waiter}, timeout=_QUEUE_REPORT)
+            waiter.result()
+            if last:
+                await emit("[QUEUE] Slot acquired; starting.")
+            token = _current_job.set(job)
+            try:
+                yield job
+            finally:
+                _current_job.reset(token)
+        finally:
+            self._scheduler.release(job)
+
+    def _kill_job(self, job: DeployJob):
+        """Terminate every subprocess tree the job currently has running."""
+        for pid in list(job.pids):
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def _cancel_local(self, run_id: str) -> bool:
+        job = self._scheduler.cancel(run_id)
+        if not job:
+            return False
+        self._kill_job(job)
+        return True
+
+    async def cancel_run(self, run_id: str) -> bool:
+        """
+        Cancel a queued run, or a running one that hasn't reached its point of no return.
+        Runs in another worker process are flagged and stopped on its next heartbeat.
+        """
+        if self._scheduler.get(run_id):
+            return self._cancel_local(run_id)
+        return await cancel_deploy_job(run_id) is not None
+
+    async def queue_status(self, run_id: str | None = None) -> dict | None:
+        """
+        Snapshot of this worker's slots plus the shared job backlog, or one run's
+        position/ETA (None if it isn't queued or running anywhere).
+        """
+        if run_id:
+            local = self._scheduler.position(run_id)
+            if local:
+                return local
+            row = await get_deploy_job(run_id)
+            if not row or row['status'] not in ('queued', 'running'):
+                return None
+            if row['status'] == 'running':
+                return {'state': 'running', 'position': 0, 'eta_seconds': 0,
+                        'run_id': run_id, 'kind': row['kind'], 'owner': row['triggered_by'],
+                        'worker_id': row['worker_id']}
+            backlog = await self._backlog()
+            entry = next((b for b in backlog if b['run_id'] == run_id), None)
+            if not entry:
+                return None
+            return {'state': 'queued', 'queued': len(backlog), **entry}
+        snapshot = self._scheduler.snapshot()
+        snapshot['worker_id'] = _WORKER_ID
+        snapshot['backlog'] = await self._backlog()
+        return snapshot
+
+    def _check_cancelled(self, job: DeployJob | None):
+        if job and job.cancelled:
+            raise DeployError("Cancelled.")
+
+    # ---- durable job queue -----------------------------------------------------
+    def _seal_pat(self, pat: str) -> str | None:
+        if not pat:
+            return None
+        if not self._fernet:
+            raise DeployError("DB_ENCRYPTION_KEY is not set; cannot queue a deploy with a PAT.")
+        return self._fernet.encrypt(pat.encode()).decode()
+
+    def _open_pat(self, sealed: str | None) -> str:
+        if not sealed:
+            return ''
+        try:
+            return self._fernet.decrypt(sealed.encode()).decode()
+        except (AttributeError, InvalidToken):
+            raise DeployError("Cannot decrypt the queued PAT (DB_ENCRYPTION_KEY missing or changed).")
+
+    def _end_stream(self, run_id: str):
+        """Send a run's end-of-stream sentinel and drop the stream after _STREAM_TTL."""
+        q = self._active_streams.get(run_id)
+        if q:
+            q.put_nowait(None)
+        asyncio.get_running_loop().call_later(_STREAM_TTL, self._active_streams.pop, run_id, None)
+
+    # ---- nodes ---------------------------------------------------------------------
+    async def _node_report_loop(self):
+        """Publish this node's capacity for placement (see utils.placement)."""
+        await self._ports_ready.wait()
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                metrics = await loop.run_in_executor(None, node_metrics)
+                await report_deploy_node(_NODE_NAME, _SERVER_IP, _DEPLOY_BASE, metrics,
+                                         self._ports.stats()['free'])
+            except Exception as e:
+                self.logger.error(f"Node report failed: {e}")
+            await asyncio.sleep(_NODE_REPORT)
+
+    async def _place(self) -> str | None:
+        """Node for a new deployment; None (any worker) when no live node has room."""
+        nodes = await get_deploy_nodes(int(_NODE_REPORT * 4))
+        return choose_node(nodes, _NODE_MEM_MB * 1024 * 1024)
+
+    async def _node_ips(self) -> dict:
+        return {n['name']: n['public_ip'] for n in await get_all_deploy_nodes() if n.get('public_ip')}
+
+    async def _expected_ip(self, deployment: dict, ips: dict | None = None) -> str:
+        """Public IP the deployment's A record should hold: its node's, else SERVER_IP."""
+        node = deployment.get('node')
+        if not node or node == _NODE_NAME:
+            return _SERVER_IP
+        ips = await self._node_ips() if ips is None else ips
+        return ips.get(node) or _SERVER_IP
+
+    @staticmethod
+    def _foreign_node(deployment: dict) -> str | None:
+        """The node a deployment lives on when that isn't this one (host-local actions can't reach it)."""
+        node = deployment.get('node')
+        return node if node and node != _NODE_NAME else None
+
+    async def nodes_overview(self) -> dict:
+        """Every known node with liveness and placement score, and where a deploy would go now."""
+        live = {n['name']: n for n in await get_deploy_nodes(int(_NODE_REPORT * 4))}
+        nodes = []
+        for n in await get_all_deploy_nodes():
+            entry = dict(live.get(n['name'], n))
+            entry['alive'] = n['name'] in live
+            entry['score'] = round(score_node(entry), 3) if entry['alive'] else None
+            nodes.append(entry)
+        return {'this_node': _NODE_NAME, 'nodes': nodes,
+                'next_placement': choose_node(list(live.values()), _NODE_MEM_MB * 1024 * 1024)}
+
+    # ---- run logs (deployment_log_chunks) ------------------------------------------
+    async def _open_log(self, run_id: str):
+        """Start buffering a run's log after whatever an earlier attempt already stored."""
+        seq, line = resume_point(await get_log_chunk_index(run_id))
+        self._run_logs[run_id] = LogChunker(seq, line)
+
+    async def _flush_log(self, run_id: str, force: bool = True):
+        """Write the run's buffered lines as one chunk (only once due unless `force`)."""
+        chunker = self._run_logs.get(run_id)
+        if not chunker or not (force or chunker.due()):
+            return
+        chunk = chunker.take()
+        if chunk and not await append_log_chunk(run_id, chunk):
+            self.logger.error(
+                f"Lost {chunk['line_count']} log line(s) of run {run_id[:8]} (chunk {chunk['seq']})."
+            )
+
+    async def _close_log(self, run_id: str):
+        await self._flush_log(run_id)
+        self._run_logs.pop(run_id, None)
+
+    async def _append_log_lines(self, run_id: str, lines: list):
+        """Append to the log of a run no process is writing any more (e.g. an abandoned job)."""
+        chunker = LogChunker(*resume_point(await get_log_chunk_index(run_id)))
+        for line in lines:
+            chunker.add(line)
+        await append_log_chunk(run_id, chunker.take())
+
+    async def read_run_log(
+        self, run_id: str, tail: int | None = None, start: int = 0, end: int | None = None
+    ) -> list[str]:
+        """Stored lines [start, end) of a run's log, or its last `tail` lines."""
+        index = await get_log_chunk_index(run_id)
+        if tail is not None:
+            seqs, start = chunks_for_tail(index, tail)
+            end = None
+        else:
+            seqs = chunks_for_range(index, start, end)
+        return slice_lines(await get_log_chunks(run_id, seqs), start, end)
+
+    async def _enqueue(self, run_id: str, kind: str, project_uuid: str, triggered_by: str,
+                       payload: dict, deployment_uuid: str = None, pat: str = '',
+                       node: str = None):
+        """Persist a job, open its local log stream and wake this process's worker."""
+        queue = self._active_streams[run_id] = asyncio.Queue()
+        try:
+            await create_deploy_job(
+                run_id, kind, project_uuid, triggered_by, priority_for(triggered_by), payload,
+                deployment_uuid=deployment_uuid, pat_encrypted=self._seal_pat(pat), node=node,
+            )
+        except Exception:
+            self._active_streams.pop(run_id, None)
+            raise
+        asyncio.create_task(self._follow_job(run_id, queue))
+        self._job_wakeup.set()
+
+    async def _backlog(self) -> list[dict]:
+        """Queued jobs across all workers, in claim order, with position and estimated wait."""
+        rows = await get_open_deploy_jobs()
+        running = [r for r in rows if r['status'] == 'running']
+        order = claim_order([r for r in rows if r['status'] == 'queued'], running)
+        # Elapsed time from DB timestamps only (heartbeat_at is at most a beat old), so
+        # the DB and local clocks never get mixed.
+        remaining = [
+            self._scheduler.expected_duration(r['kind'])
+            - ((r['heartbeat_at'] - r['started_at']).total_seconds()
+               if r['heartbeat_at'] and r['started_at'] else 0)
+            for r in running
+        ]
+        waits = estimate_waits(remaining, max(_SEMAPHORE_LIMIT, len(running)),
+                               [self._scheduler.expected_duration(r['kind']) for r in order])
+        return [
+            {'run_id': r['run_uuid'], 'kind': r['kind'], 'owner': r['triggered_by'],
+             'target': r['deployment_uuid'], 'position': i + 1, 'eta_seconds': round(w)}
+            for i, (r, w) in enumerate(zip(order, waits))
+        ]
+
+    async def _follow_job(self, run_id: str, queue: asyncio.Queue):
+        """
+        Feed a run's local stream while it isn't running in this process: its queue
+        position while it waits, then the log chunks its worker stores as it runs.
+        Steps aside as soon as this process's own worker claims the run.
+        """
+        sent = 0
+        last = None
+        try:
+            while True:
+                row = await get_deploy_job(run_id)
+                if not row or row['worker_id'] == _WORKER_ID:
+                    return
+                if row['status'] == 'queued':
+                    backlog = await self._backlog()
+                    entry = next((b for b in backlog if b['run_id'] == run_id), None)
+                    report = entry and (entry['position'], len(backlog))
+                    if report and report != last:
+                        last = report
+                        eta = entry['eta_seconds']
+                        await queue.put(
+                            f"[QUEUE] Position {entry['position']} of {len(backlog)}, "
+                            f"estimated wait ~{eta // 60}m{eta % 60:02d}s."
+                        )
+                else:
+                    lines = await self.read_run_log(run_id, start=sent)
+                    for line in lines:
+                        await queue.put(line)
+                    sent += len(lines)
+                    if row['status'] != 'running':
+                        if row.get('error'):
+                            await queue.put(f"[FAIL] {row['error']}")
+                        elif row['status'] == 'cancelled' and not sent:
+                            await queue.put("[CANCELLED] Run cancelled before a worker picked it up.")
+                        self._end_stream(run_id)
+                        return
+                await asyncio.sleep(_JOB_POLL)
+        except Exception as e:
+            self.logger.error(f"Log follower for run {run_id[:8]} failed: {e}")
+
+    async def _worker_loop(self):
+        """Claim queued jobs while this process has free slots; reap expired leases."""
+        last_reap = 0.0
+        while True:
+            self._job_wakeup.clear()
+            try:
+                if time.monotonic() - last_reap >= _JOB_HEARTBEAT:
+                    last_reap = time.monotonic()
+                    await self._reap_stale_jobs()
+                while len(self._worker_runs) < _SEMAPHORE_LIMIT:
+                    row = await claim_deploy_job(_WORKER_ID, claim_candidates_query, claim_order, _NODE_NAME)
+                    if not row:
+                        break
+                    self._worker_runs.add(row['run_uuid'])
+                    asyncio.create_task(self._execute_job(row))
+            except Exception as e:
+                self.logger.error(f"Deploy worker loop error: {e}")
+            try:
+                await asyncio.wait_for(self._job_wakeup.wait(), timeout=_JOB_POLL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute_job(self, row: dict):
+        """Run one claimed job to completion and record its outcome on the row."""
+        run_id = row['run_uuid']
+        self._active_streams.setdefault(run_id, asyncio.Queue())
+        beat = asyncio.create_task(self._heartbeat_job(run_id))
+        outcome, error = 'failed', None
+        try:
+            await self._open_log(run_id)
+            payload = json.loads(row['payload'])
+            if row['kind'] == 'deploy':
+                pat = self._open_pat(row.get('pat_encrypted'))
+                outcome = await self._run_and_cleanup(
+                    run_id, payload['project_data'], payload.get('subdomain'), pat,
+                    row['triggered_by'], payload.get('cert_staging', False),
+                    payload.get('domain'), payload.get('dns_mode', 'subdomain'),
+                    payload.get('process_profile'),
+                )
+            else:
+                outcome = await self._run_rebuild(run_id, row['deployment_uuid'], row['triggered_by'])
+        except Exception as e:
+            self.logger.exception(f"Deploy job {run_id} failed to run: {e}")
+            error = str(e)
+            self._end_stream(run_id)
+        finally:
+            beat.cancel()
+            await self._close_log(run_id)
+            self._worker_runs.discard(run_id)
+            await finish_deploy_job(run_id, outcome, _WORKER_ID, error=error)
+            self._job_wakeup.set()
+
+    async def _heartbeat_job(self, run_id: str):
+        """
+        Keep a running job's lease alive; stop the run if it was cancelled or reaped.
+        Also writes out log lines a quiet stretch left sitting in the buffer.
+        """
+        while True:
+            await asyncio.sleep(_JOB_HEARTBEAT)
+            await self._flush_log(run_id, force=False)
+            try:
+                state = await heartbeat_deploy_job(run_id, _WORKER_ID)
+            except Exception as e:
+                self.logger.warning(f"Heartbeat for run {run_id[:8]} failed: {e}")
+                continue
+            if state is None or state.get('cancel_requested'):
+                self._cancel_local(run_id)
+
+    async def _reap_stale_jobs(self):
+        """Requeue or fail jobs whose worker stopped heartbeating (see stale_job_action)."""
+        for row in await get_stale_deploy_jobs(_JOB_LEASE):
+            run_id, dead = row['run_uuid'], row['worker_id']
+            if stale_job_action(row['kind'], row['attempts'], _JOB_MAX_ATTEMPTS) == 'requeue':
+                if await requeue_deploy_job(run_id, dead):
+                    self.logger.warning(f"Requeued {row['kind']} {run_id[:8]}: worker {dead} lost.")
+                continue
+            reason = f"Worker {dead} stopped heartbeating; run abandoned."
+            if not await finish_deploy_job(run_id, 'failed', dead, error=reason):
+                continue
+            await self._append_log_lines(run_id, [f"[FATAL] {reason}"])
+            await update_deployment_log(run_id, 'failed')
+            await self._notify(
+                'error', 'Deploy job abandoned',
+                f"{row['kind'].capitalize()} run `{run_id}` lost its worker and was failed.",
+                source=row['kind'], critical=True,
+                fields={'Worker': dead, 'Attempts': row['attempts'], 'By': row['triggered_by']},
+            )
 
     async def run_exec_stream(
         self,
@@ -327,14 +888,20 @@ class DeploymentCog(commands.Cog):
             env.update(env_extra)
         timeout = timeout or _DEPLOY_TIMEOUT
         try:
+            # Own session per child so a cancelled run can kill the whole tree
+            # (npm → node → esbuild ...) with one killpg.
             process = await asyncio.create_subprocess_exec(
                 *args,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
                 cwd=cwd,
                 env=env,
+                start_new_session=True,
             )
-            
+            job = _current_job.get()
+            if job:
+                job.pids.add(process.pid)
+
             stdout_lines = []
             stderr_lines = []
             output_queue = asyncio.Queue()
@@ -376,16 +943,36 @@ class DeploymentCog(commands.Cog):
                     await asyncio.gather(stdout_task, stderr_task, process_task)
                     
             except asyncio.TimeoutError:
-                process.kill()
-                stdout_task.cancel()
-                stderr_task.cancel()
+                # The whole session, like the cancel path: killing only the direct child
+                # would leave npm/node grandchildren holding ports and CPU.
                 try:
-                    await asyncio.gather(stdout_task, stderr_task, process_task)
-                except asyncio.CancelledError:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
                     pass
+                if job:
+                    job.pids.discard(process.pid)
+                stdout_task.cancel()
+                stderr_task.cancel()
+                await asyncio.gather(stdout_task, stderr_task, process_task, return_exceptions=True)
+                await process.wait()
                 yield (None, f'Timed out after {timeout}s')
                 return
-            
+            except asyncio.CancelledError:
+                # The caller was cancelled (e.g. a sibling deploy stage failed): take the
+                # whole process tree down with it rather than leaving it running.
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+                if job:
+                    job.pids.discard(process.pid)
+                stdout_task.cancel()
+                stderr_task.cancel()
+                process_task.cancel()
+                raise
+
+            if job:
+                job.pids.discard(process.pid)
             out = '\n'.join(stdout_lines)[:_MAX_OUTPUT] if stdout_lines else ''
             err = '\n'.join(stderr_lines)[:_MAX_OUTPUT] if stderr_lines else ''
             yield (process.returncode, out, err)
@@ -414,19 +1001,81 @@ class DeploymentCog(commands.Cog):
                 return code, out, err
         return last_code, '\n'.join(out_parts), '\n'.join(err_parts)
 
-    async def _pm2_status(self, name: str) -> dict | None:
-        """Return the pm2 process info dict for `name` from `pm2 jlist`, or None."""
+    async def _pm2_procs(self, name: str) -> list:
+        """Every `pm2 jlist` entry named `name` — one per worker in cluster mode."""
         code, out, _ = await self.run_exec(['pm2', 'jlist'], timeout=30)
         if code != 0 or not out.strip():
-            return None
+            return []
         try:
             procs = json.loads(out)
         except (ValueError, TypeError):
-            return None
-        for proc in procs:
-            if proc.get('name') == name:
-                return proc
-        return None
+            return []
+        return [p for p in procs if p.get('name') == name]
+
+    async def _pm2_status(self, name: str) -> dict | None:
+        """Return the pm2 process info dict for `name` from `pm2 jlist`, or None."""
+        procs = await self._pm2_procs(name)
+        return procs[0] if procs else None
+
+    async def _pm2_launch(self, deploy_path: str, profile: dict) -> tuple[int, tuple | None]:
+        """(instances, cluster entry) for `profile` on this node; entry None → single fork."""
+        if profile.get('exec_mode') != 'cluster' or not deploy_path:
+            return 1, None
+        loop = asyncio.get_running_loop()
+
+        def _entry():
+            try:
+                with open(os.path.join(deploy_path, 'package.json'), 'r') as f:
+                    pkg = json.load(f)
+            except (OSError, ValueError):
+                return None
+            try:
+                bins = set(os.listdir(os.path.join(deploy_path, 'node_modules', '.bin')))
+            except OSError:
+                bins = set()
+            return cluster_entry(pkg, bins)
+
+        entry = await loop.run_in_executor(None, _entry)
+        if entry is None:
+            return 1, None
+        metrics = await loop.run_in_executor(None, node_metrics)
+        return resolve_instances(profile, metrics['cpu_count'], metrics['mem_available']), entry
+
+    async def _pm2_apply(
+        self, pm2_name: str, deploy_path: str, port: int | None, profile: dict | None,
+        emit=None, verb: str = 'reload',
+    ) -> tuple[int, str, str]:
+        """
+        Start `pm2_name` under `profile`, or bring the running process in line with it.
+
+        A matching process is reloaded with --update-env (PORT, heap flag); in cluster
+        mode `pm2 reload` replaces workers one at a time, so there is no restart window.
+        A changed worker count is applied with `pm2 scale` first. The process runs with
+        --cwd `deploy_path` unresolved, so after a `current` switch a reload picks up the
+        new release. A changed exec mode or memory limit, or a process pinned to a
+        resolved release directory, only takes on a fresh start, so it is deleted and
+        started.
+        """
+        profile = profile or DEFAULT_PROFILE
+        instances, entry = await self._pm2_launch(deploy_path, profile)
+        if profile.get('exec_mode') == 'cluster' and entry is None and emit:
+            await emit("[PM2] No node script behind 'npm start' to cluster; running a single fork process.")
+        action = apply_action(profile, instances, await self._pm2_procs(pm2_name), entry, cwd=deploy_path)
+        env = launch_env(profile, port)
+        if emit and action != 'reload':
+            mode = f"cluster x{instances}" if entry else "fork"
+            await emit(f"[PM2] {action.capitalize()} '{pm2_name}' ({mode}).")
+        if action == 'recreate':
+            await self.run_exec(['pm2', 'delete', pm2_name], timeout=30)
+        if action in ('start', 'recreate'):
+            return await self.run_exec(start_command(pm2_name, profile, instances, entry, cwd=deploy_path),
+                                       cwd=deploy_path, env_extra=env, timeout=120)
+        if action == 'scale':
+            code, out, err = await self.run_exec(['pm2', 'scale', pm2_name, str(instances)], timeout=120)
+            if code != 0:
+                return code, out, err
+        return await self.run_exec(['pm2', verb, pm2_name, '--update-env'],
+                                   cwd=deploy_path, env_extra=env, timeout=120)
 
     async def _pm2_is_online(
         self, name: str, checks: int = 3, delay: float = 2.0
@@ -466,13 +1115,12 @@ class DeploymentCog(commands.Cog):
         url = f"http://127.0.0.1:{port}"
         for attempt in range(attempts):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        url, timeout=aiohttp.ClientTimeout(total=5)
-                    ) as resp:
-                        # Any status (even 404/500) proves the process is bound and serving.
-                        _ = resp.status
-                        return True
+                async with self._probe_session().get(
+                    url, allow_redirects=False, timeout=aiohttp.ClientTimeout(total=5)
+                ) as resp:
+                    # Any status (even 404/500) proves the process is bound and serving.
+                    _ = resp.status
+                    return True
             except Exception:
                 pass
             if attempt < attempts - 1:
@@ -482,38 +1130,55 @@ class DeploymentCog(commands.Cog):
     def get_stream(self, run_id: str):
         return self._active_streams.get(run_id)
 
-    async def _http_health_check(self, fqdn: str, emit, attempts: int = 5) -> bool:
-        """Poll the ORIGIN directly until it returns HTTP 200; True once it does.
+    async def attach_stream(self, run_id: str) -> asyncio.Queue | None:
+        """
+        The run's log stream; for a run queued or running in another process (or queued
+        before this one restarted), a new stream fed from its deploy_jobs row.
+        """
+        queue = self._active_streams.get(run_id)
+        if queue:
+            return queue
+        row = await get_deploy_job(run_id)
+        if not row or row['status'] not in ('queued', 'running') or row['worker_id'] == _WORKER_ID:
+            return None
+        queue = self._active_streams[run_id] = asyncio.Queue()
+        asyncio.create_task(self._follow_job(run_id, queue))
+        return queue
+
+    async def _http_health_check(self, fqdn: str, emit, attempts: int = 5, path: str = '/') -> bool:
+        """Poll the ORIGIN directly until it answers 2xx/3xx on `path`; True once it does.
 
-        We hit `https://127.0.0.1/` with a `Host: <fqdn>` header (TLS verification off)
+        We hit `https://127.0.0.1<path>` with a `Host: <fqdn>` header (TLS verification off)
         rather than `https://<fqdn>`, because a rebuild only changes THIS host's app —
         so the health signal should be this box's nginx→app, not the public edge. Going
         through the public hostname instead couples the check to Cloudflare proxying,
         fresh-subdomain DNS propagation, and cert trust — e.g. a Let's Encrypt *staging*
         cert (self-test) makes Cloudflare return 526, failing a perfectly healthy site.
         `ssl=False` because we don't care whether the origin cert is trusted here; cert
-        validity is reported separately via `_ssl_days_left`.
+        validity is reported separately via `_ssl_days_left`. Redirects aren't followed (that
+        would leave the origin), so a 3xx — e.g. / → /login — counts as the app answering.
         """
-        timeout = aiohttp.ClientTimeout(total=10)
         for attempt in range(attempts):
-            try:
-                async with aiohttp.ClientSession(
-                    connector=aiohttp.TCPConnector(ssl=False)
-                ) as session:
-                    async with session.get(
-                        "https://127.0.0.1/", headers={'Host': fqdn}, timeout=timeout,
-                    ) as resp:
-                        await emit(f"[HEALTH] HTTP {resp.status} (attempt {attempt+1}/{attempts}).")
-                        if resp.status == 200:
-                            return True
-            except Exception as e:
-                await emit(f"[HEALTH] Error: {e} (attempt {attempt+1}/{attempts}).")
+            result = await self.probe_http(fqdn, path, 'origin', timeout=10)
+            if result['code'] is not None:
+                t = result['timings']
+                await emit(f"[HEALTH] HTTP {result['code']} in {t['total_ms']} ms "
+                           f"(first byte {t['ttfb_ms']} ms) (attempt {attempt+1}/{attempts}).")
+                if result['ok']:
+                    return True
+            else:
+                await emit(f"[HEALTH] Error: {result.get('error')} (attempt {attempt+1}/{attempts}).")
             if attempt < attempts - 1:
                 await asyncio.sleep(3)
         return False
 
-    async def _revert_to_commit(self, deploy_path, stack, pm2_name, assigned_port, sha, emit) -> bool:
-        """Hard-reset to `sha` and rebuild — used to roll back a failed rebuild."""
+    async def _revert_to_commit(self, deploy_path, stack, pm2_name, assigned_port, sha, emit,
+                                restart: bool = True, profile: dict = None) -> bool:
+        """Hard-reset to `sha` and rebuild — used to roll back a failed rebuild.
+
+        `restart=False` restores the tree only: after a failed blue/green cutover the old
+        process never stopped serving, so reloading it would only add a blip.
+        """
         code, _, err = await self.run_exec(['git', 'reset', '--hard', sha], cwd=deploy_path)
         if code != 0:
             await emit(f"[ROLLBACK] git reset failed: {err.strip()}")
@@ -541,18 +1206,290 @@ class DeploymentCog(commands.Cog):
                                 ['php', 'artisan', 'route:cache'],
                                 ['php', 'artisan', 'view:cache']):
                 await self.run_exec(artisan_cmd, cwd=deploy_path)
-        if stack == 'node':
-            code, _, _ = await self.run_exec(['pm2', 'reload', pm2_name], cwd=deploy_path)
+        if stack == 'node' and restart:
+            code, _, _ = await self._pm2_apply(pm2_name, deploy_path, assigned_port, profile)
             if code != 0:
-                code, _, err = await self.run_exec(
-                    ['pm2', 'start', 'npm', '--name', pm2_name, '--', 'start'],
-                    cwd=deploy_path, env_extra={'PORT': str(assigned_port)},
-                )
-                if code != 0:
-                    await emit("[ROLLBACK] pm2 reload/start failed.")
-                    return False
+                await emit("[ROLLBACK] pm2 reload/start failed.")
+                return False
+        return True
+
+    async def _switch_upstream(self, fqdn: str, port: int, emit) -> bool:
+        """Point a node site's nginx upstream at `port`: atomic config replace, `nginx -t`,
+        then a graceful reload (old workers finish in-flight requests on the old upstream).
+        A config that fails the test is put back so nginx is never left unreloadable."""
+        path = os.path.join(_NGINX_AVAILABLE, fqdn)
+        ok, detail = await self._nginx.apply([write_op(path, _nginx_node_ssl(fqdn, port))])
+        if not ok:
+            for line in detail.splitlines():
+                if line.strip():
+                    await emit(f"[NGINX] {line.strip()}")
+            await emit(f"[FAIL] Could not switch nginx upstream to port {port}; previous config restored.")
+            return False
+        await emit(f"[NGINX] Upstream switched to port {port}; nginx reloaded gracefully.")
         return True
 
+    async def _blue_green_cutover(
+        self, deployment_uuid: str, fqdn: str, deploy_path: str,
+        live_name: str, live_port: int, emit, profile: dict = None, health_path: str = '/',
+    ) -> tuple[bool, str, int]:
+        """
+        Switch a node deployment onto its freshly built tree without a restart window.
+
+        The new build runs as the other colour of the pm2 pair on a second reserved port
+        while the live process keeps serving. Only once pm2 reports it stable and the port
+        answers is the nginx upstream flipped and the site health-checked through the
+        origin; then the new name/port is persisted and the old process drained and
+        deleted. Any failure, including not persisting the row, deletes only the new
+        process (and flips nginx back if it got that far) — a failed rebuild never
+        restarts or stops the serving process. The cleanup runs the steps from
+        `cutover_cleanup` in order.
+        Returns (ok, pm2_name, port) for whichever process is serving afterwards.
+        """
+        next_name = peer_name(live_name)
+        await self._ports_ready.wait()
+        async with self._port_lock:
+            self._ports.mark_used(live_port)
+            # Leased, not persisted: the row keeps the live port until the cutover commits.
+            next_port = self._ports.allocate(f"cutover:{deployment_uuid}", ttl=_DEPLOY_TIMEOUT)
+        if next_port is None:
+            await emit(f"[FAIL] No spare port in range {_PORT_MIN}-{_PORT_MAX} for the cutover.")
+            return False, live_name, live_port
+        await emit(f"[PORT] Reserved port {next_port} for '{next_name}'.")
+
+        flipped = False
+        committed = False
+        try:
+            # A leftover from an interrupted cutover would make `pm2 start` refuse the name.
+            await self.run_exec(['pm2', 'delete', next_name], timeout=30)
+            await emit(f"[PM2] Starting '{next_name}' on port {next_port} alongside live '{live_name}'...")
+            code, out, err = await self._pm2_apply(next_name, deploy_path, next_port, profile, emit)
+            for line in (out + err).splitlines():
+                if line.strip():
+                    await emit(f"[PM2] {line.strip()}")
+            if code != 0:
+                await emit(f"[FAIL] pm2 start failed (exit {code}).")
+                return False, live_name, live_port
+            online, detail = await self._pm2_is_online(next_name)
+            if not online:
+                await emit(f"[FAIL] '{next_name}' is not healthy ({detail}).")
+                return False, live_name, live_port
+            if not await self._http_port_ok(next_port):
+                await emit(f"[FAIL] '{next_name}' never answered on port {next_port}.")
+                return False, live_name, live_port
+            await emit(f"[CHECK] '{next_name}' online and answering on port {next_port}.")
+
+            if not await self._switch_upstream(fqdn, next_port, emit):
+                return False, live_name, live_port
+            flipped = True
+            if not await self._http_health_check(fqdn, emit, path=health_path):
+                await emit(f"[FAIL] Site unhealthy on the new upstream; switching back to port {live_port}.")
+                return False, live_name, live_port
+
+            # The row must name the new process before the old one goes, or the watchdog,
+            # the next rebuild and the port pool would all act on a deleted process.
+            if not await update_deployment(deployment_uuid, assigned_port=next_port, pm2_name=next_name):
+                await emit(f"[FAIL] Could not persist the new pm2 name/port; switching back to port {live_port}.")
+                return False, live_name, live_port
+            committed = True
+        finally:
+            for step in cutover_cleanup(flipped, committed):
+                if step == 'restore_upstream':
+                    if not await self._switch_upstream(fqdn, live_port, emit):
+                        await emit(f"[WARN] nginx still points at port {next_port}; site may be down.")
+                elif step == 'delete_next':
+                    await self.run_exec(['pm2', 'delete', next_name], timeout=30)
+                    await emit(f"[CLEANUP] Removed '{next_name}'; '{live_name}' still serving on port {live_port}.")
+                elif step == 'release_next_port':
+                    self._ports.release(next_port)
+                elif step == 'confirm_next_port':
+                    self._ports.confirm(next_port)
+                elif step == 'drain_live':
+                    await emit(f"[PM2] Draining '{live_name}' for {_DRAIN_SECONDS:g}s before stopping it...")
+                    await asyncio.sleep(_DRAIN_SECONDS)
+                elif step == 'delete_live':
+                    code, _, _ = await self.run_exec(['pm2', 'delete', live_name], timeout=30)
+                    if code != 0:
+                        await emit(f"[WARN] Could not delete old pm2 process '{live_name}'; remove it manually.")
+                    else:
+                        self._ports.release(live_port)
+
+        await self.run_exec(['pm2', 'save'], timeout=30)
+        await emit(f"[PM2] Cutover complete: '{next_name}' serving on port {next_port}.")
+        return True, next_name, next_port
+
+    async def _prepare_release(
+        self, site_root: str, deploy_path: str, branch: str, stack: str,
+        env_file_name: str | None, emit,
+    ) -> tuple[str, bool]:
+        """
+        Stage the tip of `branch` as a new release beside the live one, ready to build.
+
+        Objects come from the repository's local mirror (a shallow file:// clone — no
+        network beyond the mirror's incremental fetch), or from the live release's repo if
+        the mirror is unavailable. The env file is carried over, and node_modules/vendor
+        are hardlinked from the live release when the lockfiles match. Nothing the live
+        site reads is modified, so a failed build leaves it untouched.
+        Returns (release_path, deps_shared).
+        """
+        loop = asyncio.get_running_loop()
+        live_path = await loop.run_in_executor(None, os.path.realpath, deploy_path)
+        remote    = await self.get_local_git_remote_url(deploy_path)
+        mirror    = await self._sync_mirror(remote, emit) if remote else None
+        incoming  = os.path.join(site_root, RELEASES_DIR, f"{INCOMING}{uuid_lib.uuid4().hex[:8]}")
+
+        if mirror:
+            clone = ['git', 'clone', '-q', '-b', branch]
+            if _CLONE_DEPTH > 0:
+                clone += ['--depth', str(_CLONE_DEPTH)]
+            steps = [(clone + [f"file://{mirror}", incoming], site_root)]
+        else:
+            await emit(f"[GIT] Fetching origin/{branch}...")
+            code, out, err = await self.run_exec(['git', 'fetch', 'origin', branch], cwd=deploy_path)
+            for line in (out + err).splitlines():
+                if line.strip():
+                    await emit(f"[GIT] {line.strip()}")
+            if code != 0:
+                await emit(f"[FAIL] git fetch origin {branch} failed (exit {code}).")
+                raise DeployError("Git update failed.")
+            code, out, _ = await self.run_exec(['git', 'rev-parse', f'origin/{branch}'], cwd=deploy_path)
+            if code != 0 or not out.strip():
+                await emit(f"[FAIL] Could not resolve origin/{branch}.")
+                raise DeployError("Git update failed.")
+            steps = [
+                (['git', 'clone', '-q', '--no-checkout', live_path, incoming], site_root),
+                (['git', 'checkout', '-q', '-B', branch, out.strip()], incoming),
+            ]
+        if remote:
+            # The clone's origin is the mirror/live release; point it at the real remote.
+            steps.append((['git', 'remote', 'set-url', 'origin', remote], incoming))
+        for step, cwd in steps:
+            code, out, err = await self.run_exec(step, cwd=cwd)
+            if code != 0:
+                await emit(f"[FAIL] git {step[1]} failed (exit {code}): {(err or out).strip()[:300]}")
+                await loop.run_in_executor(None, lambda: shutil.rmtree(incoming, ignore_errors=True))
+                raise DeployError("Could not stage release.")
+
+        # Name the release after what was actually checked out, not a ref read earlier.
+        code, out, _ = await self.run_exec(['git', 'rev-parse', 'HEAD'], cwd=incoming)
+        if code != 0 or not out.strip():
+            await loop.run_in_executor(None, lambda: shutil.rmtree(incoming, ignore_errors=True))
+            await emit("[FAIL] Could not resolve the staged commit.")
+            raise DeployError("Could not stage release.")
+        sha          = out.strip()
+        release      = release_name(sha)
+        release_path = os.path.join(site_root, RELEASES_DIR, release)
+        await loop.run_in_executor(None, os.rename, incoming, release_path)
+        await emit(f"[GIT] Staged release {release} at {sha[:8]}.")
+
+        dep_dir = 'vendor' if stack == 'laravel' else 'node_modules'
+
+        def _carry_over():
+            for name in {env_file_name or '.env', '.env'}:
+                src = os.path.join(live_path, name)
+                if os.path.isfile(src) and not os.path.exists(os.path.join(release_path, name)):
+                    shutil.copy2(src, os.path.join(release_path, name))
+            if stack == 'laravel':
+                link_shared(site_root, release_path, 'storage')
+            return share_dependencies(live_path, release_path, dep_dir)
+
+        try:
+            shared = await loop.run_in_executor(None, _carry_over)
+        except OSError as e:
+            await emit(f"[WARN] Could not share {dep_dir} with the live release: {e}")
+            shared = False
+        return release_path, shared
+
+    async def _activate_release(
+        self, site_root: str, release: str, stack: str, pm2_name: str, port: int | None,
+        deploy_path: str, emit, reload: bool = True, profile: dict = None,
+    ) -> bool:
+        """Point `current` at `release` and, for node, pm2-reload onto it. Seconds, no rebuild."""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, switch_current, site_root, release)
+        except OSError as e:
+            await emit(f"[ROLLBACK] Could not switch current -> {release}: {e}")
+            return False
+        await emit(f"[ROLLBACK] current -> {release}.")
+        if stack == 'node' and reload:
+            code, _, _ = await self._pm2_apply(pm2_name, deploy_path, port, profile)
+            if code != 0:
+                await emit("[ROLLBACK] pm2 reload/start failed.")
+                return False
+            if port:
+                await self._http_port_ok(port)
+        return True
+
+    async def list_deployment_releases(self, deployment: dict) -> dict:
+        """Releases on disk for a deployment, newest first, with the live one flagged."""
+        root = release_root(deployment.get('deploy_path'))
+        if not root:
+            return {'managed': False, 'current': None, 'releases': []}
+        loop = asyncio.get_running_loop()
+        names = await loop.run_in_executor(None, list_releases, root)
+        current = await loop.run_in_executor(None, current_release, root)
+        return {
+            'managed': True,
+            'current': current,
+            'releases': [{'name': n, 'sha': release_sha(n), 'current': n == current} for n in names],
+        }
+
+    async def rollback_release(self, deployment: dict, release: str | None = None,
+                               triggered_by: str = 'api') -> tuple[bool, str]:
+        """
+        Roll a release-managed deployment back to `release` (default: the one before
+        `current`) by symlink swap + pm2 reload, then health-check the origin.
+        """
+        if node := self._foreign_node(deployment):
+            return False, f"Deployment runs on node '{node}'; roll it back from that node."
+        root = release_root(deployment.get('deploy_path'))
+        if not root:
+            return False, "Deployment predates release directories; redeploy it (a rebuild won't) to enable rollback."
+        loop = asyncio.get_running_loop()
+        names = await loop.run_in_executor(None, list_releases, root)
+        current = await loop.run_in_executor(None, current_release, root)
+        target = release or previous_release(names, current)
+        if not target or target not in names:
+            return False, f"No release '{release}' to roll back to." if release else "No earlier release on disk."
+        if target == current:
+            return False, f"Release {target} is already current."
+
+        lines: list[str] = []
+
+        async def emit(line: str):
+            lines.append(line)
+
+        fqdn = fqdn_of(deployment)
+        pm2_name = deployment.get('pm2_name') or deployment['deployment_uuid'][:12]
+        job = DeployJob(str(uuid_lib.uuid4()), 'rollback', deployment['project_uuid'],
+                        triggered_by, priority_for(triggered_by),
+                        target=deployment['deployment_uuid'])
+        try:
+            async with self._scheduled(job, emit):
+                job.cancellable = False
+                ok = await self._activate_release(
+                    root, target, deployment['tech_stack'], pm2_name,
+                    deployment.get('assigned_port'), deployment['deploy_path'], emit,
+                    profile=load_profile(deployment.get('process_profile')),
+                )
+                healthy = ok and await self._http_health_check(
+                    fqdn, emit, path=deployment.get('health_path') or '/',
+                )
+        except JobCancelled:
+            return False, "Rollback was cancelled while queued."
+        if not ok:
+            return False, lines[-1] if lines else "Rollback failed."
+        await self._notify(
+            'warning' if healthy else 'error', 'Release rolled back',
+            f"`{fqdn}` rolled back from {current} to {target}."
+            + ("" if healthy else " Health check still failing."),
+            source='rebuild', target=fqdn, critical=not healthy,
+            fields={'By': triggered_by},
+        )
+        if not healthy:
+            return False, f"Switched to {target}, but the health check is still failing."
+        return True, f"Rolled back to {target}."
+
     async def _notify(self, level: str, title: str, message: str, fields: dict | None = None,
                       critical: bool = False, target: str | None = None, source: str = 'deploy'):
         """Record an alert (frontend feed); Discord only when critical=True. Never raises."""
@@ -580,7 +1517,7 @@ class DeploymentCog(commands.Cog):
         return int(m.group(1)) if m else None
 
     async def _dns_state(self, deployment: dict) -> dict:
-        """Cloudflare A-record state for a deployment vs the expected SERVER_IP."""
+        """Cloudflare A-record state for a deployment vs the IP of the node it runs on."""
         if (deployment.get('dns_mode') or 'subdomain') == 'external':
             # DNS is client-managed; nydus has no record to inspect, so report it as
             # unmanaged rather than as drift.
@@ -602,50 +1539,164 @@ class DeploymentCog(commands.Cog):
             'present': True,
             'content': content,
             'proxied': rec.get('proxied'),
-            'drift': content != _SERVER_IP,
+            'drift': content != await self._expected_ip(deployment),
         }
 
-    async def _http_health(self, fqdn: str) -> dict:
+    def _probe_session(self) -> aiohttp.ClientSession:
+        """
+        The shared probe session: keep-alive connections pooled per (host, port, TLS), so
+        repeated origin probes of every site on a node reuse the same few connections to
+        nginx. Certificates are verified except where a probe passes ssl=False (origin).
+        """
+        if self._probe_http is None or self._probe_http.closed:
+            trace = aiohttp.TraceConfig()
+            for event in _PROBE_EVENTS:
+                getattr(trace, f"on_{event}").append(_trace_mark(event))
+            self._probe_http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=_PROBE_POOL, keepalive_timeout=_PROBE_KEEPALIVE, ttl_dns_cache=300,
+                ),
+                trace_configs=[trace],
+            )
+        return self._probe_http
+
+    async def probe_http(
+        self, fqdn: str | None = None, path: str = '/', mode: str | None = None, *,
+        url: str | None = None, origin: str | None = None, timeout: float | None = None,
+    ) -> dict:
+        """
+        One HTTP probe through the shared client (see utils.http_probe for the modes).
+        {'ok', 'code', 'mode', 'url', 'timings': {'dns_ms', 'connect_ms', 'ttfb_ms',
+        'total_ms', 'reused'}} plus 'error' when there was no response.
+        """
+        target = probe_target(fqdn, path, mode or _HEALTH_MODE, url=url, origin=origin or '127.0.0.1')
+        marks: dict = {}
+        code, error = None, None
         try:
-            async with aiohttp.ClientSession() as s:
-                async with s.get(
-                    f"https://{fqdn}", timeout=aiohttp.ClientTimeout(total=8)
-                ) as r:
-                    return {'ok': r.status == 200, 'code': r.status}
+            async with self._probe_session().get(
+                target['url'], headers=target['headers'], ssl=target['ssl'],
+                allow_redirects=target['follow'], trace_request_ctx=marks,
+                timeout=aiohttp.ClientTimeout(total=timeout or _PROBE_TIMEOUT),
+            ) as r:
+                code = r.status
+                # Draining the body lets the connection go back to the pool.
+                if (r.content_length or 0) <= _PROBE_MAX_BODY:
+                    await r.read()
         except Exception as e:
-            return {'ok': False, 'code': None, 'error': str(e)}
+            error = str(e) or type(e).__name__
+        marks['done'] = time.monotonic()
+        result = {'ok': status_ok(code), 'code': code, 'mode': target['mode'],
+                  'url': target['url'], 'timings': phase_timings(marks)}
+        if error:
+            result['error'] = error
+        return result
+
+    async def _health_origin(self, deployment: dict, ips: dict | None = None) -> str:
+        """Where origin probes of a deployment go: this node's nginx, or its own node's."""
+        if not self._foreign_node(deployment):
+            return '127.0.0.1'
+        return await self._expected_ip(deployment, ips) or '127.0.0.1'
+
+    async def _http_health(self, deployment: dict, ips: dict | None = None,
+                           mode: str | None = None, timeout: float | None = None) -> dict:
+        """Probe a deployment's health path in its health mode (origin unless configured)."""
+        mode = mode or deployment.get('health_mode') or _HEALTH_MODE
+        return await self.probe_http(
+            fqdn_of(deployment), deployment.get('health_path') or '/', mode,
+            origin=await self._health_origin(deployment, ips) if mode == 'origin' else None,
+            timeout=timeout,
+        )
+
+    async def health_settings(self, deployment: dict, probe: bool = True) -> dict:
+        """A deployment's health path/mode and, when `probe`, a live origin and edge probe."""
+        out = {
+            'path': deployment.get('health_path') or '/',
+            'mode': deployment.get('health_mode') or _HEALTH_MODE,
+            'mode_default': _HEALTH_MODE,
+        }
+        if probe:
+            origin, edge = await asyncio.gather(
+                self._http_health(deployment, mode='origin'),
+                self._http_health(deployment, mode='edge'),
+            )
+            out['probes'] = {'origin': origin, 'edge': edge}
+        return out
+
+    async def set_health_settings(self, deployment: dict, changes: dict) -> tuple[bool, str | dict]:
+        """Store `path` and/or `mode` (null → default) for a deployment. Returns (ok, settings or error)."""
+        unknown = set(changes) - {'path', 'mode'}
+        if unknown:
+            return False, f"unknown health field(s): {', '.join(sorted(unknown))}"
+        fields = {}
+        try:
+            if 'path' in changes:
+                path = parse_health_path(changes['path'])
+                fields['health_path'] = None if path == '/' else path
+            if 'mode' in changes:
+                fields['health_mode'] = (parse_mode(changes['mode'], default=None)
+                                         if changes['mode'] is not None else None)
+        except ValueError as e:
+            return False, str(e)
+        if not await update_deployment(deployment['deployment_uuid'], **fields):
+            return False, "Could not store the health settings."
+        self._status.drop(deployment['deployment_uuid'])
+        self._snapshots.drop(f"status:{deployment['deployment_uuid']}")
+        return True, await self.health_settings({**deployment, **fields}, probe=False)
+
+    async def _pm2_info(self, pm2_name: str) -> dict | None:
+        procs = await self._pm2_procs(pm2_name)
+        if not procs:
+            return None
+        env = procs[0].get('pm2_env', {}) or {}
+        monits = [p.get('monit', {}) or {} for p in procs]
+        return {
+            'status': env.get('status'),
+            'restarts': sum((p.get('pm2_env', {}) or {}).get('restart_time', 0) for p in procs),
+            'uptime': env.get('pm_uptime'),
+            'cpu': sum(m.get('cpu') or 0 for m in monits),
+            'memory': sum(m.get('memory') or 0 for m in monits),
+            'instances': len(procs),
+            'exec_mode': env.get('exec_mode'),
+        }
+
+    async def get_deployment_status(self, deployment: dict, fresh: bool = False) -> dict:
+        """
+        Aggregate status for a deployment (pm2/http/ssl/dns/disk).
 
-    async def get_deployment_status(self, deployment: dict) -> dict:
-        """Aggregate live status for a deployment (pm2/http/ssl/dns/disk)."""
+        Probes run concurrently. Unless `fresh`, a probe measured within its
+        _STATUS_MAX_AGE is served from memory; disk usage always comes from
+        MonitoringCog's background scan. `ages` gives each value's age in seconds
+        (None: not measured yet).
+        """
         subdomain = deployment.get('subdomain')
         fqdn = fqdn_of(deployment)
         stack = deployment.get('tech_stack')
         pm2_name = deployment.get('pm2_name') or (deployment.get('deployment_uuid') or '')[:12]
+        key = deployment.get('deployment_uuid') or fqdn
 
-        pm2_info = None
-        if stack == 'node':
-            proc = await self._pm2_status(pm2_name)
-            if proc:
-                env = proc.get('pm2_env', {}) or {}
-                monit = proc.get('monit', {}) or {}
-                pm2_info = {
-                    'status': env.get('status'),
-                    'restarts': env.get('restart_time', 0),
-                    'uptime': env.get('pm_uptime'),
-                    'cpu': monit.get('cpu'),
-                    'memory': monit.get('memory'),
-                }
-
-        disk_bytes = None
+        probes = {
+            'http': lambda: self._http_health(deployment),
+            'ssl': lambda: self._ssl_days_left(fqdn),
+            'dns': lambda: self._dns_state(deployment),
+        }
+        if stack == 'node' and not self._foreign_node(deployment):
+            probes['pm2'] = lambda: self._pm2_info(pm2_name)
+        results: dict = {'pm2': None}
+        ages: dict = {'pm2': None}
+        live = []
+        for name, probe in probes.items():
+            hit = None if fresh else self._status.fresh(key, name)
+            if hit:
+                results[name], ages[name] = hit
+            else:
+                live.append(name)
+        for name, value in zip(live, await asyncio.gather(*(probes[n]() for n in live))):
+            self._status.put(key, name, value)
+            results[name], ages[name] = value, 0.0
         dp = deployment.get('deploy_path')
-        if dp:
-            # `du -sb` is far cheaper than a Python os.walk over node_modules.
-            code, out, _ = await self.run_exec(['du', '-sb', dp], timeout=30)
-            if code == 0:
-                try:
-                    disk_bytes = int(out.split()[0])
-                except (ValueError, IndexError):
-                    disk_bytes = None
+        mon = self.bot.get_cog('MonitoringCog')
+        disk = mon.disk_usage_of(release_root(dp) or dp) if mon and dp else None
+        results['disk'], ages['disk'] = disk or (None, None)
 
         return {
             'deployment_uuid': deployment.get('deployment_uuid'),
@@ -654,11 +1705,13 @@ class DeploymentCog(commands.Cog):
             'dns_mode': deployment.get('dns_mode') or 'subdomain',
             'stack': stack,
             'status': deployment.get('status'),
-            'pm2': pm2_info,
-            'http': await self._http_health(fqdn),
-            'ssl': {'days_left': await self._ssl_days_left(fqdn)},
-            'dns': await self._dns_state(deployment),
-            'disk_bytes': disk_bytes,
+            'node': deployment.get('node'),
+            'pm2': results['pm2'],
+            'http': results['http'],
+            'ssl': {'days_left': results['ssl']},
+            'dns': results['dns'],
+            'disk_bytes': results['disk'],
+            'ages': {name: None if age is None else round(age, 1) for name, age in ages.items()},
             'assigned_port': deployment.get('assigned_port'),
             'deployed_at': deployment.get('deployed_at'),
             'deployed_by': deployment.get('deployed_by'),
@@ -714,7 +1767,11 @@ class DeploymentCog(commands.Cog):
             'fqdn': fqdn_of(deployment), 'stack': stack, 'status': deployment.get('status'),
             'assigned_port': deployment.get('assigned_port'),
             'process': None, 'port_listening': None, 'nginx_error_log': None,
+            'node': deployment.get('node'),
         }
+        if self._foreign_node(deployment):
+            # pm2, the port and nginx's log live on that node, not here.
+            return out
         if stack == 'node':
             pm2_name = deployment.get('pm2_name') or deployment['deployment_uuid'][:12]
             out['process'] = await self.get_process_diagnostics(pm2_name, lines)
@@ -726,7 +1783,8 @@ class DeploymentCog(commands.Cog):
         return out
 
     async def control_process(
-        self, pm2_name: str, action: str, deploy_path: str = None, port: int = None
+        self, pm2_name: str, action: str, deploy_path: str = None, port: int = None,
+        profile: dict = None,
     ) -> tuple[bool, str]:
         """
         pm2 lifecycle control for a process by name.
@@ -736,10 +1794,23 @@ class DeploymentCog(commands.Cog):
         `pm2 start npm -- start` (the same convention deploys use) — so a downed node app
         actually comes back instead of erroring "process not found". Needs deploy_path (+ port)
         to recreate; without them it reports what's missing rather than guessing.
+
+        With a deployment's process `profile`, start/restart/reload go through
+        _pm2_apply instead, so instance count, mode and memory limits are re-applied; a
+        restart of a cluster-mode process is done as a rolling `pm2 reload`.
         """
         if action not in ('start', 'stop', 'restart', 'reload', 'flush'):
             return False, f"Invalid action '{action}'"
 
+        if profile is not None and action in ('start', 'restart', 'reload') and deploy_path:
+            verb = 'restart' if action == 'restart' and profile.get('exec_mode') != 'cluster' else 'reload'
+            code, out, err = await self._pm2_apply(pm2_name, deploy_path, port, profile, verb=verb)
+            if code != 0:
+                return False, (err or out or f'pm2 {verb} failed').strip()
+            await self._notify('info', f"Process {action}", f"`{pm2_name}` {action} via control plane.",
+                               source='control', target=pm2_name)
+            return True, (out or '').strip()
+
         if action in ('start', 'restart', 'reload'):
             code_desc, _, _ = await self.run_exec(['pm2', 'describe', pm2_name], timeout=30)
             if code_desc != 0:
@@ -773,27 +1844,51 @@ class DeploymentCog(commands.Cog):
                            source='control', target=pm2_name)
         return True, (out or '').strip()
 
+    async def process_profile(self, deployment: dict) -> dict:
+        """A node deployment's stored pm2 profile and what pm2 is running for it now."""
+        pm2_name = deployment.get('pm2_name') or deployment['deployment_uuid'][:12]
+        node = self._foreign_node(deployment)
+        return {
+            'profile': load_profile(deployment.get('process_profile')),
+            'running': None if node else await self._pm2_info(pm2_name),
+            'node': deployment.get('node'),
+        }
+
+    async def set_process_profile(
+        self, deployment: dict, changes: dict, apply: bool = True
+    ) -> tuple[bool, str | dict]:
+        """
+        Merge `changes` into a deployment's pm2 profile, store it and, when `apply`,
+        bring the running process in line (scale / rolling reload / fresh start).
+        Returns (ok, profile or error).
+        """
+        try:
+            profile = parse_profile(changes, base=load_profile(deployment.get('process_profile')))
+        except ValueError as e:
+            return False, str(e)
+        if not await update_deployment(deployment['deployment_uuid'], process_profile=json.dumps(profile)):
+            return False, "Could not store the process profile."
+        if not apply:
+            return True, profile
+        if node := self._foreign_node(deployment):
+            return False, f"Profile stored; deployment runs on node '{node}', so it applies on its next rebuild there."
+        ok, msg = await self.control_process(
+            deployment.get('pm2_name') or deployment['deployment_uuid'][:12], 'reload',
+            deploy_path=deployment.get('deploy_path'), port=deployment.get('assigned_port'),
+            profile=profile,
+        )
+        return (True, profile) if ok else (False, f"Profile stored but not applied: {msg}")
+
     async def _port_from_sites_available(self, fqdn: str) -> int | None:
         """Upstream proxy_pass port from a site's nginx config — the on-disk source of truth
         for a port when a DB row's assigned_port/port is missing or has drifted."""
         if not fqdn:
             return None
-        path = os.path.join(_NGINX_AVAILABLE, fqdn)
-        loop = asyncio.get_running_loop()
-
-        def _read():
-            try:
-                with open(path, 'r', errors='replace') as f:
-                    content = f.read()
-            except OSError:
-                return None
-            m = re.search(r'proxy_pass\s+http://localhost:(\d+)', content)
-            return int(m.group(1)) if m else None
-        return await loop.run_in_executor(None, _read)
+        return (await self._site_index()).port_for(fqdn)
 
     async def recover_all(self) -> list:
         """
-        Bring every active node deployment and every enabled pm2 managed service back online,
+        Bring every active node deployment on this node and every enabled pm2 managed service back online,
         recreating any process pm2 has lost (on its stored deploy_path + port). Idempotent:
         processes already online are left untouched. Persists the pm2 list at the end so a
         future reboot can `pm2 resurrect`. Returns a per-target report.
@@ -801,7 +1896,7 @@ class DeploymentCog(commands.Cog):
         report = []
         pm2_map = await self._pm2_jlist_map()
 
-        async def _ensure(name, deploy_path, port, label, fqdn=None):
+        async def _ensure(name, deploy_path, port, label, fqdn=None, profile=None):
             proc = pm2_map.get(name)
             status = (proc.get('pm2_env', {}) or {}).get('status') if proc else None
             if status == 'online':
@@ -810,14 +1905,20 @@ class DeploymentCog(commands.Cog):
             # Fall back to the port nginx is actually proxying to if the row didn't carry one.
             if not port:
                 port = await self._port_from_sites_available(fqdn)
-            ok, msg = await self.control_process(name, 'start', deploy_path=deploy_path, port=port)
+            ok, msg = await self.control_process(name, 'start', deploy_path=deploy_path, port=port,
+                                                 profile=profile)
             report.append({'target': label, 'pm2_name': name, 'ok': ok, 'detail': msg})
 
         for d in await get_active_deployments():
-            if d.get('tech_stack') == 'node':
+            if node := self._foreign_node(d):
+                # Its pm2 lives on that node; a start here would run the app on this box.
+                report.append({'target': fqdn_of(d), 'pm2_name': d.get('pm2_name'), 'ok': None,
+                               'detail': f"runs on node '{node}'; not recovered from here"})
+            elif d.get('tech_stack') == 'node':
                 fqdn = fqdn_of(d)
                 await _ensure(d.get('pm2_name') or d['deployment_uuid'][:12],
-                              d.get('deploy_path'), d.get('assigned_port'), fqdn, fqdn=fqdn)
+                              d.get('deploy_path'), d.get('assigned_port'), fqdn, fqdn=fqdn,
+                              profile=load_profile(d.get('process_profile')))
         for s in await get_all_managed_services(enabled_only=True):
             if s.get('service_type') == 'pm2':
                 await _ensure(s.get('pm2_name') or s.get('name'),
@@ -835,33 +1936,18 @@ class DeploymentCog(commands.Cog):
     async def control_nginx(self, action: str, fqdn: str = None) -> tuple[bool, str]:
         """nginx control: test / reload / enable|disable a site."""
         if action == 'test':
-            code, out, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-            return code == 0, (out + err).strip()
+            return await self._nginx.test()
         if action == 'reload':
-            code, _, err = await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
-            return code == 0, ('' if code == 0 else err.strip())
+            ok, detail = await self._nginx.reload()
+            return ok, ('' if ok else detail)
         if action in ('enable', 'disable') and fqdn:
             avail = os.path.join(_NGINX_AVAILABLE, fqdn)
             link = os.path.join(_NGINX_ENABLED, fqdn)
-            loop = asyncio.get_running_loop()
-
-            def _toggle():
-                try:
-                    if action == 'enable' and not os.path.islink(link):
-                        os.symlink(avail, link)
-                    elif action == 'disable' and os.path.islink(link):
-                        os.remove(link)
-                    return True
-                except OSError:
-                    return False
-            if not await loop.run_in_executor(None, _toggle):
-                return False, "symlink toggle failed"
-            # Validate before reloading; never leave nginx in a broken state.
-            code, _, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-            if code != 0:
-                return False, f"nginx -t failed after {action}: {err.strip()}"
-            code, _, err = await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
-            return code == 0, ('' if code == 0 else err.strip())
+            # Validated before the reload and rolled back on failure, so a bad site
+            # never leaves nginx in a broken state.
+            op = link_op(link, avail) if action == 'enable' else remove_op(link)
+            ok, detail = await self._nginx.apply([op])
+            return ok, ('' if ok else f"nginx rejected {action}: {detail}")
         return False, f"Invalid nginx action '{action}'"
 
     async def renew_ssl(self, fqdn: str) -> tuple[bool, str]:
@@ -870,7 +1956,7 @@ class DeploymentCog(commands.Cog):
         )
         if code != 0:
             return False, (err or out).strip()
-        await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
+        await self._nginx.reload()
         await self._notify('info', 'SSL renewed', f"Cert for `{fqdn}` renewed.",
                            source='control', target=fqdn)
         return True, (out or '').strip()
@@ -892,19 +1978,20 @@ class DeploymentCog(commands.Cog):
         except Exception as e:
             return False, str(e)
         rec = (data or [None])[0]
+        ip = await self._expected_ip(deployment)
         if rec:
             _, err = await cf.update_dns_record(
-                record_id=rec['id'], type='A', name=record_name, content=_SERVER_IP,
+                record_id=rec['id'], type='A', name=record_name, content=ip,
                 ttl=1, proxied=True, comment="nydus | dns reconcile", zone_id=zone_id,
             )
         else:
             _, err = await cf.create_dns_record(
-                type='A', name=record_name, content=_SERVER_IP, ttl=1, proxied=True,
+                type='A', name=record_name, content=ip, ttl=1, proxied=True,
                 comment="nydus | dns reconcile", zone_id=zone_id,
             )
         if err:
             return False, err
-        await self._notify('info', 'DNS reconciled', f"`{fqdn}` → {_SERVER_IP} (proxied).",
+        await self._notify('info', 'DNS reconciled', f"`{fqdn}` → {ip} (proxied).",
                            source='control', target=fqdn)
         return True, "ok"
 
@@ -926,34 +2013,7 @@ class DeploymentCog(commands.Cog):
             except (ValueError, TypeError):
                 pass
 
-        loop = asyncio.get_running_loop()
-
-        def _scan_sites():
-            sites = []
-            try:
-                for fn in os.listdir(_NGINX_AVAILABLE):
-                    path = os.path.join(_NGINX_AVAILABLE, fn)
-                    if not os.path.isfile(path):
-                        continue
-                    try:
-                        with open(path, 'r', errors='replace') as f:
-                            content = f.read()
-                    except OSError:
-                        continue
-                    names = re.findall(r'server_name\s+([^;]+);', content)
-                    ports = re.findall(r'proxy_pass\s+http://localhost:(\d+)', content)
-                    roots = re.findall(r'\broot\s+([^;]+);', content)
-                    sites.append({
-                        'file': fn,
-                        'server_names': [s.strip() for nm in names for s in nm.split()],
-                        'ports': [int(p) for p in ports],
-                        'roots': [r.strip() for r in roots],
-                        'enabled': os.path.islink(os.path.join(_NGINX_ENABLED, fn)),
-                    })
-            except Exception:
-                pass
-            return sites
-        result['nginx_sites'] = await loop.run_in_executor(None, _scan_sites)
+        result['nginx_sites'] = (await self._site_index()).sites()
 
         code, out, _ = await self.run_exec(['sudo', 'certbot', 'certificates'], timeout=30)
         if code == 0:
@@ -1009,6 +2069,40 @@ class DeploymentCog(commands.Cog):
             return {}
         return {r.get('name'): r for r in (data or []) if r.get('name')}
 
+    async def snapshot(self, key: str, compute, fresh: bool = False) -> dict:
+        """
+        `compute()`'s dict served through the single-flight snapshot cache, stamped with
+        when it was computed (`as_of`) and its age. `fresh` skips the stored snapshot.
+        """
+        value, as_of, age = await self._snapshots.get(key, compute, fresh=fresh)
+        return {**value, 'as_of': datetime.fromtimestamp(as_of, timezone.utc),
+                'age_seconds': round(age, 1)}
+
+    async def server_overview(self) -> dict:
+        """System averages, every active deployment's live state and the managed services."""
+        deployments = await get_active_deployments()
+        services = await get_all_managed_services()
+        dep_status = await self.build_overview(deployments)
+        stats = await get_recent_system_resources_with_averages()
+        return {
+            'system': stats,
+            'deployments': dep_status,
+            'managed_services': services,
+        }
+
+    async def refresh_overview(self):
+        """
+        Recompute the overview snapshot ahead of its expiry, but only while a dashboard
+        has read it within _OVERVIEW_DEMAND s. Called after each watchdog tick.
+        """
+        read = self._snapshots.last_read('overview')
+        if read is None or time.monotonic() - read > _OVERVIEW_DEMAND:
+            return
+        hit = self._snapshots.peek('overview')
+        if hit is not None and hit[2] < _SNAPSHOT_MAX_AGE['overview'] / 2:
+            return
+        await self._snapshots.refresh('overview', self.server_overview)
+
     async def build_overview(self, deployments: list) -> list:
         """
         Lightweight per-deployment status for the server overview: one pm2/cert/DNS
@@ -1018,6 +2112,7 @@ class DeploymentCog(commands.Cog):
         pm2_map = await self._pm2_jlist_map()
         cert_map = await self._all_certs_map()
         dns_map = await self._all_dns_a_map()
+        node_ips = await self._node_ips()
         sem = asyncio.Semaphore(8)
 
         async def _one(d):
@@ -1039,7 +2134,7 @@ class DeploymentCog(commands.Cog):
                         'memory': monit.get('memory'),
                     }
             async with sem:
-                http = await self._http_health(fqdn)
+                http = await self._http_health(d, node_ips)
             # The bulk dns_map only covers the managed arvo.team zone, so it's only valid for
             # subdomain mode. Custom domains (other/no Cloudflare zone) are reported as
             # unmanaged here to avoid false "drift" — their DNS is checked per-row elsewhere.
@@ -1049,7 +2144,7 @@ class DeploymentCog(commands.Cog):
                     'present': bool(rec),
                     'content': rec.get('content') if rec else None,
                     'proxied': rec.get('proxied') if rec else None,
-                    'drift': (not rec) or rec.get('content') != _SERVER_IP,
+                    'drift': (not rec) or rec.get('content') != await self._expected_ip(d, node_ips),
                 }
             else:
                 dns = {'managed': False}
@@ -1063,7 +2158,7 @@ class DeploymentCog(commands.Cog):
             }
         return list(await asyncio.gather(*[_one(d) for d in deployments]))
 
-    def queue_deploy(
+    async def queue_deploy(
         self,
         project_data: dict,
         subdomain: str,
@@ -1072,13 +2167,16 @@ class DeploymentCog(commands.Cog):
         cert_staging: bool = False,
         domain: str = None,
         dns_mode: str = 'subdomain',
+        process_profile: dict = None,
     ) -> str:
         run_id = str(uuid_lib.uuid4())
-        self._active_streams[run_id] = asyncio.Queue()
-        asyncio.create_task(
-            self._run_and_cleanup(run_id, project_data, subdomain, pat, triggered_by,
-                                  cert_staging, domain, dns_mode)
-        )
+        payload = {
+            'project_data': project_data, 'subdomain': subdomain,
+            'cert_staging': cert_staging, 'domain': domain, 'dns_mode': dns_mode,
+            'process_profile': process_profile,
+        }
+        await self._enqueue(run_id, 'deploy', project_data['project_uuid'], triggered_by,
+                            payload, pat=pat, node=await self._place())
         return run_id
 
     async def _run_and_cleanup(
@@ -1091,37 +2189,39 @@ class DeploymentCog(commands.Cog):
         cert_staging: bool = False,
         domain: str = None,
         dns_mode: str = 'subdomain',
+        process_profile: dict = None,
     ):
         try:
-            await self.deploy_project(run_id, project_data, subdomain, pat, triggered_by,
-                                      cert_staging, domain, dns_mode)
+            return await self.deploy_project(run_id, project_data, subdomain, pat, triggered_by,
+                                             cert_staging, domain, dns_mode, process_profile)
         except Exception as e:
             self.logger.exception(f"Unhandled deploy error [{run_id}]: {e}")
             q = self._active_streams.get(run_id)
             if q:
                 await q.put(f"[FATAL] Unhandled error: {e}")
+            return 'failed'
         finally:
-            q = self._active_streams.get(run_id)
-            if q:
-                await q.put(None)
-            await asyncio.sleep(_STREAM_TTL)
-            self._active_streams.pop(run_id, None)
+            self._end_stream(run_id)
 
     async def _emit(
         self,
         run_id: str,
-        log_lines: list,
         line: str,
         pat: str = '',
     ):
         if pat:
             line = redact_pat(line, pat)
         line = line.rstrip()[:_MAX_LINE]
-        log_lines.append(line)
+        chunker = self._run_logs.get(run_id)
+        if chunker is None:
+            chunker = self._run_logs[run_id] = LogChunker()
+        chunker.add(line)
         self.logger.info(f"[deploy:{run_id[:8]}] {line}")
         q = self._active_streams.get(run_id)
         if q:
             await q.put(line)
+        if chunker.due():
+            await self._flush_log(run_id)
 
     async def deploy_project(
         self,
@@ -1133,17 +2233,20 @@ class DeploymentCog(commands.Cog):
         cert_staging: bool = False,
         domain: str = None,
         dns_mode: str = 'subdomain',
+        process_profile: dict = None,
     ):
-        log_lines: list[str] = []
         loop = asyncio.get_running_loop()
+        profile = load_profile(process_profile)
 
         async def emit(line: str):
-            await self._emit(run_id, log_lines, line, pat)
+            await self._emit(run_id, line, pat)
 
         stack:           str | None = None
         deployment_uuid: str | None = None
         success:         bool       = False
 
+        spans = StageSpans()
+
         cleanup = {
             'deploy_path':   None,
             'makedirs':      False,
@@ -1154,6 +2257,7 @@ class DeploymentCog(commands.Cog):
             'cf_zone_id':    None,
             'pm2_name':      None,
             'cert_name':     None,
+            'port':          None,
             'deployment_uuid': None,
         }
 
@@ -1177,25 +2281,25 @@ class DeploymentCog(commands.Cog):
 
         # Identity by dns_mode. subdomain mode keeps the exact legacy paths (parity);
         # custom modes key everything on the full fqdn (dots in /var/www are fine).
+        # The site root holds releases/ + current; deploy_path is the `current` symlink,
+        # so everything downstream (env, build, pm2 cwd, nginx roots) follows it.
         if dns_mode == 'subdomain':
             fqdn         = f"{subdomain}.{_DOMAIN}"
-            deploy_path  = os.path.join(_DEPLOY_BASE, subdomain)
+            site_root    = os.path.join(_DEPLOY_BASE, subdomain)
         else:
             fqdn         = domain
-            deploy_path  = os.path.join(_DEPLOY_BASE, fqdn)
+            site_root    = os.path.join(_DEPLOY_BASE, fqdn)
+        deploy_path              = os.path.join(site_root, CURRENT_LINK)
 
-        cleanup['deploy_path']   = deploy_path
+        cleanup['deploy_path']   = site_root
         nginx_config_path        = os.path.join(_NGINX_AVAILABLE, fqdn)
         nginx_symlink_path       = os.path.join(_NGINX_ENABLED, fqdn)
 
         await emit(f"[START] Deployment initiated: {name} -> {fqdn} | run={run_id}")
 
-        async with self._semaphore:
-            lock = self._get_project_lock(project_uuid)
-            if lock.locked():
-                await emit("[WAIT] Another deployment is active for this project. Queued.")
-
-            async with lock:
+        job = DeployJob(run_id, 'deploy', project_uuid, triggered_by, priority_for(triggered_by))
+        try:
+            async with self._scheduled(job, emit):
                 try:
                     if dns_mode == 'subdomain':
                         valid, reason = validate_subdomain(subdomain)
@@ -1225,630 +2329,581 @@ class DeploymentCog(commands.Cog):
                     # No live owner: clear any remnants from a prior failed/deleted/crashed
                     # deploy so this attempt starts clean (prevents the "already in use"
                     # blocker, duplicate Cloudflare records, and leaked ports).
-                    await self._reclaim_target(fqdn, deploy_path, run_id, log_lines, pat)
+                    await self._reclaim_target(fqdn, site_root, run_id, pat)
 
                     await emit("[CHECK] Pre-flight passed.")
 
-                    await emit(f"[GIT] Preparing repository on branch '{branch}'...")
-
-                    pat_url = (
-                        git_url.replace('https://', f'https://{pat}@')
-                        if pat else git_url
-                    )
-
-                    path_exists = await loop.run_in_executor(
-                        None, os.path.exists, deploy_path
-                    )
-
-                    if not path_exists:
-                        await loop.run_in_executor(
-                            None, lambda: os.makedirs(deploy_path, exist_ok=True)
-                        )
-                        cleanup['makedirs'] = True
-                        await emit(f"[GIT] Created directory {deploy_path}.")
-
-                        async for result in self.run_exec_stream(
-                            ['git', 'clone', '-b', branch, pat_url, '.'],
-                            cwd=deploy_path,
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[GIT] {line.strip()}")
-                                else:
-                                    await emit(f"[GIT] git clone finished with code {code}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[GIT] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] git clone failed (exit {code}).")
-                                    raise DeployError("git clone failed.")
-                        cleanup['cloned'] = True
-                        await emit("[GIT] Clone successful.")
-                    else:
-                        await emit(f"[GIT] Directory exists. Fetching origin/{branch}...")
-                        for step in [
-                            ['git', 'fetch', 'origin', branch],
-                            ['git', 'reset', '--hard', f'origin/{branch}'],
-                        ]:
-                            async for result in self.run_exec_stream(step, cwd=deploy_path):
-                                if len(result) == 2:
-                                    code, line = result
-                                    if code is None:
-                                        if line.strip():
-                                            await emit(f"[GIT] {line.strip()}")
-                                    else:
-                                        await emit(f"[GIT] {' '.join(step)} finished with code {code}")
-                                else:
-                                    code, out, err = result
-                                    for line in (out + err).splitlines():
-                                        if line.strip():
-                                            await emit(f"[GIT] {line.strip()}")
-                                    if code != 0:
-                                        await emit(f"[FAIL] {' '.join(step)} failed (exit {code}).")
-                                        raise DeployError("Git update failed.")
-                        await emit("[GIT] Repository updated.")
-
-                    await emit("[DETECT] Detecting stack...")
-
-                    has_package_json = await loop.run_in_executor(
-                        None, os.path.exists, os.path.join(deploy_path, 'package.json')
-                    )
-                    has_artisan = await loop.run_in_executor(
-                        None, os.path.exists, os.path.join(deploy_path, 'artisan')
-                    )
-                    has_composer_json = await loop.run_in_executor(
-                        None, os.path.exists, os.path.join(deploy_path, 'composer.json')
-                    )
-
-                    has_vite = False
-                    for vite_file in ['vite.config.js', 'vite.config.ts', 'vite.config.mjs']:
-                        if await loop.run_in_executor(
-                            None, os.path.exists, os.path.join(deploy_path, vite_file)
-                        ):
-                            has_vite = True
-                            break
-
-                    pkg_scripts: dict = {}
-                    if has_package_json:
-                        def _read_pkg_scripts():
-                            try:
-                                with open(os.path.join(deploy_path, 'package.json'), 'r') as f:
-                                    return json.load(f).get('scripts', {}) or {}
-                            except Exception:
-                                return {}
-                        pkg_scripts = await loop.run_in_executor(None, _read_pkg_scripts)
-
-                    if has_artisan and has_composer_json:
-                        stack = 'laravel'
-                    elif has_package_json and 'start' in pkg_scripts:
-                        stack = 'node'
-                    elif has_package_json:
-                        stack = 'static'
-                        if 'build' not in pkg_scripts:
-                            await emit(
-                                "[FAIL] package.json has neither a 'start' nor a 'build' script. "
-                                "Nothing to run or serve."
-                            )
-                            raise DeployError("No start or build script in package.json.")
-                    else:
-                        await emit("[FAIL] No recognizable stack detected (no package.json or artisan).")
-                        raise DeployError("Unsupported stack.")
-
-                    if stack == 'static':
-                        await emit(
-                            "[DETECT] Stack: static (no start script — "
-                            "build output will be served directly by nginx)."
-                        )
-                    else:
-                        await emit(f"[DETECT] Stack: {stack}.")
-
-                    env_file_name = '.env.production' if (stack in ('node', 'static') and has_vite) else '.env'
-                    await emit(f"[ENV] Target env file: {env_file_name}")
-
-                    example_path = os.path.join(deploy_path, '.env.example')
-                    env_path     = os.path.join(deploy_path, env_file_name)
-
-                    example_exists = await loop.run_in_executor(None, os.path.exists, example_path)
-                    env_exists     = await loop.run_in_executor(None, os.path.exists, env_path)
-
-                    if example_exists and not env_exists:
-                        def _copy_env():
-                            shutil.copy2(example_path, env_path)
-
-                        await loop.run_in_executor(None, _copy_env)
-                        await emit(f"[ENV] Copied .env.example -> {env_file_name}.")
-
-                        def _read_example():
-                            with open(example_path, 'r', errors='replace') as f:
-                                return f.readlines()
-
-                        raw_lines = await loop.run_in_executor(None, _read_example)
-                        for raw in raw_lines:
-                            stripped = raw.strip()
-                            if stripped and not stripped.startswith('#') and '=' in stripped:
-                                key = stripped.split('=', 1)[0].strip()
-                                await emit(f"[ENV] Variable: {key}")
-
-                    elif env_exists:
-                        await emit(f"[ENV] {env_file_name} already exists. Skipping copy.")
-                    else:
-                        await emit("[ENV] No .env.example found. Continuing without env copy.")
-
-                    if stack in ('node', 'static'):
-                        await emit("[INSTALL] Running npm install...")
-                        async for result in self.run_exec_stream(
-                            ['npm', 'install'], cwd=deploy_path
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                else:
-                                    await emit(f"[INSTALL] npm install finished with code {code}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] npm install failed (exit {code}).")
-                                    raise DeployError("npm install failed.")
-                        await emit("[INSTALL] npm install complete.")
-                    elif stack == 'laravel':
-                        await emit("[INSTALL] Running composer install...")
-                        async for result in self.run_exec_stream(
-                            ['composer', 'install', '--no-dev', '--optimize-autoloader'],
-                            cwd=deploy_path,
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                else:
-                                    await emit(f"[INSTALL] composer install finished with code {code}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] composer install failed (exit {code}).")
-                                    raise DeployError("composer install failed.")
-                        await emit("[INSTALL] composer install complete.")
-
-                    if stack in ('node', 'static') and 'build' in pkg_scripts:
-                        await emit("[BUILD] Running npm run build...")
-                        async for result in self.run_exec_stream(
-                            ['npm', 'run', 'build'],
-                            cwd=deploy_path,
-                            env_extra={'NODE_OPTIONS': f'--max-old-space-size={_NODE_MEM_MB}'},
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[BUILD] {line.strip()}")
-                                else:
-                                    await emit(f"[BUILD] npm run build finished with code {code}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[BUILD] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] npm run build failed (exit {code}).")
-                                    raise DeployError("npm build failed.")
-                        await emit("[BUILD] Build complete.")
-                    elif stack == 'laravel':
-                        await emit("[BUILD] Running Laravel artisan setup...")
-                        for artisan_cmd in [
-                            ['php', 'artisan', 'migrate', '--force'],
-                            ['php', 'artisan', 'config:cache'],
-                            ['php', 'artisan', 'route:cache'],
-                            ['php', 'artisan', 'view:cache'],
-                        ]:
-                            async for result in self.run_exec_stream(artisan_cmd, cwd=deploy_path):
-                                if len(result) == 2:
-                                    code, line = result
-                                    if code is None:
-                                        if line.strip():
-                                            await emit(f"[BUILD] {line.strip()}")
-                                    else:
-                                        await emit(f"[BUILD] {' '.join(artisan_cmd)} finished with code {code}")
-                                else:
-                                    code, out, err = result
-                                    for line in (out + err).splitlines():
-                                        if line.strip():
-                                            await emit(f"[BUILD] {line.strip()}")
-                                    if code != 0:
-                                        await emit(f"[FAIL] {' '.join(artisan_cmd)} failed (exit {code}).")
-                                        raise DeployError("Artisan command failed.")
-                        await emit("[BUILD] Laravel setup complete.")
-
-                    static_root: str | None = None
-                    if stack == 'static':
-                        await emit("[STATIC] Locating build output directory...")
-                        for candidate in ('dist', 'build', 'out'):
-                            candidate_index = os.path.join(deploy_path, candidate, 'index.html')
-                            if await loop.run_in_executor(None, os.path.exists, candidate_index):
-                                static_root = os.path.join(deploy_path, candidate)
-                                break
-                        if not static_root:
-                            await emit(
-                                "[FAIL] No build output with an index.html found "
-                                "(checked dist/, build/, out/)."
-                            )
-                            raise DeployError("Static build output not found.")
-                        await emit(f"[STATIC] Serving from {static_root}.")
-
-                    # Create the deployment record first (port still unassigned). For node we
-                    # then pick a port and persist it while holding _port_lock, so the
-                    # scan→reserve window is atomic and concurrent deploys can't collide.
-                    await emit("[DB] Saving deployment record...")
-                    deployment_uuid = await create_deployment(
-                        project_uuid=project_uuid,
-                        subdomain=subdomain if dns_mode == 'subdomain' else None,
-                        tech_stack=stack,
-                        assigned_port=None,
-                        deploy_path=deploy_path,
-                        env_file_name=env_file_name,
-                        deployed_by=triggered_by,
-                        branch=branch,
-                        fqdn=fqdn,
-                        dns_mode=dns_mode,
-                    )
-                    cleanup['deployment_uuid'] = deployment_uuid
-
+                    # The pipeline is a stage graph (see utils.deploy_stages): the DNS record →
+                    # propagation → certbot chain runs alongside install → build, and both meet at
+                    # the SSL config. Stages publish what later ones need through these locals.
+                    release:       str | None = None
+                    pkg_scripts:   dict       = {}
+                    env_file_name: str | None = None
+                    static_root:   str | None = None
                     assigned_port: int | None = None
-                    if stack == 'node':
-                        # Manually check nginx config files one by one (except default)
-                        def _scan_nginx_ports():
-                            ports = set()
-                            try:
-                                for config_file in os.listdir(_NGINX_AVAILABLE):
-                                    if config_file == 'default':
-                                        continue
-                                    config_path = os.path.join(_NGINX_AVAILABLE, config_file)
-                                    if not os.path.isfile(config_path):
-                                        continue
-                                    with open(config_path, 'r', errors='replace') as f:
-                                        content = f.read()
-                                        for line in content.splitlines():
-                                            line = line.strip()
-                                            if 'proxy_pass http://localhost:' in line:
-                                                try:
-                                                    port_str = line.split('localhost:')[1].split(';')[0].split('/')[0].strip()
-                                                    ports.add(int(port_str))
-                                                except (ValueError, IndexError):
-                                                    pass
-                            except Exception:
-                                pass
-                            return ports
-
-                        async with self._port_lock:
-                            await emit("[PORT] Scanning for an available port...")
-                            nginx_ports = await loop.run_in_executor(None, _scan_nginx_ports)
-                            db_ports    = await get_used_deployment_ports()
-                            used_ports  = nginx_ports | db_ports
-                            assigned_port = assign_free_port(used_ports, _PORT_MIN, _PORT_MAX)
-                            if assigned_port is None:
-                                await emit(f"[FAIL] No ports available in range {_PORT_MIN}-{_PORT_MAX}.")
-                                raise DeployError("Port exhaustion.")
-                            # Persist immediately so a concurrent deploy's scan sees this port taken.
-                            await update_deployment(deployment_uuid, assigned_port=assigned_port)
-                        await emit(f"[PORT] Assigned port {assigned_port}.")
-
-                    await create_deployment_log(
-                        run_uuid=run_id,
-                        deployment_uuid=deployment_uuid,
-                        project_uuid=project_uuid,
-                        triggered_by=triggered_by,
-                    )
-                    await emit(f"[DB] Deployment UUID: {deployment_uuid}.")
-
-                    await emit("[NGINX] Writing initial HTTP nginx config...")
-
-                    if stack == 'node':
-                        http_config = _nginx_node_http(fqdn, assigned_port)
-                    elif stack == 'static':
-                        http_config = _nginx_static_http(fqdn, static_root)
-                    else:
-                        http_config = _nginx_laravel_http(fqdn, deploy_path)
+                    pm2_name:      str | None = None
+                    cf_cog     = self.bot.get_cog('CloudflareCog')
+                    cf_record  = None          # set for subdomain/cloudflare; None for external
+                    cf_zone_id = None          # client zone for cloudflare; None → managed zone
+
+                    async def _stage_source():
+                        nonlocal release
+                        await emit(f"[GIT] Preparing repository on branch '{branch}'...")
+
+                        pat_url = (
+                            git_url.replace('https://', f'https://{pat}@')
+                            if pat else git_url
+                        )
 
-                    def _write_http():
-                        with open(nginx_config_path, 'w') as f:
-                            f.write(http_config)
+                        root_exists = await loop.run_in_executor(
+                            None, os.path.exists, site_root
+                        )
+                        incoming = os.path.join(site_root, RELEASES_DIR, f"{INCOMING}{run_id[:8]}")
+                        await loop.run_in_executor(
+                            None, lambda: os.makedirs(incoming, exist_ok=True)
+                        )
+                        if not root_exists:
+                            cleanup['makedirs'] = True
+                            await emit(f"[GIT] Created directory {site_root}.")
+
+                        # Borrow objects from the local mirror and keep the clone shallow; without
+                        # a mirror, a blobless partial clone still skips most of the history.
+                        mirror = await self._sync_mirror(git_url, emit, pat)
+                        clone_cmd = ['git', 'clone', '-b', branch]
+                        if _CLONE_DEPTH > 0:
+                            clone_cmd += ['--depth', str(_CLONE_DEPTH)]
+                        if mirror:
+                            clone_cmd += ['--reference-if-able', mirror]
+                        else:
+                            clone_cmd += ['--filter=blob:none']
+                        async for result in self.run_exec_stream(
+                            clone_cmd + [pat_url, '.'],
+                            cwd=incoming,
+                        ):
+                            if len(result) == 2:
+                                code, line = result
+                                if code is None:
+                                    if line.strip():
+                                        await emit(f"[GIT] {line.strip()}")
+                                else:
+                                    await emit(f"[GIT] git clone finished with code {code}")
+                            else:
+                                code, out, err = result
+                                for line in (out + err).splitlines():
+                                    if line.strip():
+                                        await emit(f"[GIT] {line.strip()}")
+                                if code != 0:
+                                    await emit(f"[FAIL] git clone failed (exit {code}).")
+                                    raise DeployError("git clone failed.")
+                        cleanup['cloned'] = True
+                        await emit("[GIT] Clone successful.")
 
-                    await loop.run_in_executor(None, _write_http)
-                    cleanup['nginx_config'] = nginx_config_path
-                    await emit(f"[NGINX] Config written: {nginx_config_path}.")
+                        code, out_sha, _ = await self.run_exec(['git', 'rev-parse', 'HEAD'], cwd=incoming)
+                        if code != 0 or not out_sha.strip():
+                            await emit("[FAIL] Could not resolve the cloned commit.")
+                            raise DeployError("git rev-parse failed.")
+                        release = release_name(out_sha.strip())
 
-                    def _create_symlink():
-                        if os.path.islink(nginx_symlink_path):
-                            os.remove(nginx_symlink_path)
-                        os.symlink(nginx_config_path, nginx_symlink_path)
+                        def _activate_first_release():
+                            os.rename(incoming, os.path.join(site_root, RELEASES_DIR, release))
+                            switch_current(site_root, release)
 
-                    await loop.run_in_executor(None, _create_symlink)
-                    cleanup['nginx_symlink'] = nginx_symlink_path
-                    await emit("[NGINX] Symlink created in sites-enabled.")
+                        await loop.run_in_executor(None, _activate_first_release)
+                        await emit(f"[GIT] Release {release} is current.")
 
-                    code, out, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-                    for line in (out + err).splitlines():
-                        if line.strip():
-                            await emit(f"[NGINX] {line.strip()}")
-                    if code != 0:
-                        await emit("[FAIL] nginx config test failed (HTTP).")
-                        raise DeployError("nginx -t failed (HTTP).")
+                    async def _stage_detect():
+                        nonlocal stack, pkg_scripts, env_file_name
+                        await emit("[DETECT] Detecting stack...")
 
-                    code, _, err = await self.run_exec(
-                        ['sudo', 'systemctl', 'reload', 'nginx'], timeout=30
-                    )
-                    if code != 0:
-                        await emit(f"[FAIL] nginx reload failed: {err.strip()}")
-                        raise DeployError("nginx reload failed (HTTP).")
-                    await emit("[NGINX] nginx reloaded with HTTP config.")
-
-                    cf_cog = self.bot.get_cog('CloudflareCog')
-                    cf_record = None          # set for subdomain/cloudflare; None for external
-                    cf_zone_id = None         # client zone for cloudflare; None → managed zone
-
-                    if dns_mode == 'external':
-                        # Client runs DNS elsewhere. We create nothing; instead we REQUIRE the
-                        # domain to already resolve to this server before certbot, so an
-                        # unpointed domain fails cheaply instead of burning a Let's Encrypt
-                        # failure against the rate limit.
-                        await emit(
-                            f"[DNS] External DNS mode: verifying {fqdn} resolves to {_SERVER_IP} "
-                            f"(up to {int(_DNS_RETRIES * _DNS_DELAY)}s)..."
+                        has_package_json = await loop.run_in_executor(
+                            None, os.path.exists, os.path.join(deploy_path, 'package.json')
                         )
-                        propagation_task = asyncio.create_task(
-                            check_dns_propagated(fqdn, _SERVER_IP, _DNS_RETRIES, _DNS_DELAY)
+                        has_artisan = await loop.run_in_executor(
+                            None, os.path.exists, os.path.join(deploy_path, 'artisan')
                         )
-                        q = self._active_streams.get(run_id)
-                        while not propagation_task.done():
-                            try:
-                                await asyncio.wait_for(asyncio.shield(propagation_task), timeout=15)
-                            except asyncio.TimeoutError:
-                                if q:
-                                    await q.put("[DNS] Still waiting for the A record to point here...")
-                        if not propagation_task.result():
-                            await emit(
-                                f"[FAIL] {fqdn} does not resolve to {_SERVER_IP}. Point an A "
-                                f"record at {_SERVER_IP} with your DNS provider, then redeploy."
-                            )
-                            raise DeployError("Custom domain does not resolve to this server yet.")
-                        await emit("[DNS] Domain resolves to this server.")
-                    else:
-                        if not cf_cog:
-                            await emit("[FAIL] CloudflareCog is not loaded.")
-                            raise DeployError("CloudflareCog unavailable.")
-
-                        # cloudflare mode: resolve the client's zone; subdomain mode: managed zone.
-                        if dns_mode == 'cloudflare':
-                            cf_zone_id, zone_err = await cf_cog.get_zone_id_for_domain(fqdn)
-                            if zone_err:
-                                await emit(f"[FAIL] {zone_err}")
-                                raise DeployError(zone_err)
-                            cleanup['cf_zone_id'] = cf_zone_id
-                            await update_deployment(deployment_uuid, cf_zone_id=cf_zone_id)
-                            await emit(f"[DNS] Resolved Cloudflare zone {cf_zone_id} for {fqdn}.")
-
-                        # Record name: bare subdomain in the managed zone (legacy); full fqdn in
-                        # a client zone (Cloudflare accepts the full name for apex and sub).
-                        record_name = subdomain if dns_mode == 'subdomain' else fqdn
-                        await emit(f"[DNS] Creating DNS A record for {fqdn} (unproxied)...")
-                        cf_record, cf_error = await cf_cog.create_dns_record(
-                            type='A',
-                            name=record_name,
-                            content=_SERVER_IP,
-                            ttl=60,
-                            proxied=False,
-                            comment=f"nydus | run={run_id}",
-                            zone_id=cf_zone_id,
+                        has_composer_json = await loop.run_in_executor(
+                            None, os.path.exists, os.path.join(deploy_path, 'composer.json')
                         )
-                        if cf_error:
-                            await emit(f"[FAIL] Cloudflare DNS error: {cf_error}")
-                            raise DeployError(f"Cloudflare DNS failed: {cf_error}")
 
-                        cleanup['cf_record_id'] = cf_record['id']
-                        await update_deployment(deployment_uuid, cf_record_id=cf_record['id'])
-                        await emit(f"[DNS] Record created (unproxied). ID: {cf_record['id']}")
+                        has_vite = False
+                        for vite_file in ['vite.config.js', 'vite.config.ts', 'vite.config.mjs']:
+                            if await loop.run_in_executor(
+                                None, os.path.exists, os.path.join(deploy_path, vite_file)
+                            ):
+                                has_vite = True
+                                break
 
-                        await emit(
-                            f"[DNS] Waiting for propagation "
-                            f"(up to {int(_DNS_RETRIES * _DNS_DELAY)}s)..."
-                        )
-                        propagation_task = asyncio.create_task(
-                            check_dns_propagated(fqdn, _SERVER_IP, _DNS_RETRIES, _DNS_DELAY)
-                        )
-                        q = self._active_streams.get(run_id)
-                        while not propagation_task.done():
-                            try:
-                                await asyncio.wait_for(asyncio.shield(propagation_task), timeout=15)
-                            except asyncio.TimeoutError:
-                                if q:
-                                    await q.put("[DNS] Still waiting for propagation...")
-                        if propagation_task.result():
-                            await emit("[DNS] DNS propagated successfully.")
+                        if has_package_json:
+                            def _read_pkg_scripts():
+                                try:
+                                    with open(os.path.join(deploy_path, 'package.json'), 'r') as f:
+                                        return json.load(f).get('scripts', {}) or {}
+                                except Exception:
+                                    return {}
+                            pkg_scripts = await loop.run_in_executor(None, _read_pkg_scripts)
+
+                        if has_artisan and has_composer_json:
+                            stack = 'laravel'
+                            # storage/ (uploads, sessions, logs) must survive release switches.
+                            await loop.run_in_executor(
+                                None, link_shared, site_root,
+                                os.path.join(site_root, RELEASES_DIR, release), 'storage',
+                            )
+                        elif has_package_json and 'start' in pkg_scripts:
+                            stack = 'node'
+                        elif has_package_json:
+                            stack = 'static'
+                            if 'build' not in pkg_scripts:
+                                await emit(
+                                    "[FAIL] package.json has neither a 'start' nor a 'build' script. "
+                                    "Nothing to run or serve."
+                                )
+                                raise DeployError("No start or build script in package.json.")
                         else:
+                            await emit("[FAIL] No recognizable stack detected (no package.json or artisan).")
+                            raise DeployError("Unsupported stack.")
+
+                        if stack == 'static':
                             await emit(
-                                "[DNS] Propagation check timed out. "
-                                "Proceeding anyway; certbot may fail."
+                                "[DETECT] Stack: static (no start script — "
+                                "build output will be served directly by nginx)."
                             )
+                        else:
+                            await emit(f"[DETECT] Stack: {stack}.")
 
-                    staging_note = " (staging)" if cert_staging else ""
-                    await emit(f"[SSL] Obtaining Let's Encrypt certificate for {fqdn}{staging_note}...")
-                    certbot_cmd = [
-                        'sudo', 'certbot', 'certonly', '--nginx',
-                        '-d', fqdn,
-                        '--non-interactive',
-                        '--agree-tos',
-                        '-m', _CERTBOT_EMAIL,
-                    ]
-                    if cert_staging:
-                        certbot_cmd.append('--staging')
-                    code, out, err = await self.run_exec(certbot_cmd, timeout=180)
-                    for line in (out + err).splitlines():
-                        if line.strip():
-                            await emit(f"[SSL] {line.strip()}")
-                    if code != 0:
-                        await emit(f"[FAIL] certbot failed (exit {code}).")
-                        raise DeployError("certbot SSL provisioning failed.")
-                    cleanup['cert_name'] = fqdn
-                    await emit(f"[SSL] Certificate obtained for {fqdn}.")
+                        env_file_name = '.env.production' if (stack in ('node', 'static') and has_vite) else '.env'
+                        await emit(f"[ENV] Target env file: {env_file_name}")
 
-                    await emit("[NGINX] Writing full SSL nginx config...")
+                        example_path = os.path.join(deploy_path, '.env.example')
+                        env_path     = os.path.join(deploy_path, env_file_name)
 
-                    if stack == 'node':
-                        ssl_config = _nginx_node_ssl(fqdn, assigned_port)
-                    elif stack == 'static':
-                        ssl_config = _nginx_static_ssl(fqdn, static_root)
-                    else:
-                        ssl_config = _nginx_laravel_ssl(fqdn, deploy_path)
+                        example_exists = await loop.run_in_executor(None, os.path.exists, example_path)
+                        env_exists     = await loop.run_in_executor(None, os.path.exists, env_path)
 
-                    def _write_ssl():
-                        with open(nginx_config_path, 'w') as f:
-                            f.write(ssl_config)
+                        if example_exists and not env_exists:
+                            def _copy_env():
+                                shutil.copy2(example_path, env_path)
 
-                    await loop.run_in_executor(None, _write_ssl)
-                    await emit("[NGINX] SSL config written.")
+                            await loop.run_in_executor(None, _copy_env)
+                            await emit(f"[ENV] Copied .env.example -> {env_file_name}.")
 
-                    code, out, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-                    for line in (out + err).splitlines():
-                        if line.strip():
-                            await emit(f"[NGINX] {line.strip()}")
-                    if code != 0:
-                        await emit("[FAIL] nginx config test failed (SSL).")
-                        raise DeployError("nginx -t failed (SSL).")
+                            def _read_example():
+                                with open(example_path, 'r', errors='replace') as f:
+                                    return f.readlines()
 
-                    code, _, err = await self.run_exec(
-                        ['sudo', 'systemctl', 'reload', 'nginx'], timeout=30
-                    )
-                    if code != 0:
-                        await emit(f"[FAIL] nginx reload failed (SSL): {err.strip()}")
-                        raise DeployError("nginx reload failed (SSL).")
-                    await emit("[NGINX] nginx reloaded with SSL config.")
-
-                    if dns_mode != 'external' and cf_record:
-                        await emit("[DNS] Enabling Cloudflare proxy on DNS record...")
-                        record_name = subdomain if dns_mode == 'subdomain' else fqdn
-                        _, cf_upd_err = await cf_cog.update_dns_record(
-                            record_id=cf_record['id'],
-                            type='A',
-                            name=record_name,
-                            content=_SERVER_IP,
-                            ttl=1,
-                            proxied=True,
-                            comment=f"nydus | run={run_id}",
-                            zone_id=cf_zone_id,
-                        )
-                        if cf_upd_err:
-                            await emit(
-                                f"[WARN] Could not enable Cloudflare proxy: {cf_upd_err}. "
-                                "Site is live but not proxied yet."
-                            )
+                            raw_lines = await loop.run_in_executor(None, _read_example)
+                            for raw in raw_lines:
+                                stripped = raw.strip()
+                                if stripped and not stripped.startswith('#') and '=' in stripped:
+                                    key = stripped.split('=', 1)[0].strip()
+                                    await emit(f"[ENV] Variable: {key}")
+
+                        elif env_exists:
+                            await emit(f"[ENV] {env_file_name} already exists. Skipping copy.")
                         else:
-                            await emit("[DNS] Cloudflare proxy enabled.")
+                            await emit("[ENV] No .env.example found. Continuing without env copy.")
+
+                    async def _stage_record():
+                        nonlocal deployment_uuid, assigned_port
+                        # Create the deployment record first (port still unassigned). For node we
+                        # then lease a port from the in-memory pool and claim it on the row, so
+                        # concurrent deploys (in this or another worker) can't collide.
+                        await emit("[DB] Saving deployment record...")
+                        deployment_uuid = await create_deployment(
+                            project_uuid=project_uuid,
+                            subdomain=subdomain if dns_mode == 'subdomain' else None,
+                            tech_stack=stack,
+                            assigned_port=None,
+                            deploy_path=deploy_path,
+                            env_file_name=env_file_name,
+                            deployed_by=triggered_by,
+                            branch=branch,
+                            fqdn=fqdn,
+                            dns_mode=dns_mode,
+                            node=_NODE_NAME,
+                            process_profile=json.dumps(profile) if process_profile else None,
+                        )
+                        cleanup['deployment_uuid'] = deployment_uuid
 
-                    pm2_name = deployment_uuid[:12]
-                    if stack == 'node':
-                        await emit(f"[PM2] Starting process '{pm2_name}' on port {assigned_port}...")
-                        # Track the process for rollback as soon as we attempt to start it,
-                        # so a later health failure tears it down instead of leaking it.
-                        cleanup['pm2_name'] = pm2_name
+                        if stack == 'node':
+                            await emit("[PORT] Allocating a port...")
+                            assigned_port = await self._allocate_port(deployment_uuid)
+                            if assigned_port is None:
+                                await emit(f"[FAIL] No ports available in range {_PORT_MIN}-{_PORT_MAX}.")
+                                raise DeployError("Port exhaustion.")
+                            cleanup['port'] = assigned_port
+                            await emit(f"[PORT] Assigned port {assigned_port}.")
+
+                        await create_deployment_log(
+                            run_uuid=run_id,
+                            deployment_uuid=deployment_uuid,
+                            project_uuid=project_uuid,
+                            triggered_by=triggered_by,
+                        )
+                        await emit(f"[DB] Deployment UUID: {deployment_uuid}.")
 
-                        code_desc, _, _ = await self.run_exec(['pm2', 'describe', pm2_name])
-                        if code_desc == 0:
+                    async def _stage_install():
+                        if stack in ('node', 'static'):
+                            await emit("[INSTALL] Running npm install...")
                             async for result in self.run_exec_stream(
-                                ['pm2', 'reload', pm2_name], cwd=deploy_path
+                                ['npm', 'install'], cwd=deploy_path
                             ):
                                 if len(result) == 2:
                                     code, line = result
                                     if code is None:
                                         if line.strip():
-                                            await emit(f"[PM2] {line.strip()}")
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                    else:
+                                        await emit(f"[INSTALL] npm install finished with code {code}")
                                 else:
                                     code, out, err = result
                                     for line in (out + err).splitlines():
                                         if line.strip():
-                                            await emit(f"[PM2] {line.strip()}")
+                                            await emit(f"[INSTALL] {line.strip()}")
                                     if code != 0:
-                                        await emit(f"[FAIL] pm2 reload failed (exit {code}).")
-                                        raise DeployError("pm2 reload failed.")
-                        else:
+                                        await emit(f"[FAIL] npm install failed (exit {code}).")
+                                        raise DeployError("npm install failed.")
+                            await emit("[INSTALL] npm install complete.")
+                        elif stack == 'laravel':
+                            await emit("[INSTALL] Running composer install...")
                             async for result in self.run_exec_stream(
-                                ['pm2', 'start', 'npm', '--name', pm2_name, '--', 'start'],
+                                ['composer', 'install', '--no-dev', '--optimize-autoloader'],
                                 cwd=deploy_path,
-                                env_extra={'PORT': str(assigned_port)},
                             ):
                                 if len(result) == 2:
                                     code, line = result
                                     if code is None:
                                         if line.strip():
-                                            await emit(f"[PM2] {line.strip()}")
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                    else:
+                                        await emit(f"[INSTALL] composer install finished with code {code}")
                                 else:
                                     code, out, err = result
                                     for line in (out + err).splitlines():
                                         if line.strip():
-                                            await emit(f"[PM2] {line.strip()}")
+                                            await emit(f"[INSTALL] {line.strip()}")
                                     if code != 0:
-                                        await emit(f"[FAIL] pm2 start failed (exit {code}).")
-                                        raise DeployError("pm2 start failed.")
-
-                        await emit(f"[PM2] Process '{pm2_name}' started; verifying it stays online...")
-                        online, detail = await self._pm2_is_online(pm2_name)
-                        if not online:
+                                        await emit(f"[FAIL] composer install failed (exit {code}).")
+                                        raise DeployError("composer install failed.")
+                            await emit("[INSTALL] composer install complete.")
+
+                    async def _stage_build():
+                        nonlocal static_root
+                        if stack in ('node', 'static') and 'build' in pkg_scripts:
+                            await emit("[BUILD] Running npm run build...")
+                            async for result in self.run_exec_stream(
+                                ['npm', 'run', 'build'],
+                                cwd=deploy_path,
+                                env_extra={'NODE_OPTIONS': f'--max-old-space-size={_NODE_MEM_MB}'},
+                            ):
+                                if len(result) == 2:
+                                    code, line = result
+                                    if code is None:
+                                        if line.strip():
+                                            await emit(f"[BUILD] {line.strip()}")
+                                    else:
+                                        await emit(f"[BUILD] npm run build finished with code {code}")
+                                else:
+                                    code, out, err = result
+                                    for line in (out + err).splitlines():
+                                        if line.strip():
+                                            await emit(f"[BUILD] {line.strip()}")
+                                    if code != 0:
+                                        await emit(f"[FAIL] npm run build failed (exit {code}).")
+                                        raise DeployError("npm build failed.")
+                            await emit("[BUILD] Build complete.")
+                        elif stack == 'laravel':
+                            await emit("[BUILD] Running Laravel artisan setup...")
+                            for artisan_cmd in [
+                                ['php', 'artisan', 'migrate', '--force'],
+                                ['php', 'artisan', 'config:cache'],
+                                ['php', 'artisan', 'route:cache'],
+                                ['php', 'artisan', 'view:cache'],
+                            ]:
+                                async for result in self.run_exec_stream(artisan_cmd, cwd=deploy_path):
+                                    if len(result) == 2:
+                                        code, line = result
+                                        if code is None:
+                                            if line.strip():
+                                                await emit(f"[BUILD] {line.strip()}")
+                                        else:
+                                            await emit(f"[BUILD] {' '.join(artisan_cmd)} finished with code {code}")
+                                    else:
+                                        code, out, err = result
+                                        for line in (out + err).splitlines():
+                                            if line.strip():
+                                                await emit(f"[BUILD] {line.strip()}")
+                                        if code != 0:
+                                            await emit(f"[FAIL] {' '.join(artisan_cmd)} failed (exit {code}).")
+                                            raise DeployError("Artisan command failed.")
+                            await emit("[BUILD] Laravel setup complete.")
+
+                        if stack == 'static':
+                            await emit("[STATIC] Locating build output directory...")
+                            for candidate in ('dist', 'build', 'out'):
+                                candidate_index = os.path.join(deploy_path, candidate, 'index.html')
+                                if await loop.run_in_executor(None, os.path.exists, candidate_index):
+                                    static_root = os.path.join(deploy_path, candidate)
+                                    break
+                            if not static_root:
+                                await emit(
+                                    "[FAIL] No build output with an index.html found "
+                                    "(checked dist/, build/, out/)."
+                                )
+                                raise DeployError("Static build output not found.")
+                            await emit(f"[STATIC] Serving from {static_root}.")
+
+                    async def _stage_nginx_http():
+                        # Only answers certbot's HTTP-01 challenge, so it can go live before the
+                        # build finishes without exposing a half-built release.
+                        await emit("[NGINX] Writing initial HTTP nginx config...")
+                        nginx_ok, nginx_out = await self._nginx.apply([
+                            write_op(nginx_config_path, _nginx_acme_http(fqdn)),
+                            link_op(nginx_symlink_path, nginx_config_path),
+                        ])
+                        cleanup['nginx_config'] = nginx_config_path
+                        cleanup['nginx_symlink'] = nginx_symlink_path
+                        for line in nginx_out.splitlines():
+                            if line.strip():
+                                await emit(f"[NGINX] {line.strip()}")
+                        if not nginx_ok:
+                            await emit("[FAIL] nginx rejected the HTTP config; it was rolled back.")
+                            raise DeployError("nginx config failed (HTTP).")
+                        await emit(f"[NGINX] Config written: {nginx_config_path}; symlink created in sites-enabled.")
+                        await emit("[NGINX] nginx reloaded with HTTP config.")
+
+                    async def _stage_dns():
+                        nonlocal cf_record, cf_zone_id
+                        if dns_mode == 'external':
+                            # Client runs DNS elsewhere. We create nothing; instead we REQUIRE the
+                            # domain to already resolve to this server before certbot, so an
+                            # unpointed domain fails cheaply instead of burning a Let's Encrypt
+                            # failure against the rate limit.
                             await emit(
-                                f"[FAIL] pm2 process '{pm2_name}' is not healthy ({detail}). "
-                                "The app likely crashed on startup (e.g. missing 'start' script "
-                                "or a runtime error)."
+                                f"[DNS] External DNS mode: verifying {fqdn} resolves to {_SERVER_IP} "
+                                f"(up to {int(_DNS_RETRIES * _DNS_DELAY)}s)..."
                             )
-                            raise DeployError(f"pm2 process not healthy: {detail}")
-                        if not await self._http_port_ok(assigned_port):
+                            propagation_task = asyncio.create_task(
+                                check_dns_propagated(fqdn, _SERVER_IP, _DNS_RETRIES, _DNS_DELAY)
+                            )
+                            q = self._active_streams.get(run_id)
+                            while not propagation_task.done():
+                                try:
+                                    await asyncio.wait_for(asyncio.shield(propagation_task), timeout=15)
+                                except asyncio.TimeoutError:
+                                    if q:
+                                        await q.put("[DNS] Still waiting for the A record to point here...")
+                            if not propagation_task.result():
+                                await emit(
+                                    f"[FAIL] {fqdn} does not resolve to {_SERVER_IP}. Point an A "
+                                    f"record at {_SERVER_IP} with your DNS provider, then redeploy."
+                                )
+                                raise DeployError("Custom domain does not resolve to this server yet.")
+                            await emit("[DNS] Domain resolves to this server.")
+                        else:
+                            if not cf_cog:
+                                await emit("[FAIL] CloudflareCog is not loaded.")
+                                raise DeployError("CloudflareCog unavailable.")
+
+                            # cloudflare mode: resolve the client's zone; subdomain mode: managed zone.
+                            if dns_mode == 'cloudflare':
+                                cf_zone_id, zone_err = await cf_cog.get_zone_id_for_domain(fqdn)
+                                if zone_err:
+                                    await emit(f"[FAIL] {zone_err}")
+                                    raise DeployError(zone_err)
+                                cleanup['cf_zone_id'] = cf_zone_id
+                                await update_deployment(deployment_uuid, cf_zone_id=cf_zone_id)
+                                await emit(f"[DNS] Resolved Cloudflare zone {cf_zone_id} for {fqdn}.")
+
+                            # Record name: bare subdomain in the managed zone (legacy); full fqdn in
+                            # a client zone (Cloudflare accepts the full name for apex and sub).
+                            record_name = subdomain if dns_mode == 'subdomain' else fqdn
+                            await emit(f"[DNS] Creating DNS A record for {fqdn} (unproxied)...")
+                            cf_record, cf_error = await cf_cog.create_dns_record(
+                                type='A',
+                                name=record_name,
+                                content=_SERVER_IP,
+                                ttl=60,
+                                proxied=False,
+                                comment=f"nydus | run={run_id}",
+                                zone_id=cf_zone_id,
+                            )
+                            if cf_error:
+                                await emit(f"[FAIL] Cloudflare DNS error: {cf_error}")
+                                raise DeployError(f"Cloudflare DNS failed: {cf_error}")
+
+                            cleanup['cf_record_id'] = cf_record['id']
+                            await update_deployment(deployment_uuid, cf_record_id=cf_record['id'])
+                            await emit(f"[DNS] Record created (unproxied). ID: {cf_record['id']}")
+
                             await emit(
-                                f"[FAIL] App is not responding on 127.0.0.1:{assigned_port}; "
-                                "it did not bind the assigned port."
+                                f"[DNS] Waiting for propagation "
+                                f"(up to {int(_DNS_RETRIES * _DNS_DELAY)}s)..."
+                            )
+                            propagation_task = asyncio.create_task(
+                                check_dns_propagated(fqdn, _SERVER_IP, _DNS_RETRIES, _DNS_DELAY)
                             )
-                            raise DeployError("App did not bind its assigned port.")
-                        await emit(f"[PM2] Process '{pm2_name}' confirmed online on port {assigned_port}.")
-                    elif stack == 'static':
-                        await emit("[PM2] Static stack — no process to manage; nginx serves the build output.")
+                            q = self._active_streams.get(run_id)
+                            while not propagation_task.done():
+                                try:
+                                    await asyncio.wait_for(asyncio.shield(propagation_task), timeout=15)
+                                except asyncio.TimeoutError:
+                                    if q:
+                                        await q.put("[DNS] Still waiting for propagation...")
+                            if propagation_task.result():
+                                await emit("[DNS] DNS propagated successfully.")
+                            else:
+                                await emit(
+                                    "[DNS] Propagation check timed out. "
+                                    "Proceeding anyway; certbot may fail."
+                                )
 
-                    await emit("[CHECK] Running final verification...")
+                    async def _stage_cert():
+                        staging_note = " (staging)" if cert_staging else ""
+                        await emit(f"[SSL] Obtaining Let's Encrypt certificate for {fqdn}{staging_note}...")
+                        certbot_cmd = [
+                            'sudo', 'certbot', 'certonly', '--nginx',
+                            '-d', fqdn,
+                            '--non-interactive',
+                            '--agree-tos',
+                            '-m', _CERTBOT_EMAIL,
+                        ]
+                        if cert_staging:
+                            certbot_cmd.append('--staging')
+                        code, out, err = await self.run_exec(certbot_cmd, timeout=180)
+                        for line in (out + err).splitlines():
+                            if line.strip():
+                                await emit(f"[SSL] {line.strip()}")
+                        if code != 0:
+                            await emit(f"[FAIL] certbot failed (exit {code}).")
+                            raise DeployError("certbot SSL provisioning failed.")
+                        cleanup['cert_name'] = fqdn
+                        await emit(f"[SSL] Certificate obtained for {fqdn}.")
+
+                    async def _stage_nginx_ssl():
+                        await emit("[NGINX] Writing full SSL nginx config...")
 
-                    cert_path = f"/etc/letsencrypt/live/{fqdn}/fullchain.pem"
-                    cert_ok = await loop.run_in_executor(None, os.path.exists, cert_path)
-                    if cert_ok:
-                        await emit("[CHECK] SSL certificate confirmed on disk.")
-                    else:
-                        await emit(f"[WARN] SSL certificate not found at {cert_path}.")
+                        if stack == 'node':
+                            ssl_config = _nginx_node_ssl(fqdn, assigned_port)
+                        elif stack == 'static':
+                            ssl_config = _nginx_static_ssl(fqdn, static_root)
+                        else:
+                            ssl_config = _nginx_laravel_ssl(fqdn, deploy_path)
+
+                        nginx_ok, nginx_out = await self._nginx.apply([write_op(nginx_config_path, ssl_config)])
+                        for line in nginx_out.splitlines():
+                            if line.strip():
+                                await emit(f"[NGINX] {line.strip()}")
+                        if not nginx_ok:
+                            await emit("[FAIL] nginx rejected the SSL config; HTTP config restored.")
+                            raise DeployError("nginx config failed (SSL).")
+                        await emit("[NGINX] SSL config written.")
+                        await emit("[NGINX] nginx reloaded with SSL config.")
+
+                    async def _stage_proxy():
+                        if dns_mode != 'external' and cf_record:
+                            await emit("[DNS] Enabling Cloudflare proxy on DNS record...")
+                            record_name = subdomain if dns_mode == 'subdomain' else fqdn
+                            _, cf_upd_err = await cf_cog.update_dns_record(
+                                record_id=cf_record['id'],
+                                type='A',
+                                name=record_name,
+                                content=_SERVER_IP,
+                                ttl=1,
+                                proxied=True,
+                                comment=f"nydus | run={run_id}",
+                                zone_id=cf_zone_id,
+                            )
+                            if cf_upd_err:
+                                await emit(
+                                    f"[WARN] Could not enable Cloudflare proxy: {cf_upd_err}. "
+                                    "Site is live but not proxied yet."
+                                )
+                            else:
+                                await emit("[DNS] Cloudflare proxy enabled.")
 
-                    code, out, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-                    if code == 0:
-                        await emit("[CHECK] nginx config is valid.")
-                    else:
-                        await emit("[WARN] nginx -t returned non-zero on final check.")
+                    async def _stage_process():
+                        nonlocal pm2_name
+                        pm2_name = deployment_uuid[:12]
+                        if stack == 'node':
+                            await emit(f"[PM2] Starting process '{pm2_name}' on port {assigned_port}...")
+                            # Track the process for rollback as soon as we attempt to start it,
+                            # so a later health failure tears it down instead of leaking it.
+                            cleanup['pm2_name'] = pm2_name
+
+                            code, out, err = await self._pm2_apply(
+                                pm2_name, deploy_path, assigned_port, profile, emit
+                            )
+                            for line in (out + err).splitlines():
+                                if line.strip():
+                                    await emit(f"[PM2] {line.strip()}")
+                            if code != 0:
+                                await emit(f"[FAIL] pm2 start failed (exit {code}).")
+                                raise DeployError("pm2 start failed.")
+
+                            await emit(f"[PM2] Process '{pm2_name}' started; verifying it stays online...")
+                            online, detail = await self._pm2_is_online(pm2_name)
+                            if not online:
+                                await emit(
+                                    f"[FAIL] pm2 process '{pm2_name}' is not healthy ({detail}). "
+                                    "The app likely crashed on startup (e.g. missing 'start' script "
+                                    "or a runtime error)."
+                                )
+                                raise DeployError(f"pm2 process not healthy: {detail}")
+                            if not await self._http_port_ok(assigned_port):
+                                await emit(
+                                    f"[FAIL] App is not responding on 127.0.0.1:{assigned_port}; "
+                                    "it did not bind the assigned port."
+                                )
+                                raise DeployError("App did not bind its assigned port.")
+                            await emit(f"[PM2] Process '{pm2_name}' confirmed online on port {assigned_port}.")
+                        elif stack == 'static':
+                            await emit("[PM2] Static stack — no process to manage; nginx serves the build output.")
+
+                    await run_stages([
+                        Stage('source',     spans.timed('git', _stage_source)),
+                        Stage('detect',     _stage_detect,                            needs=('source',)),
+                        Stage('record',     _stage_record,                            needs=('detect',)),
+                        Stage('install',    spans.timed('install', _stage_install),   needs=('record',)),
+                        Stage('build',      spans.timed('build', _stage_build),       needs=('install',)),
+                        Stage('nginx_http', spans.timed('nginx', _stage_nginx_http),  needs=('detect',)),
+                        Stage('dns',        spans.timed('dns', _stage_dns),           needs=('record',)),
+                        Stage('cert',       spans.timed('certbot', _stage_cert),      needs=('dns', 'nginx_http')),
+                        Stage('nginx_ssl',  spans.timed('nginx', _stage_nginx_ssl),   needs=('build', 'cert')),
+                        Stage('proxy',      _stage_proxy,                             needs=('nginx_ssl',)),
+                        Stage('process',    spans.timed('pm2', _stage_process),       needs=('build', 'record')),
+                    ])
+
+                    with spans.span('health'):
+                        await emit("[CHECK] Running final verification...")
+
+                        cert_path = f"/etc/letsencrypt/live/{fqdn}/fullchain.pem"
+                        cert_ok = await loop.run_in_executor(None, os.path.exists, cert_path)
+                        if cert_ok:
+                            await emit("[CHECK] SSL certificate confirmed on disk.")
+                        else:
+                            await emit(f"[WARN] SSL certificate not found at {cert_path}.")
 
-                    if stack == 'node':
-                        online, detail = await self._pm2_is_online(pm2_name, checks=1)
-                        if online:
-                            await emit(f"[CHECK] pm2 process '{pm2_name}' confirmed online.")
+                        nginx_ok, _ = await self._nginx.test()
+                        if nginx_ok:
+                            await emit("[CHECK] nginx config is valid.")
                         else:
-                            await emit(f"[WARN] pm2 process '{pm2_name}' not online ({detail}).")
-
-                    await emit("[HEALTH] Performing HTTP health check...")
-                    # Probe the ORIGIN directly (see _http_health_check) rather than the public
-                    # hostname: a just-created subdomain often isn't resolvable from this box yet
-                    # ("Name or service not known"), and a staging cert would 526 through Cloudflare
-                    # — either would falsely mark a live site 'unhealthy'. The origin is up the
-                    # moment nginx reloaded, independent of public DNS / Cloudflare / cert trust.
-                    health_ok = await self._http_health_check(fqdn, emit)
+                            await emit("[WARN] nginx -t returned non-zero on final check.")
+
+                        if stack == 'node':
+                            online, detail = await self._pm2_is_online(pm2_name, checks=1)
+                            if online:
+                                await emit(f"[CHECK] pm2 process '{pm2_name}' confirmed online.")
+                            else:
+                                await emit(f"[WARN] pm2 process '{pm2_name}' not online ({detail}).")
+
+                        await emit("[HEALTH] Performing HTTP health check...")
+                        # Probe the ORIGIN directly (see _http_health_check) rather than the public
+                        # hostname: a just-created subdomain often isn't resolvable from this box yet
+                        # ("Name or service not known"), and a staging cert would 526 through Cloudflare
+                        # — either would falsely mark a live site 'unhealthy'. The origin is up the
+                        # moment nginx reloaded, independent of public DNS / Cloudflare / cert trust.
+                        health_ok = await self._http_health_check(fqdn, emit)
                     # The deploy pipeline completed (nginx/SSL/DNS/process all succeeded), so the
                     # site is live and must NOT be rolled back — but the HTTP health result is
                     # recorded durably as the deployment status instead of being overwritten.
@@ -1859,6 +2914,8 @@ class DeploymentCog(commands.Cog):
                         deployed_at=datetime.now(timezone.utc),
                     )
                     success = True
+                    if assigned_port:
+                        self._ports.confirm(assigned_port)
                     if health_ok:
                         await emit("[HEALTH] Health check passed.")
                         await emit(f"[DONE] Deployment complete. Live at: https://{fqdn}")
@@ -1882,7 +2939,7 @@ class DeploymentCog(commands.Cog):
 
                 except DeployError as e:
                     await emit(f"[FAIL] {e}")
-                    await self._cleanup_failed_deploy(cleanup, run_id, log_lines, pat, stack)
+                    await self._cleanup_failed_deploy(cleanup, run_id, pat, stack)
                     await self._notify(
                         'error', 'Deployment failed',
                         f"`{fqdn}` failed and was rolled back: {e}",
@@ -1893,7 +2950,7 @@ class DeploymentCog(commands.Cog):
                 except Exception as e:
                     self.logger.exception(f"Unexpected deploy error [{run_id}]: {e}")
                     await emit(f"[FATAL] Unexpected error: {e}")
-                    await self._cleanup_failed_deploy(cleanup, run_id, log_lines, pat, stack)
+                    await self._cleanup_failed_deploy(cleanup, run_id, pat, stack)
                     await self._notify(
                         'error', 'Deployment error',
                         f"`{fqdn}` hit an unexpected error and was rolled back: {e}",
@@ -1902,23 +2959,26 @@ class DeploymentCog(commands.Cog):
                     )
 
                 finally:
-                    full_log = '\n'.join(log_lines)
-                    if len(full_log) > _MAX_LOG_BYTES:
-                        full_log = full_log[:_MAX_LOG_BYTES] + '\n[LOG TRUNCATED]'
-
+                    await self._flush_log(run_id)
                     if cleanup['deployment_uuid']:
                         if not success:
                             await update_deployment(cleanup['deployment_uuid'], status='failed')
                         await update_deployment_log(
                             run_id,
                             'success' if success else 'failed',
-                            full_log,
+                            stage_timings=spans.dump('deploy', stack),
                         )
                     else:
                         self.logger.error(
-                            f"Deploy run {run_id} ended without a deployment_uuid. "
-                            f"Partial log: {full_log[:500]}"
+                            f"Deploy run {run_id} ended without a deployment_uuid; "
+                            f"its log is kept under that run id."
                         )
+        except JobCancelled:
+            await emit("[CANCELLED] Deployment cancelled while queued.")
+            return 'cancelled'
+        if success:
+            return 'succeeded'
+        return 'cancelled' if job.cancelled else 'failed'
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -1939,6 +2999,7 @@ class DeploymentCog(commands.Cog):
         except Exception as e:
             self.logger.error(f"Reconciliation query failed: {e}")
             return
+        stale = [d for d in stale if not self._foreign_node(d)]   # other nodes reconcile their own
         for d in stale:
             try:
                 # Kill any process the crashed deploy may have left running, so it doesn't
@@ -1964,7 +3025,7 @@ class DeploymentCog(commands.Cog):
             )
 
     async def _reclaim_target(
-        self, fqdn: str, deploy_path: str, run_id: str, log_lines: list, pat: str = ''
+        self, fqdn: str, deploy_path: str, run_id: str, pat: str = ''
     ):
         """
         Tear down leftovers for an fqdn that has no live deployment, so a fresh deploy
@@ -1976,7 +3037,7 @@ class DeploymentCog(commands.Cog):
         loop = asyncio.get_running_loop()
 
         async def emit(line: str):
-            await self._emit(run_id, log_lines, line, pat)
+            await self._emit(run_id, line, pat)
 
         nginx_config_path  = os.path.join(_NGINX_AVAILABLE, fqdn)
         nginx_symlink_path = os.path.join(_NGINX_ENABLED, fqdn)
@@ -1996,15 +3057,8 @@ class DeploymentCog(commands.Cog):
             if name:
                 await self.run_exec(['pm2', 'delete', name])
 
-        # nginx config + symlink
-        def _rm_nginx():
-            for p in (nginx_symlink_path, nginx_config_path):
-                try:
-                    if os.path.islink(p) or os.path.exists(p):
-                        os.remove(p)
-                except OSError:
-                    pass
-        await loop.run_in_executor(None, _rm_nginx)
+        # nginx config + symlink (tested and reloaded in the shared nginx batch)
+        await self._nginx.apply([remove_op(nginx_symlink_path), remove_op(nginx_config_path)])
 
         # Cloudflare records: delete each stale row's record in ITS zone (subdomain rows have
         # cf_zone_id=None → managed zone), then a name-lookup fallback for any the row didn't
@@ -2059,28 +3113,25 @@ class DeploymentCog(commands.Cog):
         for d in stale:
             await delete_deployment_row(d['deployment_uuid'])
 
-        # Reload nginx if it still validates after removing the config.
-        code, _, _ = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-        if code == 0:
-            await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
-
         await emit("[RECLAIM] Remnants cleared.")
 
     async def _cleanup_failed_deploy(
         self,
         cleanup: dict,
         run_id: str,
-        log_lines: list,
         pat: str,
         stack: str | None,
     ):
         loop = asyncio.get_running_loop()
 
         async def emit(line: str):
-            await self._emit(run_id, log_lines, line, pat)
+            await self._emit(run_id, line, pat)
 
         await emit("[CLEANUP] Rolling back deployment...")
 
+        if cleanup.get('port'):
+            self._ports.release(cleanup['port'])
+
         if cleanup.get('pm2_name'):
             await emit(f"[CLEANUP] Stopping pm2 process '{cleanup['pm2_name']}'...")
             code, _, _ = await self.run_exec(['pm2', 'delete', cleanup['pm2_name']])
@@ -2092,31 +3143,11 @@ class DeploymentCog(commands.Cog):
                     "Manual cleanup may be required."
                 )
 
-        if cleanup.get('nginx_symlink'):
-            def _rm_symlink():
-                try:
-                    os.remove(cleanup['nginx_symlink'])
-                except OSError:
-                    pass
-
-            await loop.run_in_executor(None, _rm_symlink)
-            await emit("[CLEANUP] nginx symlink removed.")
-
-        if cleanup.get('nginx_config'):
-            def _rm_config():
-                try:
-                    os.remove(cleanup['nginx_config'])
-                except OSError:
-                    pass
-
-            await loop.run_in_executor(None, _rm_config)
-            await emit("[CLEANUP] nginx config removed.")
-
-        if cleanup.get('nginx_config') or cleanup.get('nginx_symlink'):
-            code, out, err = await self.run_exec(['sudo', 'nginx', '-t'], timeout=30)
-            if code == 0:
-                await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
-                await emit("[CLEANUP] nginx reloaded.")
+        nginx_paths = [p for p in (cleanup.get('nginx_symlink'), cleanup.get('nginx_config')) if p]
+        if nginx_paths:
+            ok, _ = await self._nginx.apply([remove_op(p) for p in nginx_paths])
+            if ok:
+                await emit("[CLEANUP] nginx config and symlink removed.")
             else:
                 await emit(
                     "[CLEANUP] Warning: nginx -t failed after config removal. "
@@ -2175,30 +3206,26 @@ class DeploymentCog(commands.Cog):
         if not deployment:
             return False, "Deployment not found."
 
+        if node := self._foreign_node(deployment):
+            return False, f"Deployment runs on node '{node}'; delete it from that node."
+
         fqdn = fqdn_of(deployment)
         loop = asyncio.get_running_loop()
 
         if deployment['tech_stack'] == 'node' and deployment['assigned_port']:
-            pm2_name = deployment_uuid[:12]
+            pm2_name = deployment.get('pm2_name') or deployment_uuid[:12]
             code, _, _ = await self.run_exec(['pm2', 'delete', pm2_name])
             if code != 0:
                 self.logger.warning(f"Could not delete pm2 process {pm2_name} for {deployment_uuid}")
+            # An interrupted blue/green cutover can leave the other colour behind.
+            await self.run_exec(['pm2', 'delete', peer_name(pm2_name)])
 
         nginx_config_path = os.path.join(_NGINX_AVAILABLE, fqdn)
         nginx_symlink_path = os.path.join(_NGINX_ENABLED, fqdn)
 
-        def _remove_nginx():
-            try:
-                if os.path.islink(nginx_symlink_path):
-                    os.remove(nginx_symlink_path)
-                if os.path.exists(nginx_config_path):
-                    os.remove(nginx_config_path)
-            except Exception as e:
-                self.logger.warning(f"Nginx cleanup error: {e}")
-
-        await loop.run_in_executor(None, _remove_nginx)
-
-        await self.run_exec(['sudo', 'systemctl', 'reload', 'nginx'], timeout=30)
+        ok, detail = await self._nginx.apply([remove_op(nginx_symlink_path), remove_op(nginx_config_path)])
+        if not ok:
+            self.logger.warning(f"Nginx cleanup error: {detail}")
 
         cf_cog = self.bot.get_cog('CloudflareCog')
         if cf_cog and deployment.get('cf_record_id'):
@@ -2212,9 +3239,12 @@ class DeploymentCog(commands.Cog):
         )
 
         if deployment.get('deploy_path'):
+            # Release-managed rows store `<root>/current`; remove the whole site root.
+            site_root = release_root(deployment['deploy_path']) or deployment['deploy_path']
+
             def _rm_deploy():
                 try:
-                    shutil.rmtree(deployment['deploy_path'])
+                    shutil.rmtree(site_root)
                 except Exception:
                     pass
             await loop.run_in_executor(None, _rm_deploy)
@@ -2223,6 +3253,12 @@ class DeploymentCog(commands.Cog):
         # ever re-deploying this subdomain. (The previous status='deleted' was also an
         # invalid enum value and silently failed.) Audit history stays in deployment_logs.
         await delete_deployment_row(deployment_uuid)
+        if deployment.get('assigned_port'):
+            self._ports.release(deployment['assigned_port'])
+        self._status.drop(deployment_uuid)
+        self._snapshots.drop(f"status:{deployment_uuid}")
+        self._snapshots.drop(f"diagnostics:{deployment_uuid}")
+        self._snapshots.drop('overview')
         return True, "Deployment deleted successfully."
 
     async def get_env_lines(self, deployment_uuid: str) -> tuple[list, str]:
@@ -2463,31 +3499,47 @@ class DeploymentCog(commands.Cog):
 
         return False, f"Unsupported stack: {stack}"
 
-    def queue_rebuild(self, deployment_uuid: str, triggered_by: str) -> str:
+    async def queue_rebuild(self, deployment_uuid: str, triggered_by: str) -> str | None:
+        """Queue a rebuild; returns its run_id, or None when the deployment doesn't exist."""
+        deployment = await get_deployment_by_uuid(deployment_uuid)
+        if not deployment:
+            return None
         run_id = str(uuid_lib.uuid4())
-        self._active_streams[run_id] = asyncio.Queue()
-        asyncio.create_task(self._run_rebuild(run_id, deployment_uuid, triggered_by))
+        await self._enqueue(run_id, 'rebuild', deployment['project_uuid'], triggered_by,
+                            {}, deployment_uuid=deployment_uuid, node=deployment.get('node'))
+        # A newer rebuild makes any queued/in-progress one for the same deployment moot:
+        # queued rows are cancelled, running ones stop on their worker's next heartbeat.
+        await supersede_rebuild_jobs(deployment_uuid, run_id)
+        for job in self._scheduler.supersede(deployment_uuid, keep=run_id):
+            self._kill_job(job)
         return run_id
 
     async def _run_rebuild(
         self, run_id: str, deployment_uuid: str, triggered_by: str
     ):
-        log_lines: list[str] = []
         success    = False
         log_created = False
         rolled_back = False
+        cutover     = None  # None → in-place reload; True/False → blue/green outcome
+        staged      = None  # new release dir not (or no longer) serving — discarded on exit
+        site_root   = None
+        job         = None
+        cancelled   = False
+        spans       = StageSpans()
+        stack       = None
+        loop        = asyncio.get_running_loop()
 
         async def emit(line: str):
-            await self._emit(run_id, log_lines, line)
+            await self._emit(run_id, line)
 
         try:
             deployment = await get_deployment_by_uuid(deployment_uuid)
             if not deployment:
                 await emit("[FAIL] Deployment not found.")
-                return
+                return 'failed'
             if deployment['status'] != 'active':
                 await emit(f"[FAIL] Cannot rebuild: deployment status is '{deployment['status']}'.")
-                return
+                return 'failed'
 
             await create_deployment_log(
                 run_uuid=run_id,
@@ -2500,14 +3552,17 @@ class DeploymentCog(commands.Cog):
             deploy_path   = deployment['deploy_path']
             stack         = deployment['tech_stack']
             assigned_port = deployment['assigned_port']
-            pm2_name      = deployment_uuid[:12]
+            pm2_name      = deployment.get('pm2_name') or deployment_uuid[:12]
             branch        = deployment.get('branch', 'main')
+            profile       = load_profile(deployment.get('process_profile'))
+            health_path   = deployment.get('health_path') or '/'
 
-            async with self._semaphore:
-                lock = self._get_project_lock(deployment['project_uuid'])
-                async with lock:
-                    await emit(f"[REBUILD] Starting rebuild for {deployment_uuid[:8]}...")
+            job = DeployJob(run_id, 'rebuild', deployment['project_uuid'], triggered_by,
+                            priority_for(triggered_by), target=deployment_uuid)
+            async with self._scheduled(job, emit):
+                await emit(f"[REBUILD] Starting rebuild for {deployment_uuid[:8]}...")
 
+                with spans.span('git'):
                     # Try to detect the correct branch if the stored one doesn't exist
                     await emit(f"[REBUILD] Verifying branch '{branch}' exists...")
                     git_url = await self.get_local_git_remote_url(deploy_path)
@@ -2534,50 +3589,87 @@ class DeploymentCog(commands.Cog):
                     if code_sha == 0 and out_sha.strip():
                         prev_sha = out_sha.strip()
 
-                    await emit("[REBUILD] Fetching latest code from git...")
-                    for step in [
-                        ['git', 'fetch', 'origin', branch],
-                        ['git', 'reset', '--hard', f'origin/{branch}'],
-                    ]:
-                        async for result in self.run_exec_stream(step, cwd=deploy_path):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[GIT] {line.strip()}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[GIT] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] {' '.join(step)} failed (exit {code}).")
-                                    raise DeployError("Git update failed.")
+                    # Release-managed deployments build into a fresh release beside the live
+                    # one; legacy plain checkouts are still updated in place.
+                    site_root    = release_root(deploy_path)
+                    prev_release = None
+                    if site_root:
+                        prev_release = await loop.run_in_executor(None, current_release, site_root)
+                    deps_shared = False
+                    if site_root and prev_release:
+                        build_path, deps_shared = await self._prepare_release(
+                            site_root, deploy_path, branch, stack,
+                            deployment.get('env_file_name'), emit,
+                        )
+                        staged = build_path
+                    else:
+                        site_root  = None
+                        build_path = deploy_path
+                        await emit("[REBUILD] Fetching latest code from git...")
+                        for step in [
+                            ['git', 'fetch', 'origin', branch],
+                            ['git', 'reset', '--hard', f'origin/{branch}'],
+                        ]:
+                            async for result in self.run_exec_stream(step, cwd=deploy_path):
+                                if len(result) == 2:
+                                    code, line = result
+                                    if code is None:
+                                        if line.strip():
+                                            await emit(f"[GIT] {line.strip()}")
+                                else:
+                                    code, out, err = result
+                                    for line in (out + err).splitlines():
+                                        if line.strip():
+                                            await emit(f"[GIT] {line.strip()}")
+                                    if code != 0:
+                                        await emit(f"[FAIL] {' '.join(step)} failed (exit {code}).")
+                                        raise DeployError("Git update failed.")
                     await emit("[REBUILD] Git update complete.")
+                self._check_cancelled(job)
+
+                async def activate():
+                    nonlocal staged
+                    # Point of no return: a newer rebuild now waits for this one to finish.
+                    self._check_cancelled(job)
+                    job.cancellable = False
+                    if site_root:
+                        await loop.run_in_executor(
+                            None, switch_current, site_root, os.path.basename(build_path)
+                        )
+                        staged = None
+                        await emit(f"[REBUILD] Release {os.path.basename(build_path)} is now current.")
 
-                    if stack in ('node', 'static'):
-                        await emit("[REBUILD] npm install...")
-                        async for result in self.run_exec_stream(
-                            ['npm', 'install'], cwd=deploy_path
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] npm install failed (exit {code}).")
-                                    raise DeployError("npm install failed.")
+                if stack in ('node', 'static'):
+                    if deps_shared:
+                        await emit(
+                            f"[INSTALL] node_modules hardlinked from {prev_release} "
+                            "(lockfile unchanged); skipping npm install."
+                        )
+                    else:
+                        with spans.span('install'):
+                            await emit("[REBUILD] npm install...")
+                            async for result in self.run_exec_stream(
+                                ['npm', 'install'], cwd=build_path
+                            ):
+                                if len(result) == 2:
+                                    code, line = result
+                                    if code is None:
+                                        if line.strip():
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                else:
+                                    code, out, err = result
+                                    for line in (out + err).splitlines():
+                                        if line.strip():
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                    if code != 0:
+                                        await emit(f"[FAIL] npm install failed (exit {code}).")
+                                        raise DeployError("npm install failed.")
 
+                    with spans.span('build'):
                         await emit("[REBUILD] npm run build...")
                         async for result in self.run_exec_stream(
                             ['npm', 'run', 'build'],
-                            cwd=deploy_path,
+                            cwd=build_path,
                             env_extra={'NODE_OPTIONS': f'--max-old-space-size={_NODE_MEM_MB}'},
                         ):
                             if len(result) == 2:
@@ -2594,18 +3686,22 @@ class DeploymentCog(commands.Cog):
                                     await emit(f"[FAIL] Build failed (exit {code}).")
                                     raise DeployError("Build failed.")
 
-                        if stack == 'node':
+                    # The new release goes live before the process switch: a blue/green
+                    # peer or a pm2 reload both start from `current`.
+                    await activate()
+                    with spans.span('pm2'):
+                        if stack == 'node' and _BLUE_GREEN and assigned_port:
+                            await emit(f"[REBUILD] Blue/green cutover from '{pm2_name}' (port {assigned_port})...")
+                            cutover, pm2_name, assigned_port = await self._blue_green_cutover(
+                                deployment_uuid, fqdn_of(deployment), deploy_path,
+                                pm2_name, assigned_port, emit, profile=profile,
+                                health_path=health_path,
+                            )
+                        elif stack == 'node':
                             await emit(f"[REBUILD] Restarting pm2 process '{pm2_name}'...")
-                            code, out, err = await self.run_exec(
-                                ['pm2', 'reload', pm2_name], cwd=deploy_path
+                            code, out, err = await self._pm2_apply(
+                                pm2_name, deploy_path, assigned_port, profile, emit
                             )
-                            if code != 0:
-                                await emit("[REBUILD] pm2 reload failed, trying pm2 start...")
-                                code, out, err = await self.run_exec(
-                                    ['pm2', 'start', 'npm', '--name', pm2_name, '--', 'start'],
-                                    cwd=deploy_path,
-                                    env_extra={'PORT': str(assigned_port)},
-                                )
                             for line in (out + err).splitlines():
                                 if line.strip():
                                     await emit(f"[PM2] {line.strip()}")
@@ -2621,32 +3717,40 @@ class DeploymentCog(commands.Cog):
                         else:
                             await emit("[REBUILD] Static stack — build output refreshed; no process restart needed.")
 
-                    elif stack == 'laravel':
-                        await emit("[REBUILD] composer install...")
-                        async for result in self.run_exec_stream(
-                            ['composer', 'install', '--no-dev', '--optimize-autoloader'],
-                            cwd=deploy_path,
-                        ):
-                            if len(result) == 2:
-                                code, line = result
-                                if code is None:
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                            else:
-                                code, out, err = result
-                                for line in (out + err).splitlines():
-                                    if line.strip():
-                                        await emit(f"[INSTALL] {line.strip()}")
-                                if code != 0:
-                                    await emit(f"[FAIL] composer install failed (exit {code}).")
-                                    raise DeployError("composer install failed.")
+                elif stack == 'laravel':
+                    if deps_shared:
+                        await emit(
+                            f"[INSTALL] vendor/ hardlinked from {prev_release} "
+                            "(lockfile unchanged); skipping composer install."
+                        )
+                    else:
+                        with spans.span('install'):
+                            await emit("[REBUILD] composer install...")
+                            async for result in self.run_exec_stream(
+                                ['composer', 'install', '--no-dev', '--optimize-autoloader'],
+                                cwd=build_path,
+                            ):
+                                if len(result) == 2:
+                                    code, line = result
+                                    if code is None:
+                                        if line.strip():
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                else:
+                                    code, out, err = result
+                                    for line in (out + err).splitlines():
+                                        if line.strip():
+                                            await emit(f"[INSTALL] {line.strip()}")
+                                    if code != 0:
+                                        await emit(f"[FAIL] composer install failed (exit {code}).")
+                                        raise DeployError("composer install failed.")
 
+                    with spans.span('build'):
                         for artisan_cmd in [
                             ['php', 'artisan', 'config:cache'],
                             ['php', 'artisan', 'route:cache'],
                             ['php', 'artisan', 'view:cache'],
                         ]:
-                            async for result in self.run_exec_stream(artisan_cmd, cwd=deploy_path):
+                            async for result in self.run_exec_stream(artisan_cmd, cwd=build_path):
                                 if len(result) == 2:
                                     code, line = result
                                     if code is None:
@@ -2660,53 +3764,99 @@ class DeploymentCog(commands.Cog):
                                     if code != 0:
                                         await emit(f"[FAIL] {' '.join(artisan_cmd)} failed (exit {code}).")
                                         raise DeployError("Artisan command failed.")
+                    await activate()
 
-                    await emit("[REBUILD] Performing health check...")
-                    fqdn = fqdn_of(deployment)
-                    # Wait for the reloaded process to rebind before probing, so the health check
-                    # isn't racing pm2's restart window (which otherwise reads as a transient 502).
-                    if stack == 'node' and assigned_port:
-                        await self._http_port_ok(assigned_port)
-                    health_ok = await self._http_health_check(fqdn, emit)
+                fqdn = fqdn_of(deployment)
+                if cutover is not None:
+                    # The cutover already health-checked the site through the new upstream.
+                    health_ok = cutover
+                else:
+                    with spans.span('health'):
+                        await emit("[REBUILD] Performing health check...")
+                        # Wait for the reloaded process to rebind before probing, so the health check
+                        # isn't racing pm2's restart window (which otherwise reads as a transient 502).
+                        if stack == 'node' and assigned_port:
+                            await self._http_port_ok(assigned_port)
+                        health_ok = await self._http_health_check(fqdn, emit, path=health_path)
 
-                    if health_ok:
-                        await emit("[HEALTH] Health check passed.")
+                if health_ok:
+                    await emit("[HEALTH] Health check passed.")
+                    success = True
+                    await emit("[REBUILD] Rebuild complete.")
+                elif site_root:
+                    # New release is unhealthy — point `current` back at the last-good one.
+                    await emit(f"[ROLLBACK] Rebuild unhealthy; switching back to release {prev_release}...")
+                    rolled_back = True
+                    staged = build_path
+                    # After a failed cutover the old process never stopped serving, so
+                    # the symlink swap is all it takes; otherwise reload onto it.
+                    reverted = await self._activate_release(
+                        site_root, prev_release, stack, pm2_name, assigned_port, deploy_path,
+                        emit, reload=cutover is None, profile=profile,
+                    )
+                    if reverted and await self._http_health_check(fqdn, emit, path=health_path):
                         success = True
-                        await emit("[REBUILD] Rebuild complete.")
-                    elif prev_sha:
-                        # New build is unhealthy — roll back to the last-good commit.
-                        await emit(f"[ROLLBACK] Rebuild unhealthy; reverting to {prev_sha[:8]}...")
-                        rolled_back = True
-                        reverted = await self._revert_to_commit(
-                            deploy_path, stack, pm2_name, assigned_port, prev_sha, emit
-                        )
-                        if reverted and stack == 'node' and assigned_port:
-                            await self._http_port_ok(assigned_port)
-                        if reverted and await self._http_health_check(fqdn, emit):
-                            success = True
-                            await emit("[ROLLBACK] Previous build restored; site healthy again.")
-                        else:
-                            success = False
-                            await emit("[ROLLBACK] Rollback did not restore a healthy site.")
+                        await emit("[ROLLBACK] Previous release restored; site healthy again.")
+                    else:
+                        success = False
+                        await emit("[ROLLBACK] Rollback did not restore a healthy site.")
+                elif prev_sha:
+                    # Legacy in-place checkout: roll back by rebuilding the last-good commit.
+                    await emit(f"[ROLLBACK] Rebuild unhealthy; reverting to {prev_sha[:8]}...")
+                    rolled_back = True
+                    # After a failed cutover the old process is still serving the old
+                    # build from memory; only the tree needs restoring, not a reload.
+                    reverted = await self._revert_to_commit(
+                        deploy_path, stack, pm2_name, assigned_port, prev_sha, emit,
+                        restart=cutover is None, profile=profile,
+                    )
+                    if reverted and stack == 'node' and assigned_port:
+                        await self._http_port_ok(assigned_port)
+                    if reverted and await self._http_health_check(fqdn, emit, path=health_path):
+                        success = True
+                        await emit("[ROLLBACK] Previous build restored; site healthy again.")
                     else:
-                        await emit("[HEALTH] Health check failed after rebuild; no prior commit to revert to.")
                         success = False
+                        await emit("[ROLLBACK] Rollback did not restore a healthy site.")
+                else:
+                    await emit("[HEALTH] Health check failed after rebuild; no prior commit to revert to.")
+                    success = False
 
+        except JobCancelled:
+            cancelled = True
+            await emit("[CANCELLED] Rebuild cancelled while queued.")
         except DeployError:
-            pass
+            if job and job.cancelled:
+                cancelled = True
+                await emit("[CANCELLED] Rebuild cancelled before going live; current release untouched.")
         except Exception as e:
             self.logger.exception(f"Unexpected rebuild error [{run_id}]: {e}")
             await emit(f"[FATAL] Unexpected error: {e}")
         finally:
-            full_log = '\n'.join(log_lines)
-            if len(full_log) > _MAX_LOG_BYTES:
-                full_log = full_log[:_MAX_LOG_BYTES] + '\n[LOG TRUNCATED]'
+            if staged:
+                # A release that failed to build, or was rolled back, is never kept around as
+                # a rollback target.
+                await loop.run_in_executor(None, lambda: shutil.rmtree(staged, ignore_errors=True))
+                await emit(f"[CLEANUP] Discarded release {os.path.basename(staged)}.")
+            elif success and not rolled_back and site_root:
+                removed = await loop.run_in_executor(None, prune_releases, site_root, _KEEP_RELEASES)
+                if removed:
+                    await emit(f"[CLEANUP] Pruned {len(removed)} old release(s); keeping {_KEEP_RELEASES}.")
+            await self._flush_log(run_id)
             if log_created:
                 await update_deployment_log(
-                    run_id, 'success' if success else 'failed', full_log
+                    run_id, 'success' if success else 'failed',
+                    stage_timings=spans.dump('rebuild', stack),
                 )
                 fqdn = fqdn_of(deployment)
-                if success and rolled_back:
+                if cancelled:
+                    await self._notify(
+                        'info', 'Rebuild cancelled',
+                        f"`{fqdn}` rebuild was cancelled or superseded by a newer one.",
+                        source='rebuild', target=fqdn,
+                        fields={'Run': run_id, 'By': triggered_by},
+                    )
+                elif success and rolled_back:
                     await self._notify(
                         'warning', 'Rebuild reverted',
                         f"`{fqdn}` rebuild was unhealthy and was rolled back to the previous build.",
@@ -2727,11 +3877,10 @@ class DeploymentCog(commands.Cog):
                         source='rebuild', target=fqdn, critical=True,
                         fields={'Run': run_id, 'By': triggered_by},
                     )
-            q = self._active_streams.get(run_id)
-            if q:
-                await q.put(None)
-            await asyncio.sleep(_STREAM_TTL)
-            self._active_streams.pop(run_id, None)
+            self._end_stream(run_id)
+        if cancelled:
+            return 'cancelled'
+        return 'succeeded' if success else 'failed'
 
     async def _check_dev(self, ctx_or_interaction) -> bool:
         user_id = ctx_or_interaction.author.id if hasattr(ctx_or_interaction, 'author') else ctx_or_interaction.user.id
@@ -2749,7 +3898,7 @@ class DeploymentCog(commands.Cog):
             return
         await ctx.respond("Processing deployment...", ephemeral=True)
         project_data = {"project_uuid": project_uuid, "name": project_uuid, "git_url": "https://github.com/example/repo.git", "default_branch": "main"}
-        run_id = self.queue_deploy(project_data, subdomain, github_pat, str(ctx.author.id))
+        run_id = await self.queue_deploy(project_data, subdomain, github_pat, str(ctx.author.id))
         embed = discord.Embed(title="Deployment Started", description=f"Run ID: `{run_id}`\nSubdomain: `{subdomain}`", color=discord.Color.blue())
         await ctx.send_followup(embed=embed)
 
@@ -2789,7 +3938,10 @@ class DeploymentCog(commands.Cog):
         if not await self._check_dev(ctx):
             return
         await ctx.respond(f"Rebuilding deployment `{deployment_uuid}`...", ephemeral=True)
-        run_id = self.queue_rebuild(deployment_uuid, str(ctx.author.id))
+        run_id = await self.queue_rebuild(deployment_uuid, str(ctx.author.id))
+        if not run_id:
+            await ctx.send_followup("Deployment not found.", ephemeral=True)
+            return
         await ctx.send_followup(f"Rebuild started. Run ID: `{run_id}`\nUse `/logs {run_id}` to watch.", ephemeral=True)
 
 
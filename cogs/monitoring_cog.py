@@ -2,17 +2,73 @@ import discord
 from discord.ext import commands, tasks
 import psutil
 import os
+import asyncio
 import logging
-import aiohttp
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from database.db import (
-    log_system_resources, execute_query,
+    log_system_resources, log_host_io, execute_query,
     get_all_managed_services, get_active_deployments,
+    log_disk_usage, get_disk_usage_since,
+    log_app_resources, rollup_app_resources, get_app_resource_history, get_app_resource_totals,
+    log_watch_probes, get_watch_probes, save_watch_probe_hourly, get_watch_probe_hourly,
+    open_watch_incident, close_watch_incident, get_open_watch_incidents, get_watch_incidents,
+    save_access_minutes, get_access_minutes, get_access_log_offsets, save_access_log_offsets,
 )
+from utils.access_log import MinuteAggregator, follow, parse_line, summarize
+from utils.anomaly import AnomalyDetector
+from utils.app_resources import AppSampler, pm2_pids, top_consumers
+from utils.disk_scan import DiskScanner, culprit_summary, usage_report
 from utils.domains import fqdn_of
+from utils.host_metrics import HostSampler, alert_values, system_columns
+from utils.pm2_profile import load_profile
+from utils.probe_stats import rollup, summarize_hourly, summarize_probes
+from utils.sockstat import connection_counts
+from utils.stage_timing import percentile
+from utils.watch_schedule import WatchSchedule
 
 _DOMAIN = os.getenv('DEPLOY_DOMAIN', 'arvo.team')
 _DEV_ID = int(os.getenv('DEV_ID', '0'))
+_DEPLOY_BASE = os.getenv('DEPLOY_BASE', '/var/www')
+_DISK_SCAN_INTERVAL = float(os.getenv('DISK_SCAN_INTERVAL', '900'))
+_APP_SAMPLE_INTERVAL = float(os.getenv('APP_SAMPLE_INTERVAL', '60'))
+_WATCH_FAST = float(os.getenv('WATCHDOG_FAST_INTERVAL', '15'))
+_CERT_MAP_TTL = 3600.0
+_ACCESS_LOG_INTERVAL = float(os.getenv('ACCESS_LOG_INTERVAL', '30'))
+_NGINX_LOG_DIR = os.getenv('NGINX_LOG_DIR', '/var/log/nginx')
+
+# Thresholds over utils.host_metrics.alert_values: (key, env var, default, label, unit).
+# 0 disables one; percentages recover 5 points below, the rest 10% below.
+_HOST_THRESHOLDS = (
+    ('load_per_core', 'ALERT_LOAD_PER_CORE',  '2',  'load',               '/core'),
+    ('core_max',      'ALERT_CORE_PCT',       '0',  'single-core CPU',    '%'),
+    ('psi_cpu',       'ALERT_PSI_CPU_PCT',    '0',  'CPU pressure',       '%'),
+    ('psi_memory',    'ALERT_PSI_MEMORY_PCT', '20', 'memory pressure',    '%'),
+    ('psi_io',        'ALERT_PSI_IO_PCT',     '40', 'I/O pressure',       '%'),
+    ('disk_mbps',     'ALERT_DISK_MBPS',      '0',  'disk throughput',    ' MB/s'),
+    ('net_mbps',      'ALERT_NET_MBPS',       '0',  'network throughput', ' MB/s'),
+)
+
+_ANOMALY_LABELS = {'cpu': 'CPU', 'ram': 'RAM', 'disk': 'disk', 'inodes': 'inode'}
+
+
+def _eta_text(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{max(1, round(seconds / 60))} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def _lower_priority():
+    # Runs in the scan thread: nice 19 for this thread only (Linux threads have their
+    # own nice value), so the walk yields the CPU to builds and request handling.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
 
 class MonitoringCog(commands.Cog):
     def __init__(self, bot):
@@ -24,6 +80,29 @@ class MonitoringCog(commands.Cog):
         self._ram_threshold  = float(os.getenv('ALERT_RAM_PCT', '90'))
         self._disk_threshold = float(os.getenv('ALERT_DISK_PCT', '85'))
         self._alert_state = {'cpu': False, 'ram': False, 'disk': False}
+        self._host_thresholds = [
+            (key, float(os.getenv(env, default)), label, unit)
+            for key, env, default, label, unit in _HOST_THRESHOLDS
+        ]
+        # Statistical alerts over the same samples (utils.anomaly): CPU/RAM well above
+        # their own EWMA baseline for ANOMALY_SUSTAIN ticks, and disk/inodes (RAM: leaks)
+        # projected to fill within their horizon. ANOMALY_ALERTS=false turns them off.
+        self._anomaly_enabled = os.getenv('ANOMALY_ALERTS', 'true').lower() in ('1', 'true', 'yes')
+        self._anomaly = AnomalyDetector(
+            deviation={'cpu': 20.0, 'ram': 10.0},
+            forecast={
+                'disk': float(os.getenv('ANOMALY_DISK_HORIZON', '86400')),
+                'inodes': float(os.getenv('ANOMALY_DISK_HORIZON', '86400')),
+                'ram': float(os.getenv('ANOMALY_RAM_HORIZON', '21600')),
+            },
+            z=float(os.getenv('ANOMALY_Z', '4')),
+            sustain=int(os.getenv('ANOMALY_SUSTAIN', '6')),
+            halflife=float(os.getenv('ANOMALY_HALFLIFE', '3600')),
+        )
+        # Rates (disk/net/per-core) are deltas between monitor ticks; the last sample is
+        # kept for GET /api/stats/host.
+        self._host_sampler = HostSampler()
+        self._host_latest: dict = {}
         # Health watchdog over managed services + active deployments. Alert-only by default;
         # set SELF_HEAL_ENABLED=true to allow auto-restart / cert renewal (cooldown-guarded).
         self._watch_state = {}
@@ -41,9 +120,53 @@ class MonitoringCog(commands.Cog):
         # starts, so a reboot's transient downtime never storms before things finish booting.
         self._watch_grace = float(os.getenv('WATCHDOG_GRACE_SECONDS', '300'))
         self._watch_started_at = None
+        # Each target has its own probe schedule (utils.watch_schedule): failing targets
+        # every WATCHDOG_FAST_INTERVAL s, healthy ones every WATCHDOG_INTERVAL s, long-stable
+        # ones every WATCHDOG_SLOW_INTERVAL s. Due targets are probed concurrently (at most
+        # WATCHDOG_CONCURRENCY at once) through DeploymentCog's pooled probe client.
+        self._watch_schedule = WatchSchedule(
+            base=float(os.getenv('WATCHDOG_INTERVAL', '60')),
+            fast=_WATCH_FAST,
+            slow=float(os.getenv('WATCHDOG_SLOW_INTERVAL', '300')),
+            stable_after=float(os.getenv('WATCHDOG_STABLE_AFTER', '1800')),
+        )
+        self._watch_concurrency = int(os.getenv('WATCHDOG_CONCURRENCY', '10'))
+        self._watch_timeout = float(os.getenv('WATCHDOG_HTTP_TIMEOUT', '8'))
+        self._watch_ticks: deque = deque(maxlen=100)    # (duration ms, targets probed)
+        self._cert_map: dict = {}
+        self._cert_map_at: float | None = None
+        # Every probe goes to watchdog_probes (rolled up hourly); confirmed outages become
+        # watchdog_incidents rows. _incidents_open is loaded from the DB on the first tick
+        # so an outage open across a restart is still closed by its recovery.
+        self._fail_since: dict[str, float] = {}
+        self._incidents_open: set | None = None
+        # Background disk accounting: one low-priority thread walks the targets
+        # incrementally every DISK_SCAN_INTERVAL s; the latest sizes stay in memory
+        # (status endpoints) and every pass is stored in disk_usage (growth rates).
+        self._disk_scanner = DiskScanner()
+        self._disk_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='disk-scan',
+                                             initializer=_lower_priority)
+        self._disk_usage: dict = {}
+        self._disk_scanned_at: datetime | None = None
+        # Per-app /proc accounting (each pm2 app's process tree), taken on the monitor
+        # tick every APP_SAMPLE_INTERVAL s; the latest pass stays in memory, every pass
+        # goes to app_resources and is rolled up hourly.
+        self._app_sampler = AppSampler()
+        self._app_latest: dict = {}
+        self._app_sampled_at: datetime | None = None
+        # nginx access-log analytics: every ACCESS_LOG_INTERVAL s each deployment's access
+        # log is read from its stored offset (off the loop) and folded into per-minute
+        # aggregates in access_stats. Offsets and the open minutes are reloaded from the
+        # DB on the first pass.
+        self._access = MinuteAggregator()
+        self._access_offsets: dict | None = None
         self.monitor_system.start()
         self.cleanup_old_logs.start()
         self.watchdog.start()
+        self.scan_disk_usage.start()
+        self.roll_up_app_resources.start()
+        self.roll_up_watch_probes.start()
+        self.ingest_access_logs.start()
 
     async def _emit_alert(self, level, title, message, *, source, target, critical=False) -> bool:
         """The single gate for EVERY monitoring alert — resource thresholds AND the service
@@ -61,72 +184,157 @@ class MonitoringCog(commands.Cog):
                 logging.debug("monitoring alert emit failed", exc_info=True)
         return True
 
-    async def _check_threshold(self, key, value, threshold, label):
+    async def _check_threshold(self, key, value, threshold, label, detail=None, unit='%'):
+        def _fmt(v):
+            return f"{v:.0f}%" if unit == '%' else f"{v:.1f}{unit}"
+
+        margin = 5 if unit == '%' else threshold * 0.1
         breached = value >= threshold
         was = self._alert_state.get(key, False)
         if breached and not was:
+            message = f"{label} at {_fmt(value)} (threshold {_fmt(threshold)})."
+            if detail and self._alerts_active():
+                try:
+                    extra = await detail()
+                except Exception:
+                    logging.debug("threshold alert detail failed", exc_info=True)
+                    extra = None
+                if extra:
+                    message += f" {extra}"
             # Consume the edge only if we actually alerted, so a breach that happens while
             # alerting is off surfaces once it's enabled (same rule the watchdog uses).
             if await self._emit_alert(
-                'warning', f"High {label}",
-                f"{label} at {value:.0f}% (threshold {threshold:.0f}%).",
+                'warning', f"High {label}", message,
                 source='monitor', target=label, critical=True,
             ):
                 self._alert_state[key] = True
-        elif was and value < (threshold - 5):
+        elif was and value < (threshold - margin):
             self._alert_state[key] = False
             await self._emit_alert(
-                'success', f"{label} recovered", f"{label} back to {value:.0f}%.",
+                'success', f"{label} recovered", f"{label} back to {_fmt(value)}.",
                 source='monitor', target=label, critical=False,
             )
 
+    async def _check_anomalies(self, sample):
+        inodes = (100.0 * sample['inodes_used'] / sample['inodes_total']
+                  if sample['inodes_total'] else None)
+        findings = self._anomaly.observe(time.monotonic(), {
+            'cpu': sample['cpu'], 'ram': sample['ram_percent'],
+            'disk': sample['disk_percent'], 'inodes': inodes,
+        })
+        for key, f in findings.items():
+            edge = f"anomaly:{key}"
+            if self._alert_state.get(edge):
+                continue
+            label = _ANOMALY_LABELS[key.split('_')[0]]
+            if f['kind'] == 'deviation':
+                title = f"Unusual {label} usage"
+                message = (f"{label} at {f['value']:.0f}%, {f['z']:.1f}σ above its recent "
+                           f"baseline of {f['baseline']:.0f}%.")
+            else:
+                title = f"{label} filling up"
+                message = (f"{label} at {f['value']:.0f}% and rising {f['rate_per_hour']:.2f} "
+                           f"points/hour: full in about {_eta_text(f['eta_s'])} at this rate.")
+            # Forecasts page (action needed before it's full); deviations are informational.
+            if await self._emit_alert('warning', title, message, source='anomaly', target=label,
+                                      critical=f['kind'] == 'forecast'):
+                self._alert_state[edge] = True
+        for edge in [k for k, v in self._alert_state.items() if v and k.startswith('anomaly:')]:
+            key = edge.split(':', 1)[1]
+            if key in findings:
+                continue
+            self._alert_state[edge] = False
+            label = _ANOMALY_LABELS[key.split('_')[0]]
+            title, message = ((f"{label} growth eased", f"{label} no longer projected to fill soon.")
+                              if key.endswith('_forecast') else
+                              (f"{label} usage normal", f"{label} back near its baseline."))
+            await self._emit_alert('success', title, message, source='anomaly', target=label,
+                                   critical=False)
+
     def cog_unload(self):
         self.monitor_system.cancel()
         self.cleanup_old_logs.cancel()
         self.watchdog.cancel()
+        self.scan_disk_usage.cancel()
+        self.roll_up_app_resources.cancel()
+        self.roll_up_watch_probes.cancel()
+        self.ingest_access_logs.cancel()
+        self._disk_pool.shutdown(wait=False)
+
+    def _sample_system(self) -> dict:
+        # Blocking reads (psutil, statvfs, /proc); runs in a worker thread.
+        mem = psutil.virtual_memory()
+        disk_info = psutil.disk_usage('/')
+        st = os.statvfs('/')
+        return {
+            'cpu': psutil.cpu_percent(interval=None),
+            'ram_percent': mem.percent,
+            'ram_remaining': mem.available,
+            'ram_total': mem.total,
+            'disk_percent': disk_info.percent,
+            'disk_remaining': disk_info.free,
+            'disk_total': disk_info.total,
+            'inodes_used': st.f_files - st.f_ffree,
+            'inodes_total': st.f_files,
+            # Kernel socket counters instead of psutil.net_connections(), which builds
+            # an object per socket and resolves every inode to a pid.
+            **connection_counts(),
+            'host': self._host_sampler.sample(),
+        }
 
     @tasks.loop(seconds=10)
     async def monitor_system(self):
         try:
-            cpu = psutil.cpu_percent(interval=None)
-            
-            mem = psutil.virtual_memory()
-            ram_percent = mem.percent
-            ram_remaining = mem.available
-            ram_total = mem.total
-
-            disk_info = psutil.disk_usage('/')
-            disk_percent = disk_info.percent
-            disk_remaining = disk_info.free
-            disk_total = disk_info.total
-
-            st = os.statvfs('/')
-            inodes_total = st.f_files
-            inodes_free = st.f_ffree
-            inodes_used = inodes_total - inodes_free
-
-            connections = len(psutil.net_connections())
+            loop = asyncio.get_running_loop()
+            sample = await loop.run_in_executor(None, self._sample_system)
+            cpu = sample['cpu']
+            ram_percent = sample['ram_percent']
+            disk_percent = sample['disk_percent']
 
             await log_system_resources(
                 cpu,
                 ram_percent,
-                ram_remaining,
-                ram_total,
+                sample['ram_remaining'],
+                sample['ram_total'],
                 disk_percent,
-                disk_remaining,
-                disk_total,
-                inodes_used,
-                inodes_total,
-                connections
+                sample['disk_remaining'],
+                sample['disk_total'],
+                sample['inodes_used'],
+                sample['inodes_total'],
+                sample['connections'],
+                tcp_established=sample['established'],
+                tcp_time_wait=sample['time_wait'],
+                tcp_listen=sample['listen'],
+                host=system_columns(sample['host']),
+            )
+            host = sample['host']
+            self._host_latest = dict(host, sampled_at=datetime.now(timezone.utc))
+            await log_host_io(
+                [(dev, d['read_bps'], d['write_bps'], d['read_iops'], d['write_iops'])
+                 for dev, d in host['disks'].items() if d['read_bps'] is not None],
+                [(iface, n['rx_bps'], n['tx_bps'])
+                 for iface, n in host['net'].items() if n['rx_bps'] is not None],
             )
 
             # Edge-triggered alerts on sustained resource pressure.
             await self._check_threshold('cpu', cpu, self._cpu_threshold, 'CPU')
             await self._check_threshold('ram', ram_percent, self._ram_threshold, 'RAM')
-            await self._check_threshold('disk', disk_percent, self._disk_threshold, 'disk')
+            await self._check_threshold('disk', disk_percent, self._disk_threshold, 'disk',
+                                        detail=self._disk_culprits)
+            values = alert_values(host)
+            for key, threshold, label, unit in self._host_thresholds:
+                if threshold > 0 and key in values:
+                    await self._check_threshold(key, values[key], threshold, label, unit=unit)
+            if self._anomaly_enabled:
+                await self._check_anomalies(sample)
         except Exception as e:
             logging.error(f"Monitoring error: {e}")
 
+        if (self._app_sampled_at is None
+                or (datetime.now(timezone.utc) - self._app_sampled_at).total_seconds()
+                >= _APP_SAMPLE_INTERVAL - 1):
+            await self._sample_apps()
+
     @tasks.loop(hours=24)
     async def cleanup_old_logs(self):
         try:
@@ -137,10 +345,242 @@ class MonitoringCog(commands.Cog):
                 "DELETE FROM alerts WHERE acknowledged_at IS NOT NULL "
                 "AND created_at < NOW() - INTERVAL 30 DAY"
             )
+            await execute_query(
+                "DELETE FROM disk_usage WHERE measured_at < NOW() - INTERVAL 30 DAY"
+            )
+            await execute_query(
+                "DELETE FROM app_resources WHERE measured_at < NOW() - INTERVAL 2 DAY"
+            )
+            await execute_query(
+                "DELETE FROM host_disk_io WHERE measured_at < NOW() - INTERVAL 7 DAY"
+            )
+            await execute_query(
+                "DELETE FROM host_net_io WHERE measured_at < NOW() - INTERVAL 7 DAY"
+            )
+            await execute_query(
+                "DELETE FROM app_resources_hourly WHERE hour < NOW() - INTERVAL 90 DAY"
+            )
+            await execute_query(
+                "DELETE FROM watchdog_probes WHERE probed_at < NOW() - INTERVAL 2 DAY"
+            )
+            await execute_query(
+                "DELETE FROM watchdog_probes_hourly WHERE hour < NOW() - INTERVAL 90 DAY"
+            )
+            await execute_query(
+                "DELETE FROM watchdog_incidents WHERE ended_at < NOW() - INTERVAL 90 DAY"
+            )
+            await execute_query(
+                "DELETE FROM access_stats WHERE minute < NOW() - INTERVAL 14 DAY"
+            )
+            await execute_query(
+                "DELETE FROM access_log_offsets WHERE updated_at < NOW() - INTERVAL 30 DAY"
+            )
             logging.info("Cleaned up old system resources logs.")
         except Exception as e:
             logging.error(f"Cleanup error: {e}")
 
+    # ------------------------------
+    # Disk usage accounting
+    # ------------------------------
+    def _disk_targets(self) -> dict:
+        """{target: (path, restat)}: every site root under /var/www plus the log/backup trees."""
+        targets = {}
+        try:
+            names = sorted(os.listdir(_DEPLOY_BASE))
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(_DEPLOY_BASE, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                targets[f"www/{name}"] = (path, False)
+        targets['pm2-logs'] = (os.path.expanduser('~/.pm2/logs'), True)
+        targets['nginx-logs'] = ('/var/log/nginx', True)
+        targets['backups'] = (os.getenv('BACKUP_DIR', '/var/backups/nydus'), True)
+        return targets
+
+    def _scan_disk(self) -> dict:
+        return self._disk_scanner.scan(self._disk_targets())
+
+    @tasks.loop(seconds=_DISK_SCAN_INTERVAL)
+    async def scan_disk_usage(self):
+        try:
+            loop = asyncio.get_running_loop()
+            usage = await loop.run_in_executor(self._disk_pool, self._scan_disk)
+            self._disk_usage = usage
+            self._disk_scanned_at = datetime.now(timezone.utc)
+            await log_disk_usage([
+                (name, u['path'], u['bytes'], u['files']) for name, u in usage.items()
+            ])
+        except Exception as e:
+            logging.error(f"Disk usage scan error: {e}")
+
+    def disk_usage_of(self, path: str) -> tuple[int, float] | None:
+        """(bytes, age in seconds) of the scanned target rooted at `path`, if scanned."""
+        if self._disk_scanned_at is None:
+            return None
+        path = os.path.normpath(path)
+        for u in self._disk_usage.values():
+            if u['path'] == path:
+                age = (datetime.now(timezone.utc) - self._disk_scanned_at).total_seconds()
+                return u['bytes'], age
+        return None
+
+    async def disk_usage_report(self, hours: int = 24, top: int = 10) -> dict:
+        """Top consumers and growth rates over the last `hours` of stored scans."""
+        report = usage_report(await get_disk_usage_since(hours), top=top)
+        report['hours'] = hours
+        report['scanned_at'] = self._disk_scanned_at
+        report['dirs_listed'] = self._disk_scanner.dirs_listed
+        return report
+
+    async def _disk_culprits(self) -> str:
+        return culprit_summary(usage_report(await get_disk_usage_since(24), top=3))
+
+    def host_metrics(self) -> dict:
+        """The last tick's load, per-core CPU, disk/network rates and PSI, plus alert values and anomalies."""
+        if not self._host_latest:
+            return {}
+        return dict(self._host_latest, alert_values=alert_values(self._host_latest),
+                    thresholds={key: t for key, t, _, _ in self._host_thresholds if t > 0},
+                    anomalies=self._anomaly.findings if self._anomaly_enabled else {},
+                    baselines=self._anomaly.baselines())
+
+    # ------------------------------
+    # Per-application resources
+    # ------------------------------
+    async def _app_roots(self) -> dict:
+        """{app: (label, [pm2 pids])} for node deployments and pm2 services running here."""
+        dep = self.bot.get_cog('DeploymentCog')
+        if not dep:
+            return {}
+        code, out, _ = await dep.run_exec(['pm2', 'jlist'], timeout=30)
+        pids = pm2_pids(out) if code == 0 else {}
+        apps = {}
+        for d in await get_active_deployments():
+            name = d.get('pm2_name') or d['deployment_uuid'][:12]
+            if d.get('tech_stack') == 'node' and name in pids:
+                apps[d['deployment_uuid']] = (fqdn_of(d), pids[name])
+        for s in await get_all_managed_services(enabled_only=True):
+            name = s.get('pm2_name') or s.get('name')
+            if s.get('service_type') == 'pm2' and name in pids:
+                apps[f"svc:{s['name']}"] = (s['name'], pids[name])
+        return apps
+
+    async def _sample_apps(self):
+        try:
+            apps = await self._app_roots()
+            loop = asyncio.get_running_loop()
+            usage = await loop.run_in_executor(
+                None, self._app_sampler.sample, {app: pids for app, (_, pids) in apps.items()}
+            )
+            self._app_sampled_at = datetime.now(timezone.utc)
+            self._app_latest = {app: dict(u, app=app, label=apps[app][0]) for app, u in usage.items()}
+            await log_app_resources([
+                (app, u['label'], u['cpu_pct'], u['rss'], u['fds'], u['threads'], u['procs'])
+                for app, u in self._app_latest.items()
+            ])
+        except Exception as e:
+            logging.error(f"App resource sampling error: {e}")
+
+    @tasks.loop(hours=1)
+    async def roll_up_app_resources(self):
+        try:
+            await rollup_app_resources()
+        except Exception as e:
+            logging.error(f"App resource rollup error: {e}")
+
+    async def app_resource_report(self, hours: int = 24, by: str = 'cpu', top: int = 10) -> dict:
+        """Top consumers right now (last sample) and over the last `hours`, by CPU or RSS."""
+        return {
+            'hours': hours,
+            'by': by,
+            'sampled_at': self._app_sampled_at,
+            'now': top_consumers(list(self._app_latest.values()), by, top),
+            'window': top_consumers(await get_app_resource_totals(hours), by, top),
+        }
+
+    async def app_resource_history(self, app: str, hours: int = 24) -> dict:
+        """An app's stored samples (hourly rollups past 48 h) plus its latest in-memory one."""
+        history = await get_app_resource_history(app, hours)
+        history.update(app=app, hours=hours, latest=self._app_latest.get(app))
+        return history
+
+    # ------------------------------
+    # nginx access-log analytics
+    # ------------------------------
+    def _ingest(self, logs: dict) -> tuple[list, dict, object]:
+        """
+        (Worker thread) Read new lines of {deployment_uuid: log path}; (rows, changed
+        offsets, aggregator checkpoint from before the read). Offsets are only returned:
+        the caller commits them once the rows are stored.
+        """
+        checkpoint = self._access.checkpoint()
+        changed = {}
+        for app, path in logs.items():
+            before = self._access_offsets.get(path)
+            lines, state = follow(path, before)
+            for line in lines:
+                rec = parse_line(line)
+                if rec:
+                    self._access.add(app, rec)
+            if state is not None and state != before:
+                changed[path] = state
+        return self._access.flush(time.time()), changed, checkpoint
+
+    @tasks.loop(seconds=_ACCESS_LOG_INTERVAL)
+    async def ingest_access_logs(self):
+        try:
+            if self._access_offsets is None:
+                offsets = await get_access_log_offsets()
+                self._access.seed(await get_access_minutes(self._access.keep // 60 + 1))
+                self._access_offsets = offsets
+            dep = self.bot.get_cog('DeploymentCog')
+            # Another node's deployments log to that node's nginx.
+            logs = {
+                d['deployment_uuid']: os.path.join(_NGINX_LOG_DIR, f"{fqdn_of(d)}.access.log")
+                for d in await get_active_deployments()
+                if not (dep and dep._foreign_node(d))
+            }
+            rows, offsets, checkpoint = await asyncio.get_running_loop().run_in_executor(
+                None, self._ingest, logs
+            )
+            # Minutes first, offsets after: a crash in between re-reads lines rather than
+            # losing them. If the minutes can't be stored, the read is undone and the same
+            # lines are read again next tick.
+            try:
+                await save_access_minutes(rows)
+            except Exception:
+                self._access.restore(checkpoint)
+                raise
+            self._access_offsets.update(offsets)
+            await save_access_log_offsets(offsets)
+        except Exception as e:
+            logging.error(f"Access log ingest error: {e}")
+
+    async def traffic(self, deployment_uuid: str, minutes: int = 60) -> dict:
+        """A deployment's per-minute traffic over the last `minutes`, with window totals."""
+        rows = await get_access_minutes(minutes, deployment_uuid)
+        points = [
+            {k: r[k] for k in ('minute', 'requests', 's2xx', 's3xx', 's4xx', 's5xx', 'bytes',
+                               'upstream_p50', 'upstream_p95', 'upstream_p99')}
+            for r in rows
+        ]
+        return {'deployment_uuid': deployment_uuid, 'minutes': minutes,
+                'totals': summarize(rows), 'points': points}
+
+    async def traffic_report(self, minutes: int = 60, top: int = 10) -> dict:
+        """Deployments ranked by requests over the last `minutes`, each with its totals."""
+        by_app: dict[str, list] = {}
+        for r in await get_access_minutes(minutes):
+            by_app.setdefault(r['app'], []).append(r)
+        labels = {d['deployment_uuid']: fqdn_of(d) for d in await get_active_deployments()}
+        ranked = sorted(
+            ({'deployment_uuid': app, 'fqdn': labels.get(app), **summarize(rows)}
+             for app, rows in by_app.items()),
+            key=lambda e: (-e['requests'], e['deployment_uuid']),
+        )
+        return {'minutes': minutes, 'late_lines': self._access.late, 'deployments': ranked[:top]}
+
     # ------------------------------
     # Health watchdog (managed services + active deployments)
     # ------------------------------
@@ -166,6 +606,25 @@ class MonitoringCog(commands.Cog):
             'grace_remaining_seconds': int(remaining),
             'self_heal_enabled': self._heal_enabled,
             'fail_threshold': self._watch_fail_threshold,
+            'intervals': {'fast': self._watch_schedule.fast, 'base': self._watch_schedule.base,
+                          'slow': self._watch_schedule.slow,
+                          'stable_after': self._watch_schedule.stable_after},
+            'concurrency': self._watch_concurrency,
+            'ticks': self._tick_stats(),
+        }
+
+    def _tick_stats(self) -> dict:
+        """Duration of recent watchdog ticks (ms) and how many targets each probed."""
+        if not self._watch_ticks:
+            return {'count': 0}
+        durations = sorted(d for d, _ in self._watch_ticks)
+        return {
+            'count': len(durations),
+            'last_ms': self._watch_ticks[-1][0],
+            'last_probed': self._watch_ticks[-1][1],
+            'p50_ms': percentile(durations, 50),
+            'p95_ms': percentile(durations, 95),
+            'max_ms': durations[-1],
         }
 
     def set_watchdog(self, alerts_enabled=None, self_heal_enabled=None) -> dict:
@@ -176,83 +635,136 @@ class MonitoringCog(commands.Cog):
             self._heal_enabled = bool(self_heal_enabled)
         return self.watchdog_status()
 
-    @tasks.loop(seconds=60)
+    @tasks.loop(seconds=_WATCH_FAST)
     async def watchdog(self):
+        started = time.monotonic()
+        probed = 0
         try:
-            await self._run_watchdog()
+            probed = await self._run_watchdog()
         except Exception as e:
             logging.error(f"Watchdog error: {e}")
+        if probed:
+            ms = round((time.monotonic() - started) * 1000)
+            self._watch_ticks.append((ms, probed))
+            if ms > _WATCH_FAST * 1000:
+                logging.warning(f"Watchdog tick took {ms} ms for {probed} target(s).")
+        # Keep the dashboard's overview snapshot warm (only while someone is reading it).
+        dep = self.bot.get_cog('DeploymentCog')
+        if dep:
+            try:
+                await dep.refresh_overview()
+            except Exception as e:
+                logging.error(f"Overview refresh error: {e}")
 
-    async def _http_ok(self, url):
+    async def _http_ok(self, dep, t):
+        # Through DeploymentCog's shared probe client: deployments on their health path and
+        # mode (origin by default), services at their health_url or their fqdn.
         # For a watchdog, "responding" matters more than "exactly 200": 3xx/4xx mean the
         # server is up (redirects, auth gates). Only 5xx or no response counts as down.
-        try:
-            async with aiohttp.ClientSession() as s:
-                async with s.get(url, timeout=aiohttp.ClientTimeout(total=8)) as r:
-                    return r.status < 500, r.status
-        except Exception:
-            return False, None
+        if t.get('deployment'):
+            r = await dep._http_health(t['deployment'], timeout=self._watch_timeout)
+        else:
+            r = await dep.probe_http(t['fqdn'], url=t['health_url'], timeout=self._watch_timeout)
+        code = r['code']
+        latency = r['timings']['total_ms'] if code is not None else None
+        return code is not None and code < 500, code, None if latency is None else round(latency)
+
+    async def _certs(self, dep) -> dict:
+        # Cert expiry moves in days; one `certbot certificates` an hour is plenty.
+        now = time.monotonic()
+        if self._cert_map_at is None or now - self._cert_map_at >= _CERT_MAP_TTL:
+            self._cert_map = await dep._all_certs_map()
+            self._cert_map_at = now
+        return self._cert_map
 
-    async def _collect_targets(self):
+    async def _collect_targets(self, dep):
         targets = []
         for s in await get_all_managed_services(enabled_only=True):
             fqdn = s.get('fqdn')
             url = s.get('health_url') or (f"https://{fqdn}" if fqdn else None)
             targets.append({
                 'key': f"svc:{s['service_uuid']}", 'label': s['name'], 'url': url, 'fqdn': fqdn,
+                'health_url': s.get('health_url'),
                 'pm2_name': s.get('pm2_name') if s.get('service_type') == 'pm2' else None,
                 'deploy_path': s.get('deploy_path'), 'port': s.get('port'),
             })
         for d in await get_active_deployments():
             fqdn = fqdn_of(d)  # canonical hostname (custom domains have subdomain=None)
+            # A deployment on another node is only HTTP-probed (at that node's origin): its
+            # process and certificate aren't in this host's pm2/certbot, and nothing here
+            # can restart them. Node workers run no watchdog of their own.
+            node = dep._foreign_node(d)
             targets.append({
                 'key': f"dep:{d['deployment_uuid']}", 'label': fqdn,
                 'url': f"https://{fqdn}", 'fqdn': fqdn,
                 'pm2_name': (d.get('pm2_name') or d['deployment_uuid'][:12])
-                            if d.get('tech_stack') == 'node' else None,
+                            if d.get('tech_stack') == 'node' and not node else None,
                 'deploy_path': d.get('deploy_path'), 'port': d.get('assigned_port'),
+                'profile': load_profile(d.get('process_profile')),
+                'deployment': d, 'node': node,
             })
         return targets
 
-    async def _run_watchdog(self):
+    async def _run_watchdog(self) -> int:
+        """Probe the targets that are due; returns how many were probed."""
         dep = self.bot.get_cog('DeploymentCog')
         if not dep:
-            return
+            return 0
 
-        targets = await self._collect_targets()
+        targets = await self._collect_targets(dep)
+        self._watch_schedule.retain(t['key'] for t in targets)
+        due = set(self._watch_schedule.due(t['key'] for t in targets))
+        targets = [t for t in targets if t['key'] in due]
         if not targets:
-            return
+            return 0
 
-        # One pm2 jlist + one certbot snapshot per tick, shared across all targets.
-        pm2_map = await dep._pm2_jlist_map()
-        cert_map = await dep._all_certs_map()
+        # One pm2 jlist per tick (only when a due target has a process) and an hourly
+        # certbot snapshot, shared across all targets.
+        pm2_map = await dep._pm2_jlist_map() if any(t['pm2_name'] for t in targets) else {}
+        cert_map = await self._certs(dep)
+        gate = asyncio.Semaphore(self._watch_concurrency)
 
-        # Detection/debounce always runs; only EMITTING is gated (via _emit_alert). When
-        # alerting is turned on later, anything genuinely still down alerts on the next tick
-        # (it was never marked "alerted" while suppressed).
-        for t in targets:
-            problems = []
+        async def _probe(t):
+            problems, code, latency = [], None, None
             if t['pm2_name']:
                 proc = pm2_map.get(t['pm2_name'])
                 status = (proc.get('pm2_env', {}) or {}).get('status') if proc else None
                 if status != 'online':
                     problems.append(f"process {status or 'not found'}")
             if t['url']:
-                ok, code = await self._http_ok(t['url'])
+                async with gate:
+                    ok, code, latency = await self._http_ok(dep, t)
                 if not ok:
                     problems.append(f"HTTP {code}")
-            if t['fqdn']:
+            if t['fqdn'] and not t.get('node'):
                 days = cert_map.get(t['fqdn'])
                 if days is not None and days < 14:
                     problems.append(f"cert expires in {days}d")
+            return problems, code, latency
 
+        results = await asyncio.gather(*(_probe(t) for t in targets))
+        if self._incidents_open is None:
+            try:
+                self._incidents_open = set(await get_open_watch_incidents())
+            except Exception as e:
+                logging.error(f"Watchdog incident load error: {e}")
+        probes = []
+
+        # Detection/debounce always runs; only EMITTING is gated (via _emit_alert). When
+        # alerting is turned on later, anything genuinely still down alerts on the next tick
+        # (it was never marked "alerted" while suppressed).
+        for t, (problems, code, latency) in zip(targets, results):
             key = t['key']
             now_down = bool(problems)
-            # Debounce: require N consecutive failing ticks before declaring down.
+            interval = self._watch_schedule.record(key, healthy=not now_down)
+            probes.append((key, t['label'], not now_down, code, latency, round(interval),
+                           "; ".join(problems)[:255] or None))
+            # Debounce: require N consecutive failing probes before declaring down.
             fails = self._watch_fail.get(key, 0) + 1 if now_down else 0
             self._watch_fail[key] = fails
             confirmed_down = fails >= self._watch_fail_threshold
             was_alerted = self._watch_state.get(key, False)
+            await self._track_incident(t, problems, fails, confirmed_down)
 
             if confirmed_down and not was_alerted:
                 # _emit_alert returns False while alerting is off or in startup grace — then we
@@ -267,6 +779,72 @@ class MonitoringCog(commands.Cog):
                 self._heal_attempts.pop(key, None)
                 await self._emit_alert('success', f"Service recovered: {t['label']}", "Back to healthy.",
                                        source='watchdog', target=t['label'], critical=False)
+        try:
+            await log_watch_probes(probes)
+        except Exception as e:
+            logging.error(f"Watchdog probe logging error: {e}")
+        return len(targets)
+
+    async def _track_incident(self, t, problems, fails, confirmed_down):
+        """Open an incident when the debounce trips, close it on the first healthy probe.
+        Independent of alerting: history is kept while alerts are off or in grace."""
+        key = t['key']
+        if fails == 1:
+            self._fail_since[key] = time.monotonic()
+        elif fails == 0:
+            self._fail_since.pop(key, None)
+        if self._incidents_open is None:
+            return
+        try:
+            if confirmed_down and key not in self._incidents_open:
+                down_for = time.monotonic() - self._fail_since.get(key, time.monotonic())
+                await open_watch_incident(key, t['label'], "; ".join(problems), down_for)
+                self._incidents_open.add(key)
+            elif not problems and key in self._incidents_open:
+                await close_watch_incident(key)
+                self._incidents_open.discard(key)
+        except Exception as e:
+            logging.error(f"Watchdog incident error for {t['label']}: {e}")
+
+    @tasks.loop(hours=1)
+    async def roll_up_watch_probes(self):
+        try:
+            rows = await get_watch_probes(hours=3)
+            await save_watch_probe_hourly(rollup(rows, before=time.time()))
+        except Exception as e:
+            logging.error(f"Watchdog probe rollup error: {e}")
+
+    async def uptime_report(self, target: str | None = None) -> dict:
+        """
+        Per target: uptime % and p50/p95/p99 latency over 24h (raw probes) and 7d/30d
+        (hourly rollups), plus whether an incident is open now.
+        """
+        windows = {
+            '24h': summarize_probes(await get_watch_probes(24, target)),
+            '7d': summarize_hourly(await get_watch_probe_hourly(24 * 7, target)),
+            '30d': summarize_hourly(await get_watch_probe_hourly(24 * 30, target)),
+        }
+        keys = sorted(set().union(*windows.values()))
+        targets = []
+        for key in keys:
+            label = next((w[key]['label'] for w in windows.values() if key in w), None)
+            entry = {'target': key, 'label': label,
+                     'down_now': key in (self._incidents_open or ())}
+            for name, w in windows.items():
+                stats = w.get(key)
+                entry[name] = {k: v for k, v in stats.items() if k != 'label'} if stats else None
+            targets.append(entry)
+        return {'targets': targets}
+
+    async def incident_timeline(self, hours: int = 24 * 30, target: str | None = None) -> dict:
+        """Outages (down → up edges) overlapping the last `hours`, newest first."""
+        incidents = await get_watch_incidents(hours, target)
+        return {
+            'hours': hours,
+            'target': target,
+            'incidents': incidents,
+            'total_down_seconds': sum(i['duration_s'] for i in incidents),
+        }
 
     async def _attempt_heal(self, t, problems, dep):
         """Safe auto-remediation (off by default): restart a down process, renew an expiring cert."""
@@ -280,11 +858,14 @@ class MonitoringCog(commands.Cog):
             )
             return
         self._heal_attempts[key] = attempts + 1
+        if t.get('node'):
+            # Host-local remedies only; a pm2 start or certbot run here would act on this box.
+            return
         if t['pm2_name'] and any('process' in p for p in problems):
             # Pass path + port so a process pm2 lost is recreated on its correct port.
             await dep.control_process(
                 t['pm2_name'], 'restart',
-                deploy_path=t.get('deploy_path'), port=t.get('port'),
+                deploy_path=t.get('deploy_path'), port=t.get('port'), profile=t.get('profile'),
             )
         if t['fqdn'] and any('cert expires' in p for p in problems):
             await dep.renew_ssl(t['fqdn'])
@@ -292,6 +873,10 @@ class MonitoringCog(commands.Cog):
     @monitor_system.before_loop
     @cleanup_old_logs.before_loop
     @watchdog.before_loop
+    @scan_disk_usage.before_loop
+    @roll_up_app_resources.before_loop
+    @roll_up_watch_probes.before_loop
+    @ingest_access_logs.before_loop
     async def before_tasks(self):
         await self.bot.wait_until_ready()
         # Stamp monitoring's start once (after ready) so the startup grace applies uniformly to
@@ -3,7 +3,18 @@ from discord.ext import commands, tasks
 import asyncio
 import os
 import json
-from database.db import create_alert
+import logging
+import time
+from database.db import create_alert, get_unsent_critical_alerts, mark_alerts_discord_sent
+from utils.alert_batch import AlertAggregator, TokenBucket
+
+_ALERT_COLORS = {
+    'info':     discord.Color.blue(),
+    'success':  discord.Color.green(),
+    'warning':  discord.Color.gold(),
+    'error':    discord.Color.red(),
+    'critical': discord.Color.red(),
+}
 
 class OutputView(discord.ui.View):
     def __init__(self):
@@ -21,13 +32,34 @@ class OutputCog(commands.Cog):
         except Exception:
             self.channel_ids = []
             
+        # deploy_worker.py sets DISCORD_DELIVERY=0: it never connects to Discord, so it
+        # stores critical alerts with discord_sent = 0 and the bot posts them (relay_alerts).
+        self.discord = os.getenv('DISCORD_DELIVERY', '1') != '0'
         self.message_queue = asyncio.Queue()
-        self.process_queue.start()
+        # Alerts pass through utils.alert_batch: repeats are dropped, bursts from one
+        # source are folded into a summary per ALERT_GROUP_WINDOW, and each channel gets
+        # at most ALERT_DISCORD_PER_MINUTE alert embeds (ALERT_DISCORD_BURST at once).
+        self._alerts = AlertAggregator(
+            window=float(os.getenv('ALERT_GROUP_WINDOW', '10')),
+            dedupe_ttl=float(os.getenv('ALERT_DEDUPE_TTL', '300')),
+        )
+        self._alert_rate = float(os.getenv('ALERT_DISCORD_PER_MINUTE', '6')) / 60.0
+        self._alert_burst = float(os.getenv('ALERT_DISCORD_BURST', '5'))
+        self._buckets = {}
+        self._rate_limited = {}    # channel id → alert embeds not posted there
+        self.flush_alerts.start()
+        if self.discord:
+            self.process_queue.start()
+            self.relay_alerts.start()
 
     def cog_unload(self):
         self.process_queue.cancel()
+        self.flush_alerts.cancel()
+        self.relay_alerts.cancel()
 
-    async def send_embed(self, title, description, color=discord.Color.default(), fields=None, thumbnail=None, image=None, author_name=None, author_icon=None, footer_text=None):
+    async def send_embed(self, title, description, color=discord.Color.default(), fields=None, thumbnail=None, image=None, author_name=None, author_icon=None, footer_text=None, rate_limited=False):
+        if not self.discord:
+            return
         embed = discord.Embed(title=str(title), description=str(description), color=color)
         
         if author_name:
@@ -49,64 +81,119 @@ class OutputCog(commands.Cog):
         else:
             embed.set_footer(text=f"Sent from {link}")
             
-        await self.message_queue.put((None, embed))
+        await self.message_queue.put((None, embed, rate_limited))
 
     async def alert(self, level, title, message, fields=None, source=None, target=None, critical=False):
         """
-        Frontend-first alert. EVERY alert is persisted to the `alerts` table for the
-        dashboard notification feed. Discord is secondary: only `critical=True` alerts are
-        also pushed to the Discord channel(s).
+        Frontend-first alert. Every alert that isn't a repeat is persisted to the `alerts`
+        table for the dashboard notification feed; a burst from one source lands there as
+        one summary (see utils.alert_batch). Discord is secondary: only `critical=True`
+        alerts are also pushed to the Discord channel(s), rate limited per channel; without
+        a Discord connection they are left for the bot's relay_alerts.
         """
+        alert = {'level': level, 'title': title, 'message': str(message), 'source': source,
+                 'target': target, 'critical': critical, 'fields': fields}
+        if self._alerts.add(alert, time.monotonic()) == 'send':
+            await self._deliver(alert)
+
+    async def _deliver(self, alert):
         try:
-            await create_alert(level, title, str(message), source=source, target=target, is_critical=critical)
+            await create_alert(alert['level'], alert['title'], alert['message'], source=alert['source'],
+                               target=alert['target'], is_critical=alert['critical'],
+                               discord_sent=self.discord or not alert['critical'])
         except Exception:
             pass
 
-        if not critical:
+        if not alert['critical'] or not self.discord:
             return
 
-        colors = {
-            'info':     discord.Color.blue(),
-            'success':  discord.Color.green(),
-            'warning':  discord.Color.gold(),
-            'error':    discord.Color.red(),
-            'critical': discord.Color.red(),
-        }
         await self.send_embed(
-            title=title,
-            description=message,
-            color=colors.get(level, discord.Color.default()),
-            fields=fields,
+            title=alert['title'],
+            description=alert['message'],
+            color=_ALERT_COLORS.get(alert['level'], discord.Color.default()),
+            fields=alert['fields'],
+            rate_limited=True,
         )
 
+    @tasks.loop(seconds=1)
+    async def flush_alerts(self):
+        for alert in self._alerts.due(time.monotonic()):
+            try:
+                await self._deliver(alert)
+            except Exception:
+                logging.debug("alert summary delivery failed", exc_info=True)
+
+    @tasks.loop(seconds=15)
+    async def relay_alerts(self):
+        """Post critical alerts that deploy workers stored in the feed but couldn't send."""
+        try:
+            rows = await get_unsent_critical_alerts()
+            if not rows or not await mark_alerts_discord_sent([r['id'] for r in rows]):
+                return
+            for row in rows:
+                await self.send_embed(
+                    title=row['title'],
+                    description=row['message'] or '',
+                    color=_ALERT_COLORS.get(row['level'], discord.Color.default()),
+                    rate_limited=True,
+                )
+        except Exception:
+            logging.debug("alert relay failed", exc_info=True)
+
+    def _bucket(self, channel_id):
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self._alert_rate, self._alert_burst)
+        return bucket
+
     async def queue_message(self, message, msg_type="INFO"):
+        if not self.discord:
+            return
         if not isinstance(message, str):
             message = json.dumps(message, default=str)
 
         content = f"**{msg_type}**: {message}"
-        await self.message_queue.put((content, None))
+        await self.message_queue.put((content, None, False))
 
     @tasks.loop(seconds=0.5)
     async def process_queue(self):
+        now = time.monotonic()
+        # Once a rate-limited channel has a token again, tell it how many alerts it missed.
+        for channel_id, missed in list(self._rate_limited.items()):
+            if self._bucket(channel_id).take(now):
+                del self._rate_limited[channel_id]
+                await self._send_to(channel_id, f"**INFO**: {missed} alert(s) were not posted here "
+                                                f"while rate limited; see the dashboard feed.", None)
         if self.message_queue.empty():
             return
         try:
-            content, embed = await self.message_queue.get()
+            content, embed, rate_limited = await self.message_queue.get()
             for channel_id in self.channel_ids:
-                try:
-                    target_id = int(channel_id)
-                    channel = self.bot.get_channel(target_id) or await self.bot.fetch_channel(target_id)
-                    if channel:
-                        await channel.send(content=content, embed=embed, view=OutputView())
-                except Exception:
+                if rate_limited and (channel_id in self._rate_limited
+                                     or not self._bucket(channel_id).take(now)):
+                    self._rate_limited[channel_id] = self._rate_limited.get(channel_id, 0) + 1
                     continue
+                await self._send_to(channel_id, content, embed)
             self.message_queue.task_done()
         except Exception:
             pass
 
+    async def _send_to(self, channel_id, content, embed):
+        try:
+            target_id = int(channel_id)
+            channel = self.bot.get_channel(target_id) or await self.bot.fetch_channel(target_id)
+            if channel:
+                await channel.send(content=content, embed=embed, view=OutputView())
+        except Exception:
+            pass
+
     @process_queue.before_loop
     async def before_process_queue(self):
         await self.bot.wait_until_ready()
 
+    @relay_alerts.before_loop
+    async def before_relay_alerts(self):
+        await self.bot.wait_until_ready()
+
 def setup(bot):
     bot.add_cog(OutputCog(bot))
\ No newline at end of file
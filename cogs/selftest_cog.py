@@ -214,14 +214,13 @@ class SelfTestCog(commands.Cog):
     # ------------------------------------------------------------------
     async def _run_selftest(self, run_id: str, triggered_by: str, variants: list, cert_staging: bool):
         dep = self.bot.get_cog('DeploymentCog')
-        log_lines: list[str] = []
         results: list[dict] = []
         token = uuid_lib.uuid4().hex[:8]
         root = os.path.join(_SELFTEST_DIR, token)
         created = {'deployments': [], 'subdomains': [], 'projects': [], 'webhooks': []}
 
         async def emit(line: str):
-            await dep._emit(run_id, log_lines, line)
+            await dep._emit(run_id, line)
 
         async def step(name: str, ok: bool, detail: str = ''):
             results.append({'step': name, 'ok': bool(ok), 'detail': detail})
@@ -291,7 +290,7 @@ class SelfTestCog(commands.Cog):
                         deploy_path = row['deploy_path']
                         new_sha = await self._push_update(dep, node_fx, _node_files(200, 'ok-v2'),
                                                           'selftest: healthy update', emit)
-                        rb = dep.queue_rebuild(node_uuid, 'selftest')
+                        rb = await dep.queue_rebuild(node_uuid, 'selftest')
                         await self._relay(dep, rb, emit, 'rebuild')
                         log = await get_deployment_log_by_run(rb)
                         head = await self._rev_parse(dep, deploy_path)
@@ -349,7 +348,7 @@ class SelfTestCog(commands.Cog):
                         good_sha = await self._rev_parse(dep, deploy_path)
                         broken_sha = await self._push_update(dep, node_fx, _node_files(500, 'broken'),
                                                              'selftest: break the build', emit)
-                        rb = dep.queue_rebuild(node_uuid, 'selftest')
+                        rb = await dep.queue_rebuild(node_uuid, 'selftest')
                         await self._relay(dep, rb, emit, 'rollback')
                         log = await get_deployment_log_by_run(rb)
                         head = await self._rev_parse(dep, deploy_path)
@@ -370,7 +369,7 @@ class SelfTestCog(commands.Cog):
             self.logger.exception(f"Self-test crashed [{run_id}]: {e}")
             await emit(f"[FATAL] Self-test crashed: {e}")
         finally:
-            await self._teardown(dep, run_id, log_lines, created, root, emit)
+            await self._teardown(dep, run_id, created, root, emit)
             passed = sum(1 for r in results if r['ok'])
             total = len(results)
             await emit(f"[SELFTEST] Complete: {passed}/{total} steps passed.")
@@ -379,6 +378,7 @@ class SelfTestCog(commands.Cog):
                  'steps': results}
             ))
             await self._notify_summary(passed, total, results)
+            await dep._close_log(run_id)
             # End the stream cleanly, then linger briefly before dropping it.
             q = dep._active_streams.get(run_id)
             if q:
@@ -534,7 +534,7 @@ class SelfTestCog(commands.Cog):
     # ------------------------------------------------------------------
     # Teardown
     # ------------------------------------------------------------------
-    async def _teardown(self, dep, run_id, log_lines, created, root, emit):
+    async def _teardown(self, dep, run_id, created, root, emit):
         await emit("[TEARDOWN] Removing self-test resources...")
         # Full per-deployment teardown (pm2 + nginx + Cloudflare + staging cert + dir + row).
         for d in created['deployments']:
@@ -552,7 +552,7 @@ class SelfTestCog(commands.Cog):
             try:
                 if not await get_live_deployment_by_subdomain(sub):
                     await dep._reclaim_target(f"{sub}.{domain}", f"/var/www/{sub}",
-                                              run_id, log_lines, '')
+                                              run_id, '')
             except Exception as e:
                 await emit(f"[TEARDOWN] reclaim {sub} error: {e}")
         for wh in created['webhooks']:
@@ -91,13 +91,37 @@ async def execute_query(query, params=(), fetch_one=False, fetch_all=False, rais
             raise
         return None
 
-async def log_system_resources(cpu, ram_p, ram_rem, ram_tot, disk_p, disk_rem, disk_total, i_used, i_tot, conn):
-    query = """
+_HOST_COLUMNS = ('load_1m', 'load_5m', 'load_15m', 'core_max', 'cpu_cores', 'psi_cpu_some',
+                 'psi_memory_some', 'psi_memory_full', 'psi_io_some', 'psi_io_full')
+
+async def log_system_resources(cpu, ram_p, ram_rem, ram_tot, disk_p, disk_rem, disk_total, i_used, i_tot, conn,
+                               tcp_established=None, tcp_time_wait=None, tcp_listen=None, host=None):
+    # host: utils.host_metrics.system_columns(sample); missing keys are stored as NULL.
+    host = host or {}
+    query = f"""
         INSERT INTO system_stats 
-        (cpu, ram_percent, ram_remaining, ram_total, disk_percent, disk_remaining, disk_total, inodes_used, inodes_total, connections) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        (cpu, ram_percent, ram_remaining, ram_total, disk_percent, disk_remaining, disk_total, inodes_used, inodes_total, connections,
+         tcp_established, tcp_time_wait, tcp_listen, {', '.join(_HOST_COLUMNS)}) 
+        VALUES ({', '.join(['%s'] * (13 + len(_HOST_COLUMNS)))})
     """
-    await execute_query(query, (cpu, ram_p, ram_rem, ram_tot, disk_p, disk_rem, disk_total, i_used, i_tot, conn))
+    await execute_query(query, (cpu, ram_p, ram_rem, ram_tot, disk_p, disk_rem, disk_total, i_used, i_tot, conn,
+                                tcp_established, tcp_time_wait, tcp_listen)
+                        + tuple(host.get(c) for c in _HOST_COLUMNS))
+
+async def log_host_io(disks: list, nets: list):
+    """Per-tick rates: disks as (device, read_bps, write_bps, read_iops, write_iops), nets as (iface, rx_bps, tx_bps)."""
+    if disks:
+        await execute_query(
+            "INSERT INTO host_disk_io (device, read_bps, write_bps, read_iops, write_iops) VALUES "
+            + ", ".join(["(%s, %s, %s, %s, %s)"] * len(disks)),
+            tuple(v for row in disks for v in row),
+        )
+    if nets:
+        await execute_query(
+            "INSERT INTO host_net_io (iface, rx_bps, tx_bps) VALUES "
+            + ", ".join(["(%s, %s, %s)"] * len(nets)),
+            tuple(v for row in nets for v in row),
+        )
 
 async def get_system_resources(limit=10):
     return await execute_query(
@@ -110,21 +134,291 @@ async def get_recent_averages():
     query = "SELECT AVG(cpu), AVG(ram_percent) FROM system_stats WHERE timestamp >= NOW() - INTERVAL 3 MINUTE"
     return await execute_query(query, fetch_one=True)
 
+async def log_disk_usage(samples: list):
+    """One disk_usage row per (target, path, bytes, files) sample from a scan pass."""
+    if not samples:
+        return
+    query = (
+        "INSERT INTO disk_usage (target, path, bytes, files) VALUES "
+        + ", ".join(["(%s, %s, %s, %s)"] * len(samples))
+    )
+    await execute_query(query, tuple(v for sample in samples for v in sample))
+
+async def get_disk_usage_since(hours: int = 24) -> list:
+    """disk_usage samples of the last `hours`, oldest first, with ts as epoch seconds."""
+    query = """
+        SELECT target, path, bytes, files, UNIX_TIMESTAMP(measured_at) AS ts
+        FROM disk_usage
+        WHERE measured_at >= NOW() - INTERVAL %s HOUR
+        ORDER BY measured_at ASC
+    """
+    rows = await execute_query(query, (hours,), fetch_all=True)
+    return [dict(r, bytes=int(r['bytes']), ts=float(r['ts'])) for r in rows or []]
+
+async def log_app_resources(samples: list):
+    """One app_resources row per (app, label, cpu_pct, rss, fds, threads, procs) sample."""
+    if not samples:
+        return
+    query = (
+        "INSERT INTO app_resources (app, label, cpu_pct, rss, fds, threads, procs) VALUES "
+        + ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(samples))
+    )
+    await execute_query(query, tuple(v for sample in samples for v in sample))
+
+async def rollup_app_resources(hours: int = 3):
+    """(Re)build app_resources_hourly for the completed hours among the last `hours`."""
+    query = """
+        INSERT INTO app_resources_hourly
+            (app, hour, label, samples, cpu_avg, cpu_max, rss_avg, rss_max, fds_max, threads_max)
+        SELECT app, FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP(measured_at) / 3600) * 3600) AS hr,
+               MAX(label), COUNT(*), AVG(cpu_pct), MAX(cpu_pct), AVG(rss), MAX(rss),
+               MAX(fds), MAX(threads)
+        FROM app_resources
+        WHERE measured_at >= FROM_UNIXTIME((FLOOR(UNIX_TIMESTAMP() / 3600) - %s) * 3600)
+          AND measured_at < FROM_UNIXTIME(FLOOR(UNIX_TIMESTAMP() / 3600) * 3600)
+        GROUP BY app, hr
+        ON DUPLICATE KEY UPDATE
+            label = VALUES(label), samples = VALUES(samples),
+            cpu_avg = VALUES(cpu_avg), cpu_max = VALUES(cpu_max),
+            rss_avg = VALUES(rss_avg), rss_max = VALUES(rss_max),
+            fds_max = VALUES(fds_max), threads_max = VALUES(threads_max)
+    """
+    await execute_query(query, (hours,))
+
+async def get_app_resource_history(app: str, hours: int = 24) -> dict:
+    """
+    An app's samples over the last `hours`, oldest first, ts as epoch seconds: raw
+    rows up to 48 hours, hourly rollups beyond.
+    """
+    if hours <= 48:
+        query = """
+            SELECT cpu_pct, rss, fds, threads, procs, UNIX_TIMESTAMP(measured_at) AS ts
+            FROM app_resources
+            WHERE app = %s AND measured_at >= NOW() - INTERVAL %s HOUR
+            ORDER BY measured_at ASC
+        """
+        resolution = 'sample'
+    else:
+        query = """
+            SELECT samples, cpu_avg, cpu_max, rss_avg, rss_max, fds_max, threads_max,
+                   UNIX_TIMESTAMP(hour) AS ts
+            FROM app_resources_hourly
+            WHERE app = %s AND hour >= NOW() - INTERVAL %s HOUR
+            ORDER BY hour ASC
+        """
+        resolution = 'hour'
+    rows = await execute_query(query, (app, hours), fetch_all=True)
+    return {'resolution': resolution, 'points': [dict(r, ts=float(r['ts'])) for r in rows or []]}
+
+async def get_app_resource_totals(hours: int = 24) -> list:
+    """Per app over the last `hours`: label, average and peak CPU, average and peak RSS."""
+    if hours <= 48:
+        query = """
+            SELECT app, MAX(label) AS label, AVG(cpu_pct) AS cpu_avg, MAX(cpu_pct) AS cpu_max,
+                   AVG(rss) AS rss_avg, MAX(rss) AS rss_max
+            FROM app_resources
+            WHERE measured_at >= NOW() - INTERVAL %s HOUR
+            GROUP BY app
+        """
+    else:
+        query = """
+            SELECT app, MAX(label) AS label, SUM(cpu_avg * samples) / SUM(samples) AS cpu_avg,
+                   MAX(cpu_max) AS cpu_max, SUM(rss_avg * samples) / SUM(samples) AS rss_avg,
+                   MAX(rss_max) AS rss_max
+            FROM app_resources_hourly
+            WHERE hour >= NOW() - INTERVAL %s HOUR
+            GROUP BY app
+        """
+    rows = await execute_query(query, (hours,), fetch_all=True)
+    return [
+        {
+            'app': r['app'], 'label': r['label'],
+            'cpu_avg': None if r['cpu_avg'] is None else round(float(r['cpu_avg']), 1),
+            'cpu_max': None if r['cpu_max'] is None else round(float(r['cpu_max']), 1),
+            'rss_avg': int(r['rss_avg'] or 0), 'rss_max': int(r['rss_max'] or 0),
+        }
+        for r in rows or []
+    ]
+
+async def log_watch_probes(probes: list):
+    """One watchdog_probes row per (target, label, ok, status, latency_ms, interval_s, problem)."""
+    if not probes:
+        return
+    query = (
+        "INSERT INTO watchdog_probes (target, label, ok, status, latency_ms, interval_s, problem) VALUES "
+        + ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(probes))
+    )
+    await execute_query(query, tuple(v for probe in probes for v in probe))
+
+async def get_watch_probes(hours: int = 24, target: str | None = None) -> list:
+    """Raw probes over the last `hours` (optionally one target), oldest first, ts as epoch seconds."""
+    query = """
+        SELECT target, label, ok, status, latency_ms, interval_s, UNIX_TIMESTAMP(probed_at) AS ts
+        FROM watchdog_probes
+        WHERE probed_at >= NOW() - INTERVAL %s HOUR
+    """
+    params = [hours]
+    if target:
+        query += " AND target = %s"
+        params.append(target)
+    rows = await execute_query(query + " ORDER BY probed_at ASC", tuple(params), fetch_all=True)
+    return [dict(r, ts=float(r['ts'])) for r in rows or []]
+
+async def save_watch_probe_hourly(rows: list):
+    """Upsert watchdog_probes_hourly rows built by utils.probe_stats.rollup."""
+    if not rows:
+        return
+    query = (
+        "INSERT INTO watchdog_probes_hourly "
+        "(target, hour, label, probes, failures, up_s, down_s, latency_hist) VALUES "
+        + ", ".join(["(%s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s)"] * len(rows))
+        + " ON DUPLICATE KEY UPDATE label = VALUES(label), probes = VALUES(probes), "
+          "failures = VALUES(failures), up_s = VALUES(up_s), down_s = VALUES(down_s), "
+          "latency_hist = VALUES(latency_hist)"
+    )
+    await execute_query(query, tuple(
+        v for r in rows for v in (r['target'], r['hour'], r['label'], r['probes'],
+                                  r['failures'], r['up_s'], r['down_s'], r['latency_hist'])
+    ))
+
+async def get_watch_probe_hourly(hours: int, target: str | None = None) -> list:
+    """Hourly probe rollups over the last `hours` (optionally one target), oldest first."""
+    query = """
+        SELECT target, label, probes, failures, up_s, down_s, latency_hist,
+               UNIX_TIMESTAMP(hour) AS ts
+        FROM watchdog_probes_hourly
+        WHERE hour >= NOW() - INTERVAL %s HOUR
+    """
+    params = [hours]
+    if target:
+        query += " AND target = %s"
+        params.append(target)
+    rows = await execute_query(query + " ORDER BY hour ASC", tuple(params), fetch_all=True)
+    return [dict(r, ts=float(r['ts'])) for r in rows or []]
+
+async def open_watch_incident(target: str, label: str, problem: str, down_for: float = 0):
+    """Record a confirmed outage that began `down_for` seconds ago (the first failing probe)."""
+    query = """
+        INSERT INTO watchdog_incidents (target, label, problem, started_at)
+        VALUES (%s, %s, %s, NOW() - INTERVAL %s SECOND)
+    """
+    await execute_query(query, (target, label, (problem or '')[:255], int(down_for)))
+
+async def close_watch_incident(target: str):
+    """Close the target's open incident(s) at the current time."""
+    await execute_query(
+        "UPDATE watchdog_incidents SET ended_at = NOW() WHERE target = %s AND ended_at IS NULL",
+        (target,),
+    )
+
+async def get_open_watch_incidents() -> list:
+    """Targets with an incident still open (survives bot restarts)."""
+    rows = await execute_query(
+        "SELECT DISTINCT target FROM watchdog_incidents WHERE ended_at IS NULL", fetch_all=True,
+    )
+    return [r['target'] for r in rows or []]
+
+async def get_watch_incidents(hours: int = 24 * 30, target: str | None = None) -> list:
+    """Incidents overlapping the last `hours`, newest first; open ones have ended_at None."""
+    query = """
+        SELECT id, target, label, problem, started_at, ended_at,
+               TIMESTAMPDIFF(SECOND, started_at, COALESCE(ended_at, NOW())) AS duration_s
+        FROM watchdog_incidents
+        WHERE (ended_at IS NULL OR ended_at >= NOW() - INTERVAL %s HOUR)
+    """
+    params = [hours]
+    if target:
+        query += " AND target = %s"
+        params.append(target)
+    rows = await execute_query(query + " ORDER BY started_at DESC", tuple(params), fetch_all=True)
+    return [dict(r, duration_s=int(r['duration_s'] or 0)) for r in rows or []]
+
+_ACCESS_COLUMNS = ('requests', 's2xx', 's3xx', 's4xx', 's5xx', 'bytes',
+                   'upstream_p50', 'upstream_p95', 'upstream_p99', 'upstream_hist', 'top_paths')
+
+async def save_access_minutes(rows: list):
+    """Upsert access_stats rows from utils.access_log.MinuteAggregator.flush ('app' is the deployment_uuid). Raises on a DB error."""
+    if not rows:
+        return
+    placeholders = "(%s, FROM_UNIXTIME(%s), " + ", ".join(["%s"] * len(_ACCESS_COLUMNS)) + ")"
+    query = (
+        f"INSERT INTO access_stats (deployment_uuid, minute, {', '.join(_ACCESS_COLUMNS)}) VALUES "
+        + ", ".join([placeholders] * len(rows))
+        + " ON DUPLICATE KEY UPDATE "
+        + ", ".join(f"{c} = VALUES({c})" for c in _ACCESS_COLUMNS)
+    )
+    await execute_query(query, tuple(
+        v for r in rows for v in (r['app'], r['minute'], *(r[c] for c in _ACCESS_COLUMNS))
+    ), raise_on_error=True)
+
+async def get_access_minutes(minutes: int = 60, deployment_uuid: str | None = None) -> list:
+    """access_stats rows over the last `minutes` (optionally one deployment), oldest first."""
+    query = f"""
+        SELECT deployment_uuid AS app, UNIX_TIMESTAMP(minute) AS minute, {', '.join(_ACCESS_COLUMNS)}
+        FROM access_stats
+        WHERE minute >= NOW() - INTERVAL %s MINUTE
+    """
+    params = [minutes]
+    if deployment_uuid:
+        query += " AND deployment_uuid = %s"
+        params.append(deployment_uuid)
+    rows = await execute_query(query + " ORDER BY minute ASC", tuple(params), fetch_all=True)
+    return [dict(r, minute=int(r['minute'])) for r in rows or []]
+
+async def get_access_log_offsets() -> dict:
+    """{path: {'inode', 'offset'}} for every access log read so far."""
+    rows = await execute_query("SELECT path, inode, `offset` FROM access_log_offsets", fetch_all=True)
+    return {r['path']: {'inode': int(r['inode']), 'offset': int(r['offset'])} for r in rows or []}
+
+async def save_access_log_offsets(offsets: dict):
+    """Upsert {path: {'inode', 'offset'}}."""
+    if not offsets:
+        return
+    query = (
+        "INSERT INTO access_log_offsets (path, inode, `offset`) VALUES "
+        + ", ".join(["(%s, %s, %s)"] * len(offsets))
+        + " ON DUPLICATE KEY UPDATE inode = VALUES(inode), `offset` = VALUES(`offset`)"
+    )
+    await execute_query(query, tuple(
+        v for path, st in offsets.items() for v in (path, st['inode'], st['offset'])
+    ))
+
 # =====================================================
 # Alerts (frontend notification feed; Discord is secondary, critical-only)
 # =====================================================
 
-async def create_alert(level, title, message=None, source=None, target=None, is_critical=False):
+async def create_alert(level, title, message=None, source=None, target=None, is_critical=False,
+                       discord_sent=True):
     alert_uuid = str(uuid.uuid4())
     query = """
-        INSERT INTO alerts (alert_uuid, level, source, title, message, target, is_critical)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO alerts (alert_uuid, level, source, title, message, target, is_critical, discord_sent)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
     """
-    params = (alert_uuid, level, source, title, message, target, int(bool(is_critical)))
+    params = (alert_uuid, level, source, title, message, target, int(bool(is_critical)),
+              int(bool(discord_sent)))
     result = await execute_query(query, params)
     return alert_uuid if result else None
 
 
+async def get_unsent_critical_alerts(limit=20):
+    """Critical alerts raised without a Discord connection (deploy workers), oldest first."""
+    rows = await execute_query(
+        "SELECT * FROM alerts WHERE discord_sent = 0 AND is_critical = 1 ORDER BY id LIMIT %s",
+        (int(limit),), fetch_all=True
+    )
+    return rows or []
+
+
+async def mark_alerts_discord_sent(alert_ids) -> bool:
+    if not alert_ids:
+        return True
+    placeholders = ", ".join(["%s"] * len(alert_ids))
+    result = await execute_query(
+        f"UPDATE alerts SET discord_sent = 1 WHERE id IN ({placeholders})", tuple(alert_ids)
+    )
+    return result is not None and result >= 0
+
+
 async def get_alerts(limit=50, unacknowledged_only=False, level=None):
     clauses, params = [], []
     if unacknowledged_only:
@@ -957,6 +1251,8 @@ async def create_deployment(
     fqdn: str = None,
     dns_mode: str = 'subdomain',
     cf_zone_id: str = None,
+    node: str = None,
+    process_profile: str = None,
 ) -> str:
     deployment_uuid = str(uuid.uuid4())
     # This is the sole INSERT path for deployments, so it always populates `fqdn` (the
@@ -964,11 +1260,12 @@ async def create_deployment(
     query = """
         INSERT INTO deployments
         (deployment_uuid, project_uuid, subdomain, dns_mode, fqdn, cf_zone_id, tech_stack,
-         assigned_port, deploy_path, env_file_name, status, deployed_by, deployed_at, branch)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s, NOW(), %s)
+         assigned_port, deploy_path, env_file_name, status, deployed_by, deployed_at, branch,
+         node, process_profile)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s, NOW(), %s, %s, %s)
     """
     params = (deployment_uuid, project_uuid, subdomain, dns_mode, fqdn, cf_zone_id, tech_stack,
-              assigned_port, deploy_path, env_file_name, deployed_by, branch)
+              assigned_port, deploy_path, env_file_name, deployed_by, branch, node, process_profile)
     # raise_on_error=True so a constraint/type failure surfaces the real DB message
     # to the deploy log instead of an opaque "Failed to create deployment record".
     result = await execute_query(query, params, raise_on_error=True)
@@ -1080,6 +1377,31 @@ async def get_used_deployment_ports() -> set[int]:
     return {row['assigned_port'] for row in rows}
 
 
+async def claim_deployment_port(deployment_uuid: str, port: int) -> bool:
+    """
+    Set a deployment's assigned_port unless another live deployment already holds it.
+
+    The in-memory port pool is per process, so with several deploy workers on one host
+    this conditional write is what stops two of them persisting the same port. False
+    means the port is taken; DB errors raise.
+    """
+    placeholders = ", ".join(["%s"] * len(LIVE_DEPLOYMENT_STATUSES))
+    # DISTINCT keeps the derived table materialized — MySQL rejects an UPDATE that
+    # reads its own table through a merged subquery.
+    query = f"""
+        UPDATE deployments d
+        LEFT JOIN (
+            SELECT DISTINCT assigned_port FROM deployments
+            WHERE assigned_port = %s AND status IN ({placeholders})
+        ) AS taken ON 1 = 1
+        SET d.assigned_port = %s
+        WHERE d.deployment_uuid = %s AND taken.assigned_port IS NULL
+    """
+    params = (port, *LIVE_DEPLOYMENT_STATUSES, port, deployment_uuid)
+    result = await execute_query(query, params, raise_on_error=True)
+    return bool(result)
+
+
 # =====================================================
 # Managed services (managed_services) — adopted/external sites the control plane
 # monitors and operates but did NOT create via the deploy pipeline.
@@ -1183,17 +1505,76 @@ async def update_deployment(deployment_uuid: str, **kwargs) -> bool:
 async def update_deployment_log(
     run_uuid: str,
     status: str,          # 'success' or 'failed'
-    output_log: str,
+    stage_timings: str = None,   # StageSpans.dump() JSON; None keeps what's stored
 ) -> bool:
+    # The log itself lives in deployment_log_chunks; output_log is only read for runs
+    # recorded before chunked logs.
     query = """
         UPDATE deployment_logs
-        SET status = %s, output_log = %s, completed_at = NOW()
+        SET status = %s, completed_at = NOW(),
+            stage_timings = COALESCE(%s, stage_timings)
         WHERE run_uuid = %s
     """
-    params = (status, output_log, run_uuid)
+    params = (status, stage_timings, run_uuid)
     result = await execute_query(query, params)
     return result is not None and result >= 0
 
+
+async def append_log_chunk(run_uuid: str, chunk: dict) -> bool:
+    """Store one LogChunker.take() chunk of a run's log."""
+    query = """
+        INSERT INTO deployment_log_chunks
+        (run_uuid, seq, first_line, line_count, raw_bytes, data)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    params = (run_uuid, chunk['seq'], chunk['first_line'], chunk['line_count'],
+              chunk['raw_bytes'], chunk['data'])
+    return await execute_query(query, params) is not None
+
+
+async def get_log_chunk_index(run_uuid: str) -> list:
+    """Position of every stored chunk of a run ({'seq', 'first_line', 'line_count'}), no data."""
+    rows = await execute_query(
+        "SELECT seq, first_line, line_count FROM deployment_log_chunks "
+        "WHERE run_uuid = %s ORDER BY seq",
+        (run_uuid,), fetch_all=True,
+    )
+    return list(rows or [])
+
+
+async def get_log_chunks(run_uuid: str, seqs: list) -> list:
+    """The listed chunks of a run with their compressed data."""
+    if not seqs:
+        return []
+    placeholders = ", ".join(["%s"] * len(seqs))
+    rows = await execute_query(
+        f"SELECT seq, first_line, line_count, data FROM deployment_log_chunks "
+        f"WHERE run_uuid = %s AND seq IN ({placeholders}) ORDER BY seq",
+        (run_uuid, *seqs), fetch_all=True,
+    )
+    return list(rows or [])
+
+
+async def get_latest_deployment_run(deployment_uuid: str) -> Optional[dict]:
+    """run_uuid (+ legacy output_log) of a deployment's most recent deploy/rebuild run."""
+    return await execute_query(
+        "SELECT run_uuid, output_log FROM deployment_logs WHERE deployment_uuid = %s "
+        "ORDER BY started_at DESC LIMIT 1",
+        (deployment_uuid,), fetch_one=True,
+    )
+
+
+async def get_recent_stage_timings(limit: int = 200) -> list:
+    """stage_timings JSON of the most recent successful runs, newest first."""
+    query = """
+        SELECT stage_timings FROM deployment_logs
+        WHERE status = 'success' AND stage_timings IS NOT NULL
+        ORDER BY started_at DESC
+        LIMIT %s
+    """
+    rows = await execute_query(query, (limit,), fetch_all=True)
+    return [r['stage_timings'] for r in rows or []]
+
 async def get_all_deployments(project_uuid: str = None, status: str = None) -> list:
     query = "SELECT * FROM deployments"
     conditions = []
@@ -1210,6 +1591,241 @@ async def get_all_deployments(project_uuid: str = None, status: str = None) -> l
     result = await execute_query(query, params, fetch_all=True)
     return result or []
 
+# Durable deploy/rebuild queue. Rows are claimed by worker processes (see
+# DeploymentCog._worker_loop); the claim is the only multi-statement transaction here,
+# so it takes its own connection instead of going through execute_query.
+DEPLOY_JOB_CLAIM_BATCH = 20
+
+
+async def create_deploy_job(
+    run_uuid: str,
+    kind: str,
+    project_uuid: str,
+    triggered_by: str,
+    priority: int,
+    payload: dict,
+    deployment_uuid: str = None,
+    pat_encrypted: str = None,
+    node: str = None,
+) -> None:
+    query = """
+        INSERT INTO deploy_jobs
+        (run_uuid, kind, project_uuid, deployment_uuid, triggered_by, priority, payload,
+         pat_encrypted, node, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'queued')
+    """
+    params = (run_uuid, kind, project_uuid, deployment_uuid, triggered_by, priority,
+              json.dumps(payload), pat_encrypted, node)
+    # raise_on_error: a job that silently failed to persist would never run.
+    await execute_query(query, params, raise_on_error=True)
+
+
+async def claim_deploy_job(worker_id: str, query, order, node: str = None) -> Optional[dict]:
+    """
+    Claim the next queued job for `worker_id`, or None when nothing is claimable.
+    Only jobs pinned to `node` or to no node are candidates.
+
+    Queued rows are read FOR UPDATE SKIP LOCKED, so concurrent workers each see a
+    disjoint batch instead of blocking on one another. `query(node, busy_projects,
+    batch)` builds that read, best priority first (utils.deploy_queue.claim_candidates_query);
+    `order(candidates, running)` picks the dispatch order within the batch
+    (utils.deploy_queue.claim_order). Setting running_project
+    fails on its UNIQUE key when another worker already runs that project; the next
+    candidate is tried instead.
+    """
+    global DB_POOL
+    if not DB_POOL:
+        logger.error("Database pool is not initialized!")
+        return None
+    try:
+        async with DB_POOL.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    await cursor.execute(
+                        "SELECT project_uuid, triggered_by FROM deploy_jobs WHERE status = 'running'"
+                    )
+                    running = await cursor.fetchall()
+                    await cursor.execute(*query(
+                        node, [r['project_uuid'] for r in running], DEPLOY_JOB_CLAIM_BATCH,
+                    ))
+                    candidates = await cursor.fetchall()
+                    for row in order(list(candidates), list(running)):
+                        try:
+                            await cursor.execute(
+                                "UPDATE deploy_jobs SET status = 'running', worker_id = %s, "
+                                "running_project = project_uuid, attempts = attempts + 1, "
+                                "started_at = NOW(), heartbeat_at = NOW() "
+                                "WHERE run_uuid = %s AND status = 'queued'",
+                                (worker_id, row['run_uuid']),
+                            )
+                        except aiomysql.IntegrityError:
+                            continue
+                        if cursor.rowcount != 1:
+                            continue
+                        await cursor.execute(
+                            "SELECT * FROM deploy_jobs WHERE run_uuid = %s", (row['run_uuid'],)
+                        )
+                        job = await cursor.fetchone()
+                        await conn.commit()
+                        return job
+                await conn.rollback()
+                return None
+            except Exception:
+                await conn.rollback()
+                raise
+    except Exception as e:
+        logger.error(f"Deploy job claim failed: {e}")
+        return None
+
+
+async def heartbeat_deploy_job(run_uuid: str, worker_id: str) -> Optional[dict]:
+    """
+    Extend a running job's lease. Returns {'cancel_requested': 0|1}, or None when
+    `worker_id` no longer owns the job — it was reaped, or finished elsewhere — and
+    the worker should stop it.
+    """
+    await execute_query(
+        "UPDATE deploy_jobs SET heartbeat_at = NOW() "
+        "WHERE run_uuid = %s AND worker_id = %s AND status = 'running'",
+        (run_uuid, worker_id), raise_on_error=True,
+    )
+    # raise_on_error throughout: a DB blip must not read as a lost lease.
+    return await execute_query(
+        "SELECT cancel_requested FROM deploy_jobs "
+        "WHERE run_uuid = %s AND worker_id = %s AND status = 'running'",
+        (run_uuid, worker_id), fetch_one=True, raise_on_error=True,
+    )
+
+
+async def finish_deploy_job(
+    run_uuid: str, status: str, worker_id: str, error: str = None
+) -> bool:
+    """Record a job's outcome. Guarded on worker_id, so a worker that lost its lease can't
+    overwrite what the reaper (or the job's next attempt) decided."""
+    query = """
+        UPDATE deploy_jobs
+        SET status = %s, error = %s,
+            running_project = NULL, pat_encrypted = NULL, finished_at = NOW()
+        WHERE run_uuid = %s AND worker_id = %s AND status = 'running'
+    """
+    result = await execute_query(query, (status, error, run_uuid, worker_id))
+    return bool(result)
+
+
+async def report_deploy_node(
+    name: str, public_ip: str, deploy_base: str, metrics: dict, ports_free: int
+) -> None:
+    """Upsert this node's deploy_nodes row (utils.placement.node_metrics + free ports)."""
+    query = """
+        INSERT INTO deploy_nodes
+        (name, public_ip, deploy_base, cpu_count, load_1m, mem_total, mem_available,
+         ports_free, last_seen)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            public_ip = VALUES(public_ip), deploy_base = VALUES(deploy_base),
+            cpu_count = VALUES(cpu_count), load_1m = VALUES(load_1m),
+            mem_total = VALUES(mem_total), mem_available = VALUES(mem_available),
+            ports_free = VALUES(ports_free), last_seen = NOW()
+    """
+    params = (name, public_ip, deploy_base, metrics['cpu_count'], metrics['load_1m'],
+              metrics['mem_total'], metrics['mem_available'], ports_free)
+    await execute_query(query, params)
+
+
+async def get_deploy_nodes(max_age: int = 60) -> list:
+    """Nodes that reported within `max_age` seconds, with their running job count."""
+    query = """
+        SELECT n.*, COALESCE(j.running, 0) AS running_jobs
+        FROM deploy_nodes n
+        LEFT JOIN (
+            SELECT node, COUNT(*) AS running FROM deploy_jobs
+            WHERE status = 'running' AND node IS NOT NULL GROUP BY node
+        ) j ON j.node = n.name
+        WHERE n.last_seen >= NOW() - INTERVAL %s SECOND
+        ORDER BY n.name
+    """
+    rows = await execute_query(query, (max_age,), fetch_all=True)
+    return list(rows or [])
+
+
+async def get_all_deploy_nodes() -> list:
+    rows = await execute_query("SELECT * FROM deploy_nodes ORDER BY name", fetch_all=True)
+    return list(rows or [])
+
+
+async def cancel_deploy_job(run_uuid: str) -> Optional[str]:
+    """
+    Cancel a queued job outright ('cancelled'), or flag a running one for its worker
+    to stop ('requested'). None when the job is unknown or already finished.
+    """
+    result = await execute_query(
+        "UPDATE deploy_jobs SET status = 'cancelled', pat_encrypted = NULL, finished_at = NOW() "
+        "WHERE run_uuid = %s AND status = 'queued'",
+        (run_uuid,),
+    )
+    if result:
+        return 'cancelled'
+    result = await execute_query(
+        "UPDATE deploy_jobs SET cancel_requested = 1 WHERE run_uuid = %s AND status = 'running'",
+        (run_uuid,),
+    )
+    return 'requested' if result else None
+
+
+async def supersede_rebuild_jobs(deployment_uuid: str, keep_run_uuid: str) -> None:
+    """A newer rebuild was queued: cancel older queued ones, ask running ones to stop."""
+    await execute_query(
+        "UPDATE deploy_jobs SET status = 'cancelled', finished_at = NOW(), "
+        "error = 'Superseded by a newer rebuild' "
+        "WHERE kind = 'rebuild' AND deployment_uuid = %s AND status = 'queued' AND run_uuid <> %s",
+        (deployment_uuid, keep_run_uuid),
+    )
+    await execute_query(
+        "UPDATE deploy_jobs SET cancel_requested = 1 "
+        "WHERE kind = 'rebuild' AND deployment_uuid = %s AND status = 'running' AND run_uuid <> %s",
+        (deployment_uuid, keep_run_uuid),
+    )
+
+
+async def get_stale_deploy_jobs(lease_seconds: int) -> list:
+    """Running jobs whose worker hasn't heartbeated within the lease (crashed or hung)."""
+    rows = await execute_query(
+        "SELECT * FROM deploy_jobs WHERE status = 'running' "
+        "AND heartbeat_at < (NOW() - INTERVAL %s SECOND)",
+        (lease_seconds,), fetch_all=True,
+    )
+    return rows or []
+
+
+async def requeue_deploy_job(run_uuid: str, worker_id: str) -> bool:
+    """Put a stale job back in the queue for another attempt (guarded on the dead worker)."""
+    result = await execute_query(
+        "UPDATE deploy_jobs SET status = 'queued', worker_id = NULL, running_project = NULL, "
+        "heartbeat_at = NULL, cancel_requested = 0 "
+        "WHERE run_uuid = %s AND worker_id = %s AND status = 'running'",
+        (run_uuid, worker_id),
+    )
+    return bool(result)
+
+
+async def get_deploy_job(run_uuid: str) -> Optional[dict]:
+    return await execute_query(
+        "SELECT * FROM deploy_jobs WHERE run_uuid = %s", (run_uuid,), fetch_one=True
+    )
+
+
+async def get_open_deploy_jobs() -> list:
+    """Queued and running jobs (without logs or secrets), oldest first."""
+    rows = await execute_query(
+        "SELECT run_uuid, kind, project_uuid, deployment_uuid, triggered_by, priority, status, "
+        "attempts, cancel_requested, worker_id, heartbeat_at, created_at, started_at "
+        "FROM deploy_jobs WHERE status IN ('queued', 'running') ORDER BY id ASC",
+        fetch_all=True,
+    )
+    return rows or []
+
+
 async def get_github_project_by_uuid(project_uuid: str):
     query = "SELECT * FROM projects WHERE project_uuid = %s"
     return await execute_query(query, (project_uuid,), fetch_one=True)
@@ -0,0 +1,57 @@
+import discord
+import os
+import logging
+import asyncio
+from dotenv import load_dotenv
+from database.db import init_db
+
+# Build-only worker: claims deploy/rebuild jobs from the deploy_jobs table and runs them,
+# without the Discord gateway or the API. Run any number of these (one per host or
+# several on one host) next to the bot; set DEPLOY_WORKER=0 on the bot to keep builds
+# off its event loop entirely. Uses the same .env as main.py.
+
+load_dotenv()
+os.environ.setdefault('DEPLOY_WORKER', '1')
+# Never connected to Discord: OutputCog skips its send queue and leaves critical
+# alerts in the alerts table for the bot to post.
+os.environ['DISCORD_DELIVERY'] = '0'
+
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+logging.basicConfig(
+    filename='logs/nydus-worker.log',
+    level=logging.INFO,
+    format='%(asctime)s %(levelname)s:%(name)s: %(message)s'
+)
+
+intents = discord.Intents.none()
+bot = discord.Bot(intents=intents)
+
+# What a deploy touches: alerts (OutputCog), DNS (CloudflareCog), the pipeline itself.
+cogs_list = [
+    'cogs.output_cog',
+    'cogs.cloudflare_cog',
+    'cogs.deployment_cog',
+]
+
+async def main():
+    await init_db()
+
+    for cog in cogs_list:
+        try:
+            bot.load_extension(cog)
+        except Exception as e:
+            logging.error(f"Failed to load cog {cog}: {e}")
+
+    # No Discord connection: alerts land in the alerts table (dashboard feed), and the
+    # bot's OutputCog posts the critical ones (alerts.discord_sent = 0) to Discord.
+    logging.info("Nydus deploy worker running")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    try:
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(main())
+    except KeyboardInterrupt:
+        pass
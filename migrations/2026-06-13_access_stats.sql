@@ -0,0 +1,40 @@
+-- Nydus nginx access-log analytics migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- access_stats — one row per deployment per minute, aggregated from its
+-- /var/log/nginx/<fqdn>.access.log by MonitoringCog (utils.access_log):
+-- request count, status classes, body bytes, the ten most requested paths
+-- (JSON [[path, count], ...]) and upstream response time p50/p95/p99 plus the
+-- histogram they come from (JSON bucket counts over
+-- utils.access_log.UPSTREAM_BUCKETS_MS), so longer windows can be merged.
+-- A minute's row is rewritten while late lines for it arrive. Kept 14 days.
+--
+-- access_log_offsets — how far each access log has been read (inode + byte
+-- offset), so ingestion resumes where it stopped after a restart.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `access_stats` (
+  `deployment_uuid` varchar(36) NOT NULL,
+  `minute` datetime NOT NULL,
+  `requests` int(11) NOT NULL DEFAULT 0,
+  `s2xx` int(11) NOT NULL DEFAULT 0,
+  `s3xx` int(11) NOT NULL DEFAULT 0,
+  `s4xx` int(11) NOT NULL DEFAULT 0,
+  `s5xx` int(11) NOT NULL DEFAULT 0,
+  `bytes` bigint(20) NOT NULL DEFAULT 0,
+  `upstream_p50` float DEFAULT NULL,
+  `upstream_p95` float DEFAULT NULL,
+  `upstream_p99` float DEFAULT NULL,
+  `upstream_hist` text DEFAULT NULL,
+  `top_paths` text DEFAULT NULL,
+  PRIMARY KEY (`deployment_uuid`, `minute`),
+  KEY `idx_access_stats_minute` (`minute`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `access_log_offsets` (
+  `path` varchar(512) NOT NULL,
+  `inode` bigint(20) unsigned NOT NULL,
+  `offset` bigint(20) unsigned NOT NULL DEFAULT 0,
+  `updated_at` datetime NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`path`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
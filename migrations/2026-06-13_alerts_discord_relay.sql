@@ -0,0 +1,12 @@
+-- Nydus alert relay migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- alerts.discord_sent — whether a critical alert has been posted to Discord.
+-- deploy_worker.py has no Discord connection, so its critical alerts are stored
+-- with discord_sent = 0 and the bot's OutputCog posts them and sets it to 1.
+-- Existing rows and everything the bot raises itself default to 1.
+-- ---------------------------------------------------------------------------
+ALTER TABLE `alerts`
+  ADD COLUMN `discord_sent` tinyint(1) NOT NULL DEFAULT 1,
+  ADD KEY `idx_discord_pending` (`discord_sent`, `is_critical`);
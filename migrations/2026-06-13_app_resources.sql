@@ -0,0 +1,42 @@
+-- Nydus per-application resource history migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- app_resources — one row per pm2 app per sample (MonitoringCog, every
+-- APP_SAMPLE_INTERVAL s). `app` is the deployment_uuid, or `svc:<name>` for a
+-- managed pm2 service; values cover the app's whole /proc process tree
+-- (utils.app_resources): cpu_pct is percent of one core averaged over the
+-- interval, rss is bytes. Raw rows are kept 2 days.
+--
+-- app_resources_hourly — hourly rollups of the raw rows, kept 90 days; history
+-- beyond 48 hours is served from here.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `app_resources` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `app` varchar(64) NOT NULL,
+  `label` varchar(255) DEFAULT NULL,
+  `cpu_pct` float DEFAULT NULL,
+  `rss` bigint(20) NOT NULL DEFAULT 0,
+  `fds` int(11) NOT NULL DEFAULT 0,
+  `threads` int(11) NOT NULL DEFAULT 0,
+  `procs` smallint(6) NOT NULL DEFAULT 0,
+  `measured_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_app_resources_measured` (`measured_at`),
+  KEY `idx_app_resources_app` (`app`, `measured_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `app_resources_hourly` (
+  `app` varchar(64) NOT NULL,
+  `hour` datetime NOT NULL,
+  `label` varchar(255) DEFAULT NULL,
+  `samples` int(11) NOT NULL DEFAULT 0,
+  `cpu_avg` float DEFAULT NULL,
+  `cpu_max` float DEFAULT NULL,
+  `rss_avg` bigint(20) NOT NULL DEFAULT 0,
+  `rss_max` bigint(20) NOT NULL DEFAULT 0,
+  `fds_max` int(11) NOT NULL DEFAULT 0,
+  `threads_max` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`app`, `hour`),
+  KEY `idx_app_resources_hourly_hour` (`hour`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
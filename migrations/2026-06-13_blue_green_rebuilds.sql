@@ -0,0 +1,11 @@
+-- Nydus blue/green rebuild migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deployments.pm2_name — the pm2 process currently serving a node deployment.
+-- Blue/green rebuilds alternate between `<uuid12>` and `<uuid12>-g`, so the live
+-- name can no longer be derived from the UUID alone. NULL means the legacy
+-- `<uuid12>` name (every deployment created before this migration).
+-- ---------------------------------------------------------------------------
+ALTER TABLE `deployments`
+  ADD COLUMN `pm2_name` varchar(64) DEFAULT NULL;
@@ -0,0 +1,45 @@
+-- Nydus durable deploy job queue migration (apply on the nydus database)
+-- Safe to run once; additive. Requires SKIP LOCKED (MySQL 8.0+ / MariaDB 10.6+).
+
+-- ---------------------------------------------------------------------------
+-- deploy_jobs — every queued/running/finished deploy and rebuild.
+-- queue_deploy/queue_rebuild insert a 'queued' row; worker processes claim rows
+-- with SELECT ... FOR UPDATE SKIP LOCKED and heartbeat while they run. A row whose
+-- heartbeat_at goes stale past the lease is requeued (rebuilds) or failed (deploys).
+--
+-- running_project is the project_uuid while the job runs and NULL otherwise; its
+-- UNIQUE key is what keeps two workers from running jobs for the same project at
+-- once (NULLs don't collide).
+-- pat_encrypted is the deploy PAT, Fernet-encrypted with DB_ENCRYPTION_KEY, and is
+-- cleared as soon as the job finishes. output_log is no longer written: run logs
+-- are stored as chunks in deployment_log_chunks while the run executes
+-- (2026-06-13_deployment_log_chunks.sql); the column stays for rows recorded before.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `deploy_jobs` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `run_uuid` char(36) NOT NULL,
+  `kind` enum('deploy','rebuild') NOT NULL,
+  `project_uuid` char(36) NOT NULL,
+  `deployment_uuid` char(36) DEFAULT NULL,        -- rebuild target; NULL for deploys
+  `triggered_by` varchar(64) NOT NULL,
+  `priority` tinyint(4) NOT NULL DEFAULT 0,        -- 0 manual, 1 webhook, 2 selftest
+  `payload` text NOT NULL,                         -- JSON arguments for the run
+  `pat_encrypted` text DEFAULT NULL,
+  `status` enum('queued','running','succeeded','failed','cancelled') NOT NULL DEFAULT 'queued',
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `cancel_requested` tinyint(1) NOT NULL DEFAULT 0,
+  `worker_id` varchar(128) DEFAULT NULL,
+  `running_project` char(36) DEFAULT NULL,
+  `heartbeat_at` timestamp NULL DEFAULT NULL,
+  `output_log` mediumtext DEFAULT NULL,
+  `error` text DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `started_at` timestamp NULL DEFAULT NULL,
+  `finished_at` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `run_uuid` (`run_uuid`),
+  UNIQUE KEY `running_project` (`running_project`),
+  KEY `idx_claim` (`status`, `priority`, `id`),
+  KEY `idx_deployment` (`deployment_uuid`, `status`),
+  KEY `idx_worker` (`worker_id`, `status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,33 @@
+-- Nydus multi-node deployments migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deploy_nodes — one row per machine running a deploy worker (NODE_NAME). Each
+-- node refreshes its row every few seconds with its capacity and public IP;
+-- placement (utils.placement.choose_node) only considers rows seen recently.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `deploy_nodes` (
+  `name` varchar(64) NOT NULL,
+  `public_ip` varchar(45) DEFAULT NULL,
+  `deploy_base` varchar(255) DEFAULT NULL,
+  `cpu_count` int(11) NOT NULL DEFAULT 1,
+  `load_1m` float NOT NULL DEFAULT 0,
+  `mem_total` bigint(20) NOT NULL DEFAULT 0,
+  `mem_available` bigint(20) NOT NULL DEFAULT 0,
+  `ports_free` int(11) NOT NULL DEFAULT 0,
+  `last_seen` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- ---------------------------------------------------------------------------
+-- deploy_jobs.node — the node a job is pinned to; only that node's workers claim
+-- it. NULL (single-host setups, jobs queued before this migration) means any worker.
+-- deployments.node — where the deployment was placed; its rebuilds run there and
+-- its DNS record points at that node's public_ip. NULL means the original host.
+-- ---------------------------------------------------------------------------
+ALTER TABLE `deploy_jobs`
+  ADD COLUMN `node` varchar(64) DEFAULT NULL,
+  ADD KEY `idx_deploy_jobs_node` (`node`, `status`);
+
+ALTER TABLE `deployments`
+  ADD COLUMN `node` varchar(64) DEFAULT NULL;
@@ -0,0 +1,13 @@
+-- Nydus deploy stage timings migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deployment_logs.stage_timings — per-stage spans of a deploy/rebuild run, as JSON:
+--   {"kind": "deploy"|"rebuild", "stack": "node"|"static"|"laravel",
+--    "spans": [{"stage": "install", "start": 12.4, "seconds": 48.1, "ok": true}, ...]}
+-- Stages: git, install, build, nginx, dns, certbot, pm2, health. Summarized as
+-- p50/p95 per stage per stack by GET /api/deploy/timings. NULL for runs recorded
+-- before this migration.
+-- ---------------------------------------------------------------------------
+ALTER TABLE `deployment_logs`
+  ADD COLUMN `stage_timings` text DEFAULT NULL;
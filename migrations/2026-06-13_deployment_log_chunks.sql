@@ -0,0 +1,25 @@
+-- Nydus chunked deployment logs migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deployment_log_chunks — run logs (deploy, rebuild, self-test) stored as they
+-- are produced. A run writes a chunk whenever its buffer reaches 32 KB or has
+-- held lines for 2 s. `data` is the zlib-compressed text of lines
+-- [first_line, first_line + line_count). Readers fetch only the chunks covering
+-- a tail or line range, and other processes follow a running job's log from
+-- these rows.
+--
+-- deployment_logs.output_log and deploy_jobs.output_log are no longer written;
+-- output_log is still served for runs recorded before this migration.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `deployment_log_chunks` (
+  `run_uuid` char(36) NOT NULL,
+  `seq` int(11) NOT NULL,
+  `first_line` int(11) NOT NULL,
+  `line_count` int(11) NOT NULL,
+  `raw_bytes` int(11) NOT NULL,
+  `data` mediumblob NOT NULL,
+  `created_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`run_uuid`, `seq`),
+  KEY `idx_log_chunks_created` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,21 @@
+-- Nydus disk usage accounting migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- disk_usage — one row per target per background scan pass (MonitoringCog,
+-- every DISK_SCAN_INTERVAL s). Targets are `www/<site root>` for each directory
+-- under /var/www, plus `pm2-logs`, `nginx-logs` and `backups`. bytes are apparent
+-- sizes (du -sb). GET /api/disk/usage reports top consumers and growth rates from
+-- these rows; rows older than 30 days are pruned by the daily cleanup.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `disk_usage` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `target` varchar(255) NOT NULL,
+  `path` varchar(512) NOT NULL,
+  `bytes` bigint(20) NOT NULL,
+  `files` int(11) NOT NULL DEFAULT 0,
+  `measured_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_disk_usage_measured` (`measured_at`),
+  KEY `idx_disk_usage_target` (`target`, `measured_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,14 @@
+-- Nydus health probe settings migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deployments.health_path — path the health probes request (status, overview,
+-- deploy/rebuild health gates, watchdog). NULL probes '/'.
+--
+-- deployments.health_mode — 'origin' (this node's nginx with a Host header) or
+-- 'edge' (the public hostname through Cloudflare); NULL follows
+-- HEALTH_PROBE_MODE. Deploy and rebuild health gates always probe the origin.
+-- ---------------------------------------------------------------------------
+ALTER TABLE `deployments`
+  ADD COLUMN `health_path` varchar(255) DEFAULT NULL,
+  ADD COLUMN `health_mode` enum('origin','edge') DEFAULT NULL;
@@ -0,0 +1,48 @@
+-- Nydus extended host metrics migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- system_stats — load averages, the busiest core and every core's utilisation
+-- (cpu_cores: JSON list of percent), and pressure-stall avg10 values from
+-- /proc/pressure (percent of the last 10 s stalled; NULL on kernels without PSI).
+-- Filled on every monitor tick (utils.host_metrics).
+-- ---------------------------------------------------------------------------
+ALTER TABLE `system_stats`
+  ADD COLUMN `load_1m` float DEFAULT NULL,
+  ADD COLUMN `load_5m` float DEFAULT NULL,
+  ADD COLUMN `load_15m` float DEFAULT NULL,
+  ADD COLUMN `core_max` float DEFAULT NULL,
+  ADD COLUMN `cpu_cores` varchar(2048) DEFAULT NULL,
+  ADD COLUMN `psi_cpu_some` float DEFAULT NULL,
+  ADD COLUMN `psi_memory_some` float DEFAULT NULL,
+  ADD COLUMN `psi_memory_full` float DEFAULT NULL,
+  ADD COLUMN `psi_io_some` float DEFAULT NULL,
+  ADD COLUMN `psi_io_full` float DEFAULT NULL;
+
+-- ---------------------------------------------------------------------------
+-- host_disk_io / host_net_io — per block device and per network interface
+-- rates over each monitor tick (bytes/s, operations/s). Pruned after 7 days.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `host_disk_io` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `device` varchar(64) NOT NULL,
+  `read_bps` double NOT NULL DEFAULT 0,
+  `write_bps` double NOT NULL DEFAULT 0,
+  `read_iops` double NOT NULL DEFAULT 0,
+  `write_iops` double NOT NULL DEFAULT 0,
+  `measured_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_host_disk_io_measured` (`measured_at`),
+  KEY `idx_host_disk_io_device` (`device`, `measured_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `host_net_io` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `iface` varchar(64) NOT NULL,
+  `rx_bps` double NOT NULL DEFAULT 0,
+  `tx_bps` double NOT NULL DEFAULT 0,
+  `measured_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_host_net_io_measured` (`measured_at`),
+  KEY `idx_host_net_io_iface` (`iface`, `measured_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,10 @@
+-- Nydus pm2 process profiles migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- deployments.process_profile — JSON pm2 profile for node deployments:
+-- {"instances": 1|N|"max", "exec_mode": "fork"|"cluster", "max_memory_mb", "heap_mb"}
+-- (utils.pm2_profile). NULL runs the single fork process deployments always had.
+-- ---------------------------------------------------------------------------
+ALTER TABLE `deployments`
+  ADD COLUMN `process_profile` text DEFAULT NULL;
@@ -0,0 +1,13 @@
+-- Nydus connection state counters migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- system_stats.tcp_* — IPv4 + IPv6 TCP sockets per state, counted from
+-- /proc/net/tcp{,6} on every monitor tick (utils.sockstat). `connections` keeps
+-- its meaning (TCP + UDP in use plus TIME_WAIT) but now comes from
+-- /proc/net/sockstat{,6} instead of psutil.net_connections().
+-- ---------------------------------------------------------------------------
+ALTER TABLE `system_stats`
+  ADD COLUMN `tcp_established` int(11) DEFAULT NULL,
+  ADD COLUMN `tcp_time_wait` int(11) DEFAULT NULL,
+  ADD COLUMN `tcp_listen` int(11) DEFAULT NULL;
@@ -0,0 +1,56 @@
+-- Nydus watchdog probe history migration (apply on the nydus database)
+-- Safe to run once; additive.
+
+-- ---------------------------------------------------------------------------
+-- watchdog_probes — one row per watchdog probe of a target (`svc:<uuid>` or
+-- `dep:<uuid>`): ok, the HTTP status and latency when the target has a URL, and
+-- interval_s, the time until that target's next scheduled probe. Uptime is
+-- weighted by interval_s (utils.probe_stats). Raw rows are kept 2 days.
+--
+-- watchdog_probes_hourly — hourly rollups kept 90 days: probe and failure counts,
+-- healthy/unhealthy seconds, and a latency histogram (JSON bucket counts over
+-- utils.probe_stats.LATENCY_BUCKETS_MS) so percentiles can be merged across hours.
+--
+-- watchdog_incidents — one row per confirmed outage: opened when the failure
+-- debounce trips (started_at is the first failing probe), closed by the first
+-- healthy probe after it. Kept 90 days.
+-- ---------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS `watchdog_probes` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `target` varchar(64) NOT NULL,
+  `label` varchar(255) DEFAULT NULL,
+  `ok` tinyint(1) NOT NULL,
+  `status` smallint(6) DEFAULT NULL,
+  `latency_ms` int(11) DEFAULT NULL,
+  `interval_s` int(11) NOT NULL DEFAULT 0,
+  `problem` varchar(255) DEFAULT NULL,
+  `probed_at` datetime NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  KEY `idx_watchdog_probes_probed` (`probed_at`),
+  KEY `idx_watchdog_probes_target` (`target`, `probed_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `watchdog_probes_hourly` (
+  `target` varchar(64) NOT NULL,
+  `hour` datetime NOT NULL,
+  `label` varchar(255) DEFAULT NULL,
+  `probes` int(11) NOT NULL DEFAULT 0,
+  `failures` int(11) NOT NULL DEFAULT 0,
+  `up_s` int(11) NOT NULL DEFAULT 0,
+  `down_s` int(11) NOT NULL DEFAULT 0,
+  `latency_hist` text DEFAULT NULL,
+  PRIMARY KEY (`target`, `hour`),
+  KEY `idx_watchdog_probes_hourly_hour` (`hour`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `watchdog_incidents` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `target` varchar(64) NOT NULL,
+  `label` varchar(255) DEFAULT NULL,
+  `problem` varchar(255) DEFAULT NULL,
+  `started_at` datetime NOT NULL,
+  `ended_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_watchdog_incidents_target` (`target`, `started_at`),
+  KEY `idx_watchdog_incidents_open` (`ended_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -205,6 +205,1070 @@ check("enabled but in startup grace -> suppressed", alerts_active(True, 10, 300)
 check("enabled and past grace -> alerts", alerts_active(True, 400, 300) is True)
 check("enabled, never started -> alerts", alerts_active(True, None, 300) is True)
 
+# --- release directories (real shipped code; stdlib only) ----------------------
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from utils.releases import (
+    current_release, list_releases, previous_release, prune_releases, release_name,
+    release_root, share_dependencies, switch_current,
+)
+
+print("release directories:")
+check("release_root of a current path", release_root('/var/www/app/current') == '/var/www/app')
+check("legacy checkout is not release-managed", release_root('/var/www/app') is None)
+name = release_name('abcdef0123456789', datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+check("release name is stamp + sha12", name == '20260102T030405-abcdef012345')
+check("previous release is the newest older one", previous_release(['c', 'b', 'a'], 'b') == 'a')
+check("no previous release at the oldest", previous_release(['b', 'a'], 'a') is None)
+with tempfile.TemporaryDirectory() as root:
+    for n in ('20260101T000000-aaa', '20260102T000000-bbb', '20260103T000000-ccc'):
+        os.makedirs(os.path.join(root, 'releases', n, 'node_modules', 'pkg'))
+        with open(os.path.join(root, 'releases', n, 'package-lock.json'), 'w') as f:
+            f.write('{"lock": 1}' if n.endswith('bbb') or n.endswith('ccc') else '{"lock": 0}')
+    os.makedirs(os.path.join(root, 'releases', '.incoming-1234'))
+    switch_current(root, '20260102T000000-bbb')
+    check("current points at the switched release", current_release(root) == '20260102T000000-bbb')
+    check("incoming dirs are not releases", len(list_releases(root)) == 3)
+    switch_current(root, '20260103T000000-ccc')
+    check("switch replaces the link atomically", current_release(root) == '20260103T000000-ccc')
+
+    src = os.path.join(root, 'releases', '20260102T000000-bbb')
+    dst = os.path.join(root, 'releases', 'new')
+    os.makedirs(dst)
+    with open(os.path.join(src, 'node_modules', 'pkg', 'index.js'), 'w') as f:
+        f.write('x')
+    with open(os.path.join(dst, 'package-lock.json'), 'w') as f:
+        f.write('{"lock": 1}')
+    check("matching lockfiles share node_modules", share_dependencies(src, dst, 'node_modules') is True)
+    check("shared files are hardlinks", os.stat(os.path.join(dst, 'node_modules', 'pkg', 'index.js')).st_nlink == 2)
+    old = os.path.join(root, 'releases', '20260101T000000-aaa')
+    other = os.path.join(root, 'releases', 'other')
+    os.makedirs(other)
+    with open(os.path.join(other, 'package-lock.json'), 'w') as f:
+        f.write('{"lock": 1}')
+    check("differing lockfiles do not share", share_dependencies(old, other, 'node_modules') is False)
+    shutil.rmtree(dst)
+    shutil.rmtree(other)
+
+    switch_current(root, '20260101T000000-aaa')
+    removed = prune_releases(root, 1)
+    check("prune keeps the newest N", '20260103T000000-ccc' in list_releases(root))
+    check("prune never removes current", '20260101T000000-aaa' in list_releases(root)
+          and removed == ['20260102T000000-bbb'])
+
+# --- git mirror / ls-remote parsing (real shipped code) ------------------------
+from utils.git_mirror import credential_env, mirror_dir_name, parse_ls_remote, strip_credentials
+
+import base64 as _base64
+print("git mirror helpers:")
+check("strips a PAT from https urls",
+      strip_credentials('https://ghp_x@github.com/o/r.git') == 'https://github.com/o/r.git')
+check("leaves credential-free urls alone", strip_credentials('file:///tmp/r.git') == 'file:///tmp/r.git')
+check("mirror name ignores the PAT",
+      mirror_dir_name('https://ghp_x@github.com/o/r.git') == mirror_dir_name('https://github.com/o/r'))
+check("mirror name is filesystem-safe", '/' not in mirror_dir_name('https://github.com/o/r.git'))
+_env = credential_env('https://github.com/o/r.git', 'ghp_x')
+check("PAT goes in a per-command header",
+      _env['GIT_CONFIG_KEY_0'] == 'http.extraHeader'
+      and _env['GIT_CONFIG_VALUE_0'] == 'Authorization: Basic ' + _base64.b64encode(b'ghp_x:').decode())
+check("PAT embedded in the url is used",
+      credential_env('https://ghp_x@github.com/o/r.git') == _env)
+check("no credentials → no header", credential_env('https://github.com/o/r.git') == {'GIT_TERMINAL_PROMPT': '0'})
+default, heads = parse_ls_remote(
+    "ref: refs/heads/main\tHEAD\n"
+    "aaa111\tHEAD\n"
+    "aaa111\trefs/heads/main\n"
+    "bbb222\trefs/heads/feature/x\n"
+)
+check("default branch from the symref line", default == 'main')
+check("heads parsed with slashes intact", heads == {'main': 'aaa111', 'feature/x': 'bbb222'})
+check("empty output parses to nothing", parse_ls_remote('') == (None, {}))
+
+# --- deploy scheduler (real shipped code) ------------------------------------
+import asyncio
+from utils.deploy_queue import (
+    DeployJob, DeployScheduler, JobCancelled, PRIORITY_MANUAL, PRIORITY_SELFTEST,
+    PRIORITY_WEBHOOK, estimate_waits, priority_for,
+)
+
+print("deploy scheduler:")
+check("webhook/selftest/manual priorities",
+      (priority_for('webhook'), priority_for('selftest'), priority_for('1234'))
+      == (PRIORITY_WEBHOOK, PRIORITY_SELFTEST, PRIORITY_MANUAL))
+check("waits simulate free slots", estimate_waits([30, 60], 2, [100, 100, 100]) == [30, 60, 130])
+check("idle slots start immediately", estimate_waits([], 2, [10, 10, 10]) == [0.0, 0.0, 10.0])
+
+
+async def _scheduler_checks():
+    s = DeployScheduler(1)
+    busy = s.submit(DeployJob('r0', 'deploy', 'p0', 'alice', PRIORITY_MANUAL))
+    hooks = [s.submit(DeployJob(f'a{i}', 'rebuild', f'pa{i}', 'alice', PRIORITY_WEBHOOK)) for i in range(3)]
+    bob = s.submit(DeployJob('b0', 'rebuild', 'pb', 'bob', PRIORITY_WEBHOOK))
+    st = s.submit(DeployJob('s0', 'rebuild', 'ps', 'selftest', PRIORITY_SELFTEST))
+    man = s.submit(DeployJob('m0', 'deploy', 'pm', 'carol', PRIORITY_MANUAL))
+    order = [j.run_id for j in s.queue_order()]
+    check("manual jumps the queue, selftest goes last", order[0] == 'm0' and order[-1] == 's0')
+    # alice already has a run in progress, so bob's single webhook goes before her burst
+    check("owners round-robin within a class", order[1:4] == ['b0', 'a0', 'a1'])
+    check("position matches dispatch order", s.position('a0')['position'] == 3)
+    await s.acquire(busy)
+    s.release(busy)
+    check("next job granted on release", s.get('m0').run_id in s._running)
+
+    # supersede: a queued rebuild is cancelled and its waiter told so
+    t = DeployJob('old', 'rebuild', 'pa0', 'alice', PRIORITY_WEBHOOK, target='dep-1')
+    s.submit(t)
+    check("supersede cancels the queued rebuild", s.supersede('dep-1') == [t])
+    try:
+        await s.acquire(t)
+        check("cancelled waiter raises JobCancelled", False)
+    except JobCancelled:
+        check("cancelled waiter raises JobCancelled", True)
+
+    # a running job past its point of no return is left alone
+    s2 = DeployScheduler(2)
+    live = s2.submit(DeployJob('live', 'rebuild', 'k', 'x', PRIORITY_MANUAL, target='dep-2'))
+    same = s2.submit(DeployJob('same', 'deploy', 'k', 'y', PRIORITY_MANUAL))
+    check("one job per project at a time", 'same' not in s2._running and 'live' in s2._running)
+    live.cancellable = False
+    check("non-cancellable running job survives supersede", s2.supersede('dep-2') == [])
+    s2.release(live)
+    check("same-project job runs after release", 'same' in s2._running)
+    for j in hooks + [bob, st, man, same]:
+        s.release(j)
+        s2.release(j)
+
+asyncio.run(_scheduler_checks())
+
+from utils.deploy_queue import claim_order, stale_job_action
+
+
+def _row(run, project, owner, priority):
+    return {'run_uuid': run, 'project_uuid': project, 'triggered_by': owner, 'priority': priority}
+
+
+queued = [_row('w1', 'p1', 'alice', PRIORITY_WEBHOOK), _row('w2', 'p2', 'alice', PRIORITY_WEBHOOK),
+          _row('w3', 'p3', 'bob', PRIORITY_WEBHOOK), _row('m1', 'p4', 'carol', PRIORITY_MANUAL),
+          _row('busy', 'p9', 'dave', PRIORITY_MANUAL)]
+running = [_row('r1', 'p9', 'alice', PRIORITY_WEBHOOK)]
+claimed = [r['run_uuid'] for r in claim_order(queued, running)]
+check("claim order: manual first, busy project skipped", claimed[0] == 'm1' and 'busy' not in claimed)
+check("claim order: idle owner before a busy one", claimed[1:] == ['w3', 'w1', 'w2'])
+check("stale rebuild is retried", stale_job_action('rebuild', 1, 2) == 'requeue')
+check("stale rebuild out of attempts fails", stale_job_action('rebuild', 2, 2) == 'fail')
+check("stale deploy is never retried", stale_job_action('deploy', 1, 2) == 'fail')
+
+from utils.deploy_queue import claim_candidates_query
+
+sql, params = claim_candidates_query('n1', ['p9', None, 'p9'], 20)
+check("claim query: best priority before arrival", "ORDER BY priority ASC, id ASC" in sql)
+check("claim query: running projects excluded in SQL",
+      "project_uuid NOT IN (%s)" in sql and params == ('n1', 'p9', 20))
+check("claim query: no exclusion when idle", "NOT IN" not in claim_candidates_query(None, [], 5)[0])
+
+
+async def _concurrent_claims():
+    # Several workers claiming from one in-memory deploy_jobs table with the semantics
+    # the real claim relies on: the candidate read (priority, id, LIMIT) skips rows
+    # another open claim has locked, and running_project is unique.
+    table = [dict(_row(f"old{i}", f"pw{i % 6}", f"hook{i % 3}", PRIORITY_WEBHOOK), id=i, status='queued')
+             for i in range(25)]
+    table.append(dict(_row('urgent', 'px', 'carol', PRIORITY_MANUAL), id=99, status='queued'))
+    locked, claims, batch = set(), [], 5
+
+    async def claim(worker):
+        running = [r for r in table if r['status'] == 'running']
+        busy = {r['project_uuid'] for r in running}
+        rows = sorted((r for r in table if r['status'] == 'queued' and r['run_uuid'] not in locked
+                       and r['project_uuid'] not in busy), key=lambda r: (r['priority'], r['id']))[:batch]
+        locked.update(r['run_uuid'] for r in rows)
+        try:
+            await asyncio.sleep(0)            # other workers run their claims meanwhile
+            for row in claim_order(rows, running):
+                if any(r['status'] == 'running' and r['project_uuid'] == row['project_uuid'] for r in table):
+                    continue                  # UNIQUE running_project rejects it
+                row['status'] = 'running'
+                claims.append((worker, row['run_uuid']))
+                return row
+        finally:
+            locked.difference_update(r['run_uuid'] for r in rows)
+
+    first = await asyncio.gather(*(claim(w) for w in range(4)))
+    check("concurrent claims: urgent job behind 25 older rows goes first",
+          claims[0][1] == 'urgent')
+    check("concurrent claims: every worker got a distinct job",
+          len({r['run_uuid'] for r in first if r}) == sum(1 for r in first if r) == 4)
+    running_projects = [r['project_uuid'] for r in table if r['status'] == 'running']
+    check("concurrent claims: one running job per project",
+          len(running_projects) == len(set(running_projects)))
+
+asyncio.run(_concurrent_claims())
+
+# --- port pool (real shipped code) -------------------------------------------
+from utils.port_pool import PortPool
+
+print("port pool:")
+pool = PortPool(3100, 3104)
+pool.reconcile({3100, 3102, 80})
+check("allocates the lowest free port", pool.allocate('d1') == 3101)
+check("skips ports marked used", pool.allocate('d2') == 3103)
+check("matches assign_free_port's choice", pool.allocate('d3') == assign_free_port({3100, 3101, 3102, 3103}, 3100, 3104))
+check("exhausted range returns None", pool.allocate('d4') is None)
+pool.release(3101)
+check("released port is reused", pool.allocate('d5', ttl=10, now=0) == 3101)
+check("unexpired lease keeps the port", pool.expire(now=5) == [] and not pool.is_free(3101))
+check("expired lease returns the port", pool.expire(now=11) == [3101] and pool.is_free(3101))
+leased = pool.allocate('d6', ttl=10, now=20)
+added, freed = pool.reconcile({3100}, now=21)
+check("reconcile keeps live leases", not pool.is_free(leased))
+check("reconcile reports drift", freed == {3102, 3103, 3104} and added == set())
+pool.confirm(leased)
+check("confirmed port survives its lease time", pool.expire(now=1000) == [] and not pool.is_free(leased))
+check("stats count used ports", pool.stats()['used'] == 2 and pool.stats()['free'] == 3)
+
+# --- nginx site index (real shipped code) -------------------------------------
+import tempfile
+from utils.nginx_index import NginxSiteIndex, parse_site
+
+print("nginx site index:")
+check("parse_site reads names/ports/roots",
+      parse_site(nginx_cfg + "\nserver { root /var/www/x/public; }") ==
+      {'server_names': ['sub.arvo.team', 'www.sub.arvo.team'], 'ports': [3133],
+       'roots': ['/var/www/x/public']})
+with tempfile.TemporaryDirectory() as tmp:
+    avail, enabled = os.path.join(tmp, 'available'), os.path.join(tmp, 'enabled')
+    os.makedirs(avail)
+    os.makedirs(enabled)
+    with open(os.path.join(avail, 'sub.arvo.team'), 'w') as f:
+        f.write(nginx_cfg)
+    with open(os.path.join(avail, 'alias.arvo.team'), 'w') as f:
+        f.write("server { server_name other.arvo.team; proxy_pass http://localhost:3140; }")
+    os.symlink(os.path.join(avail, 'sub.arvo.team'), os.path.join(enabled, 'sub.arvo.team'))
+    idx = NginxSiteIndex(avail, enabled, ttl=10)
+    check("first query is due", idx.due(now=0))
+    check("first refresh reports a change", idx.refresh(now=0))
+    check("fqdn → port by file name", idx.port_for('sub.arvo.team') == 3133)
+    check("fqdn → port by server_name", idx.port_for('other.arvo.team') == 3140)
+    check("unknown fqdn has no port", idx.port_for('nope.arvo.team') is None)
+    check("port → site", idx.site_for_port(3140) == 'alias.arvo.team')
+    check("used ports", idx.used_ports() == {3133, 3140})
+    check("enabled set", idx.enabled_sites() == {'sub.arvo.team'})
+    check("discover shape", [s['enabled'] for s in idx.sites()] == [False, True])
+    check("not due within ttl", not idx.due(now=5))
+    check("due after ttl", idx.due(now=10))
+    check("unchanged files: refresh reports nothing", not idx.refresh(now=10))
+    with open(os.path.join(avail, 'alias.arvo.team'), 'w') as f:
+        f.write("server { server_name other.arvo.team; proxy_pass http://localhost:31410; }")
+    os.utime(os.path.join(avail, 'alias.arvo.team'), ns=(1, 1))
+    idx.invalidate()
+    check("invalidate makes it due", idx.due(now=11))
+    check("changed file is re-parsed", idx.refresh(now=11) and idx.port_for('other.arvo.team') == 31410)
+    os.remove(os.path.join(enabled, 'sub.arvo.team'))
+    os.remove(os.path.join(avail, 'alias.arvo.team'))
+    idx.refresh(now=30)
+    check("removed site and link drop out", idx.used_ports() == {3133} and idx.enabled_sites() == set())
+
+# --- nginx batch controller (real shipped code) ---------------------------------
+import asyncio
+from utils.nginx_batch import NginxController, link_op, remove_op, write_op
+
+print("nginx batch controller:")
+with tempfile.TemporaryDirectory() as tmp:
+    calls = []
+
+    async def fake_nginx(cmd):
+        # `nginx -t` fails while any config on disk contains "bad".
+        calls.append(cmd[-1])
+        if cmd[-1] == '-t':
+            for fn in os.listdir(tmp):
+                with open(os.path.join(tmp, fn)) as f:
+                    if 'bad' in f.read():
+                        return 1, '', f'emerg in {fn}'
+            return 0, '', 'syntax is ok'
+        return 0, '', ''
+
+    def site(name):
+        return os.path.join(tmp, name)
+
+    async def scenario():
+        ctl = NginxController(fake_nginx, window=0.01)
+        r = await asyncio.gather(ctl.apply([write_op(site('a'), 'a1')]),
+                                 ctl.apply([write_op(site('b'), 'b1'), link_op(site('b.link'), site('b'))]))
+        check("concurrent changes share one test + reload", calls == ['-t', 'nginx'] and ctl.batches == 1)
+        check("each caller told its change is live", all(ok for ok, _ in r))
+        check("symlink op points at the config", os.readlink(site('b.link')) == site('b'))
+        calls.clear()
+        r = await ctl.apply([write_op(site('a'), 'a1')])
+        check("byte-identical config skips test and reload", r == (True, 'unchanged') and calls == [])
+        calls.clear()
+        good, bad = await asyncio.gather(ctl.apply([write_op(site('a'), 'a2')]),
+                                         ctl.apply([write_op(site('b'), 'bad')]))
+        check("good change survives a bad neighbour", good[0] and open(site('a')).read() == 'a2')
+        check("bad change rolled back and reported", not bad[0] and 'emerg' in bad[1]
+              and open(site('b')).read() == 'b1')
+        check("one reload for the surviving change", calls.count('nginx') == 1)
+        r = await ctl.apply([remove_op(site('b.link')), remove_op(site('b'))])
+        check("removals applied", r[0] and not os.path.lexists(site('b.link')) and not os.path.exists(site('b')))
+        check("removing what's gone is a no-op", await ctl.apply([remove_op(site('b'))]) == (True, 'unchanged'))
+        check("test-only request runs nginx -t", (await ctl.test())[0])
+
+    asyncio.run(scenario())
+
+# --- deploy stage graph (real shipped code) ------------------------------------
+from utils.deploy_stages import Stage, run_stages, stage_order
+
+print("deploy stage graph:")
+
+
+def noop():
+    async def _fn():
+        pass
+    return _fn
+
+
+check("order respects needs", stage_order([Stage('b', noop(), needs=('a',)), Stage('a', noop())]) == ['a', 'b'])
+try:
+    stage_order([Stage('a', noop(), needs=('b',)), Stage('b', noop(), needs=('a',))])
+    check("cycle rejected", False)
+except ValueError:
+    check("cycle rejected", True)
+try:
+    stage_order([Stage('a', noop(), needs=('ghost',))])
+    check("unknown dependency rejected", False)
+except ValueError:
+    check("unknown dependency rejected", True)
+
+
+async def stage_graph():
+    import time as _time
+    seen = []
+
+    def step(name, seconds):
+        async def _fn():
+            seen.append(name)
+            await asyncio.sleep(seconds)
+        return _fn
+
+    t0 = _time.monotonic()
+    durations = await run_stages([
+        Stage('detect', step('detect', 0)),
+        Stage('build', step('build', 0.2), needs=('detect',)),
+        Stage('dns', step('dns', 0.2), needs=('detect',)),
+        Stage('ssl', step('ssl', 0), needs=('build', 'dns')),
+    ])
+    wall = _time.monotonic() - t0
+    check("independent branches overlap", wall < 0.35 and set(durations) == {'detect', 'build', 'dns', 'ssl'})
+    check("join stage runs last", seen[-1] == 'ssl' and seen[0] == 'detect')
+
+    class Boom(Exception):
+        pass
+
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise Boom("dns failed")
+
+    ran_after = []
+
+    async def after():
+        ran_after.append(True)
+
+    try:
+        await run_stages([Stage('build', slow), Stage('dns', fail),
+                          Stage('ssl', after, needs=('build', 'dns'))])
+        check("failure propagates", False)
+    except Boom as e:
+        check("failure propagates the stage's own exception", str(e) == 'dns failed')
+    check("failure cancels running siblings", cancelled == ['slow'])
+    check("dependents of a failed stage never run", ran_after == [])
+
+asyncio.run(stage_graph())
+
+# --- stage timing (real shipped code) ------------------------------------------
+from utils.stage_timing import StageSpans, percentile, stage_totals, summarize
+import json as _json
+print("stage timing:")
+sp = StageSpans()
+with sp.span('git'):
+    pass
+try:
+    with sp.span('install'):
+        raise RuntimeError("npm")
+except RuntimeError:
+    pass
+asyncio.run(sp.timed('build', lambda: asyncio.sleep(0))())
+check("spans record each stage in order", [s['stage'] for s in sp.spans] == ['git', 'install', 'build'])
+check("a raising block is recorded as not ok", [s['ok'] for s in sp.spans] == [True, False, True])
+dumped = _json.loads(sp.dump('deploy', 'node'))
+check("dump carries kind, stack and spans", dumped['kind'] == 'deploy' and dumped['stack'] == 'node'
+      and len(dumped['spans']) == 3)
+check("repeated stages are summed", stage_totals([{'stage': 'nginx', 'seconds': 1.0},
+                                                  {'stage': 'nginx', 'seconds': 0.5}]) == {'nginx': 1.5})
+check("percentile interpolates", percentile([1, 2, 3, 4], 50) == 2.5 and percentile([5], 95) == 5)
+check("percentile of nothing is None", percentile([], 50) is None)
+
+
+def _rec(kind, stack, **stages):
+    return _json.dumps({'kind': kind, 'stack': stack,
+                        'spans': [{'stage': k, 'start': 0, 'seconds': v, 'ok': True} for k, v in stages.items()]})
+
+
+records = [_rec('deploy', 'node', git=1, install=10, certbot=20),
+           _rec('deploy', 'node', git=3, install=30, certbot=40),
+           _rec('rebuild', 'node', install=100),
+           _rec('deploy', 'static', git=2),
+           '{not json',
+           _json.dumps({'kind': 'deploy', 'stack': 'node',
+                        'spans': [{'stage': 'dns', 'start': 0, 'seconds': 99, 'ok': False}]})]
+summary = summarize(records, 'deploy')
+check("summary groups per stack", sorted(summary) == ['node', 'static'])
+check("summary orders stages canonically", list(summary['node']) == ['git', 'install', 'certbot'])
+check("p50 over matching runs", summary['node']['install'] == {'runs': 2, 'p50': 20.0, 'p95': 29.0})
+check("kind filter excludes rebuilds", summary['node']['install']['runs'] == 2)
+check("failed spans are ignored", 'dns' not in summary['node'])
+check("no kind filter mixes deploys and rebuilds", summarize(records)['node']['install']['runs'] == 3)
+
+# --- status probe cache (real shipped code) ------------------------------------
+from utils.probe_cache import ProbeCache
+print("status probe cache:")
+pc = ProbeCache({'pm2': 10.0, 'ssl': 3600.0})
+check("unmeasured probe is None", pc.get('d1', 'pm2') is None and pc.fresh('d1', 'pm2') is None)
+pc.put('d1', 'pm2', {'status': 'online'}, now=100.0)
+pc.put('d1', 'ssl', 42, now=100.0)
+check("result served with its age", pc.fresh('d1', 'pm2', now=105.0) == ({'status': 'online'}, 5.0))
+check("expired result is not fresh", pc.fresh('d1', 'pm2', now=111.0) is None)
+check("get ignores max age", pc.get('d1', 'pm2', now=111.0) == ({'status': 'online'}, 11.0))
+check("max age is per probe", pc.fresh('d1', 'ssl', now=111.0) == (42, 11.0))
+check("probe without a max age is never fresh", (pc.put('d1', 'disk', 1, now=100.0)
+                                                 or pc.fresh('d1', 'disk', now=100.5)) is None)
+pc.put('d2', 'pm2', None, now=100.0)
+check("a None result is still cached", pc.fresh('d2', 'pm2', now=101.0) == (None, 1.0))
+pc.drop('d1')
+check("drop forgets only that deployment", pc.get('d1', 'ssl') is None and pc.get('d2', 'pm2') is not None)
+
+# --- disk usage scanner (real shipped code) ------------------------------------
+from utils.disk_scan import DiskScanner, culprit_summary, growth_per_hour, usage_report
+print("disk usage scanner:")
+with tempfile.TemporaryDirectory() as td:
+    app_dir = os.path.join(td, 'www', 'app')
+    logs = os.path.join(td, 'logs')
+    os.makedirs(os.path.join(app_dir, 'node_modules', 'pkg'))
+    os.makedirs(logs)
+    with open(os.path.join(app_dir, 'index.js'), 'w') as f:
+        f.write('x' * 100)
+    with open(os.path.join(app_dir, 'node_modules', 'pkg', 'lib.js'), 'w') as f:
+        f.write('y' * 50)
+    with open(os.path.join(logs, 'app.log'), 'w') as f:
+        f.write('z' * 10)
+    targets = {'www/app': (app_dir, False), 'logs': (logs, True), 'gone': (os.path.join(td, 'nope'), True)}
+    ds = DiskScanner(full_every=0)
+    first = ds.scan(targets)
+    check("scan totals apparent bytes", first['www/app']['bytes'] == 150 and first['www/app']['files'] == 2)
+    check("missing targets are skipped", 'gone' not in first)
+    check("first pass lists every directory", ds.dirs_listed == 4)
+    second = ds.scan(targets)
+    check("unchanged tree is not re-listed", ds.dirs_listed == 0 and second == first)
+    with open(os.path.join(logs, 'app.log'), 'a') as f:
+        f.write('z' * 90)
+    with open(os.path.join(app_dir, 'index.js'), 'a') as f:
+        f.write('x' * 5)
+    third = ds.scan(targets)
+    check("restat targets pick up growing files", third['logs']['bytes'] == 100 and ds.dirs_listed == 0)
+    check("other targets trust directory mtimes", third['www/app']['bytes'] == 150)
+    with open(os.path.join(app_dir, 'node_modules', 'pkg', 'new.js'), 'w') as f:
+        f.write('n' * 20)
+    fourth = ds.scan(targets)
+    check("a new file re-lists only its directory", fourth['www/app']['bytes'] == 170 and ds.dirs_listed == 1)
+    full = DiskScanner(full_every=1)
+    full.scan(targets)
+    full.scan(targets)
+    check("periodic full pass ignores the cache", full.dirs_listed == 4)
+    ds.scan({'logs': (logs, True)})
+    check("directories no target reaches are forgotten", all(p.startswith(logs) for p in ds._dirs))
+
+check("growth is bytes per hour", growth_per_hour([(0, 0), (1800, 500), (3600, 1000)]) == 1000)
+check("growth needs two samples", growth_per_hour([(0, 5)]) is None)
+rows = [{'target': 'www/a', 'path': '/var/www/a', 'bytes': 5000, 'ts': 0},
+        {'target': 'www/a', 'path': '/var/www/a', 'bytes': 5000, 'ts': 3600},
+        {'target': 'backups', 'path': '/b', 'bytes': 1000, 'ts': 0},
+        {'target': 'backups', 'path': '/b', 'bytes': 3000, 'ts': 3600}]
+rep = usage_report(rows, top=5)
+check("top is ordered by current size", [e['target'] for e in rep['top']] == ['www/a', 'backups'])
+check("growing lists only growing targets", [(e['target'], e['growth_per_hour']) for e in rep['growing']]
+      == [('backups', 2000)])
+check("culprit summary names the growth", 'backups' in culprit_summary(rep) and '/h' in culprit_summary(rep))
+
+# --- chunked run logs (real shipped code) --------------------------------------
+from utils.log_chunks import (LogChunker, chunks_for_range, chunks_for_tail, decode_chunk,
+                              encode_chunk, resume_point, slice_lines)
+print("chunked run logs:")
+check("chunk round-trips", decode_chunk(encode_chunk(['a', '', 'ü'])) == ['a', '', 'ü'])
+lc = LogChunker(chunk_bytes=10, max_age=2.0)
+check("empty buffer is never due", not lc.due(now=100.0) and lc.take() is None)
+lc.add('abc', now=100.0)
+check("small buffer waits", not lc.due(now=101.0))
+check("old buffer is due", lc.due(now=102.5))
+lc.add('defghij', now=101.0)
+check("full buffer is due", lc.due(now=101.0))
+c0 = lc.take()
+check("chunk carries its position", (c0['seq'], c0['first_line'], c0['line_count'], c0['raw_bytes']) == (0, 0, 2, 12))
+lc.add('multi\nline')
+c1 = lc.take()
+check("embedded newlines count as lines", c1['line_count'] == 2 and decode_chunk(c1['data']) == ['multi', 'line'])
+check("positions advance", (c1['seq'], c1['first_line']) == (1, 2))
+idx = [{'seq': c['seq'], 'first_line': c['first_line'], 'line_count': c['line_count']} for c in (c0, c1)]
+check("resume after stored chunks", resume_point(idx) == (2, 4) and resume_point([]) == (0, 0))
+check("range picks overlapping chunks", chunks_for_range(idx, 1, 3) == [0, 1] and chunks_for_range(idx, 2) == [1])
+check("tail picks the fewest chunks", chunks_for_tail(idx, 1) == ([1], 3) and chunks_for_tail(idx, 10) == ([0, 1], 0))
+check("slice returns exact lines", slice_lines([c1, c0], 1, 3) == ['defghij', 'multi'])
+check("slice to the end", slice_lines([c0, c1], 3) == ['line'])
+
+# --- deployment placement (real shipped code) ----------------------------------
+from utils.placement import choose_node, parse_meminfo, score_node
+print("deployment placement:")
+mi = parse_meminfo("MemTotal:       2048 kB\nMemFree:         100 kB\nMemAvailable:    1024 kB\n")
+check("meminfo parsed to bytes", mi == {'mem_total': 2048 * 1024, 'mem_available': 1024 * 1024})
+check("MemFree used without MemAvailable", parse_meminfo("MemTotal: 10 kB\nMemFree: 4 kB")['mem_available'] == 4096)
+GB = 1024 ** 3
+node_a = {'name': 'a', 'cpu_count': 4, 'load_1m': 3.0, 'mem_total': 8 * GB, 'mem_available': 6 * GB,
+          'ports_free': 10, 'running_jobs': 0}
+node_b = {'name': 'b', 'cpu_count': 4, 'load_1m': 0.5, 'mem_total': 8 * GB, 'mem_available': 5 * GB,
+          'ports_free': 10, 'running_jobs': 0}
+check("score favours idle cores and free memory", score_node(node_b) > score_node(node_a))
+check("least loaded node wins", choose_node([node_a, node_b]) == 'b')
+check("running jobs count against a node", choose_node([node_a, dict(node_b, running_jobs=1)]) == 'a')
+check("a node without free ports is skipped", choose_node([node_a, dict(node_b, ports_free=0)]) == 'a')
+check("memory requirement filters nodes", choose_node([node_a, node_b], mem_needed=int(5.5 * GB)) == 'a')
+check("no node fits → None", choose_node([dict(node_a, ports_free=0)]) is None and choose_node([]) is None)
+check("ties go to the first name", choose_node([dict(node_a, name='z'), dict(node_a, name='m')]) == 'm')
+
+# --- pm2 process profiles (real shipped code) ----------------------------------
+from utils.pm2_profile import (
+    DEFAULT_PROFILE, apply_action, cluster_entry, launch_env, load_profile, parse_profile,
+    resolve_instances, start_command,
+)
+print("pm2 process profiles:")
+check("NULL profile is the classic single fork", load_profile(None) == DEFAULT_PROFILE)
+check("unreadable stored profile falls back to defaults", load_profile('{nope') == DEFAULT_PROFILE)
+check("default start command unchanged",
+      start_command('app', DEFAULT_PROFILE) == ['pm2', 'start', 'npm', '--name', 'app', '--', 'start'])
+prof = parse_profile({'instances': 'MAX', 'max_memory_mb': 512, 'heap_mb': 384})
+check("instances > 1 implies cluster mode", prof['exec_mode'] == 'cluster' and prof['instances'] == 'max')
+for bad in ({'instances': 0}, {'instances': 2, 'exec_mode': 'fork'}, {'exec_mode': 'thread'},
+            {'max_memory_mb': 10}, {'heap_mb': 512, 'max_memory_mb': 512}, {'workers': 2}):
+    try:
+        parse_profile(bad)
+        check(f"rejects {bad}", False)
+    except ValueError:
+        check(f"rejects {bad}", True)
+check("partial update merges over stored profile",
+      parse_profile({'heap_mb': 256}, base=prof) == dict(prof, heap_mb=256))
+check("'max' is one per core", resolve_instances(prof, 8) == 8)
+check("'max' capped by available memory", resolve_instances(prof, 8, 3 * 512 * 1024 * 1024 + 1) == 3)
+check("'max' never below one", resolve_instances(prof, 8, 100) == 1)
+check("explicit count kept", resolve_instances(parse_profile({'instances': 3}), 2) == 3)
+check("node start script → cluster entry",
+      cluster_entry({'scripts': {'start': 'NODE_ENV=production node --enable-source-maps dist/server.js --x'}})
+      == ('dist/server.js', ['--enable-source-maps'], ['--x']))
+check("local bin start script → cluster entry",
+      cluster_entry({'scripts': {'start': 'next start'}}, {'next'}) == ('node_modules/.bin/next', [], ['start']))
+check("shell chains aren't clustered", cluster_entry({'scripts': {'start': 'npm run db && node a.js'}}) is None)
+check("main used without a start script", cluster_entry({'main': 'index.js'}) == ('index.js', [], []))
+check("unknown start tool → no entry", cluster_entry({'scripts': {'start': 'serve dist'}}) is None)
+entry = ('dist/server.js', ['--enable-source-maps'], [])
+check("cluster start command",
+      start_command('app', prof, 4, entry) == ['pm2', 'start', 'dist/server.js', '--name', 'app', '-i', '4',
+                                               '--max-memory-restart', '512M',
+                                               '--node-args', '--enable-source-maps'])
+check("cluster without entry falls back to npm fork", start_command('app', prof, 4)[2] == 'npm')
+check("heap flag and port in the launch env",
+      launch_env(prof, 3100) == {'PORT': '3100', 'NODE_OPTIONS': '--max-old-space-size=384'})
+check("nothing to set → None", launch_env(DEFAULT_PROFILE) is None)
+worker = {'pm2_env': {'exec_mode': 'cluster_mode', 'max_memory_restart': 512 * 1024 * 1024}}
+fork = {'pm2_env': {'exec_mode': 'fork_mode'}}
+check("no process → start", apply_action(prof, 4, [], entry) == 'start')
+check("same shape → rolling reload", apply_action(prof, 2, [worker, worker], entry) == 'reload')
+check("worker count changed → scale", apply_action(prof, 4, [worker, worker], entry) == 'scale')
+check("fork → cluster needs a fresh start", apply_action(prof, 4, [fork], entry) == 'recreate')
+check("memory limit changed needs a fresh start",
+      apply_action(dict(prof, max_memory_mb=1024), 2, [worker, worker], entry) == 'recreate')
+check("default profile on a legacy fork → reload", apply_action(DEFAULT_PROFILE, 1, [fork]) == 'reload')
+with tempfile.TemporaryDirectory() as _root:
+    for _rel in ('r1', 'r2'):
+        os.mkdir(os.path.join(_root, _rel))
+    _current = os.path.join(_root, 'current')
+    os.symlink(os.path.join(_root, 'r2'), _current)
+    pinned = {'pm2_env': {'exec_mode': 'fork_mode', 'pm_cwd': os.path.join(_root, 'r1')}}
+    on_link = {'pm2_env': {'exec_mode': 'fork_mode', 'pm_cwd': _current}}
+    check("pinned to a resolved release → recreate onto current",
+          apply_action(DEFAULT_PROFILE, 1, [pinned], cwd=_current) == 'recreate')
+    check("started with --cwd current → reload",
+          apply_action(DEFAULT_PROFILE, 1, [on_link], cwd=_current) == 'reload')
+    os.remove(_current)
+    os.symlink(os.path.join(_root, 'r1'), _current)
+    cluster_on_link = {'pm2_env': dict(worker['pm2_env'], pm_cwd=_current + '/')}
+    check("cluster on a new release still gets a rolling reload",
+          apply_action(prof, 2, [cluster_on_link, cluster_on_link], entry, cwd=_current) == 'reload')
+    check("start command keeps the symlink as pm2's cwd",
+          start_command('app', DEFAULT_PROFILE, cwd=_current)[-4:] == ['--cwd', _current, '--', 'start'])
+
+# --- per-app resource sampler (real shipped code) ------------------------------
+from utils.app_resources import AppSampler, parse_stat, pm2_pids, top_consumers, tree_pids
+print("per-app resource sampler:")
+
+
+def _stat_line(pid, comm, ppid, utime, stime, threads, start, rss):
+    # pid (comm) state ppid pgrp session tty tpgid flags minflt cminflt majflt cmajflt
+    # utime stime cutime cstime priority nice num_threads itrealvalue starttime vsize rss
+    return (f"{pid} ({comm}) S {ppid} 1 1 0 -1 0 0 0 0 0 {utime} {stime} 0 0 20 0 "
+            f"{threads} 0 {start} 1000 {rss} 0")
+
+
+st = parse_stat(_stat_line(7, 'node) (x', 1, 30, 12, 11, 500, 25))
+check("stat parsed past a comm with ') ('",
+      st == {'ppid': 1, 'ticks': 42, 'threads': 11, 'start': 500, 'rss_pages': 25})
+check("garbage stat → None", parse_stat("nope") is None)
+procs = {1: {'ppid': 0}, 10: {'ppid': 1}, 11: {'ppid': 10}, 12: {'ppid': 11}, 20: {'ppid': 1}}
+check("tree covers descendants only", tree_pids(procs, [10]) == {10, 11, 12})
+check("dead roots ignored", tree_pids(procs, [99]) == set())
+check("pm2 jlist → pids by name (cluster workers grouped)",
+      pm2_pids('[{"name":"a","pid":10},{"name":"a","pid":20},{"name":"b","pid":0}]') == {'a': [10, 20]})
+check("bad jlist → {}", pm2_pids('not json') == {})
+
+with tempfile.TemporaryDirectory() as proc_root:
+    def _proc(pid, ppid, ticks, threads, start, rss, fds):
+        os.makedirs(os.path.join(proc_root, str(pid), 'fd'), exist_ok=True)
+        with open(os.path.join(proc_root, str(pid), 'stat'), 'w') as f:
+            f.write(_stat_line(pid, 'node', ppid, ticks, 0, threads, start, rss))
+        for i in range(fds):
+            open(os.path.join(proc_root, str(pid), 'fd', str(i)), 'w').close()
+
+    _proc(100, 1, 1000, 10, 100, 1000, 20)      # pm2 app
+    _proc(101, 100, 200, 2, 150, 500, 5)        # its child
+    _proc(300, 1, 5000, 4, 100, 9000, 3)        # unrelated
+    sampler = AppSampler(proc_root, clk_tck=100, page_size=4096)
+    first = sampler.sample({'app': [100], 'gone': [555]}, now=1000.0)
+    check("first sample: sizes, no CPU yet",
+          first == {'app': {'cpu_pct': None, 'rss': 1500 * 4096, 'fds': 25, 'threads': 12, 'procs': 2}})
+    _proc(100, 1, 1500, 10, 100, 1000, 20)      # +500 ticks = 5 s
+    _proc(101, 100, 300, 2, 150, 500, 5)        # +100 ticks = 1 s
+    _proc(102, 100, 100, 1, 100005, 100, 1)     # started 1000.05 s after boot, inside the interval
+    second = sampler.sample({'app': [100]}, now=1010.0)
+    check("CPU is tree tick delta over wall time (incl. a child born in the interval)",
+          second['app']['cpu_pct'] == 70.0 and second['app']['procs'] == 3)
+
+rows = [{'app': 'a', 'cpu_avg': 5.0, 'rss_max': 900}, {'app': 'b', 'cpu_avg': 50.0, 'rss_max': 100},
+        {'app': 'c', 'cpu_pct': None, 'rss': 500}]
+check("top by cpu", [r['app'] for r in top_consumers(rows, 'cpu')] == ['b', 'a', 'c'])
+check("top by rss, limited", [r['app'] for r in top_consumers(rows, 'rss', 2)] == ['a', 'c'])
+
+# --- sockstat connection counts (real shipped code) ----------------------------
+from utils.sockstat import connection_counts, count_tcp_states, parse_sockstat
+print("sockstat connection counts:")
+ss = parse_sockstat("sockets: used 18\nTCP: inuse 4 orphan 0 tw 7 alloc 4 mem 0\nUDP: inuse 2 mem 0\n")
+check("sockstat parsed per protocol", ss['TCP'] == {'inuse': 4, 'orphan': 0, 'tw': 7, 'alloc': 4, 'mem': 0}
+      and ss['UDP']['inuse'] == 2 and ss['sockets']['used'] == 18)
+tcp_lines = [
+    "   0: 00000000:07E8 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 662 1",
+    "   1: 0100007F:BC8F 0100007F:07E8 01 00000000:00000000 00:00000000 00000000     0        0 907 1",
+    "   2: 0100007F:BC90 0100007F:07E8 06 00000000:00000000 00:00000000 00000000     0        0 0 1",
+    "   3: 0100007F:BC91 0100007F:07E8 08 00000000:00000000 00:00000000 00000000     0        0 0 1",
+]
+check("tcp states counted from the st column",
+      count_tcp_states(tcp_lines) == {'established': 1, 'time_wait': 1, 'listen': 1})
+with tempfile.TemporaryDirectory() as proc_root:
+    os.makedirs(os.path.join(proc_root, 'net'))
+    header = "  sl  local_address rem_address   st tx_queue rx_queue\n"
+    for name, body in (
+        ('sockstat', "TCP: inuse 4 orphan 0 tw 1 alloc 4 mem 0\nUDP: inuse 2 mem 0\n"),
+        ('sockstat6', "TCP6: inuse 3\nUDP6: inuse 1\n"),
+        ('tcp', header + "\n".join(tcp_lines) + "\n"),
+        ('tcp6', header + tcp_lines[1] + "\n"),
+    ):
+        with open(os.path.join(proc_root, 'net', name), 'w') as f:
+            f.write(body)
+    check("connections = TCP/UDP in use (v4+v6) + TIME_WAIT, states summed over families",
+          connection_counts(proc_root) == {'connections': 11, 'established': 2, 'time_wait': 1, 'listen': 1})
+    check("missing /proc/net → zeros", connection_counts(os.path.join(proc_root, 'nope'))
+          == {'connections': 0, 'established': 0, 'time_wait': 0, 'listen': 0})
+
+# --- extended host metrics (real shipped code) ---------------------------------
+from utils.host_metrics import (
+    HostSampler, alert_values, parse_cpu_times, parse_diskstats, parse_net_dev, parse_pressure,
+    system_columns,
+)
+print("extended host metrics:")
+diskstats = (
+    "   8       0 sda 100 0 2000 0 50 0 4000 0 0 0 0\n"
+    "   8       1 sda1 90 0 1800 0 40 0 3000 0 0 0 0\n"
+    " 259       0 nvme0n1 10 0 80 0 5 0 40 0 0 0 0\n"
+    " 259       1 nvme0n1p1 10 0 80 0 5 0 40 0 0 0 0\n"
+    "   7       0 loop0 1 0 8 0 0 0 0 0 0 0 0\n"
+)
+check("whole disks only (partitions, loop skipped)",
+      parse_diskstats(diskstats) == {'sda': (100, 2000, 50, 4000), 'nvme0n1': (10, 80, 5, 40)})
+netdev = ("Inter-|   Receive |  Transmit\n face |bytes packets|bytes\n"
+          "    lo: 500 5 0 0 0 0 0 0 500 5 0 0 0 0 0 0\n"
+          "  eth0: 1000 10 0 0 0 0 0 0 2000 20 0 0 0 0 0 0\n")
+check("net dev bytes, loopback excluded", parse_net_dev(netdev) == {'eth0': (1000, 2000)})
+check("per-core busy/total, aggregate line skipped",
+      parse_cpu_times("cpu  9 0 9 9 0 0 0 0 0 0\ncpu0 10 0 10 70 10 0 0 0 0 0\n") == {'cpu0': (20, 100)})
+check("PSI avg10 per kind",
+      parse_pressure("some avg10=12.50 avg60=1.00 avg300=0.00 total=1\nfull avg10=3.00 avg60=0 avg300=0 total=1")
+      == {'some': 12.5, 'full': 3.0})
+with tempfile.TemporaryDirectory() as proc_root:
+    os.makedirs(os.path.join(proc_root, 'net'))
+    os.makedirs(os.path.join(proc_root, 'pressure'))
+
+    def _host(disk, net, cpu):
+        for name, body in (('diskstats', disk), (os.path.join('net', 'dev'), net), ('stat', cpu),
+                           (os.path.join('pressure', 'io'), "some avg10=45.00 avg60=0 avg300=0 total=0\n")):
+            with open(os.path.join(proc_root, name), 'w') as f:
+                f.write(body)
+
+    _host(diskstats, netdev, "cpu0 0 0 0 100 0 0 0 0\ncpu1 0 0 0 100 0 0 0 0\n")
+    hs = HostSampler(proc_root)
+    first = hs.sample(now=100.0)
+    check("first host sample has no rates", first['disks']['sda']['read_bps'] is None
+          and first['cores'] == [None, None] and first['psi'] == {'io_some': 45.0})
+    _host("   8       0 sda 120 0 2400 0 50 0 4000 0 0 0 0\n",
+          netdev.replace("2000 20", "4000 20"),
+          "cpu0 50 0 0 150 0 0 0 0\ncpu1 10 0 0 190 0 0 0 0\n")
+    second = hs.sample(now=110.0)
+    check("disk bytes and IOPS per second",
+          second['disks'] == {'sda': {'read_bps': 400 * 512 / 10, 'write_bps': 0.0,
+                                      'read_iops': 2.0, 'write_iops': 0.0}})
+    check("network rates", second['net'] == {'eth0': {'rx_bps': 0.0, 'tx_bps': 200.0}})
+    check("per-core utilisation", second['cores'] == [50.0, 10.0])
+    vals = alert_values(dict(second, load=(5.0, 1.0, 1.0)))
+    check("alert values condensed", vals['load_per_core'] == 2.5 and vals['core_max'] == 50.0
+          and vals['psi_io'] == 45.0 and 'psi_memory' not in vals
+          and abs(vals['disk_mbps'] - 20480 / 1024 / 1024) < 1e-9)
+    cols = system_columns(dict(second, load=(5.0, 1.0, 0.5)))
+    check("system_stats columns", cols['load_15m'] == 0.5 and cols['cpu_cores'] == '[50.0, 10.0]'
+          and cols['core_max'] == 50.0 and cols['psi_io_some'] == 45.0 and cols['psi_memory_some'] is None)
+
+# --- watchdog schedule (real shipped code) ---
+from utils.watch_schedule import WatchSchedule
+print("watch schedule:")
+ws = WatchSchedule(base=60, fast=15, slow=300, stable_after=1800)
+check("unseen targets are due", ws.due(['a', 'b'], now=0) == ['a', 'b'])
+check("failing target re-probed fast", ws.record('a', healthy=False, now=0) == 15)
+check("healthy target at base interval", ws.record('b', healthy=True, now=0) == 60)
+check("only due targets returned", ws.due(['a', 'b'], now=20) == ['a'])
+check("next_in counts down", ws.next_in('b', now=20) == 40 and ws.next_in('c', now=0) is None)
+check("stable target slows down", ws.record('b', healthy=True, now=1800) == 300)
+check("failure resets stability", ws.record('b', healthy=False, now=2100) == 15
+      and ws.record('b', healthy=True, now=2115) == 60)
+ws.retain(['b'])
+check("removed targets forgotten", ws.next_in('a', now=0) is None and ws.next_in('b', now=2115) == 60)
+
+# --- probe statistics (real shipped code) ---
+from utils.probe_stats import (latency_histogram, histogram_percentile, rollup,
+                               summarize_probes, summarize_hourly)
+print("probe stats:")
+hist = latency_histogram([10, 20, 60, None, 20000])
+check("latency histogram buckets", hist[0] == 2 and hist[2] == 1 and hist[-1] == 1 and sum(hist) == 4)
+check("empty histogram percentile", histogram_percentile([0] * len(hist), 50) is None)
+check("histogram percentile interpolates", histogram_percentile(latency_histogram([40] * 10), 50) == 37.5)
+probes = [
+    {'target': 'dep:a', 'label': 'a.example', 'ok': 1, 'latency_ms': 100, 'interval_s': 60, 'ts': 3600.0},
+    {'target': 'dep:a', 'label': 'a.example', 'ok': 0, 'latency_ms': None, 'interval_s': 15, 'ts': 3660.0},
+    {'target': 'dep:a', 'label': 'a.example', 'ok': 0, 'latency_ms': None, 'interval_s': 15, 'ts': 3675.0},
+    {'target': 'dep:a', 'label': 'a.example', 'ok': 1, 'latency_ms': 300, 'interval_s': 60, 'ts': 3690.0},
+]
+summary = summarize_probes(probes, now=3750.0)['dep:a']
+check("uptime is time-weighted, not per probe", summary['uptime_pct'] == 80.0
+      and summary['probes'] == 4 and summary['failures'] == 2)
+check("raw latency percentiles", summary['p50_ms'] == 200.0 and summary['p99_ms'] == 298.0)
+check("newest probe clipped at now", summarize_probes(probes[:1], now=3630.0)['dep:a']['uptime_pct'] == 100.0)
+hourly = rollup(probes + [dict(probes[0], ts=7300.0)], before=7200.0)
+check("rollup skips the unfinished hour", len(hourly) == 1 and hourly[0]['hour'] == 3600
+      and hourly[0]['up_s'] == 120 and hourly[0]['down_s'] == 30)
+merged = summarize_hourly(hourly + [dict(hourly[0], hour=0)])['dep:a']
+check("hourly summaries merge", merged['probes'] == 8 and merged['uptime_pct'] == 80.0
+      and 100 <= merged['p50_ms'] <= 200)
+
+# --- http probe shaping (real shipped code) ---
+from utils.http_probe import parse_health_path, parse_mode, phase_timings, probe_target, status_ok
+print("http probe:")
+origin = probe_target('a.arvo.team', '/healthz', 'origin')
+check("origin probe hits nginx with Host header", origin['url'] == 'https://127.0.0.1/healthz'
+      and origin['headers'] == {'Host': 'a.arvo.team'} and origin['ssl'] is False
+      and origin['follow'] is False)
+check("origin probe on another node", probe_target('a.arvo.team', '/', 'origin',
+                                                   origin='10.0.0.2')['url'] == 'https://10.0.0.2/')
+edge = probe_target('a.arvo.team', '/', 'edge')
+check("edge probe via public hostname", edge['url'] == 'https://a.arvo.team/'
+      and edge['headers'] == {} and edge['ssl'] is True and edge['follow'] is True)
+check("explicit URL probed as given", probe_target(url='https://x.example/up')['mode'] == 'url')
+check("health path defaults and validates", parse_health_path(None) == '/'
+      and parse_health_path('/api/health?full=1') == '/api/health?full=1')
+for bad in ('health', '/a b', '/x#frag', '/' + 'x' * 300, 5):
+    try:
+        parse_health_path(bad)
+        check(f"health path {bad!r} rejected", False)
+    except ValueError:
+        check(f"health path {str(bad)[:12]!r} rejected", True)
+check("mode defaults", parse_mode(None) == 'origin' and parse_mode('', default=None) is None
+      and parse_mode('edge') == 'edge')
+try:
+    parse_mode('cdn')
+    check("unknown mode rejected", False)
+except ValueError:
+    check("unknown mode rejected", True)
+check("2xx/3xx pass, 4xx/5xx and no response fail", status_ok(200) and status_ok(302)
+      and not status_ok(404) and not status_ok(502) and not status_ok(None))
+t = phase_timings({'request_start': 1.0, 'dns_resolvehost_start': 1.0, 'dns_resolvehost_end': 1.01,
+                   'connection_create_start': 1.01, 'connection_create_end': 1.05,
+                   'request_headers_sent': 1.05, 'request_end': 1.2, 'done': 1.25})
+check("phase timings", t == {'dns_ms': 10.0, 'connect_ms': 40.0, 'ttfb_ms': 150.0,
+                             'total_ms': 250.0, 'reused': False})
+t = phase_timings({'request_start': 2.0, 'connection_reuseconn': 2.0,
+                   'request_headers_sent': 2.0, 'request_end': 2.02, 'done': 2.03})
+check("reused connection has no connect time", t['reused'] and t['connect_ms'] is None
+      and t['ttfb_ms'] == 20.0)
+
+# --- single-flight snapshots (real shipped code) ---
+from utils.snapshot_cache import SnapshotCache
+print("snapshot cache:")
+
+
+async def _snapshot_checks():
+    cache = SnapshotCache({'overview': 30.0, 'status': 5.0})
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'n': len(calls)}
+
+    results = await asyncio.gather(*(cache.get('overview', compute) for _ in range(5)))
+    check("concurrent callers share one computation", len(calls) == 1
+          and all(r[0] == {'n': 1} for r in results))
+    value, as_of, age = await cache.get('overview', compute)
+    check("snapshot served within max age", len(calls) == 1 and value == {'n': 1} and age < 5)
+    value, _, _ = await cache.get('overview', compute, fresh=True)
+    check("fresh bypasses the snapshot", len(calls) == 2 and value == {'n': 2})
+    cache.put('status:a', {'x': 1}, now=0.0)
+    check("expired snapshot not fresh", cache.fresh('status:a', now=10.0) is None
+          and cache.peek('status:a', now=10.0)[2] == 10.0)
+    check("max age per key kind", cache.fresh('status:a', now=4.0) is not None)
+    read = cache.last_read('overview')
+    await cache.refresh('overview', compute)
+    check("refresh doesn't count as a read", cache.last_read('overview') == read
+          and cache.last_read('status:a') is None)
+
+    async def boom():
+        raise RuntimeError('pm2 down')
+    try:
+        await cache.get('discover', boom)
+        check("failed computation raises", False)
+    except RuntimeError:
+        check("failed computation raises and isn't stored",
+              cache.peek('discover') is None and 'discover' not in cache._inflight)
+    cache.drop('overview')
+    check("drop forgets the snapshot", cache.peek('overview') is None)
+
+asyncio.run(_snapshot_checks())
+
+# --- nginx access-log analytics (real shipped code) ---
+from utils.access_log import MinuteAggregator, follow, parse_line, parse_time_local, summarize
+print("access log:")
+check("time_local with offset", parse_time_local('10/Oct/2026:13:55:36 +0200')
+      == parse_time_local('10/Oct/2026:11:55:36 +0000'))
+combined = ('203.0.113.9 - - [10/Oct/2026:11:55:36 +0000] "GET /api/items?page=2 HTTP/1.1" '
+            '200 512 "https://ref.example/" "Mozilla/5.0 (X11; \\x22quoted\\x22)" 0.015 0.012')
+rec = parse_line(combined)
+check("combined line parsed", rec is not None and rec['status'] == 200 and rec['bytes'] == 512
+      and rec['path'] == '/api/items' and rec['upstream_ms'] == 12.0)
+rec = parse_line('1.2.3.4 - - [10/Oct/2026:11:55:40 +0000] "GET /a HTTP/1.1" 502 0 "-" "curl" '
+                 'rt=5.001 urt="5.000"')
+check("quoted urt field", rec['upstream_ms'] == 5000.0)
+rec = parse_line('1.2.3.4 - - [10/Oct/2026:11:55:40 +0000] "GET /a HTTP/1.1" 502 0 "-" "curl" '
+                 'rt=5.001 urt=0.010,0.250')
+check("urt attempts summed", rec['status'] == 502 and rec['upstream_ms'] == 260.0)
+rec = parse_line('1.2.3.4 - - [10/Oct/2026:11:55:40 +0000] "GET /logo.png HTTP/1.1" 304 0 "-" "curl" 0.000 -')
+check("static request has no upstream time", rec['upstream_ms'] is None and rec['status'] == 304)
+rec = parse_line('{"time_iso8601":"2026-10-10T13:55:36+02:00","status":"201","body_bytes_sent":"10",'
+                 '"request_uri":"/x?y=1","upstream_response_time":"0.004"}')
+check("json line parsed", rec == {'ts': parse_time_local('10/Oct/2026:11:55:36 +0000'), 'status': 201,
+                                  'bytes': 10, 'path': '/x', 'upstream_ms': 4.0})
+check("garbage skipped", parse_line('not a log line') is None and parse_line('') is None)
+
+with tempfile.TemporaryDirectory() as logdir:
+    log = os.path.join(logdir, 'a.arvo.team.access.log')
+    with open(log, 'w') as f:
+        f.write('old line\n')
+    lines, st = follow(log, None)
+    check("first sight starts at end", lines == [] and st['offset'] == 9)
+    with open(log, 'a') as f:
+        f.write('one\ntwo\npart')
+    lines, st = follow(log, st)
+    check("new complete lines only", lines == ['one', 'two'] and st['offset'] == 17)
+    with open(log, 'a') as f:
+        f.write('ial\n')
+    os.rename(log, log + '.1')
+    with open(log, 'w') as f:
+        f.write('fresh\n')
+    lines, st = follow(log, st)
+    check("rotation drains old file then starts new", lines == ['partial', 'fresh']
+          and st['offset'] == 6)
+    with open(log, 'w') as f:
+        f.write('x\n')
+    lines, st = follow(log, st)
+    check("truncation restarts at 0", lines == ['x'] and st['offset'] == 2)
+    check("missing file keeps state", follow(os.path.join(logdir, 'gone.log'), st) == ([], st))
+
+agg = MinuteAggregator(keep_minutes=5)
+base = parse_time_local('10/Oct/2026:11:55:00 +0000')
+for i, (status, path, ms) in enumerate([(200, '/a', 4.0), (200, '/a', 8.0), (404, '/b', None),
+                                        (503, '/a', 900.0)]):
+    agg.add('dep1', {'ts': base + i, 'status': status, 'bytes': 100, 'path': path, 'upstream_ms': ms})
+rows = agg.flush(base + 30)
+check("minute row aggregated", len(rows) == 1 and rows[0]['requests'] == 4 and rows[0]['s2xx'] == 2
+      and rows[0]['s4xx'] == 1 and rows[0]['s5xx'] == 1 and rows[0]['bytes'] == 400
+      and rows[0]['top_paths'] == '[["/a", 3], ["/b", 1]]' and rows[0]['upstream_p50'] is not None)
+check("unchanged minutes not re-flushed", agg.flush(base + 40) == [])
+agg.add('dep1', {'ts': base + 50, 'status': 200, 'bytes': 0, 'path': '/c', 'upstream_ms': 2.0})
+rows = agg.flush(base + 70)
+check("late line rewrites the whole minute", rows[0]['requests'] == 5)
+agg.flush(base + 600)
+agg.add('dep1', {'ts': base + 1, 'status': 200, 'bytes': 0, 'path': '/', 'upstream_ms': None})
+check("lines past the window dropped", agg.late == 1 and agg.flush(base + 600) == [])
+seeded = MinuteAggregator()
+seeded.seed(rows)
+seeded.add('dep1', {'ts': base + 59, 'status': 500, 'bytes': 0, 'path': '/a', 'upstream_ms': 30.0})
+again = seeded.flush(base + 70)[0]
+check("seeded minute merges after restart", again['requests'] == 6 and again['s5xx'] == 2)
+cp = seeded.checkpoint()
+seeded.add('dep1', {'ts': base + 59, 'status': 200, 'bytes': 0, 'path': '/a', 'upstream_ms': None})
+seeded.flush(base + 75)
+seeded.restore(cp)   # the save failed: the same line is read again
+seeded.add('dep1', {'ts': base + 59, 'status': 200, 'bytes': 0, 'path': '/a', 'upstream_ms': None})
+check("restored read isn't counted twice", seeded.flush(base + 80)[0]['requests'] == 7)
+total = summarize(rows + [dict(rows[0], minute=base + 60)])
+check("window summary", total['requests'] == 10 and total['error_rate'] == 0.2
+      and total['top_paths'][0] == ('/a', 6) and total['upstream_p99'] is not None)
+
+# --- anomaly detection (real shipped code) ---
+from utils.anomaly import AnomalyDetector, Ewma, Trend
+print("anomaly:")
+e = Ewma(halflife=60)
+check("ewma first sample has no z", e.update(10.0, 0) is None)
+for i in range(1, 50):
+    e.update(10.0 + (i % 2), i * 10)
+z = e.update(30.0, 500)
+check("ewma z of a jump is large", z is not None and z > 10)
+check("ewma mean moves toward the jump", 10.0 < e.mean < 30.0)
+
+def _det():
+    return AnomalyDetector({'cpu': 20.0}, {'disk': 86400.0}, z=4, sustain=3, warmup=10,
+                           window=6 * 3600, step=60)
+d = _det()
+t = 0
+for i in range(40):
+    t += 10
+    d.observe(t, {'cpu': 20 + (i % 3)})
+t += 10
+check("single spike not reported", 'cpu' not in d.observe(t, {'cpu': 95}))
+t += 10
+d.observe(t, {'cpu': 21})
+for _ in range(3):
+    t += 10
+    found = d.observe(t, {'cpu': 95})
+check("sustained spike reported", found.get('cpu', {}).get('kind') == 'deviation')
+check("finding carries baseline below value", found['cpu']['baseline'] < 95)
+t += 10
+check("spike clears when value returns", 'cpu' not in d.observe(t, {'cpu': 20}))
+
+d = _det()
+for i in range(0, 3 * 3600, 60):
+    d.observe(i, {'disk': 50 + i / 3600.0})   # +1 point/hour → ~47h to full
+check("slow fill beyond horizon not reported", 'disk_forecast' not in d.findings)
+eta = d.time_to_full('disk')
+check("time to full on linear growth", eta is not None and abs(eta - 47 * 3600) < 600)
+d = _det()
+for i in range(0, 3 * 3600, 60):
+    d.observe(i, {'disk': 50 + 10 * i / 3600.0})  # +10 points/hour → ~2h to full
+f = d.findings.get('disk_forecast')
+check("fast fill reported", f is not None and f['kind'] == 'forecast')
+check("forecast rate per hour", f is not None and abs(f['rate_per_hour'] - 10) < 0.1)
+d = _det()
+for i in range(0, 3 * 3600, 60):
+    d.observe(i, {'disk': 60 + (7 if (i // 60) % 2 else 0)})
+check("noisy flat disk has no forecast", d.time_to_full('disk') is None)
+d = _det()
+for i in range(0, 600, 60):
+    d.observe(i, {'disk': 50 + i})
+check("no forecast from a short window", d.time_to_full('disk') is None)
+tr = Trend(window=300, step=60)
+check("trend downsamples by step", tr.add(0, 1) and not tr.add(30, 2) and tr.add(60, 3))
+tr.add(500, 4)
+check("trend drops points outside the window", len(tr.points) == 1)
+check("baselines expose eta", 'eta_s' in _det().baselines()['disk'])
+
+# --- alert aggregation (real shipped code) ---
+from utils.alert_batch import AlertAggregator, TokenBucket, fingerprint, summarize
+print("alert_batch:")
+
+def _alert(title, target, level='error', source='watchdog', critical=True, message='down'):
+    return {'level': level, 'title': title, 'message': message, 'source': source,
+            'target': target, 'critical': critical, 'fields': None}
+
+agg = AlertAggregator(window=10, dedupe_ttl=300)
+check("first alert sent at once", agg.add(_alert("Service down: a", 'a'), 0) == 'send')
+check("exact repeat suppressed", agg.add(_alert("Service down: a", 'a'), 1) == 'duplicate')
+for i, t in enumerate('bcde'):
+    agg.add(_alert(f"Service down: {t}", t), 2 + i)
+check("burst held in window", agg.pending() == 4)
+check("other source not grouped", agg.add(_alert("High CPU", 'CPU', source='monitor'), 3) == 'send')
+check("nothing due before window closes", agg.due(9) == [])
+out = agg.due(10)
+check("one summary per window", len(out) == 1)
+check("summary title", out[0]['title'] == "Service down: 4 targets")
+check("summary lists targets", out[0]['target'] == "b, c, d, e" and out[0]['critical'])
+check("storm keeps holding", agg.add(_alert("Service down: f", 'f'), 11) == 'held')
+check("lone held alert passed through", agg.due(20) == [_alert("Service down: f", 'f')])
+check("quiet source closes window", agg.due(30) == [] and agg.add(_alert("Service down: g", 'g'), 31) == 'send')
+check("state change not a duplicate",
+      agg.add(_alert("Service recovered: a", 'a', level='success', message='ok'), 50) in ('send', 'held'))
+check("flap back down is delivered", agg.add(_alert("Service down: a", 'a'), 51) != 'duplicate')
+agg2 = AlertAggregator(window=10, dedupe_ttl=300)
+agg2.add(_alert("x", 't'), 0)
+check("repeat after ttl delivered", agg2.add(_alert("x", 't'), 301) == 'send')
+check("fingerprint covers message", fingerprint('info', 's', 't', 'x', 'a') != fingerprint('info', 's', 't', 'x', 'b'))
+s_ = summarize([_alert("Deploy failed", 'a', level='warning'), _alert("Rebuild failed", 'b')] * 6, max_lines=10)
+check("summary takes worst level", s_['level'] == 'error')
+check("summary truncates lines", s_['message'].endswith("...and 2 more"))
+tb = TokenBucket(rate=1 / 60, burst=2)
+check("bucket allows burst", tb.take(0) and tb.take(0) and not tb.take(1))
+check("bucket refills at rate", not tb.available(30) and tb.take(61))
+
+# --- blue/green cutover (real shipped code) ---
+from utils.blue_green import cutover_cleanup, peer_name
+print("blue_green:")
+check("peer of blue is green", peer_name("0123456789ab") == "0123456789ab-g")
+check("peer of green is blue", peer_name("0123456789ab-g") == "0123456789ab")
+check("names alternate", peer_name(peer_name("0123456789ab")) == "0123456789ab")
+check("peer fails health before flip → delete peer only",
+      cutover_cleanup(flipped=False, committed=False) == ['delete_next', 'release_next_port'])
+check("unhealthy after flip → nginx back first",
+      cutover_cleanup(flipped=True, committed=False)[0] == 'restore_upstream')
+check("failure never touches the live process",
+      not any('live' in step for step in cutover_cleanup(True, False) + cutover_cleanup(False, False)))
+check("commit drains then deletes the old process",
+      cutover_cleanup(flipped=True, committed=True) == ['confirm_next_port', 'drain_live', 'delete_live'])
+
 print()
 if failures:
     print(f"{len(failures)} CHECK(S) FAILED: {failures}")
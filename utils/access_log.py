@@ -0,0 +1,338 @@
+"""
+Incremental nginx access-log analytics per deployment.
+
+Every deployment's server block logs to /var/log/nginx/<fqdn>.access.log. `follow`
+reads only what was appended since the stored (inode, offset), stopping at the last
+complete line. When logrotate moves the file away (new inode), the rest of the old
+file is read from <path>.1 before the new one starts at 0. When the file shrinks in
+place (copytruncate), reading restarts at 0. A log seen for the first time starts at
+its end, so history is never backfilled in one go.
+
+`parse_line` is a str.find tokenizer rather than a regex. It reads the `combined`
+layout (`addr - user [time] "request" status bytes "referer" "agent"`) and any fields
+after it, or a `log_format ... escape=json` line. The upstream response time comes
+from a `urt=` / `upstream_response_time=` field, or else the last bare timing field
+(`$request_time $upstream_response_time`). Several upstream attempts
+("0.010, 0.250") are summed, and "-" (served by nginx itself) counts as none.
+
+`MinuteAggregator` folds parsed lines into per-deployment, per-minute buckets: request
+count, status classes, bytes, top paths and an upstream-time histogram (mergeable,
+see utils.probe_stats). `flush` returns every minute that changed, fully re-aggregated,
+so the stored row can simply be overwritten. Minutes are kept `keep_minutes` after they
+close so late lines still land, and `seed` reloads them from the DB after a restart.
+`checkpoint`/`restore` undo a read whose rows couldn't be stored, so the same lines
+can be read again from the unchanged offsets without being counted twice.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import calendar
+import copy
+import json
+import os
+from collections import Counter
+
+from utils.probe_stats import PERCENTILES, bucket_of, histogram_percentile, merge_histograms
+
+# Upstream response time buckets (ms): finer at the low end than the probe buckets,
+# since most proxied requests answer in single-digit milliseconds.
+UPSTREAM_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_MONTHS = {m: i for i, m in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+_TIMING_KEYS = ('urt', 'upstream_response_time', 'upstream_time')
+_MAX_PATH = 200
+_MAX_PATHS = 1000           # distinct paths tracked per minute; the rest count as '(other)'
+_TOP_PATHS = 10
+
+_ts_cache: dict[str, int] = {}
+
+
+def parse_time_local(text: str) -> int | None:
+    """Epoch seconds for `10/Oct/2026:13:55:36 +0200` ($time_local)."""
+    hit = _ts_cache.get(text)
+    if hit is not None:
+        return hit
+    try:
+        day, mon, rest = text.split('/', 2)
+        year, hh, mm, rest = rest.split(':', 3)
+        ss, tz = rest.split(' ', 1)
+        ts = calendar.timegm((int(year), _MONTHS[mon], int(day), int(hh), int(mm), int(ss)))
+        sign = -1 if tz[0] == '-' else 1
+        ts -= sign * (int(tz[1:3]) * 3600 + int(tz[3:5]) * 60)
+    except (ValueError, KeyError, IndexError):
+        return None
+    if len(_ts_cache) > 4096:
+        _ts_cache.clear()
+    _ts_cache[text] = ts
+    return ts
+
+
+def _parse_iso(text: str) -> int | None:
+    # $time_iso8601: 2026-10-10T13:55:36+02:00
+    try:
+        date, _, clock = text.partition('T')
+        y, mo, d = (int(v) for v in date.split('-'))
+        tz_at = max(clock.rfind('+'), clock.rfind('-'))
+        hms, tz = (clock[:tz_at], clock[tz_at:]) if tz_at > 0 else (clock.rstrip('Z'), '')
+        hh, mm, ss = (int(float(v)) for v in hms.split(':'))
+        ts = calendar.timegm((y, mo, d, hh, mm, ss))
+        if tz:
+            sign = -1 if tz[0] == '-' else 1
+            th, _, tm = tz[1:].partition(':')
+            ts -= sign * (int(th) * 3600 + int(tm or 0) * 60)
+        return ts
+    except (ValueError, IndexError):
+        return None
+
+
+def upstream_ms(value) -> float | None:
+    """`$upstream_response_time` in ms: attempts ("0.010, 0.250" / "0.010 : 0.250") summed."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return round(float(value) * 1000, 3)
+    total, seen = 0.0, False
+    for part in str(value).replace(':', ',').split(','):
+        part = part.strip()
+        if part and part != '-':
+            try:
+                total += float(part)
+                seen = True
+            except ValueError:
+                return None
+    return round(total * 1000, 3) if seen else None
+
+
+def _path_of(target: str) -> str:
+    path = target.split('?', 1)[0] or '/'
+    return path[:_MAX_PATH]
+
+
+def _is_timing(token: str) -> bool:
+    return bool(token) and all(c in '0123456789.,:-' for c in token)
+
+
+def _parse_json(line: str) -> dict | None:
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    ts = None
+    if data.get('msec'):
+        try:
+            ts = int(float(data['msec']))
+        except (TypeError, ValueError):
+            ts = None
+    if ts is None and data.get('time_iso8601'):
+        ts = _parse_iso(str(data['time_iso8601']))
+    if ts is None and data.get('time_local'):
+        ts = parse_time_local(str(data['time_local']))
+    try:
+        status = int(data.get('status'))
+    except (TypeError, ValueError):
+        return None
+    if ts is None:
+        return None
+    target = data.get('request_uri') or data.get('uri')
+    if not target and data.get('request'):
+        parts = str(data['request']).split(' ')
+        target = parts[1] if len(parts) > 1 else parts[0]
+    try:
+        size = int(data.get('body_bytes_sent') or data.get('bytes_sent') or 0)
+    except (TypeError, ValueError):
+        size = 0
+    upstream = next((data[k] for k in _TIMING_KEYS if data.get(k) not in (None, '')), None)
+    return {'ts': ts, 'status': status, 'bytes': size, 'path': _path_of(str(target or '/')),
+            'upstream_ms': upstream_ms(upstream)}
+
+
+def parse_line(line: str) -> dict | None:
+    """{'ts', 'status', 'bytes', 'path', 'upstream_ms'} for one access-log line, None if unreadable."""
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] == '{':
+        return _parse_json(line)
+    t0 = line.find('[')
+    t1 = line.find(']', t0 + 1)
+    q0 = line.find('"', t1 + 1)
+    q1 = line.find('"', q0 + 1)
+    if t0 < 0 or t1 < 0 or q0 < 0 or q1 < 0:
+        return None
+    ts = parse_time_local(line[t0 + 1:t1])
+    if ts is None:
+        return None
+    request = line[q0 + 1:q1].split(' ')
+    target = request[1] if len(request) > 1 else '/'
+    fields = line[q1 + 1:].split(None, 2)
+    if len(fields) < 2 or not fields[0].isdigit():
+        return None
+    size = int(fields[1]) if fields[1].isdigit() else 0
+    rest = fields[2] if len(fields) > 2 else ''
+    # Skip the quoted referer and user agent (nginx escapes '"' inside them as \x22).
+    for _ in range(2):
+        a = rest.find('"')
+        b = rest.find('"', a + 1) if a >= 0 else -1
+        if b < 0:
+            break
+        rest = rest[b + 1:]
+    timing = None
+    for token in rest.split():
+        key, eq, value = token.partition('=')
+        if eq and key in _TIMING_KEYS:
+            timing = value.strip('"')
+            break
+        if not eq and token[0] != '"' and _is_timing(token):
+            timing = token
+    return {'ts': ts, 'status': int(fields[0]), 'bytes': size, 'path': _path_of(target),
+            'upstream_ms': upstream_ms(timing)}
+
+
+def _read_from(path: str, offset: int, max_bytes: int) -> tuple[list, int]:
+    """Complete lines from `offset` (at most max_bytes) and the offset after the last one."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+    end = data.rfind(b'\n')
+    if end < 0:
+        return [], offset
+    lines = [b.decode('utf-8', 'replace') for b in data[:end].split(b'\n')]
+    return lines, offset + end + 1
+
+
+def follow(path: str, state: dict | None, max_bytes: int = 8 * 1024 * 1024) -> tuple[list, dict | None]:
+    """
+    New complete lines of `path` since `state` ({'inode', 'offset'}) and the state to
+    store next. A missing file yields no lines and keeps the state.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return [], state
+    if state is None:
+        return [], {'inode': st.st_ino, 'offset': st.st_size}
+    lines: list = []
+    offset = state['offset']
+    if st.st_ino != state['inode']:
+        rotated = f"{path}.1"
+        try:
+            if os.stat(rotated).st_ino == state['inode']:
+                lines, _ = _read_from(rotated, offset, max_bytes)
+        except OSError:
+            pass
+        offset = 0
+    elif st.st_size < offset:
+        offset = 0
+    if st.st_size > offset:
+        try:
+            more, offset = _read_from(path, offset, max_bytes)
+        except OSError:
+            more = []
+        lines += more
+    return lines, {'inode': st.st_ino, 'offset': offset}
+
+
+def _empty() -> dict:
+    return {'requests': 0, 's2xx': 0, 's3xx': 0, 's4xx': 0, 's5xx': 0, 'bytes': 0,
+            'paths': Counter(), 'hist': [0] * (len(UPSTREAM_BUCKETS_MS) + 1)}
+
+
+class MinuteAggregator:
+    def __init__(self, keep_minutes: int = 5):
+        self.keep = keep_minutes * 60
+        self._minutes: dict[tuple, dict] = {}    # (app, minute epoch) → running totals
+        self._dirty: set = set()
+        self._floor: int | None = None           # minutes before this were dropped
+        self.late = 0                            # lines too old to aggregate
+
+    def add(self, app: str, rec: dict):
+        minute = rec['ts'] - rec['ts'] % 60
+        key = (app, minute)
+        acc = self._minutes.get(key)
+        if acc is None:
+            if self._floor is not None and minute < self._floor:
+                self.late += 1
+                return
+            acc = self._minutes[key] = _empty()
+        acc['requests'] += 1
+        cls = f"s{rec['status'] // 100}xx"
+        if cls in acc:
+            acc[cls] += 1
+        acc['bytes'] += rec['bytes']
+        paths = acc['paths']
+        if rec['path'] in paths or len(paths) < _MAX_PATHS:
+            paths[rec['path']] += 1
+        else:
+            paths['(other)'] += 1
+        if rec['upstream_ms'] is not None:
+            acc['hist'][bucket_of(rec['upstream_ms'], UPSTREAM_BUCKETS_MS)] += 1
+        self._dirty.add(key)
+
+    def seed(self, rows: list):
+        """Reload stored minutes (flush() rows) so late lines after a restart merge into them."""
+        for r in rows:
+            acc = _empty()
+            for k in ('requests', 's2xx', 's3xx', 's4xx', 's5xx', 'bytes'):
+                acc[k] = int(r[k] or 0)
+            acc['paths'] = Counter(dict(_loads(r.get('top_paths'), [])))
+            hist = _loads(r.get('upstream_hist'), [])
+            acc['hist'] = merge_histograms([hist], UPSTREAM_BUCKETS_MS)
+            self._minutes[(r['app'], int(r['minute']))] = acc
+
+    def checkpoint(self):
+        """Opaque copy of the aggregation state for restore()."""
+        return copy.deepcopy((self._minutes, self._dirty, self._floor, self.late))
+
+    def restore(self, state):
+        self._minutes, self._dirty, self._floor, self.late = copy.deepcopy(state)
+
+    def flush(self, now: float) -> list:
+        """Rows for every minute changed since the last flush; forgets minutes past the window."""
+        rows = [self._row(key) for key in sorted(self._dirty)]
+        self._dirty.clear()
+        self._floor = int(now - now % 60) - self.keep
+        for key in [k for k in self._minutes if k[1] < self._floor]:
+            del self._minutes[key]
+        return rows
+
+    def _row(self, key) -> dict:
+        app, minute = key
+        acc = self._minutes[key]
+        row = {'app': app, 'minute': minute,
+               **{k: acc[k] for k in ('requests', 's2xx', 's3xx', 's4xx', 's5xx', 'bytes')},
+               'top_paths': json.dumps(acc['paths'].most_common(_TOP_PATHS)),
+               'upstream_hist': json.dumps(acc['hist'])}
+        for pct in PERCENTILES:
+            row[f"upstream_p{pct}"] = histogram_percentile(acc['hist'], pct, UPSTREAM_BUCKETS_MS)
+        return row
+
+
+def _loads(value, default):
+    if not isinstance(value, str):
+        return value if value is not None else default
+    try:
+        return json.loads(value)
+    except ValueError:
+        return default
+
+
+def summarize(rows: list) -> dict:
+    """
+    Totals over stored minute rows: requests, status classes, bytes, upstream
+    p50/p95/p99 (merged histograms) and the top paths (summed per-minute top lists).
+    """
+    totals = {k: sum(int(r[k] or 0) for r in rows)
+              for k in ('requests', 's2xx', 's3xx', 's4xx', 's5xx', 'bytes')}
+    hist = merge_histograms([_loads(r.get('upstream_hist'), []) for r in rows], UPSTREAM_BUCKETS_MS)
+    paths: Counter = Counter()
+    for r in rows:
+        paths.update(dict(_loads(r.get('top_paths'), [])))
+    for pct in PERCENTILES:
+        totals[f"upstream_p{pct}"] = histogram_percentile(hist, pct, UPSTREAM_BUCKETS_MS)
+    totals['error_rate'] = round(totals['s5xx'] / totals['requests'], 4) if totals['requests'] else None
+    totals['top_paths'] = paths.most_common(_TOP_PATHS)
+    return totals
+
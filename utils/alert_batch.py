@@ -0,0 +1,139 @@
+"""
+Grouping, de-duplication and rate limiting for OutputCog.alert.
+
+A bad deploy or a reboot takes several targets down together. One feed row and one
+Discord embed each would bury the feed, and the Discord queue sends a message every
+0.5 s, so it would fall minutes behind. `AlertAggregator` sits in front of delivery:
+
+  duplicates — an alert with the same fingerprint (level, source, target, title,
+               message) as the last alert for that source/target within `dedupe_ttl`
+               is dropped: the same event reported twice, not two deploys. A
+               different alert for the target (e.g. the recovery) resets this, so a
+               flapping target still shows every change of state.
+  grouping   — the first alert from a source (critical and non-critical kept apart)
+               is delivered at once and opens a `window`. Alerts arriving inside it
+               are held and come out of `due` as one summary when it closes. While a
+               storm continues, each window yields one summary.
+
+`TokenBucket` limits how many alert embeds each Discord channel gets; the feed is
+never rate limited.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import hashlib
+
+# Severity order, lowest first.
+LEVELS = ('info', 'success', 'warning', 'error', 'critical')
+
+_MAX_TARGET = 255
+
+
+def fingerprint(level, source, target, title, message=None) -> str:
+    raw = "\x1f".join(str(v or '') for v in (level, source, target, title, message))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate                   # tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self._at: float | None = None
+
+    def _refill(self, now: float):
+        if self._at is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._at) * self.rate)
+        self._at = now
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def available(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= 1
+
+
+def _clip(text: str, limit: int = 200) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def summarize(alerts: list, max_lines: int = 10) -> dict:
+    """One alert dict standing for `alerts` (all from one group): worst level, listed lines."""
+    level = max((a['level'] for a in alerts),
+                key=lambda lv: LEVELS.index(lv) if lv in LEVELS else 0)
+    titles = [a['title'] for a in alerts]
+    prefixes = {t.split(': ', 1)[0] for t in titles}
+    if len(set(titles)) == 1:
+        title = f"{titles[0]} (x{len(alerts)})"
+    elif len(prefixes) == 1 and all(': ' in t for t in titles):
+        title = f"{prefixes.pop()}: {len(alerts)} targets"
+    else:
+        title = f"{len(alerts)} {alerts[0].get('source') or 'system'} alerts"
+    lines = [f"- {a['title']}: {_clip(a['message'])}" if a.get('message') else f"- {a['title']}"
+             for a in alerts[:max_lines]]
+    if len(alerts) > max_lines:
+        lines.append(f"...and {len(alerts) - max_lines} more")
+    targets = list(dict.fromkeys(a['target'] for a in alerts if a.get('target')))
+    target = ", ".join(targets)
+    if len(target) > _MAX_TARGET:
+        target = target[:_MAX_TARGET - 3] + "..."
+    return {'level': level, 'title': title, 'message': "\n".join(lines),
+            'source': alerts[0].get('source'), 'target': target or None,
+            'critical': any(a.get('critical') for a in alerts), 'fields': None}
+
+
+class AlertAggregator:
+    def __init__(self, window: float = 10.0, dedupe_ttl: float = 300.0, max_lines: int = 10):
+        self.window = window
+        self.dedupe_ttl = dedupe_ttl
+        self.max_lines = max_lines
+        self._last: dict[tuple, tuple[str, float]] = {}   # (source, target) → (fingerprint, at)
+        self._groups: dict[tuple, dict] = {}              # (source, critical) → open window
+
+    def add(self, alert: dict, now: float) -> str:
+        """
+        'send' (deliver now), 'held' (comes out of due() in a summary) or 'duplicate'
+        for an alert dict {'level', 'title', 'message', 'source', 'target', 'critical'}.
+        """
+        key = (alert.get('source'), alert.get('target'))
+        fp = fingerprint(alert['level'], *key, alert['title'], alert.get('message'))
+        prev = self._last.get(key)
+        if prev and prev[0] == fp and now - prev[1] < self.dedupe_ttl:
+            return 'duplicate'
+        self._last[key] = (fp, now)
+        if self.window <= 0:
+            return 'send'
+        gkey = (alert.get('source'), bool(alert.get('critical')))
+        group = self._groups.get(gkey)
+        if group is None or now >= group['until']:
+            self._groups[gkey] = {'until': now + self.window, 'held': []}
+            return 'send'
+        group['held'].append(alert)
+        return 'held'
+
+    def due(self, now: float) -> list:
+        """Summaries (alert dicts) for windows that closed by `now`; a lone held alert is passed through."""
+        out = []
+        for gkey, group in list(self._groups.items()):
+            if now < group['until']:
+                continue
+            held = group['held']
+            if not held:
+                del self._groups[gkey]
+                continue
+            out.append(held[0] if len(held) == 1 else summarize(held, self.max_lines))
+            # Still busy: keep holding, so a continuing storm yields one summary per window.
+            self._groups[gkey] = {'until': now + self.window, 'held': []}
+        for key, (_, at) in list(self._last.items()):
+            if now - at >= self.dedupe_ttl:
+                del self._last[key]
+        return out
+
+    def pending(self) -> int:
+        return sum(len(g['held']) for g in self._groups.values())
@@ -0,0 +1,184 @@
+"""
+Statistical anomaly detection over the monitor's resource samples.
+
+Fixed thresholds miss slow trouble (a memory leak, a disk filling over a day) and fire
+on brief spikes. `AnomalyDetector` runs two kinds of checks on every monitor tick:
+
+  deviation — each metric keeps an exponentially weighted mean and variance (EWMA over
+              a `halflife`, valid for irregular sample spacing). A sample is anomalous
+              when it is at least `z` standard deviations AND `min_delta` units above
+              the baseline. It only counts once that has held for `sustain`
+              consecutive samples, so a single spike never alerts.
+  forecast  — percent-of-capacity metrics (disk, inodes, RAM) keep a downsampled
+              window of points. A least-squares line through them gives a growth
+              rate, and from that the time until 100%. It fires when that time is
+              inside the metric's horizon and the fit is good (r² ≥ `min_r2`), so
+              noise doesn't look like a trend.
+
+Each update is O(1) for the EWMA. The line fit runs only when a window point is added
+(once per `step`) over a few hundred points. `observe` returns what is anomalous
+right now, with hysteresis so a finding doesn't flap at its trigger. Turning that into
+alert edges (with recovery) is up to the caller.
+
+This is plain Python, not NumPy. The EWMA is a recurrence: each sample updates the
+mean and variance from the previous ones, so there is no history array to vectorize.
+Recomputing over a window every tick would cost O(n) where this costs O(1). The only
+array work is the line fit, a few hundred points once a minute. numpy is pinned in
+requirements.txt only because that file freezes the whole host environment (torch,
+PyQt5, ...); no module in the bot imports it.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import math
+from collections import deque
+
+
+class Ewma:
+    def __init__(self, halflife: float):
+        self.halflife = halflife
+        self.mean: float | None = None
+        self.var = 0.0
+        self.n = 0
+        self._at: float | None = None
+
+    def update(self, value: float, now: float) -> float | None:
+        """Fold in `value`; returns its z-score against the baseline before it (None: no spread yet)."""
+        if self.mean is None:
+            self.mean, self._at, self.n = value, now, 1
+            return None
+        dt = max(0.0, now - self._at)
+        alpha = 1.0 - math.exp(-dt * math.log(2) / self.halflife) if self.halflife > 0 else 1.0
+        diff = value - self.mean
+        z = diff / math.sqrt(self.var) if self.var > 1e-9 else None
+        incr = alpha * diff
+        self.mean += incr
+        self.var = (1.0 - alpha) * (self.var + diff * incr)
+        self._at = now
+        self.n += 1
+        return z
+
+
+class Trend:
+    def __init__(self, window: float, step: float):
+        self.window = window
+        self.step = step
+        self.points: deque = deque()
+        self._fit: tuple | None = None
+
+    def add(self, now: float, value: float) -> bool:
+        """Keep (now, value) if `step` has passed since the last point; True when kept."""
+        if self.points and now - self.points[-1][0] < self.step:
+            return False
+        self.points.append((now, value))
+        while self.points and now - self.points[0][0] > self.window:
+            self.points.popleft()
+        self._fit = None
+        return True
+
+    def fit(self) -> tuple[float, float, float] | None:
+        """(slope per second, intercept at the newest point, r²) by least squares; None if too few points."""
+        if self._fit is not None:
+            return self._fit
+        n = len(self.points)
+        if n < 3:
+            return None
+        t0 = self.points[-1][0]
+        xs = [t - t0 for t, _ in self.points]
+        ys = [v for _, v in self.points]
+        mx, my = sum(xs) / n, sum(ys) / n
+        sxx = sum((x - mx) ** 2 for x in xs)
+        syy = sum((y - my) ** 2 for y in ys)
+        if sxx <= 0:
+            return None
+        sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+        slope = sxy / sxx
+        r2 = (sxy * sxy) / (sxx * syy) if syy > 0 else 0.0
+        self._fit = (slope, my - slope * mx, r2)
+        return self._fit
+
+    def span(self) -> float:
+        return self.points[-1][0] - self.points[0][0] if len(self.points) > 1 else 0.0
+
+
+class AnomalyDetector:
+    """
+    `deviation`: {metric: min_delta}; `forecast`: {metric: horizon seconds} for
+    percent metrics. Call observe() every tick; `findings` is what's anomalous now.
+    """
+
+    def __init__(self, deviation: dict, forecast: dict, *, z: float = 4.0, sustain: int = 6,
+                 halflife: float = 3600.0, warmup: int = 30, window: float = 6 * 3600.0,
+                 step: float = 60.0, min_r2: float = 0.8):
+        self.deviation = dict(deviation)
+        self.forecast = dict(forecast)
+        self.z = z
+        self.sustain = sustain
+        self.warmup = warmup
+        self.min_r2 = min_r2
+        self._ewma = {k: Ewma(halflife) for k in self.deviation}
+        self._trend = {k: Trend(window, step) for k in self.forecast}
+        self._streak = {k: 0 for k in self.deviation}
+        # Forecast only once the window covers a meaningful stretch.
+        self._min_span = min(window / 4, 3600.0)
+        self.findings: dict = {}
+
+    def observe(self, now: float, values: dict) -> dict:
+        """
+        Fold in one sample ({metric: value}) and return `findings`: {key: finding} for
+        everything anomalous now. Deviation keys are the metric ({'kind': 'deviation',
+        'value', 'baseline', 'z'}); forecast keys are '<metric>_forecast' ({'kind':
+        'forecast', 'value', 'eta_s', 'rate_per_hour'}). A finding clears at half its
+        trigger (z and delta), or once the forecast is past 1.5x its horizon.
+        """
+        for key, min_delta in self.deviation.items():
+            value = values.get(key)
+            if value is None:
+                continue
+            value = float(value)
+            ewma = self._ewma[key]
+            baseline = ewma.mean
+            z = ewma.update(value, now)
+            scale = 0.5 if key in self.findings else 1.0
+            hot = (ewma.n > self.warmup and z is not None and z >= self.z * scale
+                   and value - baseline >= min_delta * scale)
+            self._streak[key] = self._streak[key] + 1 if hot else 0
+            if hot and (key in self.findings or self._streak[key] >= self.sustain):
+                self.findings[key] = {'kind': 'deviation', 'value': value,
+                                      'baseline': round(baseline, 2), 'z': round(z, 1)}
+            else:
+                self.findings.pop(key, None)
+        for key, horizon in self.forecast.items():
+            value = values.get(key)
+            if value is None or not self._trend[key].add(now, float(value)):
+                continue
+            name = f"{key}_forecast"
+            eta = self.time_to_full(key)
+            limit = horizon * 1.5 if name in self.findings else horizon
+            if eta is not None and eta <= limit:
+                self.findings[name] = {'kind': 'forecast', 'value': float(value), 'eta_s': round(eta),
+                                       'rate_per_hour': round(self._trend[key].fit()[0] * 3600, 2)}
+            else:
+                self.findings.pop(name, None)
+        return self.findings
+
+    def time_to_full(self, key: str) -> float | None:
+        """Seconds until `key` reaches 100 on its fitted trend; None when not rising reliably."""
+        trend = self._trend.get(key)
+        fit = trend.fit() if trend else None
+        if not fit or trend.span() < self._min_span:
+            return None
+        slope, level, r2 = fit
+        if slope <= 0 or r2 < self.min_r2:
+            return None
+        return max(0.0, (100.0 - level) / slope)
+
+    def baselines(self) -> dict:
+        """{metric: {'mean', 'std', 'samples'}} for deviation metrics, {'eta_s'} for forecast ones."""
+        out = {k: {'mean': None if e.mean is None else round(e.mean, 2),
+                   'std': round(math.sqrt(e.var), 2), 'samples': e.n}
+               for k, e in self._ewma.items()}
+        for key in self.forecast:
+            eta = self.time_to_full(key)
+            out.setdefault(key, {})['eta_s'] = None if eta is None else round(eta)
+        return out
@@ -0,0 +1,162 @@
+"""
+Per-application CPU, memory, file-descriptor and thread accounting from /proc.
+
+pm2 reports one instant `monit.cpu`/`monit.memory` per process and keeps no history.
+`AppSampler.sample` instead walks each app's whole process tree (the pm2 process, or
+every cluster worker, plus anything it spawned) from /proc and sums RSS, open fds and
+threads. CPU is the tree's utime+stime delta since the previous sample over the wall
+time between them — an average over the interval, not a spot reading. A process that
+started inside the interval counts all of its ticks; one that exited takes its ticks
+with it, so a short-lived child can be under-counted.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import json
+import os
+import time
+
+
+def parse_stat(text: str) -> dict | None:
+    """{'ppid', 'ticks', 'threads', 'rss_pages', 'start'} from /proc/<pid>/stat content."""
+    # comm (field 2) is parenthesised and may contain spaces or ')'; fields resume
+    # after the last ')'.
+    _, sep, tail = text.rpartition(')')
+    if not sep:
+        return None
+    f = tail.split()
+    try:
+        return {
+            'ppid': int(f[1]),
+            'ticks': int(f[11]) + int(f[12]),     # utime + stime
+            'threads': int(f[17]),
+            'start': int(f[19]),                  # clock ticks after boot
+            'rss_pages': int(f[21]),
+        }
+    except (IndexError, ValueError):
+        return None
+
+
+def read_procs(proc_root: str = '/proc') -> dict:
+    """{pid: parse_stat(...)} for every process readable under `proc_root`."""
+    procs = {}
+    try:
+        names = os.listdir(proc_root)
+    except OSError:
+        return procs
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_root, name, 'stat')) as f:
+                stat = parse_stat(f.read())
+        except OSError:
+            continue
+        if stat:
+            procs[int(name)] = stat
+    return procs
+
+
+def tree_pids(procs: dict, roots) -> set:
+    """`roots` that are alive plus all their descendants."""
+    children: dict[int, list] = {}
+    for pid, p in procs.items():
+        children.setdefault(p['ppid'], []).append(pid)
+    out, stack = set(), [r for r in roots if r in procs]
+    while stack:
+        pid = stack.pop()
+        if pid in out:
+            continue
+        out.add(pid)
+        stack.extend(children.get(pid, ()))
+    return out
+
+
+def pm2_pids(jlist: str) -> dict:
+    """{process name: [pid, ...]} from `pm2 jlist` output; cluster workers share a name."""
+    try:
+        procs = json.loads(jlist)
+    except (ValueError, TypeError):
+        return {}
+    out: dict[str, list] = {}
+    for p in procs if isinstance(procs, list) else []:
+        if p.get('name') and p.get('pid'):
+            out.setdefault(p['name'], []).append(int(p['pid']))
+    return out
+
+
+def _count_fds(proc_root: str, pid: int) -> int:
+    try:
+        return len(os.listdir(os.path.join(proc_root, str(pid), 'fd')))
+    except OSError:
+        return 0
+
+
+class AppSampler:
+    def __init__(self, proc_root: str = '/proc', clk_tck: int | None = None,
+                 page_size: int | None = None):
+        self.proc_root = proc_root
+        self.clk_tck = clk_tck or os.sysconf('SC_CLK_TCK')
+        self.page_size = page_size or os.sysconf('SC_PAGE_SIZE')
+        self._ticks: dict[tuple, int] = {}     # (pid, start) → ticks at the last sample
+        self._at: float | None = None          # uptime (s) at the last sample
+
+    def _uptime(self) -> float | None:
+        try:
+            with open(os.path.join(self.proc_root, 'uptime')) as f:
+                return float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def sample(self, apps: dict, now: float | None = None) -> dict:
+        """
+        {app: [root pids]} → {app: {'cpu_pct', 'rss', 'fds', 'threads', 'procs'}} for
+        apps with a live process. cpu_pct is percent of one core (None on the first
+        sample); `now` is seconds since boot (default: /proc/uptime).
+        """
+        now = self._uptime() if now is None else now
+        if now is None:
+            now = time.monotonic()
+        procs = read_procs(self.proc_root)
+        elapsed = None if self._at is None else now - self._at
+        ticks: dict[tuple, int] = {}
+        out = {}
+        for app, roots in apps.items():
+            pids = tree_pids(procs, roots)
+            if not pids:
+                continue
+            used = 0
+            for pid in pids:
+                p = procs[pid]
+                key = (pid, p['start'])
+                ticks[key] = p['ticks']
+                if key in self._ticks:
+                    used += max(0, p['ticks'] - self._ticks[key])
+                elif elapsed is not None and now - p['start'] / self.clk_tck <= elapsed:
+                    used += p['ticks']           # born during the interval
+            out[app] = {
+                'cpu_pct': (round(used / self.clk_tck / elapsed * 100, 1)
+                            if elapsed and elapsed > 0 else None),
+                'rss': sum(procs[pid]['rss_pages'] for pid in pids) * self.page_size,
+                'fds': sum(_count_fds(self.proc_root, pid) for pid in pids),
+                'threads': sum(procs[pid]['threads'] for pid in pids),
+                'procs': len(pids),
+            }
+        self._ticks, self._at = ticks, now
+        return out
+
+
+def top_consumers(rows: list, by: str = 'cpu', n: int = 10) -> list:
+    """
+    Rows of {'app', ..., 'cpu_pct'/'cpu_avg', 'rss'/'rss_max'} ranked by CPU or RSS,
+    largest first; rows without the metric sort last.
+    """
+    keys = ('cpu_avg', 'cpu_pct') if by == 'cpu' else ('rss_max', 'rss')
+
+    def _metric(r):
+        for k in keys:
+            if r.get(k) is not None:
+                return float(r[k])
+        return -1.0
+
+    return sorted(rows, key=lambda r: (-_metric(r), r['app']))[:n]
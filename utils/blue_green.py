@@ -0,0 +1,37 @@
+"""
+Naming and cleanup decisions for DeploymentCog's blue/green node rebuilds.
+
+A node deployment's pm2 process alternates between two names, `<uuid12>` and
+`<uuid12>-g`. A rebuild starts the new tree as the other name on a second port and
+moves nginx over only once it is healthy. What to undo depends on how far the
+cutover got:
+
+  before the nginx flip — delete the new process and release its port
+  after the flip        — also point nginx back at the live port first
+  committed             — keep the new process; drain and delete the old one
+
+The cutover only commits once the deployment row names the new process and port; a
+failed write is an ordinary failure, so the old process is never deleted while the row
+still points at it.
+
+The live process is never touched unless the cutover commits, so a failed rebuild
+leaves the site serving from where it was.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+
+def peer_name(pm2_name: str) -> str:
+    """The other colour of a blue/green pm2 pair: `<uuid12>` <-> `<uuid12>-g`."""
+    return pm2_name[:-2] if pm2_name.endswith('-g') else f"{pm2_name}-g"
+
+
+def cutover_cleanup(flipped: bool, committed: bool) -> list:
+    """
+    Steps after a cutover attempt, in order: 'restore_upstream', 'delete_next',
+    'release_next_port' on failure; 'confirm_next_port', 'drain_live', 'delete_live'
+    once committed.
+    """
+    if committed:
+        return ['confirm_next_port', 'drain_live', 'delete_live']
+    return (['restore_upstream'] if flipped else []) + ['delete_next', 'release_next_port']
@@ -1,13 +1,9 @@
 import asyncio
-import os
-import re
 import socket
 import logging
 
 logger = logging.getLogger('nydus')
 
-_PORT_RE = re.compile(r'proxy_pass\s+http://localhost:(\d+)', re.IGNORECASE)
-
 
 def redact_pat(text: str, pat: str) -> str:
     if not pat or not text:
@@ -15,29 +11,6 @@ def redact_pat(text: str, pat: str) -> str:
     return text.replace(pat, '***')
 
 
-def _scan_nginx_ports(nginx_dir: str) -> set[int]:
-    used: set[int] = set()
-    if not os.path.isdir(nginx_dir):
-        return used
-    for filename in os.listdir(nginx_dir):
-        path = os.path.join(nginx_dir, filename)
-        if not os.path.isfile(path):
-            continue
-        try:
-            with open(path, 'r', errors='replace') as f:
-                content = f.read()
-            for match in _PORT_RE.finditer(content):
-                used.add(int(match.group(1)))
-        except Exception as e:
-            logger.warning(f"Could not read nginx config {path}: {e}")
-    return used
-
-
-async def get_used_ports_from_nginx(nginx_dir: str) -> set[int]:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _scan_nginx_ports, nginx_dir)
-
-
 def assign_free_port(used_ports: set[int], min_port: int, max_port: int) -> int | None:
     for port in range(min_port, max_port + 1):
         if port not in used_ports:
@@ -0,0 +1,295 @@
+"""
+Priority deploy scheduler: which queued deploy/rebuild runs next, and when.
+
+Replaces a global semaphore + per-project locks. A job runs when a slot is free and
+no other job with the same `key` (project) is running. Among the eligible, the order is:
+
+  1. priority class   — manual deploy/rebuild > webhook rebuild > selftest
+  2. owner fairness   — round-robin between owners within a class, so one user's
+                        burst of webhooks can't starve everyone else
+  3. arrival order
+
+Positions and wait estimates are derived from the same ordering, so what the log
+stream and the API report is what the dispatcher will actually do.
+
+Jobs are persisted in the `deploy_jobs` table and claimed by worker processes;
+`claim_candidates_query`, `claim_order` and `stale_job_action` are the pure halves of
+that claim/reap cycle.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+PRIORITY_MANUAL   = 0
+PRIORITY_WEBHOOK  = 1
+PRIORITY_SELFTEST = 2
+PRIORITY_NAMES = {PRIORITY_MANUAL: 'manual', PRIORITY_WEBHOOK: 'webhook', PRIORITY_SELFTEST: 'selftest'}
+
+_DEFAULT_DURATION = 180.0  # seconds, until real runs have been timed
+_EWMA_ALPHA       = 0.3
+
+
+class JobCancelled(Exception):
+    """Raised to a queued job's waiter when it is cancelled or superseded."""
+
+
+def priority_for(triggered_by: str) -> int:
+    """Priority class from the run's trigger: 'webhook', 'selftest', or a person (manual)."""
+    if triggered_by == 'selftest':
+        return PRIORITY_SELFTEST
+    if triggered_by == 'webhook':
+        return PRIORITY_WEBHOOK
+    return PRIORITY_MANUAL
+
+
+def estimate_waits(running_remaining: list, slots: int, durations: list) -> list:
+    """
+    Seconds until each queued job (in dispatch order) should start.
+
+    Simulates the slots: each frees up after its running job's expected remaining
+    time, then takes the next queued job for that job's expected duration.
+    """
+    free_at = sorted(max(0.0, r) for r in running_remaining)[:max(slots, 1)]
+    free_at += [0.0] * (max(slots, 1) - len(free_at))
+    heapq.heapify(free_at)
+    waits = []
+    for d in durations:
+        start = heapq.heappop(free_at)
+        waits.append(start)
+        heapq.heappush(free_at, start + d)
+    return waits
+
+
+def claim_candidates_query(node: str | None, busy_projects, batch: int) -> tuple[str, tuple]:
+    """
+    (SQL, params) locking the queued rows a worker on `node` may claim next. Rows are
+    taken best priority class first, then by arrival (idx_claim: status, priority, id),
+    so a manual job behind any number of older webhook rows is in the batch. Projects
+    that already have a running job are excluded in SQL so they don't use up the batch.
+    `claim_order` then applies owner fairness within it.
+    """
+    busy = sorted({p for p in busy_projects if p})
+    sql = ("SELECT run_uuid, project_uuid, triggered_by, priority FROM deploy_jobs "
+           "WHERE status = 'queued' AND (node IS NULL OR node = %s) ")
+    if busy:
+        sql += f"AND project_uuid NOT IN ({', '.join(['%s'] * len(busy))}) "
+    sql += "ORDER BY priority ASC, id ASC LIMIT %s FOR UPDATE SKIP LOCKED"
+    return sql, (node, *busy, batch)
+
+
+def claim_order(candidates: list, running: list) -> list:
+    """
+    Order queued `deploy_jobs` rows for claiming: priority class, then owners with the
+    fewest running jobs, then arrival. Rows whose project already has a running job are
+    dropped (the table's unique running_project key would reject them anyway).
+    Both lists are rows with project_uuid/triggered_by/priority; `candidates` is in
+    arrival order.
+    """
+    busy = {r['project_uuid'] for r in running}
+    load = {}
+    for r in running:
+        load[r['triggered_by']] = load.get(r['triggered_by'], 0) + 1
+    eligible = [(i, c) for i, c in enumerate(candidates) if c['project_uuid'] not in busy]
+    eligible.sort(key=lambda ic: (ic[1]['priority'], load.get(ic[1]['triggered_by'], 0), ic[0]))
+    return [c for _, c in eligible]
+
+
+def stale_job_action(kind: str, attempts: int, max_attempts: int) -> str:
+    """
+    What to do with a running job whose worker stopped heartbeating: 'requeue' or 'fail'.
+
+    Rebuilds stage into a fresh release directory and only touch the live site at the
+    end, so re-running one from scratch is safe; they are retried up to max_attempts.
+    A deploy that died part-way has created DNS/cert/nginx state that the startup
+    reconciliation and the next deploy's reclaim clean up — it is failed, not retried.
+    """
+    if kind == 'rebuild' and attempts < max_attempts:
+        return 'requeue'
+    return 'fail'
+
+
+class DeployJob:
+    """One queued or running deploy/rebuild. `target` is the deployment a rebuild acts on."""
+
+    def __init__(self, run_id: str, kind: str, key: str, owner: str, priority: int,
+                 target: str | None = None):
+        self.run_id      = run_id
+        self.kind        = kind
+        self.key         = key
+        self.owner       = owner or 'unknown'
+        self.priority    = priority
+        self.target      = target
+        self.seq         = 0
+        self.enqueued_at = None
+        self.started_at  = None
+        self.cancelled   = False
+        # Cleared once a run reaches a step that must not be interrupted (e.g. the
+        # switch to a new release); supersede/cancel then leave it to finish.
+        self.cancellable = True
+        self.pids: set[int] = set()
+        self._granted: asyncio.Future | None = None
+
+    def describe(self) -> dict:
+        return {
+            'run_id': self.run_id, 'kind': self.kind, 'owner': self.owner,
+            'priority': PRIORITY_NAMES.get(self.priority, str(self.priority)),
+            'target': self.target,
+        }
+
+
+class DeployScheduler:
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self._waiting: list[DeployJob] = []
+        self._running: dict[str, DeployJob] = {}
+        self._owner_turn: dict[str, int] = {}
+        self._turns = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._durations: dict[str, float] = {}
+
+    # ---- bookkeeping ---------------------------------------------------------
+    def expected_duration(self, kind: str) -> float:
+        return self._durations.get(kind, _DEFAULT_DURATION)
+
+    def _record_duration(self, kind: str, seconds: float):
+        prev = self._durations.get(kind)
+        self._durations[kind] = seconds if prev is None else (
+            (1 - _EWMA_ALPHA) * prev + _EWMA_ALPHA * seconds
+        )
+
+    def get(self, run_id: str) -> DeployJob | None:
+        job = self._running.get(run_id)
+        if job:
+            return job
+        return next((j for j in self._waiting if j.run_id == run_id), None)
+
+    # ---- ordering ------------------------------------------------------------
+    def _ordered(self, respect_keys: bool) -> list[DeployJob]:
+        """Waiting jobs in the order they would be dispatched (simulated round-robin)."""
+        load = {}
+        for j in self._running.values():
+            load[j.owner] = load.get(j.owner, 0) + 1
+        turn = dict(self._owner_turn)
+        busy = {j.key for j in self._running.values()} if respect_keys else set()
+        pending = list(self._waiting)
+        order = []
+        sim_turn = itertools.count(max(turn.values(), default=0) + 1)
+        while pending:
+            eligible = [j for j in pending if j.key not in busy]
+            if not eligible:
+                break
+            best = min(eligible, key=lambda j: (j.priority, load.get(j.owner, 0),
+                                                turn.get(j.owner, 0), j.seq))
+            pending.remove(best)
+            order.append(best)
+            load[best.owner] = load.get(best.owner, 0) + 1
+            turn[best.owner] = next(sim_turn)
+            if respect_keys:
+                busy.add(best.key)
+        return order
+
+    def queue_order(self) -> list[DeployJob]:
+        return self._ordered(respect_keys=False)
+
+    # ---- lifecycle -----------------------------------------------------------
+    def submit(self, job: DeployJob) -> DeployJob:
+        job.seq = next(self._seq)
+        job.enqueued_at = time.monotonic()
+        job._granted = asyncio.get_running_loop().create_future()
+        self._waiting.append(job)
+        self._dispatch()
+        return job
+
+    async def acquire(self, job: DeployJob):
+        """Wait until `job` holds a slot. Raises JobCancelled if it is cancelled first."""
+        await asyncio.shield(job._granted)
+
+    def release(self, job: DeployJob):
+        """Give up a slot (or a queue place). Safe to call more than once."""
+        if job in self._waiting:
+            self._waiting.remove(job)
+        elif self._running.pop(job.run_id, None) is not None and not job.cancelled:
+            self._record_duration(job.kind, time.monotonic() - job.started_at)
+        self._dispatch()
+
+    def _dispatch(self):
+        while len(self._running) < self.slots:
+            order = self._ordered(respect_keys=True)
+            if not order:
+                return
+            job = order[0]
+            self._waiting.remove(job)
+            job.started_at = time.monotonic()
+            self._running[job.run_id] = job
+            self._owner_turn[job.owner] = next(self._turns)
+            if not job._granted.done():
+                job._granted.set_result(True)
+
+    def cancel(self, run_id: str) -> DeployJob | None:
+        """
+        Cancel a queued job (its waiter gets JobCancelled) or flag a running, still
+        cancellable one. Returns the job if anything was cancelled; the caller kills
+        a running job's `pids`.
+        """
+        job = self.get(run_id)
+        if not job or job.cancelled:
+            return None
+        if job in self._waiting:
+            job.cancelled = True
+            self._waiting.remove(job)
+            if not job._granted.done():
+                job._granted.set_exception(JobCancelled(run_id))
+                job._granted.exception()  # mark retrieved: nobody may be awaiting yet
+            self._dispatch()
+            return job
+        if job.cancellable:
+            job.cancelled = True
+            return job
+        return None
+
+    def supersede(self, target: str, kind: str = 'rebuild', keep: str | None = None) -> list[DeployJob]:
+        """Cancel every queued or cancellable running `kind` job acting on `target`,
+        except the run `keep` (the one doing the superseding)."""
+        victims = [j for j in list(self._waiting) + list(self._running.values())
+                   if j.target == target and j.kind == kind and j.run_id != keep]
+        return [j for j in (self.cancel(v.run_id) for v in victims) if j]
+
+    # ---- reporting -----------------------------------------------------------
+    def _eta_map(self) -> dict:
+        now = time.monotonic()
+        running_remaining = [self.expected_duration(j.kind) - (now - j.started_at)
+                             for j in self._running.values()]
+        order = self.queue_order()
+        waits = estimate_waits(running_remaining, self.slots,
+                               [self.expected_duration(j.kind) for j in order])
+        return {j.run_id: (i + 1, w) for i, (j, w) in enumerate(zip(order, waits))}
+
+    def position(self, run_id: str) -> dict | None:
+        """{'state', 'position', 'queued', 'eta_seconds'} for a run, or None if unknown."""
+        job = self.get(run_id)
+        if not job:
+            return None
+        if job.run_id in self._running:
+            return {'state': 'running', 'position': 0, 'queued': len(self._waiting),
+                    'eta_seconds': 0, **job.describe()}
+        pos, wait = self._eta_map().get(run_id, (len(self._waiting), None))
+        return {'state': 'queued', 'position': pos, 'queued': len(self._waiting),
+                'eta_seconds': round(wait) if wait is not None else None, **job.describe()}
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        etas = self._eta_map()
+        return {
+            'slots': self.slots,
+            'running': [{**j.describe(), 'elapsed_seconds': round(now - j.started_at),
+                         'cancellable': j.cancellable} for j in self._running.values()],
+            'queued': [{**j.describe(), 'position': etas[j.run_id][0],
+                        'eta_seconds': round(etas[j.run_id][1]),
+                        'waiting_seconds': round(now - j.enqueued_at)}
+                       for j in self.queue_order()],
+            'expected_duration_seconds': {k: round(v) for k, v in self._durations.items()},
+        }
@@ -0,0 +1,80 @@
+"""
+Deploy pipeline as a stage graph.
+
+A deploy is a list of named stages, each declaring the stages it `needs`. `run_stages`
+starts every stage as soon as everything it needs has finished, so independent
+chains — Cloudflare record → propagation wait → certbot, and install → build — run
+side by side and the deploy takes as long as its longest chain, not the sum.
+
+The first stage to fail cancels every stage still running (their subprocesses are
+killed by run_exec_stream) and its exception is re-raised unchanged, so the caller's
+DeployError handling and cleanup work exactly as they did for the sequential pipeline.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import asyncio
+import time
+
+
+class Stage:
+    def __init__(self, name: str, fn, needs: tuple = ()):
+        self.name = name
+        self.fn = fn            # async callable, no arguments
+        self.needs = tuple(needs)
+
+
+def stage_order(stages: list) -> list:
+    """
+    Names in an order that respects `needs` (declaration order among ready stages).
+    Raises ValueError on duplicate names, unknown dependencies or a cycle.
+    """
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate stage name.")
+    known = set(names)
+    for s in stages:
+        missing = [n for n in s.needs if n not in known]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' needs unknown stage(s): {', '.join(missing)}")
+    order, done = [], set()
+    while len(order) < len(stages):
+        ready = [s for s in stages if s.name not in done and all(n in done for n in s.needs)]
+        if not ready:
+            stuck = [s.name for s in stages if s.name not in done]
+            raise ValueError(f"Stage dependency cycle among: {', '.join(stuck)}")
+        for s in ready:
+            order.append(s.name)
+            done.add(s.name)
+    return order
+
+
+async def run_stages(stages: list) -> dict:
+    """Run the graph to completion. Returns {stage name: seconds it ran}."""
+    stage_order(stages)
+    durations: dict[str, float] = {}
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def _run(stage: Stage):
+        if stage.needs:
+            await asyncio.gather(*(tasks[n] for n in stage.needs))
+        started = time.monotonic()
+        await stage.fn()
+        durations[stage.name] = time.monotonic() - started
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(_run(stage))
+
+    pending = set(tasks.values())
+    try:
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+            failed = [t for t in finished if not t.cancelled() and t.exception()]
+            if failed:
+                # A stage that depended on the failed one re-raises the same exception.
+                raise failed[0].exception()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return durations
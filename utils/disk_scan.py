@@ -0,0 +1,152 @@
+"""
+Incremental disk-usage accounting for the trees that fill this box.
+
+`DiskScanner.scan` measures a set of named directory targets (each site root under
+/var/www, pm2 logs, nginx logs, backups) and remembers, per directory, its mtime, the
+sizes of its files and its subdirectories. A directory's mtime only changes when an
+entry is added, removed or renamed, so on the next pass an unchanged directory isn't
+listed again: a release's node_modules costs one lstat per directory instead of one
+per file. Targets whose files grow in place (logs, dumps) are marked `restat`, which
+re-stats their known files without re-listing; every `full_every` passes the cache is
+ignored once to pick up in-place rewrites everywhere else.
+
+Sizes are apparent bytes of files and symlinks (like `du -sb`); symlinks aren't
+followed. `usage_report` turns stored samples into top consumers and growth rates.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import os
+import stat
+
+
+class DiskScanner:
+    def __init__(self, full_every: int = 24):
+        self.full_every = full_every
+        self.passes = 0
+        self.dirs_listed = 0            # directories read with scandir on the last pass
+        # path → (mtime_ns, {file name: bytes}, (subdir names...))
+        self._dirs: dict[str, tuple] = {}
+
+    def scan(self, targets: dict) -> dict:
+        """
+        {name: (path, restat)} → {name: {'path', 'bytes', 'files'}} for the targets that
+        exist. Cache entries for directories no target reached this pass are dropped.
+        """
+        full = self.full_every > 0 and self.passes % self.full_every == 0
+        self.passes += 1
+        self.dirs_listed = 0
+        seen: set[str] = set()
+        out = {}
+        for name, (path, restat) in targets.items():
+            if not os.path.isdir(path):
+                continue
+            total, files = self._walk(path, restat, full, seen)
+            out[name] = {'path': path, 'bytes': total, 'files': files}
+        for path in self._dirs.keys() - seen:
+            del self._dirs[path]
+        return out
+
+    def _walk(self, root: str, restat: bool, full: bool, seen: set) -> tuple[int, int]:
+        total = count = 0
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            try:
+                mtime = os.lstat(path).st_mtime_ns
+            except OSError:
+                continue
+            seen.add(path)
+            known = self._dirs.get(path)
+            if known and known[0] == mtime and not full:
+                sizes, subdirs = known[1], known[2]
+                if restat:
+                    sizes = {}
+                    for fn, size in known[1].items():
+                        try:
+                            sizes[fn] = os.lstat(os.path.join(path, fn)).st_size
+                        except OSError:
+                            pass
+                    self._dirs[path] = (mtime, sizes, subdirs)
+            else:
+                sizes, subdirs = {}, []
+                try:
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            try:
+                                st = entry.stat(follow_symlinks=False)
+                            except OSError:
+                                continue
+                            if stat.S_ISDIR(st.st_mode):
+                                subdirs.append(entry.name)
+                            else:
+                                sizes[entry.name] = st.st_size
+                except OSError:
+                    continue
+                subdirs = tuple(subdirs)
+                self._dirs[path] = (mtime, sizes, subdirs)
+                self.dirs_listed += 1
+            total += sum(sizes.values())
+            count += len(sizes)
+            stack.extend(os.path.join(path, d) for d in subdirs)
+        return total, count
+
+
+def growth_per_hour(samples: list) -> float | None:
+    """Least-squares bytes/hour over [(epoch seconds, bytes), ...]; None under two samples."""
+    if len(samples) < 2:
+        return None
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_b = sum(b for _, b in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return None
+    cov = sum((t - mean_t) * (b - mean_b) for t, b in samples)
+    return cov / var * 3600
+
+
+def usage_report(rows: list, top: int = 10) -> dict:
+    """
+    Rows of {'target', 'path', 'bytes', 'ts'} (ts: epoch seconds, any order) →
+    {'top': largest targets now, 'growing': fastest-growing targets}, each entry
+    {'target', 'path', 'bytes', 'growth_per_hour'}.
+    """
+    series: dict[str, list] = {}
+    for r in rows:
+        series.setdefault(r['target'], []).append(r)
+    entries = []
+    for target, samples in series.items():
+        samples.sort(key=lambda r: r['ts'])
+        rate = growth_per_hour([(r['ts'], r['bytes']) for r in samples])
+        entries.append({
+            'target': target,
+            'path': samples[-1]['path'],
+            'bytes': samples[-1]['bytes'],
+            'growth_per_hour': None if rate is None else round(rate),
+        })
+    largest = sorted(entries, key=lambda e: (-e['bytes'], e['target']))[:top]
+    growing = sorted(
+        (e for e in entries if e['growth_per_hour'] and e['growth_per_hour'] > 0),
+        key=lambda e: (-e['growth_per_hour'], e['target']),
+    )[:top]
+    return {'top': largest, 'growing': growing}
+
+
+def culprit_summary(report: dict, n: int = 3) -> str:
+    """One line naming what fills the disk: the largest targets, then the fastest growers."""
+    def _mb(b):
+        return f"{b / 1024 / 1024:,.0f} MB"
+    parts = []
+    for e in report.get('top', [])[:n]:
+        rate = e.get('growth_per_hour')
+        parts.append(f"{e['target']} {_mb(e['bytes'])}" + (f" (+{_mb(rate)}/h)" if rate and rate > 0 else ""))
+    named = {e['target'] for e in report.get('top', [])[:n]}
+    growing = [f"{e['target']} +{_mb(e['growth_per_hour'])}/h"
+               for e in report.get('growing', []) if e['target'] not in named][:n]
+    line = "Largest: " + ", ".join(parts) if parts else ""
+    if growing:
+        line += ("; " if line else "") + "growing: " + ", ".join(growing)
+    return line
@@ -0,0 +1,86 @@
+"""
+Pure helpers for the per-repository git mirror cache and remote ref resolution.
+
+Each repository gets one bare mirror under GIT_MIRROR_DIR, fetched incrementally and
+used as the object source for deploy clones. Its directory name is derived from the
+credential-free URL, so a rotated PAT still maps to the same mirror. The mirror is
+shared by every project on that repository, so its stored remote stays credential-free
+and each fetch authenticates with its own caller's PAT (`credential_env`).
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import base64
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+_SLUG_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def strip_credentials(url: str) -> str:
+    """`https://<pat>@github.com/o/r.git` → `https://github.com/o/r.git`; other URLs unchanged."""
+    if not url or '://' not in url:
+        return url
+    parts = urlsplit(url)
+    if '@' not in parts.netloc:
+        return url
+    return urlunsplit(parts._replace(netloc=parts.netloc.rsplit('@', 1)[1]))
+
+
+def credential_env(url: str, pat: str = "") -> dict:
+    """
+    Environment for one git command against `url`, authenticated with `pat` (or the
+    credentials embedded in `url`) as an HTTP Authorization header. It is set through
+    GIT_CONFIG_COUNT/KEY/VALUE (git >= 2.31), so the secret is in neither argv nor any
+    config file. Non-https URLs and no credentials get only GIT_TERMINAL_PROMPT=0.
+    """
+    env = {'GIT_TERMINAL_PROMPT': '0'}
+    if not url or not url.startswith('https://'):
+        return env
+    if not pat:
+        netloc = urlsplit(url).netloc
+        pat = netloc.rsplit('@', 1)[0] if '@' in netloc else ''
+    if not pat:
+        return env
+    user, _, password = pat.partition(':')
+    token = base64.b64encode(f"{user}:{password}".encode()).decode()
+    env.update({'GIT_CONFIG_COUNT': '1', 'GIT_CONFIG_KEY_0': 'http.extraHeader',
+                'GIT_CONFIG_VALUE_0': f"Authorization: Basic {token}"})
+    return env
+
+
+def mirror_dir_name(url: str) -> str:
+    """Stable, filesystem-safe mirror directory name: readable slug + short hash of the URL."""
+    clean = strip_credentials(url or '').rstrip('/')
+    if clean.endswith('.git'):
+        clean = clean[:-4]
+    tail = clean.split('://', 1)[-1]
+    slug = _SLUG_RE.sub('_', tail).strip('_')[-80:] or 'repo'
+    digest = hashlib.sha256(clean.encode()).hexdigest()[:10]
+    return f"{slug}-{digest}.git"
+
+
+def parse_ls_remote(out: str) -> tuple[str | None, dict]:
+    """
+    Parse `git ls-remote --symref <url> HEAD refs/heads/*` output.
+
+    Returns (default_branch, {branch: sha}). default_branch comes from the
+    `ref: refs/heads/<name>\\tHEAD` symref line and is None when the remote
+    doesn't advertise one.
+    """
+    default = None
+    heads: dict[str, str] = {}
+    for line in (out or '').splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('ref:'):
+            target, _, name = line[4:].strip().partition('\t')
+            if name.strip() == 'HEAD' and target.startswith('refs/heads/'):
+                default = target[len('refs/heads/'):] or None
+            continue
+        sha, _, ref = line.partition('\t')
+        if ref.startswith('refs/heads/'):
+            heads[ref[len('refs/heads/'):]] = sha.strip()
+    return default, heads
@@ -0,0 +1,198 @@
+"""
+Host metrics beyond CPU/RAM/disk percentages, read straight from /proc.
+
+`HostSampler.sample` turns the kernel's cumulative counters into rates between two
+calls: per-device disk bytes and IOPS (/proc/diskstats), per-interface network bytes
+(/proc/net/dev) and per-core utilisation (/proc/stat). It adds the load averages and
+pressure-stall information (/proc/pressure/{cpu,memory,io}, avg10 — the share of the
+last 10 s in which some/all runnable tasks were stalled on that resource). Rates are
+None on the first call. Kernels without PSI simply report no pressure values.
+
+`alert_values` condenses a sample into the scalars MonitoringCog thresholds on.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import json
+import os
+import time
+
+_SECTOR = 512                                   # /proc/diskstats sectors are always 512 B
+_SKIP_DISKS = ('loop', 'ram', 'zram', 'sr', 'fd')
+
+
+def parse_diskstats(text: str) -> dict:
+    """{device: (reads, sectors read, writes, sectors written)} for whole disks."""
+    out = {}
+    for line in text.splitlines():
+        f = line.split()
+        if len(f) < 10 or f[2].startswith(_SKIP_DISKS):
+            continue
+        out[f[2]] = (int(f[3]), int(f[5]), int(f[7]), int(f[9]))
+    # Partitions (sda1, nvme0n1p1) would double-count their disk.
+    return {n: v for n, v in out.items() if not _is_partition(n, out)}
+
+
+def _is_partition(name: str, names) -> bool:
+    base = name.rstrip('0123456789')
+    if base != name and base in names:               # sda1 → sda
+        return True
+    if base.endswith('p') and base[:-1] in names:    # nvme0n1p1 → nvme0n1
+        return True
+    return False
+
+
+def parse_net_dev(text: str) -> dict:
+    """{interface: (rx bytes, tx bytes)} from /proc/net/dev, loopback excluded."""
+    out = {}
+    for line in text.splitlines()[2:]:
+        name, _, rest = line.partition(':')
+        name = name.strip()
+        f = rest.split()
+        if name == 'lo' or len(f) < 9:
+            continue
+        out[name] = (int(f[0]), int(f[8]))
+    return out
+
+
+def parse_cpu_times(text: str) -> dict:
+    """{'cpu0': (busy jiffies, total jiffies), ...} per core from /proc/stat."""
+    out = {}
+    for line in text.splitlines():
+        if not line.startswith('cpu') or line.startswith('cpu '):
+            continue
+        f = line.split()
+        values = [int(v) for v in f[1:]]
+        # user nice system idle iowait irq softirq steal [guest guest_nice] — guest time
+        # is already counted in user/nice.
+        total = sum(values[:8])
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        out[f[0]] = (total - idle, total)
+    return out
+
+
+def parse_pressure(text: str) -> dict:
+    """{'some': avg10, 'full': avg10} from one /proc/pressure/* file."""
+    out = {}
+    for line in text.splitlines():
+        kind, _, rest = line.partition(' ')
+        for item in rest.split():
+            key, _, value = item.partition('=')
+            if key == 'avg10':
+                out[kind] = float(value)
+    return out
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _rate(now, before, elapsed):
+    return None if before is None or not elapsed else max(0, now - before) / elapsed
+
+
+class HostSampler:
+    def __init__(self, proc_root: str = '/proc'):
+        self.proc_root = proc_root
+        self._prev: dict | None = None
+        self._at: float | None = None
+
+    def _counters(self) -> dict:
+        p = self.proc_root
+        return {
+            'disk': parse_diskstats(_read(os.path.join(p, 'diskstats'))),
+            'net': parse_net_dev(_read(os.path.join(p, 'net', 'dev'))),
+            'cpu': parse_cpu_times(_read(os.path.join(p, 'stat'))),
+        }
+
+    def sample(self, now: float | None = None) -> dict:
+        """
+        {'load': (1m, 5m, 15m), 'cores': [percent per core], 'disks': {dev: {'read_bps',
+        'write_bps', 'read_iops', 'write_iops'}}, 'net': {iface: {'rx_bps', 'tx_bps'}},
+        'psi': {'cpu_some', 'memory_some', 'memory_full', 'io_some', 'io_full'}}.
+        """
+        now = time.monotonic() if now is None else now
+        cur = self._counters()
+        prev = self._prev or {'disk': {}, 'net': {}, 'cpu': {}}
+        elapsed = None if self._at is None else now - self._at
+
+        disks = {}
+        for dev, (r, rs, w, ws) in cur['disk'].items():
+            b = prev['disk'].get(dev)
+            disks[dev] = {
+                'read_bps': _rate(rs * _SECTOR, b and b[1] * _SECTOR, elapsed),
+                'write_bps': _rate(ws * _SECTOR, b and b[3] * _SECTOR, elapsed),
+                'read_iops': _rate(r, b and b[0], elapsed),
+                'write_iops': _rate(w, b and b[2], elapsed),
+            }
+        net = {}
+        for iface, (rx, tx) in cur['net'].items():
+            b = prev['net'].get(iface)
+            net[iface] = {'rx_bps': _rate(rx, b and b[0], elapsed),
+                          'tx_bps': _rate(tx, b and b[1], elapsed)}
+        cores = []
+        for name in sorted(cur['cpu'], key=lambda n: int(n[3:])):
+            busy, total = cur['cpu'][name]
+            b = prev['cpu'].get(name)
+            dt = total - b[1] if b else 0
+            cores.append(round(100.0 * (busy - b[0]) / dt, 1) if b and dt > 0 else None)
+
+        psi = {}
+        for resource in ('cpu', 'memory', 'io'):
+            for kind, value in parse_pressure(
+                _read(os.path.join(self.proc_root, 'pressure', resource))
+            ).items():
+                psi[f"{resource}_{kind}"] = value
+        try:
+            load = tuple(round(v, 2) for v in os.getloadavg())
+        except (AttributeError, OSError):
+            load = None
+
+        self._prev, self._at = cur, now
+        return {'load': load, 'cores': cores, 'disks': disks, 'net': net, 'psi': psi}
+
+
+def alert_values(sample: dict) -> dict:
+    """
+    Scalars for threshold alerts: load per core (1m), busiest core %, PSI avg10 for
+    cpu/memory/io ("some"), and the busiest disk and interface in MB/s (read+write,
+    rx+tx). Keys are left out when the value isn't known yet.
+    """
+    out = {}
+    cores = [c for c in sample.get('cores') or [] if c is not None]
+    if sample.get('load') and sample.get('cores'):
+        out['load_per_core'] = sample['load'][0] / len(sample['cores'])
+    if cores:
+        out['core_max'] = max(cores)
+    for resource in ('cpu', 'memory', 'io'):
+        if f"{resource}_some" in sample.get('psi', {}):
+            out[f"psi_{resource}"] = sample['psi'][f"{resource}_some"]
+    disk = [(d['read_bps'] or 0) + (d['write_bps'] or 0)
+            for d in sample.get('disks', {}).values() if d['read_bps'] is not None]
+    if disk:
+        out['disk_mbps'] = max(disk) / 1024 / 1024
+    net = [(n['rx_bps'] or 0) + (n['tx_bps'] or 0)
+           for n in sample.get('net', {}).values() if n['rx_bps'] is not None]
+    if net:
+        out['net_mbps'] = max(net) / 1024 / 1024
+    return out
+
+
+def system_columns(sample: dict) -> dict:
+    """The system_stats columns a sample fills: load averages, per-core CPU, PSI avg10."""
+    load = sample.get('load') or (None, None, None)
+    cores = sample.get('cores') or []
+    known = [c for c in cores if c is not None]
+    psi = sample.get('psi', {})
+    return {
+        'load_1m': load[0], 'load_5m': load[1], 'load_15m': load[2],
+        'core_max': max(known) if known else None,
+        'cpu_cores': json.dumps(cores) if known else None,
+        'psi_cpu_some': psi.get('cpu_some'),
+        'psi_memory_some': psi.get('memory_some'), 'psi_memory_full': psi.get('memory_full'),
+        'psi_io_some': psi.get('io_some'), 'psi_io_full': psi.get('io_full'),
+    }
@@ -0,0 +1,89 @@
+"""
+Request shaping and timing breakdown for DeploymentCog's shared HTTP probe client.
+
+A probe runs in one of two modes:
+  origin — `https://<origin>/<health path>` with `Host: <fqdn>` and no certificate
+           check: this node's nginx → app, independent of Cloudflare, DNS propagation
+           and cert trust. Redirects are not followed, since following one would leave
+           the origin. The origin is 127.0.0.1, or the owning node's IP for a
+           deployment placed on another node.
+  edge   — `https://<fqdn>/<health path>` through the public hostname (Cloudflare,
+           DNS, a verified certificate), following redirects: what a visitor sees.
+A managed service with an explicit health_url is probed at exactly that URL.
+
+The client's aiohttp trace hooks record monotonic timestamps per request phase;
+`phase_timings` turns them into durations. aiohttp reports connection setup as one
+span, so `connect_ms` covers TCP plus the TLS handshake. It is None when a pooled
+keep-alive connection was reused.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+MODES = ('origin', 'edge')
+
+_MAX_PATH = 255
+
+
+def parse_health_path(path) -> str:
+    """A deployment's health path, validated; '/' for None/''. Raises ValueError."""
+    if path is None or path == '':
+        return '/'
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError("health path must start with '/'")
+    if len(path) > _MAX_PATH:
+        raise ValueError(f"health path must be at most {_MAX_PATH} characters")
+    if any(c.isspace() or ord(c) < 32 for c in path) or '#' in path:
+        raise ValueError("health path must not contain whitespace, control characters or '#'")
+    return path
+
+
+def parse_mode(mode, default: str = 'origin') -> str:
+    """'origin' or 'edge'; `default` for None/''. Raises ValueError."""
+    if mode is None or mode == '':
+        return default
+    if mode not in MODES:
+        raise ValueError("health mode must be 'origin' or 'edge'")
+    return mode
+
+
+def probe_target(fqdn: str | None = None, path: str = '/', mode: str = 'origin',
+                 url: str | None = None, origin: str = '127.0.0.1') -> dict:
+    """
+    {'url', 'headers', 'ssl', 'follow', 'mode'} for one probe. `ssl` is the aiohttp
+    per-request value (False: don't verify), `follow` whether to follow redirects.
+    """
+    if url:
+        return {'url': url, 'headers': {}, 'ssl': True, 'follow': True, 'mode': 'url'}
+    path = path or '/'
+    if mode == 'edge':
+        return {'url': f"https://{fqdn}{path}", 'headers': {}, 'ssl': True, 'follow': True,
+                'mode': 'edge'}
+    return {'url': f"https://{origin}{path}", 'headers': {'Host': fqdn}, 'ssl': False,
+            'follow': False, 'mode': 'origin'}
+
+
+def status_ok(code: int | None) -> bool:
+    """A health probe passes on 2xx/3xx: a redirect (e.g. to a login page) is the app answering."""
+    return code is not None and 200 <= code < 400
+
+
+def _ms(marks: dict, start: str, end: str) -> float | None:
+    if start not in marks or end not in marks:
+        return None
+    return round(max(0.0, marks[end] - marks[start]) * 1000, 1)
+
+
+def phase_timings(marks: dict) -> dict:
+    """
+    {'dns_ms', 'connect_ms', 'ttfb_ms', 'total_ms', 'reused'} from trace marks
+    (monotonic seconds keyed by aiohttp trace event: request_start, dns_resolvehost_*,
+    connection_create_*, connection_reuseconn, request_headers_sent, request_end, done).
+    ttfb is from the request being sent to the response headers arriving.
+    """
+    return {
+        'dns_ms': _ms(marks, 'dns_resolvehost_start', 'dns_resolvehost_end'),
+        'connect_ms': _ms(marks, 'connection_create_start', 'connection_create_end'),
+        'ttfb_ms': _ms(marks, 'request_headers_sent', 'request_end'),
+        'total_ms': _ms(marks, 'request_start', 'done'),
+        'reused': 'connection_reuseconn' in marks,
+    }
@@ -0,0 +1,229 @@
+"""
+Coalesced nginx config changes: one `nginx -t` and one reload per batch.
+
+Callers hand the controller file operations — write a site config, point a
+sites-enabled link, remove either — instead of editing files and running
+`nginx -t` + `systemctl reload nginx` themselves. Requests arriving within `window`
+seconds are applied together, validated once and reloaded once, so N concurrent
+deploys cost one config re-read instead of N.
+
+Operations already in effect (byte-identical content, same link target, nothing to
+remove) are skipped, and a batch that changes nothing on disk doesn't test or reload
+at all. When a batch fails the test, every change is rolled back and re-applied one
+at a time, each tested on its own, so one bad config only fails its own caller;
+every caller is told whether its change made it in.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import asyncio
+import contextvars
+import os
+
+
+def write_op(path: str, content: str) -> tuple:
+    return ('write', path, content.encode())
+
+
+def link_op(link: str, target: str) -> tuple:
+    return ('link', link, target)
+
+
+def remove_op(path: str) -> tuple:
+    return ('remove', path)
+
+
+def _state(path: str):
+    """('link', target) | ('file', bytes) | None for whatever is at `path` now."""
+    if os.path.islink(path):
+        return ('link', os.readlink(path))
+    if os.path.isfile(path):
+        with open(path, 'rb') as f:
+            return ('file', f.read())
+    return None
+
+
+def _set_state(path: str, state):
+    """Put `state` at `path` atomically (sibling temp + os.replace) or remove it."""
+    if state is None:
+        if os.path.islink(path) or os.path.exists(path):
+            os.remove(path)
+        return
+    tmp = f"{path}.nydus-tmp"
+    if os.path.islink(tmp) or os.path.exists(tmp):
+        os.remove(tmp)
+    if state[0] == 'link':
+        os.symlink(state[1], tmp)
+    else:
+        with open(tmp, 'wb') as f:
+            f.write(state[1])
+    os.replace(tmp, path)
+
+
+def apply_ops(ops: list) -> list:
+    """
+    Apply file ops, skipping any already in effect. Returns the undo list
+    [(path, previous state)] — empty when nothing changed. A failure part-way is
+    rolled back before the OSError propagates.
+    """
+    undo = []
+    try:
+        for op in ops:
+            kind, path = op[0], op[1]
+            after = None if kind == 'remove' else ('link' if kind == 'link' else 'file', op[2])
+            before = _state(path)
+            if before == after:
+                continue
+            undo.append((path, before))
+            _set_state(path, after)
+    except OSError:
+        revert_ops(undo)
+        raise
+    return undo
+
+
+def revert_ops(undo: list):
+    for path, before in reversed(undo):
+        try:
+            _set_state(path, before)
+        except OSError:
+            pass
+
+
+class _Request:
+    def __init__(self, mode: str, ops: list, future: asyncio.Future):
+        self.mode = mode        # 'apply' | 'reload' | 'test'
+        self.ops = ops
+        self.future = future
+
+
+class NginxController:
+    """
+    `run(cmd)` executes a command and returns (code, stdout, stderr); `on_change` is
+    called after the batch touched files on disk (e.g. to invalidate a site index).
+    """
+
+    TEST_CMD   = ['sudo', 'nginx', '-t']
+    RELOAD_CMD = ['sudo', 'systemctl', 'reload', 'nginx']
+
+    def __init__(self, run, window: float = 0.5, on_change=None):
+        self._run = run
+        self.window = window
+        self._on_change = on_change
+        self._pending: list[_Request] = []
+        self._flusher: asyncio.Task | None = None
+        self.batches = 0
+
+    # ---- public API ------------------------------------------------------------
+    async def apply(self, ops: list) -> tuple[bool, str]:
+        """Apply `ops` in the next batch. (True, nginx -t output) once live — or
+        unchanged — (False, reason) if it was rolled back."""
+        return await self._submit('apply', list(ops))
+
+    async def reload(self) -> tuple[bool, str]:
+        """Test and reload even if no batched change needs it (e.g. renewed certs)."""
+        return await self._submit('reload', [])
+
+    async def test(self) -> tuple[bool, str]:
+        """`nginx -t` on the current config, shared with any batch in flight."""
+        return await self._submit('test', [])
+
+    # ---- batching ----------------------------------------------------------------
+    async def _submit(self, mode: str, ops: list) -> tuple[bool, str]:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append(_Request(mode, ops, fut))
+        if self._flusher is None or self._flusher.done():
+            # Fresh context: the batch is shared, so it mustn't inherit the first
+            # caller's context variables (e.g. which deploy run owns spawned pids).
+            self._flusher = asyncio.create_task(self._flush(), context=contextvars.Context())
+        # Shielded: a caller that gives up mustn't cancel the batch's bookkeeping.
+        return await asyncio.shield(fut)
+
+    async def _flush(self):
+        while self._pending:
+            await asyncio.sleep(self.window)
+            batch, self._pending = self._pending, []
+            try:
+                results = await self._run_batch(batch)
+            except Exception as e:
+                results = [(False, f"nginx batch failed: {e}")] * len(batch)
+            self.batches += 1
+            for req, result in zip(batch, results):
+                if not req.future.done():
+                    req.future.set_result(result)
+
+    async def _test(self) -> tuple[bool, str]:
+        code, out, err = await self._run(self.TEST_CMD)
+        return code == 0, (out + err).strip()
+
+    async def _apply(self, ops: list):
+        return await asyncio.get_running_loop().run_in_executor(None, apply_ops, ops)
+
+    async def _revert(self, undo: list):
+        await asyncio.get_running_loop().run_in_executor(None, revert_ops, undo)
+
+    async def _run_batch(self, batch: list) -> list:
+        results: list = [None] * len(batch)
+        changed: dict[int, list] = {}
+        for i, req in enumerate(batch):
+            if req.mode != 'apply':
+                continue
+            try:
+                undo = await self._apply(req.ops)
+            except OSError as e:
+                results[i] = (False, f"could not write nginx config: {e}")
+                continue
+            if undo:
+                changed[i] = undo
+            else:
+                results[i] = (True, 'unchanged')
+
+        forced = [i for i, req in enumerate(batch) if req.mode in ('reload', 'test')]
+        wants_reload = bool(changed) or any(batch[i].mode == 'reload' for i in forced)
+        touched = bool(changed)
+        try:
+            if not changed and not forced:
+                return results
+            ok, output = await self._test()
+            if not ok and changed:
+                # Someone's change broke the config: roll all back, then keep only the
+                # changes that pass on their own.
+                for undo in reversed(list(changed.values())):
+                    await self._revert(undo)
+                kept = {}
+                if len(changed) > 1:
+                    for i in changed:
+                        try:
+                            undo = await self._apply(batch[i].ops)
+                        except OSError as e:
+                            results[i] = (False, f"could not write nginx config: {e}")
+                            continue
+                        one_ok, one_out = await self._test()
+                        if one_ok:
+                            kept[i] = undo
+                            ok, output = one_ok, one_out
+                        else:
+                            await self._revert(undo)
+                            results[i] = (False, one_out)
+                else:
+                    i = next(iter(changed))
+                    results[i] = (False, output)
+                changed = kept
+                if not kept and forced:
+                    ok, output = await self._test()
+                wants_reload = bool(changed) or any(batch[i].mode == 'reload' for i in forced)
+
+            if ok and wants_reload:
+                code, _, err = await self._run(self.RELOAD_CMD)
+                if code != 0:
+                    for undo in reversed(list(changed.values())):
+                        await self._revert(undo)
+                    ok, output = False, f"nginx reload failed: {err.strip()}"
+            for i in changed:
+                results[i] = (ok, output)
+            for i in forced:
+                results[i] = (ok, output)
+            return results
+        finally:
+            if touched and self._on_change:
+                self._on_change()
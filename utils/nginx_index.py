@@ -0,0 +1,130 @@
+"""
+In-memory index of nginx site configs (sites-available + enabled state).
+
+Every config is parsed once per change — server_name, proxy_pass ports, root — and
+fqdn→port, port→site and enabled-set queries are answered from memory. Changes are
+picked up by a stat-only walk (mtime + size per file, no reads) that runs at most once
+per `ttl`, or on the next query after `invalidate()`; only files whose stat changed are
+re-read. Nydus calls `invalidate()` after writing a config itself, so its own edits
+show up immediately, and edits made by hand or by certbot within `ttl`.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import os
+import re
+import time
+
+_SERVER_NAME_RE = re.compile(r'server_name\s+([^;]+);')
+_PORT_RE        = re.compile(r'proxy_pass\s+http://localhost:(\d+)', re.IGNORECASE)
+_ROOT_RE        = re.compile(r'\broot\s+([^;]+);')
+
+
+def parse_site(content: str) -> dict:
+    """server_names / upstream ports / roots declared in one nginx site config."""
+    return {
+        'server_names': [s.strip() for nm in _SERVER_NAME_RE.findall(content) for s in nm.split()],
+        'ports': [int(p) for p in _PORT_RE.findall(content)],
+        'roots': [r.strip() for r in _ROOT_RE.findall(content)],
+    }
+
+
+class NginxSiteIndex:
+    def __init__(self, available_dir: str, enabled_dir: str, ttl: float = 10.0):
+        self.available_dir = available_dir
+        self.enabled_dir = enabled_dir
+        self.ttl = ttl
+        # filename → {'server_names', 'ports', 'roots', '_stat'}
+        self._sites: dict[str, dict] = {}
+        self._enabled: set[str] = set()
+        self._by_name: dict[str, str] = {}
+        self._by_port: dict[int, str] = {}
+        self._checked_at: float | None = None
+        self._stale = True
+
+    def invalidate(self):
+        """Force a stat walk on the next query (call after writing a config)."""
+        self._stale = True
+
+    def due(self, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self._stale or self._checked_at is None or now - self._checked_at >= self.ttl
+
+    def refresh(self, now: float | None = None) -> bool:
+        """Stat-walk both directories, re-parsing only changed files. True if anything changed."""
+        sites: dict[str, dict] = {}
+        changed = False
+        try:
+            entries = list(os.scandir(self.available_dir))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            known = self._sites.get(entry.name)
+            if known and known['_stat'] == key:
+                sites[entry.name] = known
+                continue
+            try:
+                with open(entry.path, 'r', errors='replace') as f:
+                    site = parse_site(f.read())
+            except OSError:
+                continue
+            site['_stat'] = key
+            sites[entry.name] = site
+            changed = True
+        if sites.keys() != self._sites.keys():
+            changed = True
+
+        try:
+            enabled = {e.name for e in os.scandir(self.enabled_dir) if e.is_symlink()}
+        except OSError:
+            enabled = set()
+        changed = changed or enabled != self._enabled
+
+        if changed:
+            by_name, by_port = {}, {}
+            for fn, site in sorted(sites.items()):
+                for name in site['server_names']:
+                    by_name.setdefault(name, fn)
+                for port in site['ports']:
+                    by_port.setdefault(port, fn)
+            self._sites, self._enabled = sites, enabled
+            self._by_name, self._by_port = by_name, by_port
+        self._checked_at = time.monotonic() if now is None else now
+        self._stale = False
+        return changed
+
+    # ---- queries (memory only) ----------------------------------------------
+    def site_for(self, fqdn: str) -> str | None:
+        """Config filename serving `fqdn`: the file named after it, else by server_name."""
+        if fqdn in self._sites:
+            return fqdn
+        return self._by_name.get(fqdn)
+
+    def port_for(self, fqdn: str) -> int | None:
+        fn = self.site_for(fqdn)
+        ports = self._sites[fn]['ports'] if fn else []
+        return ports[0] if ports else None
+
+    def site_for_port(self, port: int) -> str | None:
+        return self._by_port.get(port)
+
+    def used_ports(self) -> set[int]:
+        return set(self._by_port)
+
+    def enabled_sites(self) -> set[str]:
+        return set(self._enabled)
+
+    def sites(self) -> list[dict]:
+        """Every site, in the shape /api/server/discover reports."""
+        return [
+            {'file': fn, 'server_names': list(site['server_names']), 'ports': list(site['ports']),
+             'roots': list(site['roots']), 'enabled': fn in self._enabled}
+            for fn, site in sorted(self._sites.items())
+        ]
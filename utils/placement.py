@@ -0,0 +1,67 @@
+"""
+Deployment placement across nodes.
+
+A node is a machine running a deploy worker (the bot itself, or deploy_worker.py) with
+its own NODE_NAME, SERVER_IP, nginx, pm2 and certbot. Each node reports its capacity —
+cores, 1-minute load, available/total memory, free ports in its pool — every few
+seconds into deploy_nodes. A new deploy is pinned to the node `choose_node` picks, and
+only that node's workers claim it. Rebuilds stay on the deployment's node. The DNS
+record points at the node's public IP.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import os
+
+
+def parse_meminfo(text: str) -> dict:
+    """{'mem_total', 'mem_available'} in bytes from /proc/meminfo content."""
+    values = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(':')
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            values[key.strip()] = int(parts[0]) * 1024
+    return {
+        'mem_total': values.get('MemTotal', 0),
+        'mem_available': values.get('MemAvailable', values.get('MemFree', 0)),
+    }
+
+
+def node_metrics(meminfo_path: str = '/proc/meminfo') -> dict:
+    """This machine's cpu_count, load_1m, mem_total and mem_available."""
+    try:
+        with open(meminfo_path) as f:
+            mem = parse_meminfo(f.read())
+    except OSError:
+        mem = {'mem_total': 0, 'mem_available': 0}
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        load = 0.0
+    return {'cpu_count': os.cpu_count() or 1, 'load_1m': round(load, 2), **mem}
+
+
+def score_node(node: dict) -> float:
+    """
+    Higher is better: the share of memory still available, plus the share of cores
+    left idle, minus one unit per job already running there.
+    """
+    mem_share = node['mem_available'] / node['mem_total'] if node.get('mem_total') else 0.0
+    cpus = max(1, node.get('cpu_count') or 1)
+    cpu_share = max(0.0, 1.0 - (node.get('load_1m') or 0.0) / cpus)
+    return mem_share + cpu_share - (node.get('running_jobs') or 0)
+
+
+def choose_node(nodes: list, mem_needed: int = 0) -> str | None:
+    """
+    Name of the best node for a new deployment among `nodes` (each {'name',
+    'cpu_count', 'load_1m', 'mem_total', 'mem_available', 'ports_free',
+    'running_jobs'}): it needs a free port and `mem_needed` bytes available. None
+    when no node qualifies. Ties go to the alphabetically first name.
+    """
+    fit = [n for n in nodes
+           if (n.get('ports_free') or 0) > 0 and (n.get('mem_available') or 0) >= mem_needed]
+    if not fit:
+        return None
+    return min(fit, key=lambda n: (-score_node(n), n['name']))['name']
@@ -0,0 +1,191 @@
+"""
+Per-deployment pm2 process profiles.
+
+A node deployment's process runs with a profile stored on its row
+(deployments.process_profile, JSON): how many instances, fork or cluster mode, the
+resident size at which pm2 restarts it, and the V8 heap limit. The defaults reproduce
+the historical single fork process (`pm2 start npm -- start`), so rows without a
+profile behave exactly as before.
+
+Cluster mode needs pm2 to run a node script itself — running npm under the cluster
+module would fork one npm per worker, each spawning an unclustered app that fights
+for the port. `cluster_entry` resolves the script behind `scripts.start` (`node
+server.js`, a node_modules/.bin tool such as `next start`, or `main`); when there is
+none the process falls back to a single fork. `instances: "max"` is sized to this
+node's cores, capped so max_memory_mb × instances fits the memory available.
+
+Processes are started with `--cwd <deploy_path>`. pm2 stores that path as given
+(it doesn't resolve symlinks), so behind a `current` symlink every reload spawns
+into wherever `current` points by then and a release switch needs no fresh start.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import json
+import os
+import shlex
+
+DEFAULT_PROFILE = {'instances': 1, 'exec_mode': 'fork', 'max_memory_mb': None, 'heap_mb': None}
+
+_MAX_INSTANCES = 64
+_MB_RANGE = (64, 65536)
+
+
+def _mb(value, field: str):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{field} must be an integer number of MB or null")
+    if not _MB_RANGE[0] <= value <= _MB_RANGE[1]:
+        raise ValueError(f"{field} must be between {_MB_RANGE[0]} and {_MB_RANGE[1]} MB")
+    return value
+
+
+def parse_profile(data: dict, base: dict | None = None) -> dict:
+    """
+    `data` (a partial profile from the API) merged over `base` (default: DEFAULT_PROFILE)
+    and validated. Asking for more than one instance without naming exec_mode implies
+    cluster mode. Raises ValueError with a message fit for a 400.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("process profile must be an object")
+    unknown = set(data) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"unknown profile field(s): {', '.join(sorted(unknown))}")
+    profile = {**DEFAULT_PROFILE, **(base or {}), **data}
+
+    instances = profile['instances']
+    if isinstance(instances, str) and instances.lower() == 'max':
+        instances = 'max'
+    elif isinstance(instances, bool) or not isinstance(instances, int) or not 1 <= instances <= _MAX_INSTANCES:
+        raise ValueError(f"instances must be 'max' or an integer from 1 to {_MAX_INSTANCES}")
+    profile['instances'] = instances
+
+    if 'exec_mode' not in data and 'instances' in data and instances != 1:
+        profile['exec_mode'] = 'cluster'
+    if profile['exec_mode'] not in ('fork', 'cluster'):
+        raise ValueError("exec_mode must be 'fork' or 'cluster'")
+    if profile['exec_mode'] == 'fork' and instances != 1:
+        raise ValueError("fork mode runs a single instance; use exec_mode 'cluster'")
+
+    profile['max_memory_mb'] = _mb(profile['max_memory_mb'], 'max_memory_mb')
+    profile['heap_mb'] = _mb(profile['heap_mb'], 'heap_mb')
+    if profile['heap_mb'] and profile['max_memory_mb'] and profile['heap_mb'] >= profile['max_memory_mb']:
+        raise ValueError("heap_mb must be below max_memory_mb, or pm2 restarts the app before V8 collects")
+    return profile
+
+
+def load_profile(raw) -> dict:
+    """The profile stored on a deployment row; defaults for NULL or an unreadable value."""
+    if isinstance(raw, dict):
+        data = raw
+    else:
+        try:
+            data = json.loads(raw) if raw else {}
+        except ValueError:
+            data = {}
+    try:
+        return parse_profile(data)
+    except ValueError:
+        return dict(DEFAULT_PROFILE)
+
+
+def resolve_instances(profile: dict, cpu_count: int, mem_available: int = 0) -> int:
+    """
+    Worker count for `profile` on a node with `cpu_count` cores and `mem_available`
+    bytes free: 'max' is one per core, capped by how many max_memory_mb workers fit.
+    """
+    instances = profile.get('instances', 1)
+    if instances != 'max':
+        return instances
+    n = max(1, cpu_count or 1)
+    if profile.get('max_memory_mb') and mem_available:
+        n = min(n, mem_available // (profile['max_memory_mb'] * 1024 * 1024))
+    return max(1, n)
+
+
+def cluster_entry(pkg: dict, local_bins=()) -> tuple[str, list, list] | None:
+    """
+    (script, node flags, script args) pm2 can run in cluster mode for a package.json,
+    from `scripts.start` (`node [flags] file [args]`, or a tool in node_modules/.bin
+    named in `local_bins`) or else `main`. None when neither gives a runnable script.
+    """
+    start = ((pkg or {}).get('scripts') or {}).get('start')
+    if start:
+        if any(op in start for op in ('&&', '||', ';', '|', '$(', '`')):
+            return None
+        try:
+            words = shlex.split(start)
+        except ValueError:
+            return None
+        while words and '=' in words[0] and not words[0].startswith('-'):
+            words = words[1:]                # leading VAR=value assignments
+        if not words:
+            return None
+        if words[0] in ('node', 'nodejs'):
+            flags = []
+            rest = words[1:]
+            while rest and rest[0].startswith('-'):
+                flags.append(rest.pop(0))
+            return (rest[0], flags, rest[1:]) if rest else None
+        if words[0] in local_bins:
+            return f"node_modules/.bin/{words[0]}", [], words[1:]
+        return None
+    main = (pkg or {}).get('main')
+    return (main, [], []) if main else None
+
+
+def start_command(pm2_name: str, profile: dict, instances: int = 1, entry=None,
+                  cwd: str | None = None) -> list:
+    """
+    argv that starts `pm2_name` under `profile`: cluster mode over `entry` (from
+    cluster_entry) with `instances` workers, or the classic `pm2 start npm -- start`.
+    `cwd` is passed as --cwd so pm2 keeps the unresolved (symlink) path.
+    """
+    opts = ['--max-memory-restart', f"{profile['max_memory_mb']}M"] if profile.get('max_memory_mb') else []
+    if cwd:
+        opts += ['--cwd', cwd]
+    if profile.get('exec_mode') == 'cluster' and entry:
+        script, flags, args = entry
+        cmd = ['pm2', 'start', script, '--name', pm2_name, '-i', str(instances)] + opts
+        if flags:
+            cmd += ['--node-args', ' '.join(flags)]
+        return cmd + (['--', *args] if args else [])
+    return ['pm2', 'start', 'npm', '--name', pm2_name] + opts + ['--', 'start']
+
+
+def launch_env(profile: dict, port: int | None = None) -> dict | None:
+    """Environment for starting or reloading with --update-env: PORT and the heap flag."""
+    env = {}
+    if port:
+        env['PORT'] = str(port)
+    if profile.get('heap_mb'):
+        env['NODE_OPTIONS'] = f"--max-old-space-size={profile['heap_mb']}"
+    return env or None
+
+
+def apply_action(profile: dict, instances: int, procs: list, entry=None, cwd: str | None = None) -> str:
+    """
+    How to bring the running `procs` (pm2 jlist entries sharing the name) in line with
+    `profile`: 'start' (none running), 'recreate' (mode or memory limit changed, or the
+    process was started from another directory than `cwd` — all of which pm2 only
+    picks up on a fresh start), 'scale' (cluster worker count changed) or 'reload'.
+
+    A process started with --cwd `cwd` reloads into the release `current` points at
+    now, so a release switch alone stays a reload. One pinned to a resolved release
+    directory (started before --cwd was passed) is recreated once onto `cwd`.
+    """
+    if not procs:
+        return 'start'
+    env = procs[0].get('pm2_env', {}) or {}
+    if cwd and env.get('pm_cwd') and os.path.normpath(env['pm_cwd']) != os.path.normpath(cwd):
+        return 'recreate'
+    mode = 'cluster' if profile.get('exec_mode') == 'cluster' and entry else 'fork'
+    if env.get('exec_mode', 'fork_mode') != f"{mode}_mode":
+        return 'recreate'
+    want_memory = (profile.get('max_memory_mb') or 0) * 1024 * 1024
+    if int(env.get('max_memory_restart') or 0) != want_memory:
+        return 'recreate'
+    if mode == 'cluster' and len(procs) != instances:
+        return 'scale'
+    return 'reload'
@@ -0,0 +1,107 @@
+"""
+In-memory port allocator for node deployments.
+
+One bit per port in DEPLOYMENT_PORT_MIN..MAX, held in a Python int: allocating is
+"lowest clear bit" (`free & -free`) and reserve/release are single bit operations, so a
+deploy no longer rereads every nginx config to pick a port. The pool is rebuilt from the
+DB and nginx at startup and reconciled periodically; between reconciles it is the only
+thing consulted.
+
+A port can be handed out on a lease: it stays reserved until `confirm` (the deploy went
+live) or `release`, and returns to the pool by itself once the lease expires, so a
+deploy that dies without cleaning up can't leak its port.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import time
+
+
+class PortPool:
+    def __init__(self, min_port: int, max_port: int):
+        self.min_port = min_port
+        self.max_port = max_port
+        self._size = max(0, max_port - min_port + 1)
+        self._full = (1 << self._size) - 1
+        self._used = 0
+        # port → (owner, monotonic expiry) for ports handed out but not yet confirmed.
+        self._leases: dict[int, tuple[str, float]] = {}
+
+    def _bit(self, port: int) -> int:
+        if port is None or not self.min_port <= port <= self.max_port:
+            return 0
+        return 1 << (port - self.min_port)
+
+    def _ports(self, bits: int) -> set[int]:
+        ports = set()
+        while bits:
+            low = bits & -bits
+            ports.add(self.min_port + low.bit_length() - 1)
+            bits ^= low
+        return ports
+
+    def is_free(self, port: int) -> bool:
+        bit = self._bit(port)
+        return bool(bit) and not self._used & bit
+
+    def mark_used(self, port: int):
+        """Record a port as taken (outside the range is ignored)."""
+        self._used |= self._bit(port)
+
+    def release(self, port: int):
+        """Return a port to the pool, dropping any lease on it."""
+        self._leases.pop(port, None)
+        self._used &= ~self._bit(port)
+
+    def allocate(self, owner: str, ttl: float | None = None, now: float | None = None) -> int | None:
+        """
+        Take the lowest free port; None when the range is exhausted. With `ttl`, the
+        port is leased to `owner` and freed again after `ttl` seconds unless confirmed.
+        """
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+        free = ~self._used & self._full
+        if not free:
+            return None
+        low = free & -free
+        self._used |= low
+        port = self.min_port + low.bit_length() - 1
+        if ttl is not None:
+            self._leases[port] = (owner, now + ttl)
+        return port
+
+    def confirm(self, port: int):
+        """Turn a leased port into a permanent reservation."""
+        self._leases.pop(port, None)
+
+    def expire(self, now: float | None = None) -> list[int]:
+        """Free every lease past its expiry. Returns the ports freed."""
+        now = time.monotonic() if now is None else now
+        expired = [p for p, (_, until) in self._leases.items() if until <= now]
+        for port in expired:
+            self.release(port)
+        return expired
+
+    def reconcile(self, used, now: float | None = None) -> tuple[set[int], set[int]]:
+        """
+        Reset the bitmap to `used` (ports the DB and nginx say are taken) plus live
+        leases. Returns (ports newly marked used, ports freed) — i.e. the drift.
+        """
+        self.expire(now)
+        target = 0
+        for port in used:
+            target |= self._bit(port)
+        for port in self._leases:
+            target |= self._bit(port)
+        added, freed = target & ~self._used, self._used & ~target
+        self._used = target
+        return self._ports(added), self._ports(freed)
+
+    def stats(self) -> dict:
+        used = self._used.bit_count()
+        return {
+            'range': [self.min_port, self.max_port],
+            'used': used,
+            'free': self._size - used,
+            'leased': {p: owner for p, (owner, _) in self._leases.items()},
+        }
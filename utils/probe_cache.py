@@ -0,0 +1,42 @@
+"""
+Last-known results of per-deployment status probes (pm2, http, ssl, dns).
+
+Each result is stored with the monotonic time it was measured, so a status request can
+serve a probe from memory while it's younger than that probe's max age and report how
+old every value it returns is. Some probes change quickly (pm2 jlist), others are slow
+and change rarely (certbot), so each kind gets its own max age.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import time
+
+
+class ProbeCache:
+    def __init__(self, max_age: dict):
+        self.max_age = dict(max_age)     # probe name → seconds a result stays servable
+        # (key, probe) → (measured at, value)
+        self._results: dict[tuple, tuple[float, object]] = {}
+
+    def put(self, key: str, probe: str, value, now: float | None = None):
+        self._results[(key, probe)] = (time.monotonic() if now is None else now, value)
+
+    def get(self, key: str, probe: str, now: float | None = None):
+        """(value, age in seconds) for the last result regardless of age; None if never measured."""
+        hit = self._results.get((key, probe))
+        if hit is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return hit[1], max(0.0, now - hit[0])
+
+    def fresh(self, key: str, probe: str, now: float | None = None):
+        """Like get(), but None once the result is older than the probe's max age."""
+        hit = self.get(key, probe, now)
+        if hit is None or hit[1] > self.max_age.get(probe, 0.0):
+            return None
+        return hit
+
+    def drop(self, key: str):
+        """Forget every probe result for `key` (deployment deleted)."""
+        for k in [k for k in self._results if k[0] == key]:
+            del self._results[k]
@@ -0,0 +1,170 @@
+"""
+Uptime and latency statistics over stored watchdog probes.
+
+Every watchdog probe is stored with its outcome, HTTP latency and the interval the
+schedule chose until the next probe of that target (utils.watch_schedule). Probes are
+not evenly spaced — a failing target is probed four times as often as a healthy one —
+so uptime is time-weighted: each result is taken to hold until the next probe, and
+uptime % is healthy seconds over observed seconds, not a share of probe counts.
+
+Raw probes are summarised exactly. Hourly rollups (`rollup`) keep a latency histogram
+over fixed buckets instead of percentiles, because percentiles of different hours
+can't be combined; `histogram_percentile` reads p50/p95/p99 back from merged hours,
+interpolating inside the bucket.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import bisect
+import json
+import math
+import time
+
+# Bucket upper bounds (ms); one more bucket counts everything slower.
+LATENCY_BUCKETS_MS = (25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 15000)
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_of(ms: float, bounds=LATENCY_BUCKETS_MS) -> int:
+    """Index of the first bucket whose upper bound is >= ms (len(bounds): overflow)."""
+    return bisect.bisect_left(bounds, ms)
+
+
+def latency_histogram(latencies, bounds=LATENCY_BUCKETS_MS) -> list:
+    """Counts per `bounds` bucket (plus overflow) for latencies in ms."""
+    counts = [0] * (len(bounds) + 1)
+    for ms in latencies:
+        if ms is not None:
+            counts[bucket_of(ms, bounds)] += 1
+    return counts
+
+
+def merge_histograms(histograms, bounds=LATENCY_BUCKETS_MS) -> list:
+    counts = [0] * (len(bounds) + 1)
+    for h in histograms:
+        for i, n in enumerate(h[:len(counts)]):
+            counts[i] += n
+    return counts
+
+
+def histogram_percentile(counts: list, pct: float, bounds=LATENCY_BUCKETS_MS) -> float | None:
+    """The pct-th latency (ms) from bucket counts, linear within a bucket; None if empty."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = total * pct / 100.0
+    seen = 0
+    for i, n in enumerate(counts):
+        if n and seen + n >= rank:
+            lo = bounds[i - 1] if i else 0
+            hi = bounds[i] if i < len(bounds) else bounds[-1]
+            return round(lo + (hi - lo) * (rank - seen) / n, 1)
+        seen += n
+    return float(bounds[-1])
+
+
+def _exact_percentile(ordered: list, pct: float) -> float | None:
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100.0
+    lo, hi = math.floor(rank), math.ceil(rank)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo), 1)
+
+
+def uptime_pct(up_s: float, down_s: float) -> float | None:
+    total = up_s + down_s
+    return round(100.0 * up_s / total, 3) if total > 0 else None
+
+
+def _weight(row: dict, now: float | None) -> float:
+    # A probe covers the interval until the next one; the newest probes are cut at `now`.
+    interval = float(row.get('interval_s') or 0)
+    if now is not None:
+        interval = max(0.0, min(interval, now - float(row['ts'])))
+    return interval
+
+
+def summarize_probes(rows: list, now: float | None = None) -> dict:
+    """
+    Raw probe rows ({'target', 'label', 'ok', 'latency_ms', 'interval_s', 'ts'}) →
+    {target: {'label', 'probes', 'failures', 'uptime_pct', 'p50_ms', 'p95_ms', 'p99_ms'}}.
+    """
+    now = time.time() if now is None else now
+    acc: dict[str, dict] = {}
+    for r in rows:
+        a = acc.setdefault(r['target'], {'label': r.get('label'), 'probes': 0, 'failures': 0,
+                                         'up': 0.0, 'down': 0.0, 'lat': []})
+        a['label'] = r.get('label') or a['label']
+        a['probes'] += 1
+        w = _weight(r, now)
+        if r['ok']:
+            a['up'] += w
+        else:
+            a['failures'] += 1
+            a['down'] += w
+        if r.get('latency_ms') is not None:
+            a['lat'].append(float(r['latency_ms']))
+    out = {}
+    for target, a in acc.items():
+        ordered = sorted(a['lat'])
+        out[target] = {'label': a['label'], 'probes': a['probes'], 'failures': a['failures'],
+                       'uptime_pct': uptime_pct(a['up'], a['down'])}
+        for pct in PERCENTILES:
+            out[target][f"p{pct}_ms"] = _exact_percentile(ordered, pct)
+    return out
+
+
+def rollup(rows: list, before: float | None = None) -> list:
+    """
+    Raw probe rows → hourly rows {'target', 'hour' (epoch), 'label', 'probes',
+    'failures', 'up_s', 'down_s', 'latency_hist' (JSON)} for hours ending by `before`.
+    """
+    hours: dict[tuple, dict] = {}
+    for r in rows:
+        hour = math.floor(float(r['ts']) / 3600) * 3600
+        if before is not None and hour + 3600 > before:
+            continue
+        h = hours.setdefault((r['target'], hour), {'label': r.get('label'), 'probes': 0,
+                                                   'failures': 0, 'up_s': 0.0, 'down_s': 0.0,
+                                                   'lat': []})
+        h['probes'] += 1
+        w = _weight(r, None)
+        if r['ok']:
+            h['up_s'] += w
+        else:
+            h['failures'] += 1
+            h['down_s'] += w
+        h['lat'].append(r.get('latency_ms'))
+    return [
+        {'target': target, 'hour': hour, 'label': h['label'], 'probes': h['probes'],
+         'failures': h['failures'], 'up_s': round(h['up_s']), 'down_s': round(h['down_s']),
+         'latency_hist': json.dumps(latency_histogram(h['lat']))}
+        for (target, hour), h in sorted(hours.items())
+    ]
+
+
+def summarize_hourly(rows: list) -> dict:
+    """Hourly rollup rows → the same per-target summary as summarize_probes."""
+    acc: dict[str, dict] = {}
+    for r in rows:
+        a = acc.setdefault(r['target'], {'label': r.get('label'), 'probes': 0, 'failures': 0,
+                                         'up': 0.0, 'down': 0.0, 'hists': []})
+        a['label'] = r.get('label') or a['label']
+        a['probes'] += int(r['probes'])
+        a['failures'] += int(r['failures'])
+        a['up'] += float(r['up_s'])
+        a['down'] += float(r['down_s'])
+        hist = r.get('latency_hist')
+        try:
+            a['hists'].append(json.loads(hist) if isinstance(hist, str) else hist or [])
+        except ValueError:
+            pass
+    out = {}
+    for target, a in acc.items():
+        counts = merge_histograms(a['hists'])
+        out[target] = {'label': a['label'], 'probes': a['probes'], 'failures': a['failures'],
+                       'uptime_pct': uptime_pct(a['up'], a['down'])}
+        for pct in PERCENTILES:
+            out[target][f"p{pct}_ms"] = histogram_percentile(counts, pct)
+    return out
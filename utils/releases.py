@@ -0,0 +1,162 @@
+"""
+Release-directory layout for deployments.
+
+A release-managed deployment lives under `/var/www/<name>/`:
+
+    releases/<UTC stamp>-<sha12>/   one immutable checkout + build per deploy/rebuild
+    shared/<dir>/                   state that must outlive a release (Laravel storage/)
+    current -> releases/<...>       what pm2 cwd, nginx roots and env edits resolve to
+
+Its `deploy_path` in the DB is `/var/www/<name>/current`, so everything that works on
+the path follows the symlink and a rollback is one atomic rename. Legacy deployments
+whose `deploy_path` is a plain checkout are left as they are.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import hashlib
+import os
+import shutil
+from datetime import datetime, timezone
+
+RELEASES_DIR = 'releases'
+SHARED_DIR   = 'shared'
+CURRENT_LINK = 'current'
+INCOMING     = '.incoming-'
+
+# Dependency directory → the lockfiles that pin its contents. Two releases whose
+# lockfiles are byte-identical can share the directory via hardlinks.
+LOCKFILES = {
+    'node_modules': ('package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml'),
+    'vendor':       ('composer.lock',),
+}
+
+
+def release_root(deploy_path: str) -> str | None:
+    """The site root for a release-managed `deploy_path` (`<root>/current`), else None."""
+    if not deploy_path:
+        return None
+    path = os.path.normpath(deploy_path)
+    if os.path.basename(path) != CURRENT_LINK:
+        return None
+    return os.path.dirname(path)
+
+
+def release_name(sha: str, now: datetime | None = None) -> str:
+    """`<UTC stamp>-<sha12>`: sorts chronologically and still names the commit."""
+    now = now or datetime.now(timezone.utc)
+    return f"{now.strftime('%Y%m%dT%H%M%S')}-{sha[:12]}"
+
+
+def release_sha(name: str) -> str:
+    """The short SHA a release directory was built from."""
+    return name.rsplit('-', 1)[-1]
+
+
+def list_releases(root: str) -> list[str]:
+    """Release names under `root`, newest first. In-flight `.incoming-*` dirs are skipped."""
+    base = os.path.join(root, RELEASES_DIR)
+    try:
+        names = os.listdir(base)
+    except OSError:
+        return []
+    return sorted(
+        (n for n in names if not n.startswith('.') and os.path.isdir(os.path.join(base, n))),
+        reverse=True,
+    )
+
+
+def current_release(root: str) -> str | None:
+    """Name of the release `current` points at, or None when it isn't a symlink."""
+    try:
+        return os.path.basename(os.path.normpath(os.readlink(os.path.join(root, CURRENT_LINK))))
+    except OSError:
+        return None
+
+
+def previous_release(releases: list[str], current: str | None) -> str | None:
+    """The newest release older than `current` — the default rollback target."""
+    older = [n for n in releases if current is None or n < current]
+    return older[0] if older else None
+
+
+def switch_current(root: str, name: str):
+    """Atomically repoint `current` at releases/<name>: build the new link beside it, then
+    rename over the old one, so readers only ever see the old or the new target."""
+    link = os.path.join(root, CURRENT_LINK)
+    tmp = f"{link}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    # Relative target keeps the tree relocatable (and readable in `ls -l`).
+    os.symlink(os.path.join(RELEASES_DIR, name), tmp)
+    os.replace(tmp, link)
+
+
+def lockfile_digest(path: str, dep_dir: str) -> str | None:
+    """sha256 over the lockfiles that pin `dep_dir` in `path`; None when there are none."""
+    h = hashlib.sha256()
+    found = False
+    for name in LOCKFILES.get(dep_dir, ()):
+        try:
+            with open(os.path.join(path, name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        found = True
+        h.update(name.encode() + b'\0' + data + b'\0')
+    return h.hexdigest() if found else None
+
+
+def share_dependencies(src: str, dst: str, dep_dir: str) -> bool:
+    """
+    Hardlink `src/<dep_dir>` into `dst` when both releases' lockfiles match.
+
+    Returns True when shared, so the caller can skip the install. Tool caches
+    (`.cache`) are left out: builds write into them, which through a hardlink
+    would mutate the older, supposedly immutable release.
+    """
+    src_deps = os.path.join(src, dep_dir)
+    dst_deps = os.path.join(dst, dep_dir)
+    if not os.path.isdir(src_deps) or os.path.lexists(dst_deps):
+        return False
+    digest = lockfile_digest(src, dep_dir)
+    if digest is None or digest != lockfile_digest(dst, dep_dir):
+        return False
+    shutil.copytree(src_deps, dst_deps, symlinks=True, copy_function=os.link,
+                    ignore=shutil.ignore_patterns('.cache'))
+    return True
+
+
+def link_shared(root: str, release: str, name: str):
+    """
+    Replace `release/<name>` with a symlink to `root/shared/<name>`.
+
+    The first release to call this seeds the shared copy from its own directory,
+    so state written before the switch to releases (uploads, sessions) carries over.
+    """
+    shared = os.path.join(root, SHARED_DIR, name)
+    target = os.path.join(release, name)
+    if not os.path.lexists(shared):
+        os.makedirs(os.path.dirname(shared), exist_ok=True)
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.move(target, shared)
+        else:
+            os.makedirs(shared)
+    elif os.path.islink(target) or os.path.isfile(target):
+        os.remove(target)
+    elif os.path.isdir(target):
+        shutil.rmtree(target)
+    if not os.path.lexists(target):
+        os.symlink(shared, target)
+
+
+def prune_releases(root: str, keep: int) -> list[str]:
+    """Delete all but the `keep` newest releases (never the current one). Returns removed names."""
+    current = current_release(root)
+    removed = []
+    for name in list_releases(root)[max(keep, 1):]:
+        if name == current:
+            continue
+        shutil.rmtree(os.path.join(root, RELEASES_DIR, name), ignore_errors=True)
+        removed.append(name)
+    return removed
@@ -0,0 +1,91 @@
+"""
+Single-flight snapshots for expensive control-plane reads.
+
+The server overview, server discovery and per-deployment status/diagnostics each run
+subprocesses (pm2 jlist, certbot, du, tail) and call Cloudflare. Several dashboard tabs
+refreshing together would start the same work several times over. `SnapshotCache.get`
+runs at most one computation per key at a time: concurrent callers await the same
+task. The result is kept as a snapshot for the key kind's max age (the kind is the
+key up to the first ':', e.g. 'status' for 'status:<uuid>'). Callers can ask for
+`fresh` to skip the snapshot; they still join a computation already in flight, which
+is no older than their request.
+
+Every result carries the wall-clock time it was computed (`as_of`) so clients can
+tell how old what they're shown is. `last_read` lets a background task `refresh` a
+snapshot only while someone is actually reading it.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import asyncio
+import time
+
+
+class SnapshotCache:
+    def __init__(self, max_age: dict):
+        self.max_age = dict(max_age)          # key kind → seconds a snapshot stays servable
+        # key → (monotonic computed at, wall-clock computed at, value)
+        self._snapshots: dict[str, tuple[float, float, object]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._read: dict[str, float] = {}
+
+    @staticmethod
+    def kind(key: str) -> str:
+        return key.split(':', 1)[0]
+
+    def peek(self, key: str, now: float | None = None):
+        """(value, as_of, age) of the stored snapshot regardless of age; None if there is none."""
+        hit = self._snapshots.get(key)
+        if hit is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return hit[2], hit[1], max(0.0, now - hit[0])
+
+    def fresh(self, key: str, now: float | None = None):
+        """Like peek(), but None once the snapshot is older than its kind's max age."""
+        hit = self.peek(key, now)
+        if hit is None or hit[2] > self.max_age.get(self.kind(key), 0.0):
+            return None
+        return hit
+
+    def put(self, key: str, value, now: float | None = None, wall: float | None = None):
+        self._snapshots[key] = (time.monotonic() if now is None else now,
+                                time.time() if wall is None else wall, value)
+
+    def drop(self, key: str):
+        """Forget `key`'s snapshot (its data changed); a computation in flight still finishes."""
+        self._snapshots.pop(key, None)
+
+    def last_read(self, key: str) -> float | None:
+        """Monotonic time `key` was last requested through get(), None if never."""
+        return self._read.get(key)
+
+    async def get(self, key: str, compute, fresh: bool = False) -> tuple:
+        """
+        (value, as_of, age) for `key`: the snapshot while it's within max age (unless
+        `fresh`), else the result of `compute()` — shared with every concurrent caller.
+        """
+        now = time.monotonic()
+        self._read[key] = now
+        if not fresh:
+            hit = self.fresh(key, now)
+            if hit is not None:
+                return hit
+        return await self.refresh(key, compute)
+
+    async def refresh(self, key: str, compute) -> tuple:
+        """Recompute `key` now (joining a computation in flight) without counting as a read."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._run(key, compute))
+        # shield: one caller going away (client disconnect) must not cancel the others'.
+        value, as_of = await asyncio.shield(task)
+        return value, as_of, max(0.0, time.time() - as_of)
+
+    async def _run(self, key: str, compute):
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value, self._snapshots[key][1]
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,72 @@
+"""
+Socket counts from /proc/net without enumerating connections.
+
+`psutil.net_connections()` builds an object per socket and maps every socket inode
+to its pid by listing each process's fds — seconds of CPU on a proxy with thousands
+of connections. The kernel already keeps totals in /proc/net/sockstat{,6}; per-state
+TCP counts only need the state column of /proc/net/tcp{,6}, with no pid lookup.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import os
+
+# /proc/net/tcp `st` column (include/net/tcp_states.h)
+_ESTABLISHED = '01'
+_TIME_WAIT = '06'
+_LISTEN = '0A'
+
+
+def parse_sockstat(text: str) -> dict:
+    """{'TCP': {'inuse': n, 'tw': n, ...}, 'UDP': {...}, ...} from sockstat(6) content."""
+    out = {}
+    for line in text.splitlines():
+        proto, _, rest = line.partition(':')
+        fields = rest.split()
+        out[proto.strip()] = {
+            k: int(v) for k, v in zip(fields[::2], fields[1::2]) if v.isdigit()
+        }
+    return out
+
+
+def count_tcp_states(lines) -> dict:
+    """{'established', 'time_wait', 'listen'} from /proc/net/tcp(6) lines (header skipped)."""
+    counts = {_ESTABLISHED: 0, _TIME_WAIT: 0, _LISTEN: 0}
+    for line in lines:
+        fields = line.split(None, 4)
+        if len(fields) > 3 and fields[3] in counts:
+            counts[fields[3]] += 1
+    return {'established': counts[_ESTABLISHED], 'time_wait': counts[_TIME_WAIT],
+            'listen': counts[_LISTEN]}
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def connection_counts(proc_root: str = '/proc') -> dict:
+    """
+    {'connections', 'established', 'time_wait', 'listen'} for IPv4 + IPv6.
+    connections matches what len(psutil.net_connections()) counted: TCP and UDP
+    sockets in use plus TCP sockets in TIME_WAIT.
+    """
+    v4 = parse_sockstat(_read(os.path.join(proc_root, 'net', 'sockstat')))
+    v6 = parse_sockstat(_read(os.path.join(proc_root, 'net', 'sockstat6')))
+    total = v4.get('TCP', {}).get('tw', 0)      # sockstat's tw covers both families
+    for stats, protos in ((v4, ('TCP', 'UDP')), (v6, ('TCP6', 'UDP6'))):
+        total += sum(stats.get(p, {}).get('inuse', 0) for p in protos)
+
+    states = {'established': 0, 'time_wait': 0, 'listen': 0}
+    for name in ('tcp', 'tcp6'):
+        try:
+            with open(os.path.join(proc_root, 'net', name)) as f:
+                next(f, None)
+                for k, v in count_tcp_states(f).items():
+                    states[k] += v
+        except OSError:
+            continue
+    return {'connections': total, **states}
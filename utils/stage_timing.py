@@ -0,0 +1,101 @@
+"""
+Per-stage timing for deploy and rebuild runs.
+
+Each run records spans — {stage, start offset, seconds, ok} — for the canonical stages
+below, and stores them with its deployment_logs row as JSON
+({'kind', 'stack', 'spans'}). `summarize` turns recent runs into p50/p95 per stage per
+stack, which is what /api/deploy/timings serves: enough to tell whether slow deploys
+come from npm, certbot or DNS, and to spot a regression after a change.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import contextlib
+import json
+import math
+import time
+
+STAGES = ('git', 'install', 'build', 'nginx', 'dns', 'certbot', 'pm2', 'health')
+
+
+class StageSpans:
+    def __init__(self):
+        self._t0 = time.monotonic()
+        self.spans: list[dict] = []
+
+    @contextlib.contextmanager
+    def span(self, stage: str):
+        """Time the enclosed block as `stage`; a block that raises is recorded with ok=False."""
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.spans.append({
+                'stage': stage,
+                'start': round(started - self._t0, 3),
+                'seconds': round(time.monotonic() - started, 3),
+                'ok': ok,
+            })
+
+    def timed(self, stage: str, fn):
+        """Wrap an async stage function so each call is recorded as a `stage` span."""
+        async def _timed():
+            with self.span(stage):
+                await fn()
+        return _timed
+
+    def dump(self, kind: str, stack: str | None) -> str:
+        return json.dumps({'kind': kind, 'stack': stack, 'spans': self.spans})
+
+
+def stage_totals(spans: list) -> dict:
+    """Seconds per stage for one run; a stage recorded more than once (nginx) is summed."""
+    totals: dict[str, float] = {}
+    for s in spans:
+        totals[s['stage']] = totals.get(s['stage'], 0.0) + s['seconds']
+    return totals
+
+
+def percentile(values: list, pct: float) -> float | None:
+    """Linear-interpolated percentile (pct in 0..100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lo, hi = math.floor(rank), math.ceil(rank)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+def summarize(records: list, kind: str | None = None) -> dict:
+    """
+    {stack: {stage: {'runs', 'p50', 'p95'}}} over stored timing records (JSON strings
+    or dicts, as written by StageSpans.dump). Only spans that completed (ok) count, and
+    only records of `kind` when given. Unparseable records are skipped.
+    """
+    samples: dict[str, dict[str, list]] = {}
+    for rec in records:
+        if isinstance(rec, str):
+            try:
+                rec = json.loads(rec)
+            except ValueError:
+                continue
+        if not isinstance(rec, dict) or (kind and rec.get('kind') != kind):
+            continue
+        done = [s for s in rec.get('spans') or [] if s.get('ok')]
+        stack = rec.get('stack') or 'unknown'
+        for stage, seconds in stage_totals(done).items():
+            samples.setdefault(stack, {}).setdefault(stage, []).append(seconds)
+    order = {name: i for i, name in enumerate(STAGES)}
+    return {
+        stack: {
+            stage: {
+                'runs': len(vals),
+                'p50': round(percentile(vals, 50), 2),
+                'p95': round(percentile(vals, 95), 2),
+            }
+            for stage, vals in sorted(stages.items(), key=lambda kv: (order.get(kv[0], len(order)), kv[0]))
+        }
+        for stack, stages in sorted(samples.items())
+    }
@@ -0,0 +1,55 @@
+"""
+Per-target probe schedule for the health watchdog.
+
+Every target carries its own next-probe time instead of all of them being probed on
+one fixed tick. A target that is failing (or debouncing towards "down") is re-probed
+every `fast` seconds, so an outage is confirmed — and a recovery noticed — quickly.
+A healthy target is probed every `base` seconds, and every `slow` seconds once it has
+been healthy for `stable_after`. The watchdog loop ticks at the fast interval and
+only probes what is due.
+
+Kept dependency-free (stdlib only) so tests/test_logic.py can import the real logic.
+"""
+
+import time
+
+
+class WatchSchedule:
+    def __init__(self, base: float = 60.0, fast: float = 15.0, slow: float = 300.0,
+                 stable_after: float = 1800.0):
+        self.base = base
+        self.fast = fast
+        self.slow = slow
+        self.stable_after = stable_after
+        self._next: dict[str, float] = {}
+        self._healthy_since: dict[str, float] = {}
+
+    def due(self, keys, now: float | None = None) -> list:
+        """The `keys` whose next probe time has come; never-probed keys are due."""
+        now = time.monotonic() if now is None else now
+        return [k for k in keys if self._next.get(k, now) <= now]
+
+    def record(self, key: str, healthy: bool, now: float | None = None) -> float:
+        """Note a probe result and schedule the next probe; returns the interval chosen."""
+        now = time.monotonic() if now is None else now
+        if not healthy:
+            self._healthy_since.pop(key, None)
+            interval = self.fast
+        else:
+            since = self._healthy_since.setdefault(key, now)
+            interval = self.slow if now - since >= self.stable_after else self.base
+        self._next[key] = now + interval
+        return interval
+
+    def retain(self, keys):
+        """Forget targets that no longer exist."""
+        keep = set(keys)
+        for table in (self._next, self._healthy_since):
+            for k in [k for k in table if k not in keep]:
+                del table[k]
+
+    def next_in(self, key: str, now: float | None = None) -> float | None:
+        """Seconds until `key` is due again (None: never probed)."""
+        now = time.monotonic() if now is None else now
+        at = self._next.get(key)
+        return None if at is None else max(0.0, at - now)